@@ -0,0 +1,216 @@
+"""
+Vendor Analytics
+Prarthi ERP System
+
+Rollup tables behind the Analytics dashboard: vendors and their credit
+limits by category, state, MSME status and status, vendors by month
+registered, and material received per month by vendor category. The
+dashboard reads only analytics_rollups, a few hundred rows however many
+vendors, POs and MRVs there are.
+
+Vendor rollups are refreshed incrementally from the vendor change feed.
+refresh() reads the feed after its own cursor (the analytics_cursor
+counter) and, for each changed vendor, subtracts what the vendor added last
+time (kept in vendor_analytics) and adds what it adds now, so a refresh
+costs O(changes) and applying a vendor twice changes nothing. The receipts
+rollup is updated on write, by post_receipt, under the vendor's category at
+the time of the receipt; the receipt keeps that category, so a rebuild
+counts it under the same one.
+
+The first refresh builds everything from the tables. Run rebuild again if
+the change feed was pruned past the analytics cursor or after restoring a
+backup.
+
+Usage:
+    python analytics.py refresh
+    python analytics.py rebuild
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+
+from change_feed import CHANGE_BATCH, changes_since, latest_cursor
+from database import (AnalyticsRollup, MaterialReceipt, Vendor, VendorAnalytics, add_to_rollup, adjust_counter,
+                      read_counter)
+
+CURSOR_COUNTER = "analytics_cursor"
+
+# Rollups of where vendors stand now (period ""); "registrations" is by month registered
+VENDOR_DIMENSIONS = ["category", "state", "msme", "status"]
+PROFILE_FIELDS = VENDOR_DIMENSIONS + ["registered", "credit_limit"]
+PROFILE_COLUMNS = (Vendor.id, Vendor.vendor_category, Vendor.state, Vendor.is_msme, Vendor.msme_category,
+                   Vendor.status, Vendor.created_at, Vendor.credit_limit)
+UNCATEGORISED = "Uncategorised"
+
+# Vendors per IN (...) lookup, and vendor rows per INSERT batch in rebuild
+VENDOR_CHUNK = 500
+REBUILD_CHUNK = 20_000
+
+
+def month(value):
+    """"2026-10" for a date or datetime in October 2026"""
+    return value.strftime("%Y-%m") if value else ""
+
+
+def vendor_profile(row):
+    """The values a vendor row is counted under"""
+    return {
+        "category": row.vendor_category or UNCATEGORISED,
+        "state": row.state or "Not given",
+        "msme": (row.msme_category or "MSME") if row.is_msme else "Not MSME",
+        "status": row.status or "Active",
+        "registered": month(row.created_at),
+        "credit_limit": row.credit_limit or 0,
+    }
+
+
+def contributions(profile):
+    """{(dimension, period, key): (records, amount)} one vendor adds to the rollups"""
+    if profile is None:
+        return {}
+    added = {(dimension, "", profile[dimension]): (1, profile["credit_limit"]) for dimension in VENDOR_DIMENSIONS}
+    added[("registrations", profile["registered"], "")] = (1, profile["credit_limit"])
+    return added
+
+
+def _apply(session, deltas):
+    """Add {(dimension, period, key): [records, amount]} to the rollups, one upsert per row"""
+    for (dimension, period, key), (records, amount) in deltas.items():
+        if records or abs(amount) >= 0.005:
+            add_to_rollup(session, dimension, period, key, records, round(amount, 2))
+
+
+# ============ INCREMENTAL REFRESH ============
+def apply_vendors(session, vendor_ids):
+    """Bring the rollups up to date for these vendors. Returns how many of them had changed."""
+    deltas = defaultdict(lambda: [0, 0.0])
+    changed = 0
+    vendor_ids = list(vendor_ids)
+    for start in range(0, len(vendor_ids), VENDOR_CHUNK):
+        chunk = vendor_ids[start:start + VENDOR_CHUNK]
+        current = {row.id: vendor_profile(row)
+                   for row in session.execute(select(*PROFILE_COLUMNS).where(Vendor.id.in_(chunk)))}
+        previous = {row.vendor_id: {field: getattr(row, field) for field in PROFILE_FIELDS}
+                    for row in session.execute(select(VendorAnalytics.__table__)
+                                               .where(VendorAnalytics.vendor_id.in_(chunk)))}
+        moved = [vendor_id for vendor_id in chunk if previous.get(vendor_id) != current.get(vendor_id)]
+        if not moved:
+            continue
+        for vendor_id in moved:
+            for key, (records, amount) in contributions(previous.get(vendor_id)).items():
+                deltas[key][0] -= records
+                deltas[key][1] -= amount
+            for key, (records, amount) in contributions(current.get(vendor_id)).items():
+                deltas[key][0] += records
+                deltas[key][1] += amount
+        session.execute(delete(VendorAnalytics).where(VendorAnalytics.vendor_id.in_(moved)))
+        rows = [dict(current[vendor_id], vendor_id=vendor_id) for vendor_id in moved if vendor_id in current]
+        if rows:
+            session.execute(insert(VendorAnalytics.__table__), rows)
+        changed += len(moved)
+    _apply(session, deltas)
+    return changed
+
+
+def needs_refresh(session):
+    """Whether the rollups are behind the vendor change feed or were never built"""
+    return (read_counter(session, CURSOR_COUNTER) < latest_cursor(session)
+            or session.scalar(select(AnalyticsRollup.dimension).limit(1)) is None)
+
+
+def refresh(session):
+    """Apply the vendor changes since the last refresh (or build everything the first time).
+    Returns how many vendors' figures changed."""
+    # The upsert locks the cursor row until commit, so a concurrent refresh waits and then
+    # starts after this one instead of applying the same changes again
+    started_at = adjust_counter(session, CURSOR_COUNTER, 0)
+    if not started_at and session.scalar(select(VendorAnalytics.vendor_id).limit(1)) is None:
+        return rebuild(session)
+    cursor, changed = started_at, 0
+    while True:
+        changes, next_cursor = changes_since(session, cursor, CHANGE_BATCH)
+        if next_cursor == cursor:
+            break
+        changed += apply_vendors(session, [change["vendor_id"] for change in changes])
+        cursor = next_cursor
+    adjust_counter(session, CURSOR_COUNTER, cursor - started_at)
+    return changed
+
+
+def add_receipt(session, category, receipt_date, amount):
+    """Count a posted MRV in the receipts rollup under the vendor category it was posted with"""
+    add_to_rollup(session, "receipts", month(receipt_date), category or UNCATEGORISED, 1, amount)
+
+
+# ============ REBUILD ============
+def rebuild(session):
+    """Recompute every rollup from the vendor and receipt tables. Returns the vendors counted."""
+    # Changes after this cursor are applied again by the next refresh, harmlessly
+    cursor = latest_cursor(session)
+    connection = session.connection()
+    connection.execute(delete(AnalyticsRollup))
+    connection.execute(delete(VendorAnalytics))
+
+    deltas = defaultdict(lambda: [0, 0.0])
+    vendors = 0
+    result = connection.execute(select(*PROFILE_COLUMNS).execution_options(yield_per=REBUILD_CHUNK))
+    for rows in result.partitions():
+        profiles = [dict(vendor_profile(row), vendor_id=row.id) for row in rows]
+        for profile in profiles:
+            for key, (records, amount) in contributions(profile).items():
+                deltas[key][0] += records
+                deltas[key][1] += amount
+        connection.execute(insert(VendorAnalytics.__table__), profiles)
+        vendors += len(profiles)
+
+    # Receipts are grouped by day in SQL and folded into months here, which works on any database.
+    # Each counts under the category it was posted with; receipts posted before receipts kept
+    # their category fall back to the vendor's current one.
+    posted_category = func.coalesce(MaterialReceipt.vendor_category, Vendor.vendor_category)
+    for category, receipt_date, records, amount in connection.execute(
+            select(posted_category, MaterialReceipt.receipt_date, func.count(MaterialReceipt.id),
+                   func.coalesce(func.sum(MaterialReceipt.total_amount), 0))
+            .outerjoin(Vendor, Vendor.id == MaterialReceipt.vendor_id)
+            .group_by(posted_category, MaterialReceipt.receipt_date)):
+        key = ("receipts", month(receipt_date), category or UNCATEGORISED)
+        deltas[key][0] += records
+        deltas[key][1] += amount
+    _apply(session, deltas)
+
+    adjust_counter(session, CURSOR_COUNTER, cursor - adjust_counter(session, CURSOR_COUNTER, 0))
+    return vendors
+
+
+# ============ READS ============
+def load_rollups(session):
+    """All rollup rows as a DataFrame (dimension, period, key, records, amount) and when they last changed"""
+    rows = session.execute(select(AnalyticsRollup.dimension, AnalyticsRollup.period, AnalyticsRollup.key,
+                                  AnalyticsRollup.records, AnalyticsRollup.amount)
+                           .where(AnalyticsRollup.records != 0)).all()
+    updated_at = session.scalar(select(func.max(AnalyticsRollup.updated_at)))
+    return pd.DataFrame(rows, columns=["dimension", "period", "key", "records", "amount"]), updated_at
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from database import write_session
+
+    parser = argparse.ArgumentParser(description="Vendor analytics rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("refresh", help="Apply vendor changes since the last refresh")
+    sub.add_parser("rebuild", help="Recompute every rollup from the tables")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with write_session() as session:
+        if args.command == "refresh":
+            print(f"{refresh(session):,} vendor(s) updated", end="")
+        else:
+            print(f"{rebuild(session):,} vendors counted", end="")
+    print(f" in {time.perf_counter() - started:.1f}s ({datetime.now():%d-%m-%Y %H:%M})")
@@ -4,9 +4,15 @@ Main Application Entry Point
 """
 
 import streamlit as st
-import bcrypt
 from datetime import datetime
-from database import SessionLocal, User, init_db
+from auth import check_login, client_ip, create_session, end_session, login, start_session, sync_session_cookie
+from database import read_session, write_session
+from duplicates import ensure_name_index
+from purchase_orders import pending_po_count
+from material_receipts import receipt_totals
+from vendor_search import ensure_search_index
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started
 
 st.set_page_config(
     page_title="Prarthi ERP",
@@ -15,8 +21,21 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize database
-init_db()
+track_page("Dashboard")
+page_started("Dashboard")
+
+
+@st.cache_resource(show_spinner=False)
+def backfill_indexes():
+    """Build the duplicate detection and search indexes for vendors created before they
+    existed. Cached, so it runs once per server process rather than on every rerun."""
+    with write_session() as session:
+        ensure_name_index(session)
+        ensure_search_index(session)
+    return True
+
+
+backfill_indexes()
 
 # Custom CSS
 st.markdown("""
@@ -49,40 +68,17 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-def verify_password(plain_password, hashed_password):
-    """Verify password against hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-
 def login_user(username, password):
-    """Authenticate user"""
-    session = SessionLocal()
-    user = session.query(User).filter(User.username == username).first()
-    
-    if user and verify_password(password, user.password_hash):
-        # Update last login
-        user.last_login = datetime.utcnow()
-        session.commit()
-        
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'full_name': user.full_name,
-            'role': user.role,
-            'department': user.department
-        }
-        session.close()
-        return user_data
-    
-    session.close()
-    return None
+    """Authenticate user and start a session; returns (user, session token, error)"""
+    with write_session() as session:
+        user, error = login(session, username, password, client_ip())
+        token = create_session(session, user) if user else None
+    return user, token, error
 
 
-# Initialize session state
-if 'authenticated' not in st.session_state:
-    st.session_state.authenticated = False
-if 'user' not in st.session_state:
-    st.session_state.user = None
+# Resume the login from the session token (also after a refresh or in a new tab)
+check_login()
+sync_session_cookie()
 
 
 # ============ LOGIN PAGE ============
@@ -104,13 +100,12 @@ if not st.session_state.authenticated:
             
             if submitted:
                 if username and password:
-                    user = login_user(username, password)
+                    user, token, error = login_user(username, password)
                     if user:
-                        st.session_state.authenticated = True
-                        st.session_state.user = user
+                        start_session(user, token)
                         st.rerun()
                     else:
-                        st.error("Invalid username or password")
+                        st.error(error)
                 else:
                     st.warning("Please enter username and password")
         
@@ -131,8 +126,7 @@ else:
         st.markdown("---")
         
         if st.button("🚪 Logout", use_container_width=True):
-            st.session_state.authenticated = False
-            st.session_state.user = None
+            end_session()
             st.rerun()
     
     # Main content
@@ -151,12 +145,13 @@ else:
     st.markdown("")
     
     # Quick stats
-    session = SessionLocal()
     from database import Vendor
     
-    total_vendors = session.query(Vendor).count()
-    active_vendors = session.query(Vendor).filter(Vendor.status == "Active").count()
-    session.close()
+    with read_session() as session:
+        total_vendors = session.query(Vendor).count()
+        active_vendors = session.query(Vendor).filter(Vendor.status == "Active").count()
+        pending_pos = pending_po_count(session)
+        mrv_count, mrv_value = receipt_totals(session)
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -164,9 +159,9 @@ else:
     with col2:
         st.metric("Active vendors", active_vendors)
     with col3:
-        st.metric("Pending POs", "0")
+        st.metric("Pending POs", pending_pos)
     with col4:
-        st.metric("Today's MRV", "0")
+        st.metric("Today's MRV", mrv_count, help=f"₹{mrv_value:,.2f} received today")
     
     st.markdown("---")
     
@@ -207,3 +202,7 @@ else:
     
     st.markdown("---")
     st.caption(f"© 2026 Prarthi Bhambere Limited. Last login: {datetime.now().strftime('%d %b %Y, %H:%M')}")
+
+    render_query_panel()
+
+page_finished()
@@ -0,0 +1,300 @@
+"""
+Login Sessions
+Prarthi ERP System
+
+Password checks and the session tokens that spare a browser from entering
+its password again. bcrypt runs only when a password is typed in; the login
+then issues a token, <session id>.<expiry>.<nonce>.<HMAC signature>, kept in
+session state and in a browser cookie, with its SHA-256 stored in
+user_sessions. Each page rerun checks the token with check_login(): the
+signature and expiry are checked in memory, and the session row in the
+database only when this app process has not confirmed the token within
+SESSION_CACHE_SECONDS. A refresh, a new tab or another app server therefore
+resumes the login without bcrypt, and a logout (revoked_at) reaches the
+other app servers within SESSION_CACHE_SECONDS.
+
+Wrong passwords are rate limited per username and per client address
+(login_failures), before bcrypt runs. A password hashed with another cost
+than BCRYPT_ROUNDS is rehashed at its next successful login.
+
+Usage:
+    python auth.py purge
+    python auth.py revoke USERNAME
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import bcrypt
+import streamlit as st
+import streamlit.components.v1 as components
+from sqlalchemy import delete, func, select, update
+
+from config import (BCRYPT_ROUNDS, LOGIN_LOCKOUT_MINUTES, LOGIN_MAX_FAILURES, LOGIN_MAX_FAILURES_PER_IP,
+                    SESSION_CACHE_SECONDS, SESSION_HOURS, SESSION_SECRET)
+from database import LoginFailure, User, UserSession, read_session, write_session
+
+SESSION_COOKIE = "prarthi_session"
+SECRET_FILE = "./data/session_secret"
+
+# Tokens remembered per app process
+CACHE_SIZE = 10_000
+
+_cache = OrderedDict()  # token hash -> (user, time.monotonic() until which it is trusted)
+_cache_lock = threading.Lock()
+_secret = None
+
+
+# ============ PASSWORDS ============
+def hash_password(password):
+    """bcrypt hash of a password at the configured cost"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8')
+
+
+def verify_password(plain_password, hashed_password):
+    """Verify password against hash"""
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def needs_rehash(hashed_password):
+    """Whether a hash was made with another cost than BCRYPT_ROUNDS ("$2b$12$..." has cost 12)"""
+    return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+
+
+def _user_dict(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'full_name': user.full_name,
+        'role': user.role,
+        'department': user.department
+    }
+
+
+def _locked_out(session, username, ip_address):
+    """Whether recent failures for this username or address block another attempt"""
+    since = datetime.utcnow() - timedelta(minutes=LOGIN_LOCKOUT_MINUTES)
+    failures = session.scalar(select(func.count(LoginFailure.id))
+                              .where(LoginFailure.username == username, LoginFailure.failed_at >= since))
+    if failures >= LOGIN_MAX_FAILURES:
+        return True
+    if not ip_address:
+        return False
+    return session.scalar(select(func.count(LoginFailure.id))
+                          .where(LoginFailure.ip_address == ip_address,
+                                 LoginFailure.failed_at >= since)) >= LOGIN_MAX_FAILURES_PER_IP
+
+
+def login(session, username, password, ip_address=None):
+    """Check a typed-in password. Returns (user dict, None) or (None, error)."""
+    if _locked_out(session, username, ip_address):
+        return None, f"Too many failed attempts. Please try again in {LOGIN_LOCKOUT_MINUTES} minutes."
+
+    user = session.query(User).filter(User.username == username).first()
+    if not user or not user.is_active or not verify_password(password, user.password_hash):
+        now = datetime.utcnow()
+        session.add(LoginFailure(username=username, ip_address=ip_address, failed_at=now))
+        # Failures older than the window no longer count
+        session.execute(delete(LoginFailure).where(LoginFailure.username == username,
+                                                   LoginFailure.failed_at < now - timedelta(minutes=LOGIN_LOCKOUT_MINUTES)))
+        return None, "Invalid username or password"
+
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    session.execute(delete(LoginFailure).where(LoginFailure.username == username))
+    # Update last login (committed with the caller's transaction)
+    user.last_login = datetime.utcnow()
+    return _user_dict(user), None
+
+
+# ============ TOKENS ============
+def _signing_key():
+    """PRARTHI_SESSION_SECRET, or a key generated once and kept in data/session_secret"""
+    global _secret
+    if _secret is None:
+        if SESSION_SECRET:
+            _secret = SESSION_SECRET.encode()
+        else:
+            if not os.path.exists(SECRET_FILE):
+                with open(SECRET_FILE, "w") as f:
+                    f.write(secrets.token_hex(32))
+            with open(SECRET_FILE) as f:
+                _secret = f.read().strip().encode()
+    return _secret
+
+
+def _sign(payload):
+    return hmac.new(_signing_key(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _session_id(token):
+    """Session id of a token signed by this app and not yet expired, or None"""
+    parts = token.split(".")
+    if len(parts) != 4 or not parts[0].isdigit() or not parts[1].isdigit():
+        return None
+    if not hmac.compare_digest(parts[3], _sign(token.rsplit(".", 1)[0])) or int(parts[1]) <= time.time():
+        return None
+    return int(parts[0])
+
+
+def _remember(digest, user):
+    with _cache_lock:
+        _cache[digest] = (user, time.monotonic() + SESSION_CACHE_SECONDS)
+        _cache.move_to_end(digest)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def create_session(session, user):
+    """Start a session for a logged-in user dict; returns its token"""
+    expires = int(time.time()) + SESSION_HOURS * 3600
+    row = UserSession(user_id=user['id'], token_hash="", expires_at=datetime.utcfromtimestamp(expires))
+    session.add(row)
+    session.flush()
+    payload = f"{row.id}.{expires}.{secrets.token_urlsafe(24)}"
+    token = f"{payload}.{_sign(payload)}"
+    row.token_hash = _token_hash(token)
+    # This user's sessions that have run out are no longer needed
+    session.execute(delete(UserSession).where(UserSession.user_id == user['id'],
+                                              UserSession.expires_at < datetime.utcnow()))
+    _remember(row.token_hash, user)
+    return token
+
+
+def _session_user(session, session_id, digest):
+    """User dict of a live session row matching the token, or None"""
+    row = session.execute(select(UserSession.token_hash, UserSession.expires_at, UserSession.revoked_at, User)
+                          .join(User, User.id == UserSession.user_id)
+                          .where(UserSession.id == session_id)).first()
+    if (row is None or row.revoked_at is not None or row.expires_at <= datetime.utcnow()
+            or not row.User.is_active or not hmac.compare_digest(row.token_hash, digest)):
+        return None
+    return _user_dict(row.User)
+
+
+def verify_token(token):
+    """User dict for a valid session token, or None. Costs a dictionary lookup while the token
+    is cached, otherwise one query."""
+    session_id = _session_id(token)
+    if session_id is None:
+        return None
+
+    digest = _token_hash(token)
+    with _cache_lock:
+        cached = _cache.get(digest)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    with read_session() as session:
+        user = _session_user(session, session_id, digest)
+    if user is None:
+        # A replica may not have a session created moments ago
+        with write_session() as session:
+            user = _session_user(session, session_id, digest)
+    if user is None:
+        with _cache_lock:
+            _cache.pop(digest, None)
+        return None
+    _remember(digest, user)
+    return user
+
+
+def revoke_session(token):
+    """End the session of a token (logout)"""
+    session_id = _session_id(token)
+    if session_id is not None:
+        with write_session() as session:
+            session.execute(update(UserSession)
+                            .where(UserSession.id == session_id, UserSession.token_hash == _token_hash(token))
+                            .values(revoked_at=datetime.utcnow()))
+    with _cache_lock:
+        _cache.pop(_token_hash(token), None)
+
+
+# ============ PAGES ============
+def check_login():
+    """Whether this browser is logged in, restoring session_state.user from the session token
+    (session state, or the cookie after a refresh, in a new tab or on another app server)"""
+    token = st.session_state.get('session_token') or st.context.cookies.get(SESSION_COOKIE)
+    user = verify_token(token) if token else None
+    st.session_state.authenticated = user is not None
+    st.session_state.user = user
+    st.session_state.session_token = token if user else None
+    return user is not None
+
+
+def start_session(user, token):
+    """Log this browser in; the cookie is written by sync_session_cookie() on the next run"""
+    st.session_state.authenticated = True
+    st.session_state.user = user
+    st.session_state.session_token = token
+    st.session_state.session_cookie = (token, SESSION_HOURS * 3600)
+
+
+def end_session():
+    """Log this browser out everywhere it holds the token"""
+    token = st.session_state.get('session_token') or st.context.cookies.get(SESSION_COOKIE)
+    if token:
+        revoke_session(token)
+    st.session_state.authenticated = False
+    st.session_state.user = None
+    st.session_state.session_token = None
+    st.session_state.session_cookie = ("", 0)
+
+
+def sync_session_cookie():
+    """Write (or clear) the session cookie after a login or logout. Streamlit cannot set cookies,
+    so a zero-height component sets it from the browser."""
+    pending = st.session_state.pop('session_cookie', None)
+    if pending is None:
+        return
+    token, max_age = pending
+    components.html(f"<script>window.parent.document.cookie = '{SESSION_COOKIE}={token}; path=/; "
+                    f"max-age={max_age}; SameSite=Strict';</script>", height=0)
+
+
+def client_ip():
+    """Address of the browser, when Streamlit knows it (not for localhost or in tests)"""
+    ip_address = st.context.ip_address
+    return ip_address if isinstance(ip_address, str) else None
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Login sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("purge", help="Delete ended sessions and login failures past the lockout window")
+    revoke = sub.add_parser("revoke", help="Log a user out of every browser (e.g. after a password change)")
+    revoke.add_argument("username")
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    with write_session() as session:
+        if args.command == "purge":
+            sessions = session.execute(delete(UserSession).where(
+                (UserSession.expires_at < now) | UserSession.revoked_at.is_not(None))).rowcount
+            failures = session.execute(delete(LoginFailure).where(
+                LoginFailure.failed_at < now - timedelta(minutes=LOGIN_LOCKOUT_MINUTES))).rowcount
+            print(f"Deleted {sessions:,} ended session(s) and {failures:,} old login failure(s)")
+        else:
+            user_id = session.scalar(select(User.id).where(User.username == args.username))
+            if user_id is None:
+                parser.error(f"No user {args.username}")
+            revoked = session.execute(update(UserSession)
+                                      .where(UserSession.user_id == user_id, UserSession.revoked_at.is_(None),
+                                             UserSession.expires_at > now)
+                                      .values(revoked_at=now)).rowcount
+            print(f"Revoked {revoked:,} session(s) of {args.username}; "
+                  f"other app servers drop them within {SESSION_CACHE_SECONDS}s")
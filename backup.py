@@ -0,0 +1,422 @@
+"""
+Online Backup
+Prarthi ERP System
+
+Snapshots the SQLite database and the vendor documents folder while the app
+is in use. The database is copied with SQLite's online backup API a few
+pages per step; in WAL mode the copy reads from one open read transaction,
+so it is consistent and writers keep committing throughout. Documents are
+stored once by SHA-256 in a shared blob folder, and each snapshot keeps a
+manifest of which file had which content.
+
+Layout of the backup folder:
+    snapshots/<YYYYMMDD-HHMMSS>/prarthi_erp.db
+    snapshots/<YYYYMMDD-HHMMSS>/manifest.json
+    documents/<ab>/<sha256>
+
+Usage:
+    python backup.py create
+    python backup.py list
+    python backup.py verify [SNAPSHOT]
+    python backup.py restore SNAPSHOT --database FILE --documents DIR
+    python backup.py schedule --every 6
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+from config import BACKUP_DIR, BACKUP_KEEP, DOCUMENTS_DIR
+
+# Database pages copied per backup step, and pause between steps to leave disk time for the app
+PAGES_PER_STEP = 1024
+STEP_PAUSE = 0.005
+
+# Read size when hashing files
+HASH_CHUNK = 1024 * 1024
+
+SNAPSHOT_DB = "prarthi_erp.db"
+MANIFEST = "manifest.json"
+
+
+# ============ PATHS ============
+def snapshots_dir(backup_dir=None):
+    return os.path.join(backup_dir or BACKUP_DIR, "snapshots")
+
+
+def blob_path(sha256, backup_dir=None):
+    """Where a document with this content is stored"""
+    return os.path.join(backup_dir or BACKUP_DIR, "documents", sha256[:2], sha256)
+
+
+def list_snapshots(backup_dir=None):
+    """Completed snapshot names, oldest first"""
+    folder = snapshots_dir(backup_dir)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder)
+                  if os.path.exists(os.path.join(folder, name, MANIFEST)))
+
+
+def load_manifest(name, backup_dir=None):
+    with open(os.path.join(snapshots_dir(backup_dir), name, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def database_path():
+    """File behind the app's database URL, or None if it is not SQLite"""
+    from database import DATABASE_URL
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return None
+    return os.path.abspath(url.database)
+
+
+def read_only_uri(path):
+    """sqlite3 URI opening a database file read-only"""
+    return Path(path).resolve().as_uri() + "?mode=ro"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ============ DATABASE ============
+def table_counts(connection):
+    """Row count of every table, used to check restores"""
+    tables = [row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    return {table: connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+def copy_database(source_path, target_path, pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """
+    Copy a live SQLite database with the online backup API.
+    Returns stats: pages, steps, seconds, whether the source uses WAL, and table row counts.
+    """
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(target_path)
+    steps = 0
+    total_pages = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps, total_pages
+        steps += 1
+        total_pages = total
+        if pause:
+            time.sleep(pause)
+
+    started = time.perf_counter()
+    try:
+        wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        if wal:
+            # Pin one snapshot for the whole copy. In WAL mode this does not block writers,
+            # and the copy never restarts because of their commits.
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        # Without WAL each step takes a short read lock; a commit in between makes SQLite
+        # restart the copy, so it can take longer on a busy database
+        source.backup(target, pages=pages, progress=progress)
+        if wal:
+            source.execute("COMMIT")
+        target.execute("PRAGMA journal_mode=DELETE")
+        counts = table_counts(target)
+    finally:
+        source.close()
+        target.close()
+    return {"pages": total_pages, "steps": steps, "seconds": round(time.perf_counter() - started, 3),
+            "wal": wal, "tables": counts}
+
+
+# ============ DOCUMENTS ============
+def document_manifest(documents_dir, previous=None, backup_dir=None):
+    """
+    {relative path: {sha256, bytes, mtime_ns}} for every document, storing new
+    content in the blob folder. Files unchanged since the previous manifest
+    (same size and mtime) are not re-hashed.
+    """
+    previous = previous or {}
+    manifest = {}
+    if not os.path.isdir(documents_dir):
+        return manifest
+    for folder, _, files in os.walk(documents_dir):
+        for filename in files:
+            path = os.path.join(folder, filename)
+            relative = os.path.relpath(path, documents_dir).replace(os.sep, "/")
+            stat = os.stat(path)
+            known = previous.get(relative)
+            if known and known["bytes"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+                sha256 = known["sha256"]
+            else:
+                sha256 = file_sha256(path)
+            blob = blob_path(sha256, backup_dir)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.copyfile(path, blob + ".partial")
+                os.replace(blob + ".partial", blob)
+            manifest[relative] = {"sha256": sha256, "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return manifest
+
+
+# ============ SNAPSHOTS ============
+def create_backup(source_path=None, documents_dir=None, backup_dir=None):
+    """
+    Snapshot the database, then the documents (so every document the copied
+    database refers to is included). Returns (manifest, error).
+    """
+    source_path = source_path or database_path()
+    if source_path is None:
+        return None, "Only SQLite databases can be backed up here; use pg_dump for PostgreSQL"
+    if not os.path.exists(source_path):
+        return None, f"Database not found: {source_path}"
+    documents_dir = documents_dir or DOCUMENTS_DIR
+
+    name = datetime.now().strftime("%Y%m%d-%H%M%S")
+    final_dir = os.path.join(snapshots_dir(backup_dir), name)
+    if os.path.exists(final_dir):
+        return None, f"Snapshot {name} already exists"
+    work_dir = final_dir + ".partial"
+    os.makedirs(work_dir, exist_ok=True)
+
+    try:
+        started = time.perf_counter()
+        copy = copy_database(source_path, os.path.join(work_dir, SNAPSHOT_DB))
+        snapshot_db = os.path.join(work_dir, SNAPSHOT_DB)
+        hash_started = time.perf_counter()
+        db_sha256 = file_sha256(snapshot_db)
+        hash_seconds = time.perf_counter() - hash_started
+
+        existing = list_snapshots(backup_dir)
+        previous = load_manifest(existing[-1], backup_dir)["documents"] if existing else {}
+        docs_started = time.perf_counter()
+        documents = document_manifest(documents_dir, previous, backup_dir)
+
+        manifest = {
+            "name": name,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "source": source_path,
+            "documents_dir": os.path.abspath(documents_dir),
+            "database": {
+                "file": SNAPSHOT_DB,
+                "bytes": os.path.getsize(snapshot_db),
+                "sha256": db_sha256,
+                "pages": copy["pages"],
+                "steps": copy["steps"],
+                "wal": copy["wal"],
+                "tables": copy["tables"],
+            },
+            "documents": documents,
+            "timings": {
+                "database_copy": copy["seconds"],
+                "database_hash": round(hash_seconds, 3),
+                "documents": round(time.perf_counter() - docs_started, 3),
+                "total": round(time.perf_counter() - started, 3),
+            },
+        }
+        with open(os.path.join(work_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(work_dir, final_dir)
+        return manifest, None
+    except (OSError, sqlite3.Error) as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return None, f"Backup failed: {e}"
+
+
+def rotate_backups(keep=None, backup_dir=None):
+    """Delete all but the newest keep snapshots and document blobs no snapshot uses. Returns removed names."""
+    keep = BACKUP_KEEP if keep is None else keep
+    names = list_snapshots(backup_dir)
+    removed = names[:-keep] if keep else names
+    for name in removed:
+        shutil.rmtree(os.path.join(snapshots_dir(backup_dir), name), ignore_errors=True)
+
+    used = {entry["sha256"] for name in list_snapshots(backup_dir)
+            for entry in load_manifest(name, backup_dir)["documents"].values()}
+    blobs = os.path.join(backup_dir or BACKUP_DIR, "documents")
+    for folder, _, files in os.walk(blobs):
+        for filename in files:
+            if filename not in used:
+                os.remove(os.path.join(folder, filename))
+    return removed
+
+
+def verify_backup(name, backup_dir=None, full=False):
+    """
+    Problems found in a snapshot (empty list if it is sound). The quick check
+    reads every page; full=True also cross-checks every index (much slower).
+    """
+    problems = []
+    try:
+        manifest = load_manifest(name, backup_dir)
+    except (OSError, ValueError) as e:
+        return [f"Manifest unreadable: {e}"]
+
+    snapshot_db = os.path.join(snapshots_dir(backup_dir), name, manifest["database"]["file"])
+    if not os.path.exists(snapshot_db):
+        return [f"Database file missing: {snapshot_db}"]
+    if file_sha256(snapshot_db) != manifest["database"]["sha256"]:
+        problems.append("Database file checksum does not match the manifest")
+
+    connection = sqlite3.connect(read_only_uri(snapshot_db), uri=True)
+    try:
+        result = connection.execute("PRAGMA integrity_check" if full else "PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            problems.append(f"Integrity check failed: {result}")
+        counts = table_counts(connection)
+    except sqlite3.Error as e:
+        problems.append(f"Database unreadable: {e}")
+        counts = {}
+    finally:
+        connection.close()
+    for table, expected in manifest["database"]["tables"].items():
+        if counts and counts.get(table) != expected:
+            problems.append(f"Table {table}: {counts.get(table)} rows, manifest says {expected}")
+
+    for relative, entry in manifest["documents"].items():
+        blob = blob_path(entry["sha256"], backup_dir)
+        if not os.path.exists(blob):
+            problems.append(f"Document missing: {relative}")
+        elif file_sha256(blob) != entry["sha256"]:
+            problems.append(f"Document corrupted: {relative}")
+    return problems
+
+
+def restore_backup(name, target_path, documents_dir, backup_dir=None, verify=True):
+    """
+    Restore a snapshot (verified first unless verify=False) to target_path and
+    documents_dir, then check the restored database against the manifest.
+    Stop the app first when restoring over the live database. Returns (manifest, error).
+    """
+    if verify:
+        problems = verify_backup(name, backup_dir)
+        if problems:
+            return None, "Snapshot failed verification: " + "; ".join(problems)
+    manifest = load_manifest(name, backup_dir)
+    snapshot_db = os.path.join(snapshots_dir(backup_dir), name, manifest["database"]["file"])
+
+    os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+    source = sqlite3.connect(read_only_uri(snapshot_db), uri=True)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target, pages=PAGES_PER_STEP)
+        restored = table_counts(target)
+    finally:
+        source.close()
+        target.close()
+    if restored != manifest["database"]["tables"]:
+        return None, "Restored database does not match the snapshot's row counts"
+
+    for relative, entry in manifest["documents"].items():
+        path = os.path.join(documents_dir, *relative.split("/"))
+        if os.path.exists(path) and os.path.getsize(path) == entry["bytes"] and file_sha256(path) == entry["sha256"]:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(blob_path(entry["sha256"], backup_dir), path)
+    return manifest, None
+
+
+def verify_restore(name, backup_dir=None, full=False):
+    """Verify a snapshot, then restore it into a scratch folder to prove it restores. Returns problems."""
+    problems = verify_backup(name, backup_dir, full)
+    if problems:
+        return problems
+    scratch = tempfile.mkdtemp(prefix="prarthi-restore-")
+    try:
+        _, error = restore_backup(name, os.path.join(scratch, SNAPSHOT_DB),
+                                  os.path.join(scratch, "documents"), backup_dir, verify=False)
+        return [error] if error else []
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+# ============ COMMAND LINE ============
+def _describe(manifest):
+    db = manifest["database"]
+    timings = manifest["timings"]
+    return (f"{manifest['name']}  {db['bytes'] / 1e6:,.1f} MB database, "
+            f"{len(manifest['documents'])} document(s)  "
+            f"copy {timings['database_copy']:.1f}s, hash {timings['database_hash']:.1f}s, "
+            f"documents {timings['documents']:.1f}s, total {timings['total']:.1f}s")
+
+
+def _create_and_rotate(keep):
+    manifest, error = create_backup()
+    if error:
+        print(error)
+        return False
+    print("Created " + _describe(manifest))
+    for name in rotate_backups(keep):
+        print(f"Removed old snapshot {name}")
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Online backup of the database and documents")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create_cmd = sub.add_parser("create", help="Take a snapshot now, then remove old ones")
+    create_cmd.add_argument("--keep", type=int, default=BACKUP_KEEP, help="Snapshots to keep")
+    sub.add_parser("list", help="List snapshots")
+    verify_cmd = sub.add_parser("verify", help="Check a snapshot (default: newest) and test-restore it")
+    verify_cmd.add_argument("name", nargs="?")
+    verify_cmd.add_argument("--full", action="store_true", help="Full integrity check including indexes")
+    restore_cmd = sub.add_parser("restore", help="Restore a snapshot (stop the app first)")
+    restore_cmd.add_argument("name")
+    restore_cmd.add_argument("--database", required=True, help="Database file to write")
+    restore_cmd.add_argument("--documents", required=True, help="Documents folder to restore into")
+    schedule_cmd = sub.add_parser("schedule", help="Keep taking snapshots at an interval")
+    schedule_cmd.add_argument("--every", type=float, default=6, help="Hours between snapshots")
+    schedule_cmd.add_argument("--keep", type=int, default=BACKUP_KEEP, help="Snapshots to keep")
+    args = parser.parse_args()
+
+    if args.command == "create":
+        sys.exit(0 if _create_and_rotate(args.keep) else 1)
+
+    elif args.command == "list":
+        names = list_snapshots()
+        for name in names:
+            print(_describe(load_manifest(name)))
+        print(f"{len(names)} snapshot(s) in {snapshots_dir()}")
+
+    elif args.command == "verify":
+        names = list_snapshots()
+        name = args.name or (names[-1] if names else None)
+        if name is None:
+            print("No snapshots found")
+            sys.exit(1)
+        started = time.perf_counter()
+        problems = verify_restore(name, full=args.full)
+        for problem in problems:
+            print(problem)
+        print(f"{name}: {'FAILED' if problems else 'OK'} ({time.perf_counter() - started:.1f}s)")
+        sys.exit(1 if problems else 0)
+
+    elif args.command == "restore":
+        manifest, error = restore_backup(args.name, args.database, args.documents)
+        if error:
+            print(error)
+            sys.exit(1)
+        print(f"Restored {args.name} to {args.database} and {args.documents}")
+
+    elif args.command == "schedule":
+        print(f"Taking a snapshot every {args.every:g} hour(s), keeping {args.keep}. Ctrl+C to stop.")
+        while True:
+            try:
+                _create_and_rotate(args.keep)
+            except Exception as e:
+                print(f"Backup failed: {e}")
+            time.sleep(args.every * 3600)
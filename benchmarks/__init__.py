@@ -0,0 +1,38 @@
+"""
+Benchmarks
+Prarthi ERP System
+
+Benchmarks run against their own generated databases in benchmarks/data/,
+never against data/prarthi_erp.db. database.py connects (and runs init_db)
+when it is first imported, so call use_dataset() before importing it.
+"""
+
+import os
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Dataset sizes (number of vendors)
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def dataset_path(size):
+    """SQLite file for a dataset size"""
+    return os.path.join(DATA_DIR, f"vendors_{size}.db")
+
+
+def use_database(path, documents_dir=None):
+    """Point database.py and uploaded documents at a SQLite file. Call before importing database."""
+    os.environ["PRARTHI_DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["PRARTHI_DOCUMENTS_DIR"] = documents_dir or os.path.join(os.path.dirname(path), "documents")
+    return path
+
+
+def use_dataset(size):
+    """Point database.py at a benchmark dataset. Call before importing database."""
+    if size not in SIZES:
+        raise ValueError(f"Unknown dataset size {size!r}, expected one of {', '.join(SIZES)}")
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return use_database(dataset_path(size))
@@ -0,0 +1,105 @@
+"""
+Vendor Analytics Benchmark
+Prarthi ERP System
+
+Times what the Analytics dashboard reads (the rollup rows) against the
+GROUP BY queries over the vendors table it replaces, on a copy of a vendor
+dataset, plus building the rollups and refreshing them after a batch of
+vendor edits.
+
+Usage:
+    python -m benchmarks.bench_analytics [--size 100k] [--edits 1000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks import SIZES, dataset_path, use_database
+
+
+def _timed(action, repeat=10):
+    """Median milliseconds of repeat calls"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def raw_dashboard(session):
+    """The dashboard's figures straight from the vendors table"""
+    from sqlalchemy import func, select
+
+    from database import Vendor
+
+    for column in (Vendor.vendor_category, Vendor.state, Vendor.msme_category, Vendor.status):
+        session.execute(select(column, func.count(Vendor.id), func.sum(Vendor.credit_limit)).group_by(column)).all()
+    session.execute(select(func.strftime("%Y-%m", Vendor.created_at), func.count(Vendor.id))
+                    .group_by(func.strftime("%Y-%m", Vendor.created_at))).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor analytics benchmark")
+    parser.add_argument("--size", choices=SIZES, default="100k")
+    parser.add_argument("--edits", type=int, default=1000, help="Vendors edited before the refresh")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch folder")
+    args = parser.parse_args()
+
+    if not os.path.exists(dataset_path(args.size)):
+        parser.error(f"Generate the dataset first: python -m benchmarks.generate --size {args.size}")
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-analytics-bench-")
+    try:
+        database_copy = os.path.join(workdir, "prarthi_erp.db")
+        source, target = sqlite3.connect(dataset_path(args.size)), sqlite3.connect(database_copy)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        use_database(database_copy)
+
+        from sqlalchemy import select
+
+        from analytics import load_rollups, rebuild, refresh
+        from database import Vendor, read_session, write_session
+
+        started = time.perf_counter()
+        with write_session() as session:
+            vendors = rebuild(session)
+        print(f"{vendors:,} vendors ({args.size} dataset)")
+        print(f"  {'build rollups':<34} {(time.perf_counter() - started) * 1000:8.0f} ms")
+
+        with read_session() as session:
+            print(f"  {'dashboard read (rollups)':<34} {_timed(lambda: load_rollups(session)):8.2f} ms "
+                  f"({len(load_rollups(session)[0])} rows)")
+            print(f"  {'dashboard read (GROUP BY vendors)':<34} {_timed(lambda: raw_dashboard(session), 3):8.2f} ms")
+
+        rng = random.Random(42)
+        with write_session() as session:
+            vendor_ids = session.scalars(select(Vendor.id)).all()
+            # ORM changes, so each one lands in the change feed as it would from the app
+            for vendor in session.scalars(select(Vendor).where(Vendor.id.in_(rng.sample(vendor_ids, args.edits)))):
+                vendor.credit_limit = (vendor.credit_limit or 0) + 100_000
+                vendor.status = rng.choice(["Active", "Inactive"])
+        started = time.perf_counter()
+        with write_session() as session:
+            changed = refresh(session)
+        print(f"  {f'refresh after {args.edits:,} edits':<34} {(time.perf_counter() - started) * 1000:8.0f} ms "
+              f"({changed:,} vendors moved)")
+    finally:
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Backup Benchmark
+Prarthi ERP System
+
+Backs up a copy of a benchmark dataset with backup.py while a writer thread
+keeps committing, then verifies and test-restores the snapshot. Writer
+commit latency is measured with and without the backup running, to show
+whether the backup holds up writes.
+
+Usage:
+    python -m benchmarks.bench_backup [--size 1m] [--documents 500]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from backup import create_backup, verify_restore
+from benchmarks import SIZES, dataset_path
+
+# Pause between writer commits (a busy office registering vendors)
+WRITE_INTERVAL = 0.01
+
+
+class Writer(threading.Thread):
+    """Commits one audit row at a time and records how long each commit took"""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.latencies = []
+        self.stop = threading.Event()
+
+    def run(self):
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            while not self.stop.is_set():
+                started = time.perf_counter()
+                connection.execute("INSERT INTO audit_logs (action, table_name, details) "
+                                   "VALUES ('BENCH', 'vendors', 'backup benchmark write')")
+                connection.commit()
+                self.latencies.append(time.perf_counter() - started)
+                time.sleep(WRITE_INTERVAL)
+        finally:
+            connection.close()
+
+
+def _latency_line(label, latencies):
+    if not latencies:
+        return f"  {label:<16} no commits"
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return (f"  {label:<16} {len(ordered):>6} commits  p50 {pick(0.5):7.1f} ms  "
+            f"p99 {pick(0.99):7.1f} ms  max {ordered[-1] * 1000:7.1f} ms")
+
+
+def _write_documents(folder, count, seed=42):
+    """Synthetic uploads of 50-500 KB under per-vendor folders"""
+    rng = random.Random(seed)
+    total = 0
+    for i in range(count):
+        vendor_dir = os.path.join(folder, f"V-{i // 3:04d}")
+        os.makedirs(vendor_dir, exist_ok=True)
+        data = rng.randbytes(rng.randint(50_000, 500_000))
+        with open(os.path.join(vendor_dir, f"document_{i % 3}.pdf"), "wb") as f:
+            f.write(data)
+        total += len(data)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup benchmark")
+    parser.add_argument("--size", choices=SIZES, default="1m")
+    parser.add_argument("--documents", type=int, default=500, help="Synthetic documents to back up")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch folder")
+    args = parser.parse_args()
+
+    if not os.path.exists(dataset_path(args.size)):
+        parser.error(f"Generate the dataset first: python -m benchmarks.generate --size {args.size}")
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-backup-bench-")
+    try:
+        database = os.path.join(workdir, "prarthi_erp.db")
+        documents = os.path.join(workdir, "documents")
+        backups = os.path.join(workdir, "backups")
+
+        source, target = sqlite3.connect(dataset_path(args.size)), sqlite3.connect(database)
+        try:
+            source.backup(target)
+            target.execute("PRAGMA journal_mode=WAL")
+        finally:
+            source.close()
+            target.close()
+        document_bytes = _write_documents(documents, args.documents)
+        size_mb = os.path.getsize(database) / 1e6
+        print(f"Backing up the {args.size} dataset: {size_mb:,.0f} MB database, "
+              f"{args.documents} documents ({document_bytes / 1e6:,.0f} MB)")
+
+        # Writer latency with nothing else running, for comparison
+        writer = Writer(database)
+        writer.start()
+        time.sleep(5)
+        writer.stop.set()
+        writer.join()
+        baseline = writer.latencies
+
+        writer = Writer(database)
+        writer.start()
+        manifest, error = create_backup(database, documents, backups)
+        writer.stop.set()
+        writer.join()
+        if error:
+            raise SystemExit(error)
+        timings = manifest["timings"]
+        print(f"Full backup       {timings['total']:7.1f}s  (database copy {timings['database_copy']:.1f}s = "
+              f"{size_mb / timings['database_copy']:,.0f} MB/s, hash {timings['database_hash']:.1f}s, "
+              f"documents {timings['documents']:.1f}s)")
+        print(_latency_line("writes, idle", baseline))
+        print(_latency_line("writes, backup", writer.latencies))
+
+        # Snapshot names have one-second resolution
+        time.sleep(1.1)
+        manifest, error = create_backup(database, documents, backups)
+        if error:
+            raise SystemExit(error)
+        print(f"Second backup     {manifest['timings']['total']:7.1f}s  "
+              f"(documents {manifest['timings']['documents']:.1f}s, unchanged files not re-hashed)")
+
+        started = time.perf_counter()
+        problems = verify_restore(manifest["name"], backups)
+        print(f"Verify + restore  {time.perf_counter() - started:7.1f}s  {'; '.join(problems) or 'OK'}")
+        if problems:
+            raise SystemExit(1)
+    finally:
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Document Export Benchmark
+Prarthi ERP System
+
+Attaches synthetic documents to vendors in a copy of a benchmark dataset,
+then exports them with document_export.py. Reports the export's throughput
+next to a plain file copy of the same documents (the disk's speed), and
+the peak Python memory of a one-category export and a full one, which
+should be about the same.
+
+Usage:
+    python -m benchmarks.bench_document_export [--size 100k] [--vendors 2000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from benchmarks import SIZES, dataset_path, use_database
+
+
+def _attach_documents(database, documents, vendors, seed=42):
+    """Give the first `vendors` vendors a GST certificate, PAN card and bank document of 50-500 KB.
+    Returns the total bytes written."""
+    rng = random.Random(seed)
+    total = 0
+    connection = sqlite3.connect(database)
+    try:
+        rows = connection.execute("SELECT id, vendor_code FROM vendors ORDER BY id LIMIT ?", (vendors,)).fetchall()
+        updates = []
+        for vendor_id, vendor_code in rows:
+            vendor_dir = os.path.join(documents, vendor_code)
+            os.makedirs(vendor_dir, exist_ok=True)
+            paths = []
+            for name in ("gst_certificate.pdf", "pan_card.jpg", "bank_document.pdf"):
+                data = rng.randbytes(rng.randint(50_000, 500_000))
+                path = os.path.join(vendor_dir, name)
+                with open(path, "wb") as f:
+                    f.write(data)
+                total += len(data)
+                paths.append(path)
+            updates.append((*paths, vendor_id))
+        connection.executemany("UPDATE vendors SET doc_gst_certificate = ?, doc_pan_card = ?, "
+                               "doc_cancelled_cheque = ? WHERE id = ?", updates)
+        connection.commit()
+    finally:
+        connection.close()
+    return total
+
+
+def _plain_copy(documents, target):
+    """Seconds to copy every document once, for the disk's throughput"""
+    started = time.perf_counter()
+    shutil.copytree(documents, target)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor document export benchmark")
+    parser.add_argument("--size", choices=SIZES, default="100k")
+    parser.add_argument("--vendors", type=int, default=2000, help="Vendors given documents (3 each)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch folder")
+    args = parser.parse_args()
+
+    if not os.path.exists(dataset_path(args.size)):
+        parser.error(f"Generate the dataset first: python -m benchmarks.generate --size {args.size}")
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-export-bench-")
+    try:
+        database = os.path.join(workdir, "prarthi_erp.db")
+        documents = os.path.join(workdir, "documents")
+        shutil.copyfile(dataset_path(args.size), database)
+        total = _attach_documents(database, documents, args.vendors)
+        print(f"Exporting from the {args.size} dataset: {args.vendors:,} vendors with "
+              f"{args.vendors * 3:,} documents ({total / 1e6:,.0f} MB)")
+
+        use_database(database, documents)
+        from database import read_session
+        from document_export import export_documents
+
+        copy_seconds = _plain_copy(documents, os.path.join(workdir, "copy"))
+        shutil.rmtree(os.path.join(workdir, "copy"))
+        print(f"Plain file copy   {copy_seconds:7.1f}s  {total / 1e6 / copy_seconds:7,.0f} MB/s")
+
+        out = os.path.join(workdir, "export.zip")
+        started = time.perf_counter()
+        with read_session() as session:
+            summary, error = export_documents(session, out)
+        elapsed = time.perf_counter() - started
+        if error:
+            raise SystemExit(error)
+        print(f"ZIP export        {elapsed:7.1f}s  {summary['bytes'] / 1e6 / elapsed:7,.0f} MB/s  "
+              f"({summary['files']:,} files of {summary['vendors']:,} vendors, {os.path.getsize(out) / 1e6:,.0f} MB ZIP)")
+        with zipfile.ZipFile(out) as archive:
+            bad = archive.testzip()
+        print(f"ZIP check         {'OK' if bad is None else f'corrupt entry {bad}'}")
+
+        # Peak memory of exporting one category and every vendor
+        connection = sqlite3.connect(database)
+        category = connection.execute("SELECT vendor_category FROM vendors "
+                                      "WHERE doc_gst_certificate IS NOT NULL LIMIT 1").fetchone()[0]
+        connection.close()
+        for label, filters in ((category, {"category": category}), ("All vendors", {})):
+            os.remove(out)
+            tracemalloc.start()
+            with read_session() as session:
+                summary, _ = export_documents(session, out, **filters)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"Peak memory       {peak / 1e6:7.1f} MB  {label}: {summary['files']:,} files, "
+                  f"{summary['bytes'] / 1e6:,.0f} MB")
+    finally:
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
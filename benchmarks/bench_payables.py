@@ -0,0 +1,122 @@
+"""
+Payables Ageing Benchmark
+Prarthi ERP System
+
+Fills a copy of a vendor dataset with open invoices, then times the ageing
+engine: loading the invoices and vendor terms as arrays, computing due
+dates, buckets and credit utilization, a cached report, and the rebuild
+after an invoice is recorded.
+
+Usage:
+    python -m benchmarks.bench_payables [--size 100k] [--invoices 1000000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks import SIZES, dataset_path, use_database
+
+# Rows inserted per statement batch
+CHUNK_SIZE = 20_000
+
+# Open invoices are dated within this many days before today
+HISTORY_DAYS = 180
+
+
+def fill_invoices(session, count, seed=42):
+    """Insert count open invoices, some part-paid, a few with their own due date"""
+    from sqlalchemy import insert, select
+
+    from database import Vendor, VendorInvoice
+
+    rng = random.Random(seed)
+    vendor_ids = session.scalars(select(Vendor.id)).all()
+    today = date.today()
+    for chunk_start in range(0, count, CHUNK_SIZE):
+        rows = []
+        for n in range(chunk_start, min(count, chunk_start + CHUNK_SIZE)):
+            invoice_date = today - timedelta(days=rng.randrange(HISTORY_DAYS))
+            amount = round(rng.uniform(5_000, 2_500_000), 2)
+            rows.append({
+                "vendor_id": rng.choice(vendor_ids), "invoice_number": f"INV/{n:07d}",
+                "invoice_date": invoice_date, "amount": amount,
+                "due_date": invoice_date + timedelta(days=15) if rng.random() < 0.05 else None,
+                "paid_amount": round(amount * 0.4, 2) if rng.random() < 0.1 else 0,
+                "status": "Open", "created_by_id": 1,
+            })
+        session.execute(insert(VendorInvoice), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payables ageing benchmark")
+    parser.add_argument("--size", choices=SIZES, default="100k")
+    parser.add_argument("--invoices", type=int, default=1_000_000, help="Open invoices to create")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch folder")
+    args = parser.parse_args()
+
+    if not os.path.exists(dataset_path(args.size)):
+        parser.error(f"Generate the dataset first: python -m benchmarks.generate --size {args.size}")
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-payables-bench-")
+    try:
+        database_copy = os.path.join(workdir, "prarthi_erp.db")
+        source, target = sqlite3.connect(dataset_path(args.size)), sqlite3.connect(database_copy)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        use_database(database_copy)
+
+        from sqlalchemy import select
+
+        from database import Vendor, read_session, write_session
+        from payables import ageing_report, compute_ageing, load_payables, record_invoice
+
+        started = time.perf_counter()
+        with write_session() as session:
+            fill_invoices(session, args.invoices)
+        print(f"{args.invoices:,} open invoices on the {args.size} dataset, filled in "
+              f"{time.perf_counter() - started:.0f}s")
+
+        with read_session() as session:
+            started = time.perf_counter()
+            invoices, vendors = load_payables(session)
+            loaded = time.perf_counter()
+            report = compute_ageing(invoices, vendors, date.today())
+            computed = time.perf_counter()
+        print(f"  {'load invoices and terms':<28} {(loaded - started) * 1000:8.0f} ms")
+        print(f"  {'compute ageing':<28} {(computed - loaded) * 1000:8.0f} ms "
+              f"({report['totals']['vendors']:,} vendors, {len(report['due']):,} invoices due)")
+
+        started = time.perf_counter()
+        ageing_report()
+        print(f"  {'first report (load + compute)':<28} {(time.perf_counter() - started) * 1000:8.0f} ms")
+        started = time.perf_counter()
+        ageing_report()
+        print(f"  {'cached report':<28} {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+        with write_session() as session:
+            _, error = record_invoice(session, session.scalar(select(Vendor.id).limit(1)), "BENCH/1",
+                                      date.today(), 1000, 1)
+        if error:
+            print(f"  new invoice not recorded: {error}")
+        started = time.perf_counter()
+        report = ageing_report()
+        print(f"  {'report after a new invoice':<28} {(time.perf_counter() - started) * 1000:8.0f} ms "
+              f"({report['totals']['invoices']:,} invoices)")
+    finally:
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
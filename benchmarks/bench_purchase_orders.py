@@ -0,0 +1,209 @@
+"""
+Purchase Order Benchmark
+Prarthi ERP System
+
+Fills a copy of a vendor dataset with years of purchase orders, then times
+raising a PO, posting a shift's material receipts from a batch file, the
+dashboard's pending-PO and today's-MRV figures and the PO register: the
+first page, a page deep into history (keyset pagination compared with
+OFFSET) and the per-status and per-vendor listings.
+
+Usage:
+    python -m benchmarks.bench_purchase_orders [--size 100k] [--orders 300000]
+"""
+
+import argparse
+import io
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks import SIZES, dataset_path, use_database
+
+# Rows inserted per statement batch
+CHUNK_SIZE = 10_000
+
+# PO history ends today and goes back this many days (five financial years)
+HISTORY_DAYS = 5 * 365
+LINES_PER_PO = 3
+
+# Receipts in one batch upload (a busy site's shift)
+SHIFT_RECEIPTS = 300
+
+ITEMS = [("STL-TMT-12", "TMT bar 12 mm", "MT", 56000), ("STL-TMT-16", "TMT bar 16 mm", "MT", 55500),
+         ("CEM-OPC-53", "OPC 53 grade cement", "Bag", 380), ("AGG-20", "20 mm aggregate", "Cum", 1450),
+         ("SND-M", "M-sand", "Cum", 1200), ("RMC-M25", "Ready mix concrete M25", "Cum", 5200),
+         ("ELE-WIRE-2.5", "FR wire 2.5 sqmm", "Rmt", 28), ("PLB-CPVC-25", "CPVC pipe 25 mm", "Rmt", 210)]
+
+
+def _median_ms(durations):
+    return statistics.median(durations) * 1000
+
+
+def _timed(action, repeat=20):
+    """Median milliseconds of repeat calls"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return _median_ms(durations)
+
+
+def fill_purchase_orders(session, count, seed=42):
+    """Insert count POs with lines spread over HISTORY_DAYS; older POs are mostly closed.
+    Returns the last PO number used per financial year."""
+    from sqlalchemy import func, insert, select
+
+    from config import get_financial_year
+    from database import DocumentSequence, PurchaseOrder, PurchaseOrderLine, Vendor
+    from purchase_orders import line_amount, po_number
+
+    rng = random.Random(seed)
+    vendor_count = session.scalar(select(func.count(Vendor.id)))
+    start = date.today() - timedelta(days=HISTORY_DAYS)
+    dates = sorted(start + timedelta(days=rng.randrange(HISTORY_DAYS + 1)) for _ in range(count))
+    # Continue after any POs already in the database
+    first_id = (session.scalar(select(func.max(PurchaseOrder.id))) or 0) + 1
+    line_id = session.scalar(select(func.max(PurchaseOrderLine.id))) or 0
+    numbers = dict(session.execute(select(DocumentSequence.financial_year, DocumentSequence.last_number)
+                                   .where(DocumentSequence.name == "PO")).all())
+    for chunk_start in range(0, count, CHUNK_SIZE):
+        headers, lines = [], []
+        for n in range(chunk_start, min(count, chunk_start + CHUNK_SIZE)):
+            po_id = first_id + n
+            po_date = dates[n]
+            financial_year = get_financial_year(po_date)
+            numbers[financial_year] = numbers.get(financial_year, 0) + 1
+            age = (date.today() - po_date).days
+            status = ("Open" if age < 30 else rng.choice(["Open", "Partially Received", "Closed"]) if age < 120
+                      else rng.choice(["Closed"] * 9 + ["Cancelled"]))
+            total = 0
+            for line_no in range(1, LINES_PER_PO + 1):
+                code, description, unit, rate = rng.choice(ITEMS)
+                quantity = rng.randint(1, 200)
+                amount = line_amount(quantity, rate, 18)
+                total += amount
+                line_id += 1
+                lines.append({"id": line_id, "po_id": po_id, "line_no": line_no, "item_code": code,
+                              "description": description, "unit": unit, "quantity": quantity,
+                              "rate": rate, "gst_rate": 18, "amount": amount,
+                              "received_quantity": quantity if status == "Closed" else 0})
+            headers.append({"id": po_id, "po_number": po_number(financial_year, numbers[financial_year]),
+                            "financial_year": financial_year, "vendor_id": rng.randint(1, vendor_count),
+                            "po_date": po_date, "status": status, "total_amount": round(total, 2),
+                            "created_by_id": 1})
+        session.execute(insert(PurchaseOrder), headers)
+        session.execute(insert(PurchaseOrderLine), lines)
+    return numbers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purchase order benchmark")
+    parser.add_argument("--size", choices=SIZES, default="100k")
+    parser.add_argument("--orders", type=int, default=300_000, help="Purchase orders of history to create")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch folder")
+    args = parser.parse_args()
+
+    if not os.path.exists(dataset_path(args.size)):
+        parser.error(f"Generate the dataset first: python -m benchmarks.generate --size {args.size}")
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-po-bench-")
+    try:
+        database_copy = os.path.join(workdir, "prarthi_erp.db")
+        source, target = sqlite3.connect(dataset_path(args.size)), sqlite3.connect(database_copy)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        use_database(database_copy)
+
+        from sqlalchemy import func, select
+
+        from database import DocumentSequence, PurchaseOrder, SessionLocal, read_session, write_session
+        from purchase_orders import (PENDING_STATUSES, PAGE_SIZE, create_purchase_order, list_purchase_orders,
+                                     pending_po_count, recount_pending)
+
+        started = time.perf_counter()
+        with write_session() as session:
+            numbers = fill_purchase_orders(session, args.orders)
+            # New POs continue numbering after the generated history
+            for financial_year, last in numbers.items():
+                session.merge(DocumentSequence(name="PO", financial_year=financial_year, last_number=last))
+            pending = recount_pending(session)
+        print(f"{args.orders:,} purchase orders over {len(numbers)} financial years on the {args.size} "
+              f"dataset ({pending:,} pending), filled in {time.perf_counter() - started:.0f}s")
+
+        # Raising a PO: sequence number, header, lines, counter and audit row in one transaction
+        durations = []
+        for i in range(50):
+            session = SessionLocal()
+            try:
+                started = time.perf_counter()
+                po, error = create_purchase_order(session, 1 + i, [
+                    {"description": "TMT bar 12 mm", "unit": "MT", "quantity": 10, "rate": 56000},
+                    {"description": "OPC 53 grade cement", "unit": "Bag", "quantity": 500, "rate": 380},
+                ], 1)
+                session.commit()
+                durations.append(time.perf_counter() - started)
+            finally:
+                session.close()
+        print(f"  {'create PO':<32} {_median_ms(durations):8.2f} ms")
+
+        # A shift's receipts: one CSV row per line, part of each open PO's first two lines
+        from material_receipts import post_receipt_batch, read_receipt_csv, receipt_totals
+        with read_session() as session:
+            open_pos = session.execute(
+                select(PurchaseOrder.po_number).where(PurchaseOrder.status == "Open")
+                .order_by(PurchaseOrder.po_date.desc(), PurchaseOrder.id.desc()).limit(SHIFT_RECEIPTS)
+            ).scalars().all()
+        csv_text = "po_number,line_no,quantity,challan_number\n" + "".join(
+            f"{number},{line_no},1,DC-{i}\n" for i, number in enumerate(open_pos) for line_no in (1, 2))
+        started = time.perf_counter()
+        receipts, problems = read_receipt_csv(io.StringIO(csv_text))
+        with write_session() as session:
+            posted, posting_problems = post_receipt_batch(session, receipts, 1)
+        elapsed = time.perf_counter() - started
+        print(f"  {f'batch upload, {len(posted)} MRVs':<32} {elapsed * 1000:8.2f} ms "
+              f"({len(problems) + len(posting_problems)} problems)")
+
+        with read_session() as session:
+            results = [
+                ("pending count (counter)", lambda: pending_po_count(session)),
+                ("pending count (COUNT(*))", lambda: session.scalar(
+                    select(func.count(PurchaseOrder.id)).where(PurchaseOrder.status.in_(PENDING_STATUSES)))),
+                ("today's MRV count and value", lambda: receipt_totals(session)),
+                ("register, first page", lambda: list_purchase_orders(session)),
+                ("register, open POs", lambda: list_purchase_orders(session, status="Open")),
+                ("register, one vendor", lambda: list_purchase_orders(session, vendor_id=7)),
+            ]
+            for label, action in results:
+                print(f"  {label:<32} {_timed(action):8.2f} ms")
+
+            # Page 1000 by walking keys, then the same page fetched directly with each method
+            depth = min(1000, args.orders // PAGE_SIZE - 1)
+            key = None
+            for _ in range(depth):
+                rows, key = list_purchase_orders(session, before=key)
+            offset_query = (select(PurchaseOrder.id, PurchaseOrder.po_number)
+                            .order_by(PurchaseOrder.po_date.desc(), PurchaseOrder.id.desc())
+                            .offset(depth * PAGE_SIZE).limit(PAGE_SIZE))
+            print(f"  {f'register, page {depth + 1} (keyset)':<32} "
+                  f"{_timed(lambda: list_purchase_orders(session, before=key)):8.2f} ms")
+            print(f"  {f'register, page {depth + 1} (OFFSET)':<32} "
+                  f"{_timed(lambda: session.execute(offset_query).all(), repeat=5):8.2f} ms")
+    finally:
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Stock Ledger Benchmark
+Prarthi ERP System
+
+Fills a scratch database with years of stock movements and month-end
+snapshots, then times a current balance lookup (one stock_balance row)
+against summing the item's whole ledger, as-of-date balances, posting an
+issue and the reconciliation job.
+
+Usage:
+    python -m benchmarks.bench_stock [--movements 1000000] [--months 36]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks import use_database
+
+# Rows inserted per statement batch
+CHUNK_SIZE = 10_000
+
+ITEMS = [f"{prefix}-{n:03d}" for prefix in ("STL", "CEM", "AGG", "ELE", "PLB", "SHT") for n in range(1, 51)]
+SITES = ["Main Store", "Tower A", "Tower B", "Tower C", "Podium", "Villa Phase 1", "Villa Phase 2", "Yard"]
+
+# Cement at the main store moves every day; this share of all movements is for it
+HOT_ITEM = ("CEM-001", "Main Store")
+HOT_SHARE = 0.1
+
+
+def _timed(action, repeat=20):
+    """Median milliseconds of repeat calls"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def _month_ends(first, last):
+    """Last day of every month from first's month up to the month before last"""
+    ends = []
+    month_start = first.replace(day=1)
+    while True:
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        if next_month > last.replace(day=1):
+            return ends
+        ends.append(next_month - timedelta(days=1))
+        month_start = next_month
+
+
+def fill_ledger(session, count, days, seed=42):
+    """Insert count movements over the last `days` days: receipts, then issues of part of
+    them. Balances are set from the totals. Returns the first movement date."""
+    from sqlalchemy import insert
+
+    from database import StockMovement, adjust_stock_balance
+
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+    dates = sorted(start + timedelta(days=rng.randrange(days)) for _ in range(count))
+    totals = {}
+    for chunk_start in range(0, count, CHUNK_SIZE):
+        rows = []
+        for movement_date in dates[chunk_start:chunk_start + CHUNK_SIZE]:
+            key = HOT_ITEM if rng.random() < HOT_SHARE else (rng.choice(ITEMS), rng.choice(SITES))
+            on_hand = totals.get(key, 0)
+            if on_hand > 10 and rng.random() < 0.6:
+                quantity, movement_type = -round(rng.uniform(1, on_hand / 2), 3), "ISSUE"
+            else:
+                quantity, movement_type = round(rng.uniform(5, 100), 3), "RECEIPT"
+            totals[key] = on_hand + quantity
+            rows.append({"movement_date": movement_date, "item_code": key[0], "site": key[1],
+                         "movement_type": movement_type, "quantity": quantity, "unit": "Nos",
+                         "reference": None, "remarks": None, "created_by_id": 1})
+        session.execute(insert(StockMovement), rows)
+    for (item_code, site), quantity in totals.items():
+        adjust_stock_balance(session, item_code, site, quantity, "Nos")
+    return start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock ledger benchmark")
+    parser.add_argument("--movements", type=int, default=1_000_000, help="Ledger rows to create")
+    parser.add_argument("--months", type=int, default=36, help="Months of history")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch folder")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-stock-bench-")
+    try:
+        use_database(os.path.join(workdir, "prarthi_erp.db"))
+
+        from sqlalchemy import func, select
+
+        from database import StockMovement, read_session, write_session
+        from stock import balance_as_of, issue_stock, reconcile, stock_balance, take_snapshot
+
+        started = time.perf_counter()
+        with write_session() as session:
+            first_date = fill_ledger(session, args.movements, args.months * 30)
+        month_ends = _month_ends(first_date, date.today())
+        print(f"{args.movements:,} movements over {args.months} months, {len(ITEMS)} items x {len(SITES)} sites, "
+              f"filled in {time.perf_counter() - started:.0f}s")
+
+        started = time.perf_counter()
+        for month_end in month_ends:
+            with write_session() as session:
+                take_snapshot(session, month_end)
+        print(f"  {f'{len(month_ends)} month-end snapshots':<34} {(time.perf_counter() - started) * 1000:8.0f} ms")
+
+        middle = month_ends[len(month_ends) // 2] + timedelta(days=15)
+        with read_session() as session:
+            for name, (item, site) in [("busy item", HOT_ITEM), ("typical item", (ITEMS[7], SITES[1]))]:
+                moves = session.scalar(select(func.count(StockMovement.id))
+                                       .where(StockMovement.item_code == item, StockMovement.site == site))
+                print(f"  {name}: {item} at {site}, {moves:,} movements")
+                results = [
+                    ("balance (stock_balance row)", lambda: stock_balance(session, item, site)),
+                    ("balance (SUM over ledger)", lambda: session.scalar(
+                        select(func.sum(StockMovement.quantity))
+                        .where(StockMovement.item_code == item, StockMovement.site == site))),
+                    ("as of mid-history (snapshot)", lambda: balance_as_of(session, item, site, middle)),
+                    ("as of mid-history (SUM)", lambda: session.scalar(
+                        select(func.sum(StockMovement.quantity))
+                        .where(StockMovement.item_code == item, StockMovement.site == site,
+                               StockMovement.movement_date <= middle))),
+                ]
+                for label, action in results:
+                    print(f"    {label:<32} {_timed(action):8.2f} ms")
+
+        durations = []
+        for _ in range(20):
+            with write_session() as session:
+                begun = time.perf_counter()
+                issue_stock(session, *HOT_ITEM, 0.001, 1)
+            durations.append(time.perf_counter() - begun)
+        print(f"  {'issue (incl. commit)':<34} {statistics.median(durations) * 1000:8.2f} ms")
+
+        started = time.perf_counter()
+        with read_session() as session:
+            problems = reconcile(session)
+        print(f"  {'reconcile':<34} {(time.perf_counter() - started) * 1000:8.0f} ms ({len(problems)} differences)")
+    finally:
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
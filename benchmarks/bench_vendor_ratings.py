@@ -0,0 +1,140 @@
+"""
+Vendor Rating Benchmark
+Prarthi ERP System
+
+Fills a copy of a vendor dataset with millions of rating events, rebuilds
+the running sums from them, then times recording one more event for a busy
+vendor (one upsert per dimension) against re-aggregating that vendor's
+whole history, which is what a rating without running sums would cost.
+
+Usage:
+    python -m benchmarks.bench_vendor_ratings [--size 100k] [--events 2000000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks import SIZES, dataset_path, use_database
+
+# Rows inserted per statement batch
+CHUNK_SIZE = 20_000
+
+# Events are dated within this many days before today
+HISTORY_DAYS = 3 * 365
+
+# One vendor supplies this share of all events (cement, steel)
+BUSY_SHARE = 0.05
+
+
+def fill_events(session, count, seed=42):
+    """Insert count scored events across all vendors; returns the busy vendor's id"""
+    from sqlalchemy import insert, select
+
+    from database import Vendor, VendorRatingEvent
+    from vendor_ratings import DIMENSIONS
+
+    rng = random.Random(seed)
+    vendor_ids = session.scalars(select(Vendor.id)).all()
+    busy_vendor = vendor_ids[0]
+    today = date.today()
+    for chunk_start in range(0, count, CHUNK_SIZE):
+        session.execute(insert(VendorRatingEvent), [{
+            "vendor_id": busy_vendor if rng.random() < BUSY_SHARE else rng.choice(vendor_ids),
+            "dimension": rng.choice(DIMENSIONS),
+            "event_date": today - timedelta(days=rng.randrange(HISTORY_DAYS)),
+            "score": rng.choice([1.0, 2.5, 3.0, 4.0, 4.5, 5.0, 5.0, 5.0]),
+            "reference": f"EV/{n:08d}",
+        } for n in range(chunk_start, min(count, chunk_start + CHUNK_SIZE))])
+    return busy_vendor
+
+
+def reaggregate(session, vendor_id):
+    """Decayed ratings of one vendor from all its events, without the running sums"""
+    from sqlalchemy import select
+
+    from database import VendorRatingEvent
+    from vendor_ratings import event_weight
+
+    sums = {}
+    for dimension, event_date, score in session.execute(
+            select(VendorRatingEvent.dimension, VendorRatingEvent.event_date, VendorRatingEvent.score)
+            .where(VendorRatingEvent.vendor_id == vendor_id)):
+        weight = event_weight(event_date)
+        weighted_score, total_weight = sums.get(dimension, (0, 0))
+        sums[dimension] = (weighted_score + score * weight, total_weight + weight)
+    return {dimension: weighted_score / weight for dimension, (weighted_score, weight) in sums.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor rating benchmark")
+    parser.add_argument("--size", choices=SIZES, default="100k")
+    parser.add_argument("--events", type=int, default=2_000_000, help="Rating events to create")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch folder")
+    args = parser.parse_args()
+
+    if not os.path.exists(dataset_path(args.size)):
+        parser.error(f"Generate the dataset first: python -m benchmarks.generate --size {args.size}")
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-ratings-bench-")
+    try:
+        database_copy = os.path.join(workdir, "prarthi_erp.db")
+        source, target = sqlite3.connect(dataset_path(args.size)), sqlite3.connect(database_copy)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        use_database(database_copy)
+
+        from sqlalchemy import func, select
+
+        from database import VendorRatingEvent, read_session, write_session
+        from vendor_ratings import rebuild, record_events
+
+        started = time.perf_counter()
+        with write_session() as session:
+            busy_vendor = fill_events(session, args.events)
+        with read_session() as session:
+            busy_events = session.scalar(select(func.count(VendorRatingEvent.id))
+                                         .where(VendorRatingEvent.vendor_id == busy_vendor))
+        print(f"{args.events:,} rating events on the {args.size} dataset, filled in "
+              f"{time.perf_counter() - started:.0f}s; busy vendor has {busy_events:,}")
+
+        started = time.perf_counter()
+        with write_session() as session:
+            _, vendors = rebuild(session)
+        print(f"  {'rebuild from the event log':<34} {(time.perf_counter() - started) * 1000:8.0f} ms "
+              f"({vendors:,} vendors)")
+
+        durations = []
+        for n in range(20):
+            with write_session() as session:
+                begun = time.perf_counter()
+                record_events(session, busy_vendor, [("delivery", 4.0, date.today(), f"BENCH/{n}"),
+                                                     ("quality", 5.0, date.today(), f"BENCH/{n}")])
+            durations.append(time.perf_counter() - begun)
+        print(f"  {'new MRV events (running sums)':<34} {statistics.median(durations) * 1000:8.2f} ms")
+
+        durations = []
+        with read_session() as session:
+            for _ in range(5):
+                begun = time.perf_counter()
+                reaggregate(session, busy_vendor)
+                durations.append(time.perf_counter() - begun)
+        print(f"  {'re-aggregate the busy vendor':<34} {statistics.median(durations) * 1000:8.2f} ms")
+    finally:
+        if args.keep:
+            print(f"Scratch folder kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Benchmark Dataset Generator
+Prarthi ERP System
+
+Builds deterministic vendor, contact and audit log data at a chosen size,
+with valid GSTINs and PANs, and the categories and states from config.py.
+The same seed and size always give the same rows.
+
+Usage:
+    python -m benchmarks.generate --size 100k [--force]
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import SIZES, use_dataset
+from config import GST_STATE_CODES
+from reference_data import IFSC_BANK_PREFIXES
+from validation import gstin_check_char
+
+# Rows inserted per statement batch
+CHUNK_SIZE = 10_000
+
+NAME_PREFIXES = ["Shree", "Sri", "Om", "Jai", "Maa", "New", "Royal", "National", "Bharat",
+                 "Super", "Star", "Classic", "Modern", "Universal", "Prime", "Metro", "Sai",
+                 "Sun", "Global", "Apex"]
+NAME_CORES = ["Ganesh", "Balaji", "Krishna", "Laxmi", "Durga", "Mahalaxmi", "Siddhi", "Vinayak",
+              "Hanuman", "Ambika", "Tirupati", "Annapurna", "Gurukrupa", "Swami", "Shiv", "Ram",
+              "Mahavir", "Parshwa", "Umiya", "Khodiyar", "Jalaram", "Navkar", "Padmavati",
+              "Saraswati", "Gayatri", "Venkatesh", "Murugan", "Ayyappa", "Kaveri", "Narmada",
+              "Ganga", "Yamuna", "Himalaya", "Sahyadri", "Vindhya", "Konkan", "Deccan", "Malwa",
+              "Rajputana", "Kalinga"]
+OWNER_NAMES = ["Patel", "Shah", "Jain", "Agarwal", "Mehta", "Desai", "Joshi", "Kulkarni",
+               "Deshmukh", "Patil", "Pawar", "Reddy", "Rao", "Nair", "Menon", "Iyer", "Sharma",
+               "Verma", "Gupta", "Singh", "Yadav", "Chauhan", "Bansal", "Goyal", "Mittal",
+               "Khanna", "Kapoor", "Malhotra", "Bose", "Das"]
+FIRST_NAMES = ["Rahul", "Amit", "Suresh", "Ramesh", "Vijay", "Sanjay", "Anil", "Sunil", "Prakash",
+               "Rajesh", "Priya", "Neha", "Pooja", "Sneha", "Kavita", "Anita", "Deepak", "Manoj",
+               "Nitin", "Sachin", "Ashok", "Mahesh", "Kiran", "Ravi", "Arun", "Meena"]
+LEGAL_SUFFIXES = [("Pvt Ltd", "C"), ("Private Limited", "C"), ("Enterprises", "F"), ("Traders", "F"),
+                  ("& Co", "F"), ("LLP", "F"), ("Industries", "C"), ("Agencies", "P"), ("", "P")]
+
+# Goods or service word used in names, per config category
+CATEGORY_WORDS = {
+    "Steel Suppliers": "Steel", "Cement Suppliers": "Cement", "Aggregate Suppliers": "Aggregates",
+    "Ready Mix Concrete": "RMC", "Electrical Suppliers": "Electricals",
+    "Plumbing Suppliers": "Plumbing", "Hardware Suppliers": "Hardware", "Paint Suppliers": "Paints",
+    "Timber Suppliers": "Timber", "Glass Suppliers": "Glass", "Tile Suppliers": "Tiles",
+    "Sanitary Suppliers": "Sanitaryware", "HVAC Suppliers": "Aircon", "Fire Safety Suppliers": "Fire Systems",
+    "Elevator Suppliers": "Elevators", "Fuel Supplier": "Fuels", "Labour Contractor": "Manpower",
+    "Transport Contractor": "Logistics", "Equipment Rental": "Equipments",
+    "Professional Services": "Consultants", "General Supplier": "Supplies", "Other": "Services",
+}
+
+# (city, state, PIN prefix, weight) - weighted towards where the company buys most
+CITIES = [
+    ("Mumbai", "Maharashtra", "400", 14), ("Pune", "Maharashtra", "411", 12),
+    ("Thane", "Maharashtra", "400", 6), ("Nashik", "Maharashtra", "422", 4),
+    ("Nagpur", "Maharashtra", "440", 3), ("Ahmedabad", "Gujarat", "380", 6),
+    ("Surat", "Gujarat", "395", 3), ("Vadodara", "Gujarat", "390", 2),
+    ("Bengaluru", "Karnataka", "560", 5), ("Hyderabad", "Telangana", "500", 4),
+    ("Chennai", "Tamil Nadu", "600", 4), ("Delhi", "Delhi", "110", 5),
+    ("Gurugram", "Haryana", "122", 2), ("Noida", "Uttar Pradesh", "201", 2),
+    ("Lucknow", "Uttar Pradesh", "226", 1), ("Jaipur", "Rajasthan", "302", 2),
+    ("Indore", "Madhya Pradesh", "452", 2), ("Kolkata", "West Bengal", "700", 2),
+    ("Panaji", "Goa", "403", 1), ("Raipur", "Chhattisgarh", "492", 1),
+    ("Kochi", "Kerala", "682", 1), ("Visakhapatnam", "Andhra Pradesh", "530", 1),
+    ("Bhubaneswar", "Odisha", "751", 1), ("Guwahati", "Assam", "781", 1),
+]
+
+ALPHANUMERIC = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+LETTERS = ALPHANUMERIC[10:]
+START_DATE = datetime(2022, 4, 1)
+HISTORY_DAYS = 3 * 365
+
+
+def vendor_rows(rng, vendor_id, count, gst_codes, banks):
+    """Vendor, contact and audit rows for one vendor"""
+    category = rng.choice(list(CATEGORY_WORDS))
+    suffix, holder = rng.choice(LEGAL_SUFFIXES)
+    city, state, pin_prefix, _ = rng.choices(CITIES, weights=[c[3] for c in CITIES])[0]
+    core = rng.choice(NAME_CORES)
+    words = [rng.choice(NAME_PREFIXES), core]
+    if rng.random() < 0.4:
+        words.append(rng.choice(OWNER_NAMES))
+    words.append(CATEGORY_WORDS[category])
+    if rng.random() < 0.3:
+        words.append(city)
+    trade_name = " ".join(words)
+    legal_name = f"{trade_name} {suffix}".strip()
+
+    pan = ("".join(rng.choices(LETTERS, k=3)) + holder + core[0]
+           + f"{rng.randrange(10000):04d}" + rng.choice(LETTERS))
+    gstin = f"{gst_codes[state]}{pan}{rng.choice('1112')}Z"
+    gstin += gstin_check_char(gstin)
+
+    created_at = START_DATE + timedelta(days=HISTORY_DAYS * vendor_id / count,
+                                        minutes=rng.randrange(600))
+    modified = rng.random() < 0.2
+    creator = rng.choice([1, 2])
+    has_bank = rng.random() < 0.85
+    is_msme = rng.random() < 0.3
+    ratings = [rng.choice([2.5, 3.0, 3.5, 4.0, 4.5, 5.0]) for _ in range(3)]
+    bank_prefix = rng.choice(list(banks))
+    slug = "".join(w.lower() for w in words[1:3] if w.isalpha())
+
+    vendor = {
+        "id": vendor_id,
+        "vendor_code": f"V-{vendor_id:04d}",
+        "gstin": gstin,
+        "pan": pan,
+        "legal_name": legal_name,
+        "trade_name": trade_name,
+        "vendor_type": rng.choice(["Material Supplier", "Material Supplier", "Service Provider", "Both"]),
+        "vendor_category": category,
+        "company_email": f"accounts@{slug}{vendor_id % 997}.in",
+        "company_phone": f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}",
+        "address_line1": f"{rng.randrange(1, 400)}, {rng.choice(['MIDC', 'Industrial Estate', 'Main Road', 'Market Yard', 'GIDC'])}",
+        "city": city,
+        "state": state,
+        "pin_code": f"{pin_prefix}{rng.randrange(1, 100):03d}",
+        "country": "India",
+        "bank_name": banks[bank_prefix] if has_bank else None,
+        "bank_branch": city if has_bank else None,
+        "account_number": f"{rng.randrange(10 ** 11, 10 ** 14)}" if has_bank else None,
+        "ifsc_code": bank_prefix + "0" + "".join(rng.choices(ALPHANUMERIC, k=6)) if has_bank else None,
+        "account_type": rng.choice(["Current", "Current", "Savings"]) if has_bank else None,
+        "payment_terms": rng.choice(["30 Days", "45 Days", "60 Days", "90 Days", "Advance"]),
+        "credit_days": rng.choice([0, 30, 45, 60, 90]),
+        "credit_limit": float(rng.randrange(1, 100) * 50000),
+        "rating_delivery": ratings[0],
+        "rating_quality": ratings[1],
+        "rating_pricing": ratings[2],
+        "rating_overall": round(sum(ratings) / 3, 1),
+        "is_msme": is_msme,
+        "msme_number": f"UDYAM-{gst_codes[state]}-{rng.randrange(10 ** 7):07d}" if is_msme else None,
+        "msme_category": rng.choice(["Micro", "Small", "Medium"]) if is_msme else None,
+        "status": "Inactive" if rng.random() < 0.1 else "Active",
+        "created_by_id": creator,
+        "created_at": created_at,
+        "modified_by_id": 1 if modified else None,
+        "modified_at": created_at + timedelta(days=rng.randrange(1, 200)) if modified else None,
+    }
+
+    contacts = [{
+        "vendor_id": vendor_id, "contact_type": "Primary",
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(OWNER_NAMES)}",
+        "designation": rng.choice(["Proprietor", "Director", "Partner", "Sales Manager"]),
+        "mobile": f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}",
+        "email": f"sales@{slug}{vendor_id % 997}.in", "is_primary": True,
+    }]
+    if rng.random() < 0.4:
+        contacts.append({
+            "vendor_id": vendor_id, "contact_type": "Accounts",
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(OWNER_NAMES)}",
+            "designation": "Accountant",
+            "mobile": f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}",
+            "email": f"accounts@{slug}{vendor_id % 997}.in", "is_primary": False,
+        })
+
+    audit = [{
+        "user_id": creator, "action": "CREATE", "table_name": "vendors", "record_id": vendor_id,
+        "details": f"Registered vendor {vendor['vendor_code']}", "timestamp": created_at,
+    }]
+    if modified:
+        audit.append({
+            "user_id": 1, "action": "UPDATE", "table_name": "vendors", "record_id": vendor_id,
+            "details": f"Updated vendor {vendor['vendor_code']}", "timestamp": vendor["modified_at"],
+        })
+    return vendor, contacts, audit
+
+
+def generate(session, count, seed=42, progress=print):
+    """Insert count vendors with contacts and audit logs, then build the search indexes"""
+    # Imported here: database connects on import, after use_dataset() has chosen the file
+    from sqlalchemy import insert
+    from database import AuditLog, Vendor, VendorContact
+    from duplicates import rebuild_name_index
+    from vendor_search import rebuild_search_index
+
+    rng = random.Random(seed)
+    gst_codes = {}
+    for code, state in sorted(GST_STATE_CODES.items()):
+        gst_codes.setdefault(state, code)
+    banks = dict(sorted(IFSC_BANK_PREFIXES.items()))
+
+    started = time.perf_counter()
+    for first in range(1, count + 1, CHUNK_SIZE):
+        vendors, contacts, audit = [], [], []
+        for vendor_id in range(first, min(first + CHUNK_SIZE, count + 1)):
+            v, c, a = vendor_rows(rng, vendor_id, count, gst_codes, banks)
+            vendors.append(v)
+            contacts.extend(c)
+            audit.extend(a)
+        session.execute(insert(Vendor), vendors)
+        session.execute(insert(VendorContact), contacts)
+        session.execute(insert(AuditLog), audit)
+        session.commit()
+        progress(f"  {vendor_id:,} vendors ({time.perf_counter() - started:.0f}s)")
+
+    progress("Building duplicate detection index...")
+    rebuild_name_index(session)
+    progress("Building typeahead index...")
+    rebuild_search_index(session)
+    progress(f"Done in {time.perf_counter() - started:.0f}s")
+
+
+def ensure_dataset(size, progress=print):
+    """Generate the dataset for a size unless it already exists. use_dataset(size) must have been called."""
+    from sqlalchemy import func, select
+    from database import SessionLocal, Vendor
+
+    session = SessionLocal()
+    try:
+        existing = session.execute(select(func.count(Vendor.id))).scalar()
+        if existing == SIZES[size]:
+            return
+        if existing:
+            raise RuntimeError(f"{size} dataset has {existing:,} vendors, expected {SIZES[size]:,}; "
+                               f"regenerate it with: python -m benchmarks.generate --size {size} --force")
+        progress(f"Generating {size} dataset ({SIZES[size]:,} vendors)...")
+        generate(session, SIZES[size], progress=progress)
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a benchmark dataset")
+    parser.add_argument("--size", choices=list(SIZES), default="1k")
+    parser.add_argument("--force", action="store_true", help="Delete and regenerate the dataset")
+    args = parser.parse_args()
+
+    path = use_dataset(args.size)
+    if args.force and os.path.exists(path):
+        os.remove(path)
+    ensure_dataset(args.size)
+    print(f"Dataset ready: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""
+Concurrent Session Load Test
+Prarthi ERP System
+
+Simulates many users working at once. Each simulated user is an AppTest
+session that logs in through app.py, then browses the Vendor Library or
+registers a vendor through the wizard, pausing between actions like a person
+would.
+
+AppTest swaps process-wide Streamlit state on every run, so two sessions
+cannot rerun in one process at the same time; each simulated user gets its
+own worker process. They all share one throwaway copy of a benchmark
+dataset, so SQLite lock contention is real. Nothing else is touched.
+
+For each concurrency level it reports script rerun latency (p50/p95/p99),
+time spent in write statements (where SQLite waits for the database lock),
+"database is locked" errors, failed registrations and per-session memory
+growth (RSS after the run minus RSS after startup).
+
+Usage:
+    python -m benchmarks.loadtest --size 1k [--sessions 1,5,10,20] [--loops 3] [--think 1.0]
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from benchmarks import RESULTS_DIR, ROOT_DIR, SIZES, dataset_path, use_database
+
+APP_SCRIPT = os.path.join(ROOT_DIR, "app.py")
+
+# Seconds a single script rerun may take before the session is reported as failed
+RERUN_TIMEOUT = 600
+
+# (username, password) pairs of the default users created by init_db
+LOGINS = [("admin", "Admin@123"), ("purchase_user", "Purchase@123")]
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+# ============ MEASUREMENTS ============
+def _percentiles(seconds):
+    """p50/p95/p99/max in milliseconds"""
+    if not seconds:
+        return {}
+    ms = sorted(s * 1000 for s in seconds)
+    pick = lambda q: round(ms[min(len(ms) - 1, int(len(ms) * q))], 2)
+    return {"count": len(ms), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ms[-1], 2)}
+
+
+class Recorder:
+    """Measurements from one simulated user, sent back to the parent as a plain dict"""
+
+    def __init__(self):
+        self.reruns = defaultdict(list)
+        self.writes = []
+        self.lock_errors = 0
+        self.failures = []
+        self.registrations = 0
+        self.rss_start = None
+        self.rss_peak = None
+
+    def as_dict(self):
+        return dict(vars(self), reruns=dict(self.reruns))
+
+
+def watch_database(engine, recorder):
+    """Time write statements and count lock errors on the app's engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        if statement.lstrip().upper().startswith(WRITE_PREFIXES):
+            recorder.writes.append(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+        if "database is locked" in str(context.original_exception):
+            recorder.lock_errors += 1
+
+
+def _proc_rss():
+    """Linux: VmRSS from /proc"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def _psutil_rss():
+    """Any platform with psutil installed"""
+    import psutil
+    # A new Process each time: worker processes are forked after import
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def _windows_rss():
+    """Windows: working set size from GetProcessMemoryInfo"""
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+    get_current_process.restype = wintypes.HANDLE
+    get_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+    get_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    if not get_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize / (1024 * 1024)
+
+
+def _getrusage_rss():
+    """macOS and other Unixes: peak RSS so far (macOS reports bytes, the others KB)"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _rss_source():
+    """(name, reader) for the first way this platform can measure RSS, or (None, None)"""
+    if importlib.util.find_spec("psutil"):
+        return "psutil", _psutil_rss
+    if os.path.exists("/proc/self/status"):
+        return "/proc", _proc_rss
+    if sys.platform == "win32":
+        return "GetProcessMemoryInfo", _windows_rss
+    if importlib.util.find_spec("resource"):
+        return "getrusage (peak)", _getrusage_rss
+    return None, None
+
+
+RSS_SOURCE, _read_rss = _rss_source()
+
+
+def rss_mb():
+    """Resident memory of this process in MB, or None if it cannot be measured here"""
+    if _read_rss is None:
+        return None
+    try:
+        return _read_rss()
+    except (OSError, AttributeError):
+        return None
+
+
+class MemorySampler(threading.Thread):
+    """Samples RSS in the background and keeps the peak"""
+
+    def __init__(self, interval=0.25):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            current = rss_mb()
+            if current is not None:
+                self.peak = max(self.peak or 0, current)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+# ============ SIMULATED USER ============
+class SimulatedUser:
+    """One browser session: log in, then run user scripts with think times"""
+
+    def __init__(self, number, recorder, think, rng):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = number
+        self.recorder = recorder
+        self.think_time = think
+        self.rng = rng
+        self.at = AppTest.from_file(APP_SCRIPT, default_timeout=RERUN_TIMEOUT)
+
+    def pause(self, scale=1.0):
+        """Think time: a person reading or typing"""
+        if self.think_time:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think_time * scale)
+
+    def run(self, action, element=None):
+        """Rerun the script (after an interaction on element) and record its latency"""
+        started = time.perf_counter()
+        (element or self.at).run()
+        self.recorder.reruns[action].append(time.perf_counter() - started)
+        if self.at.exception:
+            raise RuntimeError(f"{action}: {self.at.exception[0].value}")
+
+    def widget(self, elements, label):
+        for element in elements:
+            if element.label == label:
+                return element
+        raise LookupError(f"No widget labelled {label!r}")
+
+    def login(self):
+        username, password = LOGINS[self.number % len(LOGINS)]
+        self.run("login_page")
+        self.pause()
+        self.widget(self.at.text_input, "Username").input(username)
+        self.widget(self.at.text_input, "Password").input(password)
+        self.run("login", self.widget(self.at.button, "Login").click())
+        if not self.at.session_state["authenticated"]:
+            raise RuntimeError(f"login failed for {username}")
+
+    def browse_library(self):
+        """Open the Library, search, filter, pick a vendor and view it"""
+        self.at.switch_page("pages/02_Vendor_Library.py")
+        self.run("library_open")
+        self.pause()
+        term = self.rng.choice(["steel", "cement", "pune", "ganesh", "27A", "hardware"])
+        self.run("library_search", self.widget(self.at.text_input, "Search").input(term))
+        self.pause()
+        self.widget(self.at.text_input, "Search").input("")
+        self.run("library_filter", self.widget(self.at.selectbox, "Status").select("Active"))
+        self.pause()
+        self.run("picker_search", self.widget(self.at.text_input, "Find vendor").input(term))
+        self.pause()
+        if self.widget(self.at.selectbox, "Select vendor for actions").options:
+            self.run("vendor_details", self.widget(self.at.button, "👁️ View full details").click())
+            self.pause()
+        if self.rng.random() < 0.2:
+            self.run("csv_export", self.widget(self.at.button, "📄 Export all").click())
+            self.pause()
+
+    def register_vendor(self):
+        """Walk the registration wizard field by field and submit"""
+        from validation import gstin_check_char
+
+        n = self.rng.randrange(10 ** 6)
+        pan = f"AAB{self.rng.choice('CFP')}L{n % 10000:04d}Z"
+        gstin = f"27{pan}1Z"
+        gstin += gstin_check_char(gstin)
+
+        self.at.switch_page("pages/01_Vendor_Registration.py")
+        self.run("wizard_open")
+        self.pause()
+        self.run("wizard_step", self.widget(self.at.button, "Skip and enter manually").click())
+        fields = [
+            ("GSTIN *", gstin), ("PAN *", pan), ("Legal name *", f"Load Test Steel Traders {n}"),
+            ("Trade name *", f"Load Test Steel {n}"), ("Email *", f"load{n}@example.in"),
+            ("Phone *", "9876543210"), ("Address line 1 *", "1, MIDC"), ("PIN code *", "411001"),
+            ("City *", "Pune"),
+        ]
+        for label, value in fields:
+            self.pause(0.3)
+            self.run("wizard_field", self.widget(self.at.text_input, label).input(value))
+        # A person who sees a likely duplicate checks it and carries on
+        for checkbox in self.at.checkbox:
+            if checkbox.label.startswith("I have checked"):
+                self.run("wizard_field", checkbox.check())
+        self.pause()
+        self.run("wizard_step", self.widget(self.at.button, "Next →").click())
+        for label, value in (("Name *", "Load Tester"), ("Mobile *", "9876543210"), ("Designation *", "Manager")):
+            self.pause(0.3)
+            self.run("wizard_field", self.widget(self.at.text_input, label).input(value))
+        self.pause()
+        self.run("wizard_step", self.widget(self.at.button, "Next →").click())
+        self.pause(0.3)
+        self.run("wizard_field", self.widget(self.at.text_input, "IFSC code").input("HDFC0000001"))
+        self.pause()
+        self.run("wizard_submit", self.widget(self.at.button, "✅ Submit").click())
+
+        if self.at.session_state["v_done"]:
+            self.recorder.registrations += 1
+            self.run("wizard_step", self.widget(self.at.button, "Register another vendor").click())
+        else:
+            errors = [e.value.splitlines()[0] for e in self.at.error]
+            self.recorder.failures.append(f"registration failed: {errors[0] if errors else 'no confirmation'}")
+            # Start over, as "Register another vendor" would
+            self.at.session_state["v_step"] = 1
+            self.at.session_state["v_data"] = {}
+
+
+def simulate(number, sessions, loops, think, register_ratio, seed, ready, results):
+    """Worker process body for one simulated user"""
+    # Imported in the worker, after the parent pointed PRARTHI_DATABASE_URL at the copy
+    import database
+
+    recorder = Recorder()
+    watch_database(database.engine, recorder)
+    rng = random.Random(f"{seed}-{sessions}-{number}")
+    user = SimulatedUser(number, recorder, think, rng)
+    recorder.rss_start = rss_mb()
+    sampler = MemorySampler()
+    sampler.start()
+
+    # Start all users together once every worker has finished importing
+    ready.wait()
+    try:
+        user.login()
+        for _ in range(loops):
+            if rng.random() < register_ratio:
+                user.register_vendor()
+            else:
+                user.browse_library()
+    except Exception as e:
+        recorder.failures.append(f"session {number}: {type(e).__name__}: {str(e).splitlines()[0]}")
+    recorder.rss_peak = sampler.stop()
+    results.put(recorder.as_dict())
+
+
+def run_level(sessions, loops, think, register_ratio, seed):
+    """Run one concurrency level in worker processes and summarize it"""
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(sessions + 1)
+    results = context.Queue()
+    workers = [context.Process(target=simulate, args=(n, sessions, loops, think, register_ratio, seed, ready, results))
+               for n in range(sessions)]
+    for worker in workers:
+        worker.start()
+    ready.wait()
+    started = time.perf_counter()
+    recorded = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.join()
+
+    reruns = defaultdict(list)
+    for r in recorded:
+        for action, samples in r["reruns"].items():
+            reruns[action].extend(samples)
+    all_reruns = [s for samples in reruns.values() for s in samples]
+    writes = [w for r in recorded for w in r["writes"]]
+    growth = [r["rss_peak"] - r["rss_start"] for r in recorded if r["rss_peak"] and r["rss_start"]]
+    peaks = [r["rss_peak"] for r in recorded if r["rss_peak"]]
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 2),
+        "reruns": len(all_reruns),
+        "reruns_per_s": round(len(all_reruns) / elapsed, 2) if elapsed else None,
+        "latency_ms": _percentiles(all_reruns),
+        "by_action": {action: _percentiles(samples) for action, samples in sorted(reruns.items())},
+        "writes": len(writes),
+        "write_ms": _percentiles(writes),
+        "write_total_s": round(sum(writes), 3),
+        "lock_errors": sum(r["lock_errors"] for r in recorded),
+        "registrations": sum(r["registrations"] for r in recorded),
+        "failures": [f for r in recorded for f in r["failures"]],
+        "rss_mb_per_session": round(max(peaks), 1) if peaks else None,
+        "rss_growth_mb_per_session": round(max(growth), 1) if growth else None,
+    }
+
+
+def print_level(result):
+    """One summary line per concurrency level"""
+    latency, writes = result["latency_ms"], result["write_ms"]
+    growth = result["rss_growth_mb_per_session"]
+    print(f"{result['sessions']:>8} {result['reruns']:>7} {result['reruns_per_s']:>8} "
+          f"{latency.get('p50', 0):>9.1f} {latency.get('p95', 0):>9.1f} {latency.get('p99', 0):>9.1f} "
+          f"{writes.get('p95', 0):>9.1f} {writes.get('max', 0):>9.1f} {result['lock_errors']:>6} "
+          f"{len(result['failures']):>6} {'n/a' if growth is None else f'{growth:.1f}':>8}")
+    for failure in result["failures"][:5]:
+        print(f"         ! {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent session load test")
+    parser.add_argument("--size", choices=list(SIZES), default="1k")
+    parser.add_argument("--sessions", default="1,5,10,20", help="Comma-separated concurrency levels")
+    parser.add_argument("--loops", type=int, default=3, help="User scripts per session after login")
+    parser.add_argument("--think", type=float, default=1.0, help="Mean think time between actions (seconds)")
+    parser.add_argument("--register-ratio", type=float, default=0.2,
+                        help="Share of user scripts that register a vendor instead of browsing")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Result JSON file (default: benchmarks/results/loadtest-<size>-<time>.json)")
+    parser.add_argument("--keep", action="store_true", help="Keep the throwaway database copy")
+    args = parser.parse_args()
+    levels = [int(n) for n in args.sessions.split(",")]
+
+    # Generate the dataset in its own process: database.py binds to one file per process
+    if not os.path.exists(dataset_path(args.size)):
+        subprocess.run([sys.executable, "-m", "benchmarks.generate", "--size", args.size], cwd=ROOT_DIR, check=True)
+
+    workdir = tempfile.mkdtemp(prefix="prarthi-loadtest-")
+    try:
+        database_copy = os.path.join(workdir, "prarthi_erp.db")
+        # SQLite's backup API also picks up changes still in the dataset's WAL file
+        source, target = sqlite3.connect(dataset_path(args.size)), sqlite3.connect(database_copy)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        # Inherited by the worker processes
+        use_database(database_copy)
+
+        print(f"Load test on a copy of the {args.size} dataset in {workdir}")
+        if RSS_SOURCE is None:
+            print("Memory per session cannot be measured on this system (pip install psutil); +RSS shows n/a")
+        else:
+            print(f"Memory per session measured with {RSS_SOURCE}")
+        print(f"{'sessions':>8} {'reruns':>7} {'rerun/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'wr p95':>9} {'wr max':>9} {'locked':>6} {'failed':>6} {'+RSS MB':>8}")
+        started_at = datetime.now()
+        results = []
+        for sessions in levels:
+            result = run_level(sessions, args.loops, args.think, args.register_ratio, args.seed)
+            results.append(result)
+            print_level(result)
+    finally:
+        if args.keep:
+            print(f"Database copy kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"loadtest-{args.size}-{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "size": args.size,
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "loops": args.loops,
+            "think_s": args.think,
+            "register_ratio": args.register_ratio,
+            "rss_source": RSS_SOURCE,
+            "levels": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+    return 1 if any(r["failures"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
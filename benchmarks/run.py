@@ -0,0 +1,136 @@
+"""
+Benchmark Runner
+Prarthi ERP System
+
+Runs the vendor subsystem scenarios against a generated dataset (created on
+first use) and writes the timings as JSON, optionally comparing them with an
+earlier result file to catch regressions.
+
+Usage:
+    python -m benchmarks.run --size 100k [--repeat 5] [--scenario typeahead ...]
+                             [--output FILE] [--compare BASELINE.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks import RESULTS_DIR, ROOT_DIR, SIZES, use_dataset
+
+# Median slowdown versus the baseline that counts as a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+def summarize(durations):
+    """Timing summary in milliseconds"""
+    ms = sorted(d * 1000 for d in durations)
+    return {
+        "runs": len(ms),
+        "min": round(ms[0], 2),
+        "median": round(statistics.median(ms), 2),
+        "p95": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+        "max": round(ms[-1], 2),
+        "samples": [round(m, 2) for m in ms],
+    }
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenarios(scenarios, repeat, warmup):
+    """{name: summary} for each scenario; a failing scenario is recorded with its error"""
+    results = {}
+    for name, scenario in scenarios.items():
+        try:
+            for i in range(warmup):
+                scenario(i)
+            durations = [scenario(warmup + i) for i in range(repeat)]
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{name:<22} FAILED: {e}")
+            continue
+        results[name] = summarize(durations)
+        print(f"{name:<22} median {results[name]['median']:>10.2f} ms   p95 {results[name]['p95']:>10.2f} ms")
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print median changes versus a baseline result. Returns the names of regressed scenarios."""
+    regressed = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('started_at')}):")
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "median" not in before or "median" not in current:
+            continue
+        ratio = current["median"] / before["median"] if before["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:<22} {before['median']:>10.2f} -> {current['median']:>10.2f} ms  ({ratio:.2f}x){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor subsystem benchmarks")
+    parser.add_argument("--size", choices=list(SIZES), default="1k")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per scenario")
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios")
+    parser.add_argument("--output", help="Result JSON file (default: benchmarks/results/<size>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier result JSON to compare medians with")
+    args = parser.parse_args()
+
+    # database.py connects on import, so point it at the dataset before importing anything that uses it
+    use_dataset(args.size)
+    from benchmarks.generate import ensure_dataset
+    from benchmarks.scenarios import SCENARIOS
+
+    unknown = set(args.scenario or []) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+    scenarios = {name: fn for name, fn in SCENARIOS.items() if not args.scenario or name in args.scenario}
+
+    ensure_dataset(args.size)
+
+    started_at = datetime.now()
+    print(f"Running {len(scenarios)} scenario(s) on the {args.size} dataset, {args.repeat} run(s) each")
+    results = {
+        "size": args.size,
+        "vendors": SIZES[args.size],
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "scenarios": run_scenarios(scenarios, args.repeat, args.warmup),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.size}-{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    failed = [name for name, r in results["scenarios"].items() if "error" in r]
+    regressed = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f))
+    return 1 if failed or regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Benchmark Scenarios
+Prarthi ERP System
+
+Each scenario performs one user-visible operation and returns the seconds it
+took. Page scenarios drive the real Streamlit pages through AppTest; the rest
+call the same functions the pages use. Setup and cleanup are not timed.
+
+Imports database, so only import this module after benchmarks.use_dataset().
+"""
+
+import os
+import time
+from datetime import datetime
+
+import streamlit as st
+from sqlalchemy import case, delete, func, select
+from streamlit.testing.v1 import AppTest
+
+from auth import create_session
+from benchmarks import ROOT_DIR
+from database import (AuditLog, SessionLocal, Vendor, VendorContact, VendorNameSignature,
+                      VendorSearchKey, get_next_vendor_code, read_session, write_session)
+from duplicates import find_duplicates
+from vendor_search import lookup_vendors
+from vendor_updates import bulk_update_vendors
+
+LIBRARY_PAGE = os.path.join(ROOT_DIR, "pages", "02_Vendor_Library.py")
+REGISTRATION_PAGE = os.path.join(ROOT_DIR, "pages", "01_Vendor_Registration.py")
+
+# Vendors changed by one bulk update
+BULK_UPDATE_SIZE = 1000
+
+# Seconds an AppTest script run may take before it is reported as failed (1M-row loads are slow)
+APP_TIMEOUT = 600
+
+BENCH_USER = {"id": 1, "username": "admin", "full_name": "System Administrator",
+              "role": "Management", "department": "Admin"}
+
+SEARCH_TERMS = ["steel", "27A", "ganesh", "V-00", "cement", "pune", "shree sai", "xyz-no-match"]
+TYPEAHEAD_TERMS = ["V-0", "27", "GANESH", "Shree", "balaji st", "mumbai", "krishna ele", "29"]
+
+_token = None
+
+
+def _timed(action):
+    """Run action and return elapsed seconds"""
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+def _session_token():
+    """Session token of the benchmark user, issued once per run"""
+    global _token
+    if _token is None:
+        with write_session() as session:
+            _token = create_session(session, BENCH_USER)
+    return _token
+
+
+def _app(page, **state):
+    """AppTest for a page, logged in as the benchmark user"""
+    at = AppTest.from_file(page, default_timeout=APP_TIMEOUT)
+    at.session_state["authenticated"] = True
+    at.session_state["user"] = BENCH_USER
+    at.session_state["session_token"] = _session_token()
+    for key, value in state.items():
+        at.session_state[key] = value
+    return at
+
+
+def _check(at):
+    """Fail the scenario if the page raised"""
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at
+
+
+def _widget(elements, label):
+    """Widget by label from an AppTest element list"""
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _loaded_library():
+    """Library page after one run, with warm caches"""
+    return _check(_app(LIBRARY_PAGE).run())
+
+
+# ============ LIBRARY PAGE ============
+def library_load_cold(i):
+    """Open the Library with empty caches"""
+    st.cache_data.clear()
+    at = _app(LIBRARY_PAGE)
+    elapsed = _timed(at.run)
+    _check(at)
+    return elapsed
+
+
+def library_load_warm(i):
+    """Open the Library with the vendor table already cached"""
+    _loaded_library()
+    at = _app(LIBRARY_PAGE)
+    elapsed = _timed(at.run)
+    _check(at)
+    return elapsed
+
+
+def library_search(i):
+    """Type into the grid search box"""
+    at = _loaded_library()
+    search = _widget(at.text_input, "Search").input(SEARCH_TERMS[i % len(SEARCH_TERMS)])
+    elapsed = _timed(search.run)
+    _check(at)
+    return elapsed
+
+
+def library_filter(i):
+    """Filter the grid by status and category"""
+    at = _loaded_library()
+    _widget(at.selectbox, "Status").select("Active" if i % 2 else "Inactive")
+    category = _widget(at.selectbox, "Category")
+    category.select_index(1 + i % (len(category.options) - 1))
+    elapsed = _timed(at.run)
+    _check(at)
+    return elapsed
+
+
+def csv_export(i):
+    """Export all vendors in the grid to CSV"""
+    at = _loaded_library()
+    _widget(at.button, "📄 Export all").click()
+    elapsed = _timed(at.run)
+    _check(at)
+    return elapsed
+
+
+def pdf_generation(i):
+    """Pick a vendor whose PDF has not been built yet"""
+    at = _loaded_library()
+    _widget(at.text_input, "Find vendor").input("steel")
+    _check(at.run())
+    picker = _widget(at.selectbox, "Select vendor for actions")
+    # The picker shows labels; selecting needs the vendor ids behind them
+    session = SessionLocal()
+    try:
+        vendor_ids = [vendor_id for vendor_id, _ in lookup_vendors(session, "steel", limit=len(picker.options))]
+    finally:
+        session.close()
+    picker.select(vendor_ids[1 + i % (len(vendor_ids) - 1)])
+    elapsed = _timed(at.run)
+    _check(at)
+    return elapsed
+
+
+# ============ DIRECT DATABASE CALLS ============
+def vendor_stats(i):
+    """Header counts, as computed by the Library"""
+    with read_session() as session:
+        return _timed(lambda: session.query(
+            func.count(Vendor.id),
+            func.coalesce(func.sum(case((Vendor.status == "Active", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Vendor.status == "Inactive", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Vendor.is_msme == True, 1), else_=0)), 0),
+        ).one())
+
+
+def typeahead(i):
+    """Vendor picker lookup"""
+    with read_session() as session:
+        return _timed(lambda: lookup_vendors(session, TYPEAHEAD_TERMS[i % len(TYPEAHEAD_TERMS)]))
+
+
+def duplicate_check(i):
+    """Registration duplicate check for an existing vendor's details"""
+    session = SessionLocal()
+    try:
+        count = session.execute(select(func.count(Vendor.id))).scalar()
+        vendor = session.get(Vendor, 1 + (i * 7919) % count)
+        return _timed(lambda: find_duplicates(session, vendor.gstin, vendor.pan,
+                                              vendor.legal_name, vendor.trade_name))
+    finally:
+        session.close()
+
+
+def bulk_update(i):
+    """Deactivate 1,000 vendors selected in the Library (rolled back afterwards)"""
+    session = SessionLocal()
+    try:
+        count = session.execute(select(func.count(Vendor.id))).scalar()
+        step = max(1, count // BULK_UPDATE_SIZE)
+        vendor_ids = [1 + (i + n * step) % count for n in range(min(count, BULK_UPDATE_SIZE))]
+        loaded_at = datetime.utcnow()
+        changes = {"status": "Inactive", "credit_limit": 100000.0 + i}
+
+        def update():
+            result, error = bulk_update_vendors(session, vendor_ids, changes, BENCH_USER["id"], loaded_at)
+            if error:
+                raise RuntimeError(error)
+            session.flush()
+
+        return _timed(update)
+    finally:
+        session.rollback()
+        session.close()
+
+
+# ============ REGISTRATION PAGE ============
+def _remove_vendors_after(last_id):
+    """Delete vendors (and their rows) added by a scenario, so datasets stay as generated"""
+    session = SessionLocal()
+    try:
+        for model, column in ((VendorContact, VendorContact.vendor_id),
+                              (VendorNameSignature, VendorNameSignature.vendor_id),
+                              (VendorSearchKey, VendorSearchKey.vendor_id),
+                              (Vendor, Vendor.id)):
+            session.execute(delete(model).where(column > last_id))
+        session.execute(delete(AuditLog).where(AuditLog.table_name == "vendors", AuditLog.record_id > last_id))
+        session.commit()
+    finally:
+        session.close()
+
+
+def registration_submit(i):
+    """Submit the last step of the registration wizard"""
+    session = SessionLocal()
+    try:
+        last_id = session.execute(select(func.max(Vendor.id))).scalar() or 0
+        vendor_code = get_next_vendor_code(session)
+    finally:
+        session.close()
+
+    v_data = {
+        "vendor_code": vendor_code, "gstin": "27AAPFU0939F1ZV", "pan": "AAPFU0939F",
+        "legal_name": f"Benchmark Steel Traders {i}", "trade_name": f"Benchmark Steel {i}",
+        "vendor_type": "Material Supplier", "vendor_category": "Steel Suppliers",
+        "company_email": "bench@example.in", "company_phone": "9876543210",
+        "address": "1, MIDC", "city": "Pune", "state": "Maharashtra", "pin": "411001",
+        "p_name": "Rahul Patil", "p_desig": "Director", "p_mobile": "9876543210", "p_email": "",
+        "payment_terms": "30 Days", "credit_days": 30, "credit_limit": 500000.0,
+        "r_del": 4.0, "r_qual": 4.0, "r_price": 4.0, "r_overall": 4.0, "comments": "",
+        "ifsc": "HDFC0000001", "bank_name": "HDFC Bank", "account": "50100012345678",
+    }
+    at = _check(_app(REGISTRATION_PAGE, v_step=4, v_data=v_data, ai_extracted={}).run())
+    try:
+        _widget(at.button, "✅ Submit").click()
+        elapsed = _timed(at.run)
+        _check(at)
+        if not at.session_state["v_done"]:
+            raise RuntimeError("Registration did not complete")
+    finally:
+        _remove_vendors_after(last_id)
+    return elapsed
+
+
+# Run order; cold loads first so earlier scenarios cannot warm them
+SCENARIOS = {
+    "library_load_cold": library_load_cold,
+    "library_load_warm": library_load_warm,
+    "library_search": library_search,
+    "library_filter": library_filter,
+    "csv_export": csv_export,
+    "pdf_generation": pdf_generation,
+    "vendor_stats": vendor_stats,
+    "typeahead": typeahead,
+    "duplicate_check": duplicate_check,
+    "bulk_update": bulk_update,
+    "registration_submit": registration_submit,
+}
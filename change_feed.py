@@ -0,0 +1,218 @@
+"""
+Vendor Change Feed
+Prarthi ERP System
+
+Lets accounting and payment systems pick up only the vendors that changed
+since their last sync instead of re-reading the whole vendor list. Every
+vendor insert, update and delete (including contact changes) is appended to
+the vendor_changes table as it is flushed; the entry id is the cursor. An
+export reads entries after the cursor, keeps the latest change per vendor
+and writes the current vendor records as NDJSON, so a sync costs O(changes).
+
+Each output line is one vendor:
+    {"cursor": 1234, "operation": "UPDATE", "vendor_id": 17,
+     "changed_at": "...", "vendor": {... columns ..., "contacts": [...]}}
+"vendor" is null for deleted vendors. A first sync uses --full, which
+writes every vendor as "SNAPSHOT" and the cursor to continue from.
+
+Usage:
+    python change_feed.py export --state data/accounting.cursor --out changes.ndjson
+    python change_feed.py export --since 1234
+    python change_feed.py export --full --state data/accounting.cursor --out vendors.ndjson
+    python change_feed.py cursor
+    python change_feed.py prune --days 90
+"""
+
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from database import (IS_SQLITE, Vendor, VendorChange, VendorContact, read_session, stream_rows,
+                      write_session)
+
+# Feed entries read per query, and vendors fetched per IN (...) lookup
+CHANGE_BATCH = 5000
+VENDOR_CHUNK = 500
+
+# PostgreSQL hands out ids before commit, so a slow transaction can commit a lower id after
+# a higher one was exported. Entries younger than this are left for the next run.
+# SQLite has one writer at a time and needs no margin.
+SETTLE_SECONDS = 0 if IS_SQLITE else 60
+
+
+# ============ READING THE FEED ============
+def latest_cursor(session):
+    """Id of the newest feed entry (0 if the feed is empty)"""
+    return session.scalar(select(func.max(VendorChange.id))) or 0
+
+
+def changes_since(session, cursor, limit=CHANGE_BATCH):
+    """Latest change per vendor among the next `limit` entries after cursor.
+    Returns (changes, next_cursor); changes are dicts ordered by cursor."""
+    query = select(VendorChange).where(VendorChange.id > cursor)
+    if SETTLE_SECONDS:
+        query = query.where(VendorChange.changed_at <= datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS))
+    entries = session.scalars(query.order_by(VendorChange.id).limit(limit)).all()
+
+    changes = {}
+    for entry in entries:
+        change = changes.pop(entry.vendor_id, None)
+        # A vendor created within the range is still new to the consumer
+        if change is None or entry.operation == "DELETE":
+            operation = entry.operation
+        elif change["operation"] == "INSERT":
+            operation = "INSERT"
+        else:
+            operation = entry.operation
+        changes[entry.vendor_id] = {"cursor": entry.id, "operation": operation,
+                                    "vendor_id": entry.vendor_id, "changed_at": entry.changed_at}
+    next_cursor = entries[-1].id if entries else cursor
+    return list(changes.values()), next_cursor
+
+
+def vendor_records(session, vendor_ids):
+    """{vendor_id: column dict with a "contacts" list} for the vendors that still exist"""
+    records = {}
+    vendor_ids = list(vendor_ids)
+    for start in range(0, len(vendor_ids), VENDOR_CHUNK):
+        chunk = vendor_ids[start:start + VENDOR_CHUNK]
+        for row in session.execute(select(Vendor.__table__).where(Vendor.id.in_(chunk))).mappings():
+            records[row["id"]] = dict(row, contacts=[])
+        contacts = session.execute(select(VendorContact.__table__)
+                                   .where(VendorContact.vendor_id.in_(chunk))
+                                   .order_by(VendorContact.id)).mappings()
+        for row in contacts:
+            if row["vendor_id"] in records:
+                records[row["vendor_id"]]["contacts"].append(dict(row))
+    return records
+
+
+# ============ NDJSON EXPORT ============
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _write_line(out, record):
+    out.write(json.dumps(record, default=_json_value, ensure_ascii=False) + "\n")
+
+
+def export_changes(out, cursor, batch_size=CHANGE_BATCH):
+    """Write vendors changed after cursor as NDJSON. Returns (vendors written, next cursor)."""
+    written = 0
+    # One read transaction, so every batch sees the same state of the database
+    with read_session() as session:
+        while True:
+            changes, next_cursor = changes_since(session, cursor, batch_size)
+            if next_cursor == cursor:
+                break
+            records = vendor_records(session, [c["vendor_id"] for c in changes if c["operation"] != "DELETE"])
+            for change in changes:
+                _write_line(out, dict(change, vendor=records.get(change["vendor_id"])))
+            written += len(changes)
+            cursor = next_cursor
+    return written, cursor
+
+
+def export_snapshot(out):
+    """Write every vendor as NDJSON. Returns (vendors written, cursor to continue from)."""
+    written = 0
+    with read_session() as session:
+        # Read the cursor first: changes after it are not in the snapshot, or come again harmlessly
+        cursor = latest_cursor(session)
+        vendor_ids = []
+        for (vendor_id,) in stream_rows(session, select(Vendor.id).order_by(Vendor.id)):
+            vendor_ids.append(vendor_id)
+            if len(vendor_ids) == VENDOR_CHUNK:
+                written += _write_snapshot_chunk(out, session, vendor_ids, cursor)
+                vendor_ids = []
+        written += _write_snapshot_chunk(out, session, vendor_ids, cursor)
+    return written, cursor
+
+
+def _write_snapshot_chunk(out, session, vendor_ids, cursor):
+    records = vendor_records(session, vendor_ids)
+    for vendor_id in vendor_ids:
+        _write_line(out, {"cursor": cursor, "operation": "SNAPSHOT", "vendor_id": vendor_id,
+                          "changed_at": None, "vendor": records[vendor_id]})
+    return len(vendor_ids)
+
+
+def prune_changes(days):
+    """Delete feed entries older than `days` days. Returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with write_session() as session:
+        return session.execute(delete(VendorChange).where(VendorChange.changed_at < cutoff)).rowcount
+
+
+# ============ CURSOR FILE ============
+def read_cursor(path):
+    """Cursor saved by the previous sync (0 if there was none)"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return int(f.read().strip() or 0)
+
+
+def save_cursor(path, cursor):
+    """Save the cursor atomically, so an interrupted sync resumes from the old one"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(f"{cursor}\n")
+    os.replace(temp_path, path)
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Vendor change feed for downstream systems")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="Write vendors changed since a cursor as NDJSON")
+    source = export_cmd.add_mutually_exclusive_group()
+    source.add_argument("--since", type=int, help="Cursor from the previous sync")
+    source.add_argument("--full", action="store_true", help="Write every vendor (first sync)")
+    export_cmd.add_argument("--state", help="File holding the cursor; read before and updated after the export")
+    export_cmd.add_argument("--out", help="Output file (default: standard output)")
+    sub.add_parser("cursor", help="Print the newest cursor")
+    prune_cmd = sub.add_parser("prune", help="Delete old feed entries")
+    prune_cmd.add_argument("--days", type=int, required=True,
+                           help="Keep this many days; consumers must sync more often than this")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        since = args.since
+        if since is None and not args.full:
+            if not args.state:
+                parser.error("give --since, --state or --full")
+            since = read_cursor(args.state)
+
+        started = time.perf_counter()
+        out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        try:
+            if args.full:
+                written, cursor = export_snapshot(out)
+            else:
+                written, cursor = export_changes(out, since)
+        finally:
+            if args.out:
+                out.close()
+            else:
+                out.flush()
+        # Only move the saved cursor once the output is complete
+        if args.state:
+            save_cursor(args.state, cursor)
+        print(f"{written} vendor(s) written, next cursor {cursor} ({time.perf_counter() - started:.2f}s)",
+              file=sys.stderr)
+
+    elif args.command == "cursor":
+        with read_session() as session:
+            print(latest_cursor(session))
+
+    elif args.command == "prune":
+        print(f"Removed {prune_changes(args.days)} feed entries older than {args.days} days")
@@ -3,10 +3,63 @@ Configuration Settings
 Prarthi ERP System
 """
 
+import os
+
 # Company info
 COMPANY_NAME = "Prarthi Bhambere Limited"
 COMPANY_SHORT = "PBL"
 
+# Uploaded vendor documents
+DOCUMENTS_DIR = os.getenv("PRARTHI_DOCUMENTS_DIR", r"C:\Users\Admin\Desktop\PrarthiERP\documents")
+
+# SQL statistics: statements slower than this are logged with their query plan,
+# and Management users get a per-rerun query panel when the debug panel is on
+SLOW_QUERY_MS = float(os.getenv("PRARTHI_SLOW_QUERY_MS", "200"))
+SQL_DEBUG_PANEL = os.getenv("PRARTHI_SQL_DEBUG", "0") == "1"
+
+# Performance metrics (Prometheus format): off unless PRARTHI_METRICS=1. Served on
+# http://127.0.0.1:<port>/metrics when a port is set, and/or written to a textfile
+# every METRICS_INTERVAL seconds
+METRICS_ENABLED = os.getenv("PRARTHI_METRICS", "0") == "1"
+METRICS_PORT = int(os.getenv("PRARTHI_METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("PRARTHI_METRICS_FILE", "")
+METRICS_INTERVAL = 15
+
+# Backups (python backup.py): snapshot folder and how many snapshots to keep
+BACKUP_DIR = os.getenv("PRARTHI_BACKUP_DIR", "./backups")
+BACKUP_KEEP = int(os.getenv("PRARTHI_BACKUP_KEEP", "14"))
+
+# Audit exports of vendor documents (python document_export.py, or the Vendor Library): ZIPs are
+# written here, and offered as a browser download up to EXPORT_DOWNLOAD_MB
+EXPORT_DIR = os.getenv("PRARTHI_EXPORT_DIR", "./exports")
+EXPORT_DOWNLOAD_MB = int(os.getenv("PRARTHI_EXPORT_DOWNLOAD_MB", "500"))
+
+# Login sessions: a login stays valid for SESSION_HOURS across refreshes, tabs and app
+# servers. Tokens are signed with PRARTHI_SESSION_SECRET; set the same value on every app
+# server (without it each server keeps its own in data/session_secret)
+SESSION_HOURS = int(os.getenv("PRARTHI_SESSION_HOURS", "12"))
+SESSION_SECRET = os.getenv("PRARTHI_SESSION_SECRET", "")
+# Seconds a checked token is trusted before the database is asked again (how long a
+# logout takes to reach other app servers)
+SESSION_CACHE_SECONDS = 60
+
+# Passwords: bcrypt cost for new hashes (older hashes are upgraded at the next login), and
+# LOGIN_MAX_FAILURES wrong passwords per user within LOGIN_LOCKOUT_MINUTES lock it out for
+# the rest of that window (LOGIN_MAX_FAILURES_PER_IP across users from one address)
+BCRYPT_ROUNDS = int(os.getenv("PRARTHI_BCRYPT_ROUNDS", "12"))
+LOGIN_MAX_FAILURES = 5
+LOGIN_MAX_FAILURES_PER_IP = 20
+LOGIN_LOCKOUT_MINUTES = 15
+
+# Vendor archive: Inactive vendors unchanged for this many days (and never on a PO or invoice)
+# are moved out of the vendors table by python vendor_archive.py run
+ARCHIVE_AFTER_DAYS = int(os.getenv("PRARTHI_ARCHIVE_AFTER_DAYS", "365"))
+
+# Vendor registration drafts: changed fields are saved at most every DRAFT_AUTOSAVE_SECONDS
+# (and at once on a step change or upload); drafts untouched for DRAFT_EXPIRY_DAYS are purged
+DRAFT_AUTOSAVE_SECONDS = float(os.getenv("PRARTHI_DRAFT_AUTOSAVE_SECONDS", "5"))
+DRAFT_EXPIRY_DAYS = int(os.getenv("PRARTHI_DRAFT_EXPIRY_DAYS", "14"))
+
 # Vendor categories
 VENDOR_CATEGORIES = [
     "Steel Suppliers",
@@ -74,6 +127,50 @@ INDIAN_STATES = [
     "West Bengal"
 ]
 
+# GST state codes (first two digits of GSTIN)
+GST_STATE_CODES = {
+    "01": "Jammu and Kashmir",
+    "02": "Himachal Pradesh",
+    "03": "Punjab",
+    "04": "Chandigarh",
+    "05": "Uttarakhand",
+    "06": "Haryana",
+    "07": "Delhi",
+    "08": "Rajasthan",
+    "09": "Uttar Pradesh",
+    "10": "Bihar",
+    "11": "Sikkim",
+    "12": "Arunachal Pradesh",
+    "13": "Nagaland",
+    "14": "Manipur",
+    "15": "Mizoram",
+    "16": "Tripura",
+    "17": "Meghalaya",
+    "18": "Assam",
+    "19": "West Bengal",
+    "20": "Jharkhand",
+    "21": "Odisha",
+    "22": "Chhattisgarh",
+    "23": "Madhya Pradesh",
+    "24": "Gujarat",
+    "25": "Daman and Diu",
+    "26": "Dadra and Nagar Haveli",
+    "27": "Maharashtra",
+    "28": "Andhra Pradesh",
+    "29": "Karnataka",
+    "30": "Goa",
+    "31": "Lakshadweep",
+    "32": "Kerala",
+    "33": "Tamil Nadu",
+    "34": "Puducherry",
+    "35": "Andaman and Nicobar Islands",
+    "36": "Telangana",
+    "37": "Andhra Pradesh",
+    "38": "Ladakh",
+    "97": "Other Territory",
+    "99": "Centre Jurisdiction"
+}
+
 # Payment terms
 PAYMENT_TERMS = [
     "Advance",
@@ -94,9 +191,9 @@ DATE_FORMAT = "%d-%m-%Y"
 DATETIME_FORMAT = "%d-%m-%Y %H:%M"
 
 # Financial year
-def get_financial_year():
+def get_financial_year(on=None):
     from datetime import datetime
-    today = datetime.now()
+    today = on or datetime.now()
     if today.month >= 4:
         return f"{today.year}-{today.year + 1}"
     else:
@@ -0,0 +1,240 @@
+"""
+Vendor Document Export
+Prarthi ERP System
+
+Packs the GST certificate, PAN card, bank document and MSME certificate of
+every vendor matching a filter (category, financial year of registration,
+status) into one ZIP for auditors, with manifest.csv listing each vendor's
+documents, their size and SHA-256, and the ones that are missing.
+
+Vendors are read from the database in batches. A reader thread reads and
+hashes each file in HASH_CHUNK pieces while the previous pieces are written
+to the ZIP, holding at most READ_AHEAD_CHUNKS of them, so memory use does
+not depend on how many vendors or how many gigabytes are exported.
+Documents are scanned PDFs and images that do not compress further, so they
+are stored as they are and the export runs at about the speed of the disk.
+Archived vendors are included.
+
+Usage:
+    python document_export.py --out audit.zip [--category "Steel Suppliers"] [--fy 2024-2025] [--status Active]
+"""
+
+import csv
+import hashlib
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+from sqlalchemy import select
+
+from config import EXPORT_DIR, get_financial_year
+from database import Vendor, VendorArchive, stream_rows
+from telemetry import timed
+
+# Document columns and the file name each is exported as
+DOCUMENTS = {
+    "doc_gst_certificate": "gst_certificate",
+    "doc_pan_card": "pan_card",
+    "doc_cancelled_cheque": "bank_document",
+    "doc_msme_certificate": "msme_certificate",
+}
+
+# Read/write size when copying a document into the ZIP
+HASH_CHUNK = 1024 * 1024
+
+# Documents handed to the reader thread at a time, and chunks it may read ahead of the ZIP writer
+READ_BATCH = 500
+READ_AHEAD_CHUNKS = 16
+
+# The manifest is kept in memory up to this size, then on disk
+MANIFEST_SPOOL_BYTES = 4 * 1024 * 1024
+
+MANIFEST = "manifest.csv"
+MANIFEST_COLUMNS = ["vendor_code", "vendor_name", "gstin", "pan", "category", "registered", "status",
+                    "document", "file", "bytes", "sha256", "note"]
+
+
+def fy_bounds(financial_year):
+    """(start, end) datetimes of a financial year written like 2024-2025"""
+    match = re.fullmatch(r"(\d{4})-(\d{4})", financial_year or "")
+    if not match or int(match[2]) != int(match[1]) + 1:
+        return None
+    start = int(match[1])
+    return datetime(start, 4, 1), datetime(start + 1, 4, 1)
+
+
+def financial_years(first=None):
+    """Financial years from the one containing `first` (default 2020) to the current one, latest first"""
+    current = int(get_financial_year().split("-")[0])
+    first = int(get_financial_year(first).split("-")[0]) if first else 2020
+    return [f"{year}-{year + 1}" for year in range(current, first - 1, -1)]
+
+
+def _vendor_query(model, category, financial_year, status):
+    columns = [model.vendor_code, model.trade_name, model.legal_name, model.gstin, model.pan,
+               model.vendor_category, model.created_at, model.status,
+               *(getattr(model, column) for column in DOCUMENTS)]
+    query = select(*columns)
+    if category:
+        query = query.where(model.vendor_category == category)
+    if financial_year:
+        start, end = fy_bounds(financial_year)
+        query = query.where(model.created_at >= start, model.created_at < end)
+    if status:
+        query = query.where(model.status == status)
+    return query.order_by(model.vendor_code)
+
+
+def _folder_name(text):
+    """Characters safe in a file name on Windows"""
+    return re.sub(r'[<>:"/\\|?*]+', "_", text).strip(" .")
+
+
+def _read_files(paths, chunks, stop):
+    """Reader thread: for each path put ("file", os.stat_result) or ("missing", reason), the file's
+    chunks and ("end", bytes, sha256) on the queue, so reading and hashing overlap with writing"""
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        for path in paths:
+            try:
+                source = open(path, "rb")
+            except OSError as e:
+                if not put(("missing", e.strerror or str(e))):
+                    return
+                continue
+            with source:
+                if not put(("file", os.fstat(source.fileno()))):
+                    return
+                digest = hashlib.sha256()
+                size = 0
+                for chunk in iter(lambda: source.read(HASH_CHUNK), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    if not put(chunk):
+                        return
+            if not put(("end", size, digest.hexdigest())):
+                return
+    except Exception as e:
+        put(e)
+
+
+def _write_batch(archive, batch, writer, summary):
+    """Copy a batch of documents ([vendor columns, document, path, file name]) into the ZIP in order,
+    with a manifest row for each"""
+    chunks = queue.Queue(READ_AHEAD_CHUNKS)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_files, args=([item[2] for item in batch], chunks, stop), daemon=True)
+    reader.start()
+    try:
+        for vendor, document, path, name in batch:
+            header = chunks.get()
+            if isinstance(header, Exception):
+                raise header
+            if header[0] == "missing":
+                summary["missing"] += 1
+                writer.writerow(vendor + [document, "", "", "", f"not found: {header[1]}"])
+                continue
+            info = zipfile.ZipInfo(name, time.localtime(header[1].st_mtime)[:6])
+            info.file_size = header[1].st_size
+            with archive.open(info, "w") as target:
+                while True:
+                    item = chunks.get()
+                    if isinstance(item, Exception):
+                        raise item
+                    if isinstance(item, tuple):
+                        break
+                    target.write(item)
+            _, size, sha256 = item
+            summary["files"] += 1
+            summary["bytes"] += size
+            writer.writerow(vendor + [document, name, size, sha256, ""])
+    finally:
+        stop.set()
+        reader.join()
+
+
+# ============ EXPORT ============
+@timed("document_export")
+def export_documents(session, out, category=None, financial_year=None, status=None):
+    """Write the documents of the matching vendors, and manifest.csv, as a ZIP to out (a path or a
+    binary file). Returns ({"vendors", "files", "missing", "bytes"}, None) or (None, error)."""
+    if financial_year and fy_bounds(financial_year) is None:
+        return None, f"Financial year must look like 2024-2025, not {financial_year}"
+
+    summary = {"vendors": 0, "files": 0, "missing": 0, "bytes": 0}
+    with tempfile.SpooledTemporaryFile(MANIFEST_SPOOL_BYTES, mode="w+", newline="", encoding="utf-8") as manifest, \
+            zipfile.ZipFile(out, "w", zipfile.ZIP_STORED, allowZip64=True, strict_timestamps=False) as archive:
+        writer = csv.writer(manifest)
+        writer.writerow(MANIFEST_COLUMNS)
+        batch = []
+        for model in (Vendor, VendorArchive):
+            archived = model is VendorArchive
+            for row in stream_rows(session, _vendor_query(model, category, financial_year, status)):
+                summary["vendors"] += 1
+                name = row.trade_name or row.legal_name or ""
+                folder = _folder_name(f"{row.vendor_code} {name}")[:80]
+                vendor = [row.vendor_code, name, row.gstin, row.pan, row.vendor_category,
+                          row.created_at.strftime("%d-%m-%Y") if row.created_at else "",
+                          "Archived" if archived else row.status]
+                for column, document in DOCUMENTS.items():
+                    path = getattr(row, column)
+                    if path:
+                        batch.append((vendor, document, path, f"{folder}/{document}{os.path.splitext(path)[1].lower()}"))
+                if len(batch) >= READ_BATCH:
+                    _write_batch(archive, batch, writer, summary)
+                    batch = []
+        if batch:
+            _write_batch(archive, batch, writer, summary)
+
+        manifest.seek(0)
+        with archive.open(MANIFEST, "w") as target:
+            for line in manifest:
+                target.write(line.encode("utf-8"))
+    return summary, None
+
+
+def export_path(category=None, financial_year=None):
+    """File in EXPORT_DIR for a new export, named after its filter"""
+    parts = ["vendor_documents", category, financial_year, time.strftime("%Y%m%d-%H%M%S")]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return os.path.join(EXPORT_DIR, _folder_name("_".join(part for part in parts if part)).replace(" ", "_") + ".zip")
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+
+    from database import read_session
+
+    parser = argparse.ArgumentParser(description="Export vendor documents as a ZIP for audit")
+    parser.add_argument("--out", help="ZIP file to write (default: a new file in the exports folder)")
+    parser.add_argument("--category")
+    parser.add_argument("--fy", help="Financial year of registration, e.g. 2024-2025")
+    parser.add_argument("--status", choices=["Active", "Inactive"])
+    args = parser.parse_args()
+
+    out = args.out or export_path(args.category, args.fy)
+    started = time.perf_counter()
+    with read_session() as session:
+        summary, error = export_documents(session, out, args.category, args.fy, args.status)
+    if error:
+        parser.error(error)
+    elapsed = time.perf_counter() - started
+    print(f"{summary['files']:,} document(s) of {summary['vendors']:,} vendor(s), "
+          f"{summary['bytes'] / 1e6:,.1f} MB in {elapsed:.1f}s ({summary['bytes'] / 1e6 / max(elapsed, 1e-9):,.0f} MB/s)")
+    if summary["missing"]:
+        print(f"{summary['missing']:,} document(s) not found on disk; see {MANIFEST}")
+    print(f"Written to {out}")
@@ -0,0 +1,305 @@
+"""
+Duplicate Vendor Detection
+Prarthi ERP System
+
+Exact lookups on GSTIN and PAN go through their column indexes. Fuzzy name
+matching uses MinHash locality-sensitive hashing: each vendor's name trigrams
+are reduced to a few band keys stored in vendor_name_signatures, so a lookup
+is a handful of indexed point reads no matter how many vendors exist.
+Candidates are then scored by exact trigram similarity.
+"""
+
+import hashlib
+import re
+import struct
+import zlib
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, or_, select
+
+from database import Vendor, VendorArchive, VendorNameSignature
+from telemetry import timed
+
+# Minimum Jaccard similarity of name trigrams to report a vendor as a likely duplicate
+NAME_SIMILARITY_THRESHOLD = 0.6
+
+# MinHash banding: names at the threshold become candidates ~90% of the time,
+# unrelated names (similarity 0.3) only ~12%
+MINHASH_BANDS = 16
+MINHASH_ROWS = 4
+
+# Upper bound on candidate vendors scored per lookup
+MAX_CANDIDATES = 50
+
+# Words that carry no identity in Indian vendor names
+NAME_STOPWORDS = {
+    "M/S", "MS", "THE", "AND", "PVT", "PRIVATE", "LTD", "LIMITED", "LLP", "CO",
+    "COMPANY", "CORP", "CORPORATION", "INC", "ENTERPRISE", "ENTERPRISES",
+    "TRADERS", "TRADING", "INDUSTRIES", "INDIA",
+}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_HASH_PARAMS = [
+    (1 + (zlib.crc32(f"a{i}".encode()) * 2654435761) % (_MERSENNE_PRIME - 1),
+     zlib.crc32(f"b{i}".encode()) * 40503)
+    for i in range(MINHASH_BANDS * MINHASH_ROWS)
+]
+
+
+def normalize_name(name):
+    """Uppercase, strip punctuation and drop legal suffixes from a vendor name"""
+    if not name:
+        return ""
+    words = re.sub(r"[^A-Z0-9/ ]", " ", name.upper()).split()
+    words = [w for w in words if w not in NAME_STOPWORDS]
+    return " ".join(w.replace("/", "") for w in words if w.replace("/", ""))
+
+
+def name_trigrams(name):
+    """Return the set of space-padded word trigrams for a vendor name"""
+    trigrams = set()
+    for word in normalize_name(name).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i + 3])
+    return trigrams
+
+
+def vendor_trigrams(legal_name, trade_name):
+    """Union of trigrams for a vendor's legal and trade names"""
+    return name_trigrams(legal_name) | name_trigrams(trade_name)
+
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets"""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def band_keys(trigrams):
+    """MinHash band keys for a trigram set, as signed 64-bit integers"""
+    if not trigrams:
+        return []
+    values = [zlib.crc32(t.encode()) for t in trigrams]
+    signature = [min((a * v + b) % _MERSENNE_PRIME for v in values) for a, b in _HASH_PARAMS]
+    keys = set()
+    for band in range(MINHASH_BANDS):
+        rows = signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<B{MINHASH_ROWS}Q", band, *rows), digest_size=8).digest()
+        keys.add(struct.unpack("<q", digest)[0])
+    return sorted(keys)
+
+
+# ============ INDEX MAINTENANCE ============
+def remove_vendor_names(session, vendor_id):
+    """Drop a vendor's entries from the name index"""
+    session.execute(delete(VendorNameSignature).where(VendorNameSignature.vendor_id == vendor_id))
+
+
+def index_vendor_names(session, vendor):
+    """(Re)index a vendor's names. Call after the vendor has been flushed."""
+    remove_vendor_names(session, vendor.id)
+    keys = band_keys(vendor_trigrams(vendor.legal_name, vendor.trade_name))
+    if keys:
+        session.execute(insert(VendorNameSignature),
+                        [{"band_key": k, "vendor_id": vendor.id} for k in keys])
+
+
+def rebuild_name_index(session, batch_size=5000):
+    """Rebuild the whole name index from the vendors table"""
+    session.execute(delete(VendorNameSignature))
+
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(Vendor.id, Vendor.legal_name, Vendor.trade_name)
+            .where(Vendor.id > last_id).order_by(Vendor.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        entries = [
+            {"band_key": k, "vendor_id": vendor_id}
+            for vendor_id, legal_name, trade_name in rows
+            for k in band_keys(vendor_trigrams(legal_name, trade_name))
+        ]
+        if entries:
+            session.execute(insert(VendorNameSignature), entries)
+        last_id = rows[-1][0]
+
+    session.commit()
+
+
+def ensure_name_index(session):
+    """Build the name index once for databases that predate it"""
+    has_vendors = session.execute(select(Vendor.id).limit(1)).first()
+    has_entries = session.execute(select(VendorNameSignature.vendor_id).limit(1)).first()
+    if has_vendors and not has_entries:
+        rebuild_name_index(session)
+
+
+# ============ LOOKUPS ============
+def _name_candidates(session, trigrams, exclude_id=None):
+    """Vendor ids sharing at least one MinHash band with the given name"""
+    keys = band_keys(trigrams)
+    if not keys:
+        return []
+    query = (
+        select(VendorNameSignature.vendor_id)
+        .where(VendorNameSignature.band_key.in_(keys))
+        .group_by(VendorNameSignature.vendor_id)
+        .order_by(func.count().desc())
+        .limit(MAX_CANDIDATES)
+    )
+    if exclude_id:
+        query = query.where(VendorNameSignature.vendor_id != exclude_id)
+    return list(session.execute(query).scalars())
+
+
+@timed("duplicate_check")
+def find_duplicates(session, gstin=None, pan=None, legal_name=None, trade_name=None, exclude_id=None):
+    """
+    Find existing vendors that look like the given one (archived ones by GSTIN and PAN only).
+    Returns a list of dicts sorted by strength: exact GSTIN, exact PAN, then name score.
+    """
+    gstin = (gstin or "").strip().upper()
+    pan = (pan or "").strip().upper()
+    matches = {}
+
+    conditions = []
+    if gstin:
+        conditions.append(Vendor.gstin == gstin)
+    if pan:
+        conditions.append(Vendor.pan == pan)
+    if conditions:
+        query = select(Vendor.id, Vendor.vendor_code, Vendor.trade_name, Vendor.legal_name,
+                       Vendor.gstin, Vendor.pan, Vendor.status).where(or_(*conditions))
+        if exclude_id:
+            query = query.where(Vendor.id != exclude_id)
+        for row in session.execute(query).mappings():
+            reason = "GSTIN" if gstin and row["gstin"] == gstin else "PAN"
+            matches[row["id"]] = dict(row, reason=reason, score=1.0)
+        # Archived vendors keep their GSTIN and PAN; keyed apart, as an archived id can be reused
+        archived = [column == value for column, value in ((VendorArchive.gstin, gstin), (VendorArchive.pan, pan))
+                    if value]
+        query = select(VendorArchive.id, VendorArchive.vendor_code, VendorArchive.trade_name,
+                       VendorArchive.legal_name, VendorArchive.gstin, VendorArchive.pan).where(or_(*archived))
+        for row in session.execute(query).mappings():
+            reason = "GSTIN" if gstin and row["gstin"] == gstin else "PAN"
+            matches[("archived", row["id"])] = dict(row, status="Archived", reason=reason, score=1.0)
+
+    trigrams = vendor_trigrams(legal_name, trade_name)
+    candidate_ids = [c for c in _name_candidates(session, trigrams, exclude_id) if c not in matches]
+    if candidate_ids:
+        rows = session.execute(
+            select(Vendor.id, Vendor.vendor_code, Vendor.trade_name, Vendor.legal_name,
+                   Vendor.gstin, Vendor.pan, Vendor.status).where(Vendor.id.in_(candidate_ids))
+        ).mappings()
+        for row in rows:
+            score = similarity(trigrams, vendor_trigrams(row["legal_name"], row["trade_name"]))
+            if score >= NAME_SIMILARITY_THRESHOLD:
+                matches[row["id"]] = dict(row, reason="Name", score=round(score, 2))
+
+    rank = {"GSTIN": 0, "PAN": 1, "Name": 2}
+    return sorted(matches.values(), key=lambda m: (rank[m["reason"]], -m["score"]))
+
+
+def check_import_rows(session, rows):
+    """
+    Flag duplicates for a batch of import rows (dicts with gstin, pan, legal_name, trade_name).
+    Rows are checked against the database and against each other.
+    Returns {row_index: [matches]} for flagged rows only.
+    """
+    flagged = {}
+    seen_gstin, seen_pan = {}, {}
+    for i, row in enumerate(rows):
+        found = find_duplicates(session, row.get("gstin"), row.get("pan"),
+                                row.get("legal_name"), row.get("trade_name"))
+        gstin = (row.get("gstin") or "").strip().upper()
+        pan = (row.get("pan") or "").strip().upper()
+        if gstin and gstin in seen_gstin:
+            found.append({"reason": "GSTIN", "score": 1.0, "import_row": seen_gstin[gstin]})
+        elif pan and pan in seen_pan:
+            found.append({"reason": "PAN", "score": 1.0, "import_row": seen_pan[pan]})
+        if gstin:
+            seen_gstin.setdefault(gstin, i)
+        if pan:
+            seen_pan.setdefault(pan, i)
+        if found:
+            flagged[i] = found
+    return flagged
+
+
+# ============ BATCH SCAN ============
+def find_duplicate_clusters(session, include_names=True):
+    """
+    Scan the vendors table and group likely duplicates into clusters.
+    Returns a list of clusters, each a sorted list of vendor ids.
+    """
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        parent[find(a)] = find(b)
+
+    for column in (Vendor.gstin, Vendor.pan):
+        dupes = select(column).where(column.isnot(None), column != "").group_by(column).having(func.count() > 1)
+        rows = session.execute(
+            select(Vendor.id, column).where(column.in_(dupes)).order_by(column)
+        ).all()
+        first = {}
+        for vendor_id, key in rows:
+            if key in first:
+                union(vendor_id, first[key])
+            else:
+                first[key] = vendor_id
+
+    if include_names:
+        last_id = 0
+        while True:
+            batch = session.execute(
+                select(Vendor.id, Vendor.legal_name, Vendor.trade_name)
+                .where(Vendor.id > last_id).order_by(Vendor.id).limit(1000)
+            ).all()
+            if not batch:
+                break
+            for vendor_id, legal_name, trade_name in batch:
+                for match in find_duplicates(session, legal_name=legal_name,
+                                             trade_name=trade_name, exclude_id=vendor_id):
+                    union(vendor_id, match["id"])
+            last_id = batch[-1][0]
+
+    clusters = defaultdict(list)
+    for vendor_id in parent:
+        clusters[find(vendor_id)].append(vendor_id)
+    return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=lambda c: c[0])
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Vendor duplicate detection")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the name trigram index")
+    parser.add_argument("--exact-only", action="store_true", help="Skip fuzzy name matching in the scan")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if args.rebuild:
+            rebuild_name_index(session)
+            print("Name index rebuilt")
+        clusters = find_duplicate_clusters(session, include_names=not args.exact_only)
+        codes = dict(session.execute(select(Vendor.id, Vendor.vendor_code)).all())
+        for cluster in clusters:
+            print(", ".join(codes[v] for v in cluster))
+        print(f"{len(clusters)} duplicate cluster(s) found")
+    finally:
+        session.close()
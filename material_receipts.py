@@ -0,0 +1,353 @@
+"""
+Material Receipts
+Prarthi ERP System
+
+Material receipt vouchers (MRVs) record goods arriving at a site against a
+purchase order. A receipt is posted in one transaction: the MRV header, its
+lines in a single multi-row INSERT, the received quantities of the PO lines
+in a single executemany UPDATE, the stock ledger entries of lines with an
+item code (lines without one are services and hire charges, not stock), the
+PO status (Partially Received or Closed, which also moves the pending PO
+counter), the vendor's delivery and quality rating events and the receipts
+analytics rollup. Quantities rejected at the gate are recorded on the line
+but neither stocked nor counted against the PO. MRV numbers run per
+financial year like PO numbers.
+
+Receipts can also be uploaded in bulk from a CSV file or a scanner export,
+one row per line received; rows sharing a PO, challan, date and site make
+one MRV, and the whole file is posted with a single commit.
+
+Usage:
+    python material_receipts.py import receipts.csv --user stores_user [--dry-run]
+"""
+
+import csv
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, func, insert, select, tuple_, update
+
+from config import COMPANY_SHORT, get_financial_year
+from database import (MaterialReceipt, MaterialReceiptLine, PurchaseOrder, PurchaseOrderLine, User, Vendor,
+                      log_action, next_sequence_number, write_session)
+from purchase_orders import PENDING_STATUSES, PAGE_SIZE, line_amount, set_po_status
+from stock import DEFAULT_SITE, check_period, receive_stock, stock_movement
+from vendor_ratings import rate_receipt
+from analytics import add_receipt
+
+# Status changes made by posting a receipt
+RECEIPT_TRANSITIONS = {
+    "Open": {"Partially Received", "Closed"},
+    "Partially Received": {"Closed"},
+}
+
+# Receipts may exceed the ordered quantity by this fraction (weighbridge
+# variance on steel, aggregate and sand)
+OVER_RECEIPT_TOLERANCE = 0.05
+
+# Columns of a batch upload file; one row per PO line received
+CSV_COLUMNS = ["po_number", "line_no", "quantity", "rejected_quantity", "receipt_date", "challan_number",
+               "vehicle_number", "site", "remarks"]
+CSV_DATE_FORMATS = ["%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d"]
+
+# PO numbers per IN (...) lookup
+PO_CHUNK = 500
+
+
+def mrv_number(financial_year, number):
+    """PBL/MRV/2026-27/00001 for financial year "2026-2027" and number 1"""
+    return f"{COMPANY_SHORT}/MRV/{financial_year[:4]}-{financial_year[-2:]}/{number:05d}"
+
+
+# ============ POSTING ============
+def post_receipt(session, po_id, lines, user_id, receipt_date=None, site=None, challan_number=None,
+                 vehicle_number=None, remarks=None):
+    """Post an MRV against a PO. lines are dicts with the PO line_no, the quantity accepted and
+    optionally the quantity rejected. Returns (receipt, error); nothing is written on error."""
+    # Lock the PO (PostgreSQL) so two receipts against it cannot both pass the quantity checks
+    po = session.execute(
+        select(PurchaseOrder.id, PurchaseOrder.po_number, PurchaseOrder.status, PurchaseOrder.vendor_id,
+               PurchaseOrder.delivery_site, PurchaseOrder.delivery_date)
+        .where(PurchaseOrder.id == po_id).with_for_update()
+    ).first()
+    if po is None:
+        return None, "Purchase order not found"
+    if po.status not in PENDING_STATUSES:
+        return None, f"{po.po_number} is {po.status}; receipts can only be posted against pending POs"
+
+    po_lines = {row.line_no: row for row in session.execute(
+        select(PurchaseOrderLine.id, PurchaseOrderLine.line_no, PurchaseOrderLine.item_code,
+               PurchaseOrderLine.description, PurchaseOrderLine.unit, PurchaseOrderLine.quantity,
+               PurchaseOrderLine.rate, PurchaseOrderLine.gst_rate, PurchaseOrderLine.received_quantity)
+        .where(PurchaseOrderLine.po_id == po_id)
+    )}
+
+    received, rejected = {}, {}
+    for line in lines:
+        quantity, rejected_quantity = line.get("quantity") or 0, line.get("rejected") or 0
+        if not quantity and not rejected_quantity:
+            continue
+        line_no = line.get("line_no")
+        if line_no not in po_lines:
+            return None, f"Line {line_no} is not on {po.po_number}"
+        if quantity < 0 or rejected_quantity < 0:
+            return None, f"Line {line_no}: quantities cannot be negative"
+        received[line_no] = received.get(line_no, 0) + quantity
+        rejected[line_no] = rejected.get(line_no, 0) + rejected_quantity
+    if not received:
+        return None, "Enter the quantity received on at least one line"
+    receipt_date = receipt_date or date.today()
+    error = check_period(session, receipt_date)
+    if error:
+        return None, error
+
+    rows = []
+    for line_no, quantity in sorted(received.items()):
+        po_line = po_lines[line_no]
+        already = po_line.received_quantity or 0
+        if already + quantity > po_line.quantity * (1 + OVER_RECEIPT_TOLERANCE) + 1e-9:
+            pending = max(po_line.quantity - already, 0)
+            unit = f" {po_line.unit}" if po_line.unit else ""
+            return None, (f"Line {line_no} ({po_line.description}): {quantity:g}{unit} is more than "
+                          f"the {pending:g} still pending")
+        rows.append({
+            "po_line_id": po_line.id,
+            "line_no": line_no,
+            "item_code": po_line.item_code,
+            "description": po_line.description,
+            "unit": po_line.unit,
+            "quantity": quantity,
+            "rejected_quantity": rejected[line_no],
+            "rate": po_line.rate,
+            "amount": line_amount(quantity, po_line.rate, po_line.gst_rate),
+        })
+
+    financial_year = get_financial_year(receipt_date)
+    vendor_category = session.scalar(select(Vendor.vendor_category).where(Vendor.id == po.vendor_id))
+    receipt = MaterialReceipt(
+        mrv_number=mrv_number(financial_year, next_sequence_number(session, "MRV", financial_year)),
+        financial_year=financial_year,
+        po_id=po_id,
+        vendor_id=po.vendor_id,
+        receipt_date=receipt_date,
+        site=site or po.delivery_site,
+        challan_number=challan_number or None,
+        vehicle_number=vehicle_number or None,
+        total_amount=round(sum(row["amount"] for row in rows), 2),
+        remarks=remarks or None,
+        vendor_category=vendor_category,
+        created_by_id=user_id,
+    )
+    session.add(receipt)
+    session.flush()
+
+    session.execute(insert(MaterialReceiptLine), [dict(row, mrv_id=receipt.id) for row in rows])
+    rate_receipt(session, po.vendor_id, receipt_date, po.delivery_date,
+                 [(row["quantity"], row["rejected_quantity"]) for row in rows], receipt.mrv_number)
+    add_receipt(session, vendor_category, receipt_date, receipt.total_amount)
+
+    # A receipt that was all rejected leaves the PO and stock as they were
+    accepted = [row for row in rows if row["quantity"]]
+    if accepted:
+        po_line_table = PurchaseOrderLine.__table__
+        session.execute(
+            update(po_line_table)
+            .where(po_line_table.c.id == bindparam("line_id"))
+            .values(received_quantity=func.coalesce(po_line_table.c.received_quantity, 0) + bindparam("received")),
+            [{"line_id": row["po_line_id"], "received": row["quantity"]} for row in accepted],
+        )
+        receive_stock(session, [
+            stock_movement(receipt_date, row["item_code"], receipt.site or DEFAULT_SITE, "RECEIPT", row["quantity"],
+                           row["unit"], receipt.mrv_number)
+            for row in accepted if row["item_code"]
+        ], user_id)
+
+        fully_received = all((po_line.received_quantity or 0) + received.get(line_no, 0) >= po_line.quantity
+                             for line_no, po_line in po_lines.items())
+        _, error = set_po_status(session, po_id, "Closed" if fully_received else "Partially Received", user_id,
+                                 transitions=RECEIPT_TRANSITIONS)
+        if error:
+            # The PO changed after it was read; the caller's transaction must not commit
+            raise RuntimeError(error)
+    log_action(session, user_id, "CREATE", "material_receipts", receipt.id,
+               f"Received {receipt.mrv_number} against {po.po_number}")
+    return receipt, None
+
+
+# ============ BATCH UPLOAD ============
+def _parse_date(value):
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def read_receipt_csv(f):
+    """Group the rows of a batch upload file (text file object) into receipts.
+    Returns (receipts, problems); each receipt is a dict of post_receipt arguments plus the
+    po_number and the file rows it came from."""
+    reader = csv.DictReader(f)
+    # Scanner exports often title their columns ("PO Number")
+    reader.fieldnames = [(name or "").strip().lower().replace(" ", "_") for name in reader.fieldnames or []]
+    missing = [column for column in ("po_number", "line_no", "quantity") if column not in reader.fieldnames]
+    if missing:
+        return [], [f"Missing column(s): {', '.join(missing)}"]
+
+    receipts, problems = {}, []
+    for row_no, row in enumerate(reader, start=2):
+        row = {key: (value or "").strip() for key, value in row.items() if key}
+        if not any(row.values()):
+            continue
+        try:
+            line_no, quantity = int(row["line_no"]), float(row["quantity"] or 0)
+            rejected = float(row.get("rejected_quantity") or 0)
+        except ValueError:
+            problems.append(f"Row {row_no}: line_no and quantities must be numbers")
+            continue
+        receipt_date = date.today()
+        if row.get("receipt_date"):
+            receipt_date = _parse_date(row["receipt_date"])
+            if receipt_date is None:
+                problems.append(f"Row {row_no}: receipt date {row['receipt_date']} is not DD-MM-YYYY")
+                continue
+        if not row["po_number"]:
+            problems.append(f"Row {row_no}: PO number is empty")
+            continue
+
+        key = (row["po_number"], row.get("challan_number", ""), receipt_date, row.get("site", ""))
+        receipt = receipts.setdefault(key, {
+            "po_number": row["po_number"], "receipt_date": receipt_date, "lines": [],
+            "challan_number": row.get("challan_number"), "vehicle_number": row.get("vehicle_number"),
+            "site": row.get("site"), "remarks": row.get("remarks"), "rows": [],
+        })
+        receipt["lines"].append({"line_no": line_no, "quantity": quantity, "rejected": rejected})
+        receipt["rows"].append(row_no)
+    return list(receipts.values()), problems
+
+
+def post_receipt_batch(session, receipts, user_id):
+    """Post receipts read by read_receipt_csv in the caller's transaction. Receipts that fail
+    validation are skipped and reported. Returns (MRV numbers posted, problems)."""
+    numbers = sorted({receipt["po_number"] for receipt in receipts})
+    po_ids = {}
+    for start in range(0, len(numbers), PO_CHUNK):
+        chunk = numbers[start:start + PO_CHUNK]
+        po_ids.update(session.execute(
+            select(PurchaseOrder.po_number, PurchaseOrder.id).where(PurchaseOrder.po_number.in_(chunk))
+        ).all())
+
+    posted, problems = [], []
+    for receipt in receipts:
+        rows = ", ".join(str(row_no) for row_no in receipt["rows"])
+        po_id = po_ids.get(receipt["po_number"])
+        if po_id is None:
+            problems.append(f"Row(s) {rows}: PO {receipt['po_number']} not found")
+            continue
+        created, error = post_receipt(
+            session, po_id, receipt["lines"], user_id, receipt_date=receipt["receipt_date"],
+            site=receipt["site"], challan_number=receipt["challan_number"],
+            vehicle_number=receipt["vehicle_number"], remarks=receipt["remarks"])
+        if error:
+            problems.append(f"Row(s) {rows}: {error}")
+        else:
+            posted.append(created.mrv_number)
+    return posted, problems
+
+
+# ============ READS ============
+def receipt_totals(session, day=None):
+    """(MRV count, value) of receipts dated `day` (default today), from the receipt_date index"""
+    count, value = session.execute(
+        select(func.count(MaterialReceipt.id), func.coalesce(func.sum(MaterialReceipt.total_amount), 0))
+        .where(MaterialReceipt.receipt_date == (day or date.today()))
+    ).one()
+    return count, value
+
+
+def find_pending_pos(session, text, limit=20):
+    """[(po id, "PO number - vendor")] of pending POs whose number contains text"""
+    rows = session.execute(
+        select(PurchaseOrder.id, PurchaseOrder.po_number,
+               func.coalesce(Vendor.trade_name, Vendor.legal_name))
+        .join(Vendor, Vendor.id == PurchaseOrder.vendor_id)
+        .where(PurchaseOrder.status.in_(PENDING_STATUSES), PurchaseOrder.po_number.contains(text.strip().upper()))
+        .order_by(PurchaseOrder.po_date.desc(), PurchaseOrder.id.desc())
+        .limit(limit)
+    ).all()
+    return [(po_id, f"{number} - {vendor_name}") for po_id, number, vendor_name in rows]
+
+
+def pending_lines(session, po_id):
+    """Lines of a PO with the quantity still to be received"""
+    return session.execute(
+        select(PurchaseOrderLine.line_no, PurchaseOrderLine.item_code, PurchaseOrderLine.description,
+               PurchaseOrderLine.unit, PurchaseOrderLine.quantity,
+               func.coalesce(PurchaseOrderLine.received_quantity, 0).label("received_quantity"))
+        .where(PurchaseOrderLine.po_id == po_id)
+        .order_by(PurchaseOrderLine.line_no)
+    ).all()
+
+
+def list_receipts(session, po_id=None, before=None, limit=PAGE_SIZE):
+    """One page of MRVs, newest first, keyset-paginated on (receipt_date, id) like the PO register.
+    Returns (rows, key for the next page or None on the last page)."""
+    query = (
+        select(MaterialReceipt.id, MaterialReceipt.mrv_number, MaterialReceipt.receipt_date,
+               MaterialReceipt.site, MaterialReceipt.challan_number, MaterialReceipt.vehicle_number,
+               MaterialReceipt.total_amount, PurchaseOrder.po_number,
+               func.coalesce(Vendor.trade_name, Vendor.legal_name).label("vendor_name"))
+        .join(PurchaseOrder, PurchaseOrder.id == MaterialReceipt.po_id)
+        .join(Vendor, Vendor.id == MaterialReceipt.vendor_id)
+    )
+    if po_id:
+        query = query.where(MaterialReceipt.po_id == po_id)
+    if before:
+        query = query.where(tuple_(MaterialReceipt.receipt_date, MaterialReceipt.id) < tuple(before))
+    rows = session.execute(
+        query.order_by(MaterialReceipt.receipt_date.desc(), MaterialReceipt.id.desc()).limit(limit + 1)
+    ).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1].receipt_date, rows[-1].id)
+
+
+def receipt_lines(session, mrv_id):
+    """Lines of one MRV in order"""
+    return session.execute(
+        select(MaterialReceiptLine).where(MaterialReceiptLine.mrv_id == mrv_id)
+        .order_by(MaterialReceiptLine.line_no)
+    ).scalars().all()
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="Material receipts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_cmd = sub.add_parser("import", help="Post receipts from a CSV file or scanner export")
+    import_cmd.add_argument("file")
+    import_cmd.add_argument("--user", required=True, help="Username the receipts are posted as")
+    import_cmd.add_argument("--dry-run", action="store_true", help="Check the file without posting")
+    args = parser.parse_args()
+
+    with open(args.file, encoding="utf-8-sig", newline="") as f:
+        receipts, problems = read_receipt_csv(f)
+
+    started = time.perf_counter()
+    with write_session() as session:
+        user_id = session.scalar(select(User.id).where(User.username == args.user))
+        if user_id is None:
+            sys.exit(f"Unknown user {args.user}")
+        posted, posting_problems = post_receipt_batch(session, receipts, user_id)
+        if args.dry_run:
+            session.rollback()
+    for problem in problems + posting_problems:
+        print(problem, file=sys.stderr)
+    verb = "would be posted" if args.dry_run else "posted"
+    print(f"{len(posted)} receipt(s) {verb}, {len(problems) + len(posting_problems)} problem(s) "
+          f"({time.perf_counter() - started:.2f}s)")
@@ -1,26 +1,39 @@
 """
 Vendor Registration Module
 Clean UI with AI Toggle and Document Storage
+Drafts are saved as the wizard is filled in and can be resumed after a refresh
 """
 
 import streamlit as st
 import os
 import re
 import base64
+import time
 from datetime import datetime
-from database import SessionLocal, Vendor, VendorContact, get_next_vendor_code, log_action
-from config import VENDOR_CATEGORIES, INDIAN_STATES
+from database import Vendor, VendorContact, get_next_vendor_code, log_action, read_session, write_session
+from duplicates import find_duplicates, index_vendor_names
+from vendor_search import index_vendor_keys
+from reference_data import bank_name_for_ifsc, lookup_ifsc, lookup_pin, state_for_gstin
+from auth import check_login
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started, timed
+from validation import validate_gstin, validate_ifsc, validate_pan, validate_pin_state
+from vendor_drafts import (autosave_due, changed_fields, create_draft, delete_draft, draft_fields, list_drafts,
+                           load_draft, remove_documents, save_draft, store_document)
+from config import VENDOR_CATEGORIES, INDIAN_STATES, DOCUMENTS_DIR
 
 st.set_page_config(page_title="Vendor Registration", page_icon="🛒", layout="wide")
 
+track_page("Vendor Registration")
+page_started("Vendor Registration")
+
 CREDENTIALS_PATH = r"C:\Users\Admin\Desktop\PrarthiERP\google_credentials.json"
-DOCUMENTS_DIR = r"C:\Users\Admin\Desktop\PrarthiERP\documents"
 
 # Ensure documents directory exists
 os.makedirs(DOCUMENTS_DIR, exist_ok=True)
 
 # Check login
-if not st.session_state.get('authenticated'):
+if not check_login():
     st.error("Please login to access this module")
     st.stop()
 
@@ -40,8 +53,20 @@ if 'ai_extracted' not in st.session_state:
     st.session_state.ai_extracted = {}
 if 'use_ai' not in st.session_state:
     st.session_state.use_ai = False
+if 'v_draft_id' not in st.session_state:
+    st.session_state.v_draft_id = None
+    st.session_state.v_saved = {}
+    st.session_state.v_saved_at = 0.0
+
+# Wizard fields the GST certificate fills in; a newly extracted certificate replaces them
+GST_FIELDS = ['gstin', 'pan', 'legal_name', 'trade_name', 'company_email', 'company_phone',
+              'address', 'city', 'state', 'pin']
 
+# Session state key of the widget editing a v_data field is the field with this prefix
+WIDGET_PREFIX = "w_"
 
+
+@timed("document_ai")
 def extract_with_ai(file_bytes, file_type):
     """Extract data using AI"""
     try:
@@ -118,15 +143,13 @@ def parse_gst_data(text):
     if pin_matches:
         data['pin_code'] = pin_matches[-1]
     
-    # State from GSTIN
+    # City and state from PIN, state from GSTIN
+    place = lookup_pin(data['pin_code'])
+    if place:
+        data['city'] = place['city']
+        data['state'] = place['state']
     if data['gstin']:
-        state_codes = {
-            '01': 'Jammu and Kashmir', '02': 'Himachal Pradesh', '03': 'Punjab',
-            '07': 'Delhi', '08': 'Rajasthan', '09': 'Uttar Pradesh',
-            '24': 'Gujarat', '27': 'Maharashtra', '29': 'Karnataka',
-            '32': 'Kerala', '33': 'Tamil Nadu', '36': 'Telangana'
-        }
-        data['state'] = state_codes.get(data['gstin'][:2], 'Maharashtra')
+        data['state'] = state_for_gstin(data['gstin']) or data['state']
     
     if not data['trade_name'] and data['legal_name']:
         data['trade_name'] = data['legal_name']
@@ -142,17 +165,15 @@ def extract_pan_number(text):
 
 def extract_bank_details(text):
     """Extract bank details from cheque"""
-    data = {'bank_name': '', 'ifsc': '', 'account': ''}
+    data = {'bank_name': '', 'branch': '', 'ifsc': '', 'account': ''}
     
     ifsc_match = re.search(r'\b([A-Z]{4}0[A-Z0-9]{6})\b', text)
     if ifsc_match:
         data['ifsc'] = ifsc_match.group(1)
-        bank_prefixes = {
-            'HDFC': 'HDFC Bank', 'ICIC': 'ICICI Bank', 'SBIN': 'State Bank of India',
-            'AXIS': 'Axis Bank', 'KKBK': 'Kotak Mahindra Bank', 'PUNB': 'Punjab National Bank',
-            'BARB': 'Bank of Baroda', 'CNRB': 'Canara Bank', 'UBIN': 'Union Bank of India'
-        }
-        data['bank_name'] = bank_prefixes.get(data['ifsc'][:4], '')
+        data['bank_name'] = bank_name_for_ifsc(data['ifsc'])
+        branch = lookup_ifsc(data['ifsc'])
+        if branch:
+            data['branch'] = branch['branch']
     
     acc_match = re.search(r'\b(\d{9,18})\b', text)
     if acc_match:
@@ -161,6 +182,7 @@ def extract_bank_details(text):
     return data
 
 
+@timed("document_save")
 def save_document(vendor_code, doc_type, file_bytes, file_ext):
     """Save document to folder and return path"""
     vendor_dir = os.path.join(DOCUMENTS_DIR, vendor_code)
@@ -183,10 +205,149 @@ def show_preview(file_bytes, file_type):
         st.info("📄 PDF uploaded successfully")
 
 
+# ============ WIZARD FIELDS ============
+def field_key(field):
+    """Session state key of the widget editing a v_data field"""
+    return WIDGET_PREFIX + field
+
+
+def seed_fields(defaults, choices=None):
+    """Start each field's widget at its v_data value (entered earlier, or from a resumed draft),
+    else at the default. Only widgets without state are seeded; after that the widget keeps
+    its own value, so a rerun never puts back an older one."""
+    d = st.session_state.v_data
+    choices = choices or {}
+    for field, default in defaults.items():
+        key = field_key(field)
+        if key in st.session_state:
+            continue
+        value = d.get(field)
+        if value is None:
+            value = default
+        elif field in choices:
+            value = value if value in choices[field] else default
+        else:
+            value = type(default)(value)
+        st.session_state[key] = value
+
+
+def store_fields(fields):
+    """Copy the widgets' values into v_data, which autosave saves"""
+    st.session_state.v_data.update({field: st.session_state[field_key(field)] for field in fields})
+
+
+def fill_fields(values):
+    """Set fields from a document on the next run: their widgets are reseeded from v_data"""
+    st.session_state.v_data.update(values)
+    for field in values:
+        st.session_state.pop(field_key(field), None)
+
+
+# ============ DRAFTS ============
+def reset_wizard():
+    """Start a new registration"""
+    st.session_state.v_step = 1
+    st.session_state.v_data = {}
+    st.session_state.v_done = False
+    st.session_state.ai_extracted = {}
+    st.session_state.use_ai = False
+    st.session_state.v_draft_id = None
+    st.session_state.v_saved = {}
+    st.session_state.v_saved_at = 0.0
+    for key in [key for key in st.session_state if key.startswith(WIDGET_PREFIX)]:
+        del st.session_state[key]
+
+
+def current_draft_id():
+    """The draft this registration is saved to, created on first use"""
+    if st.session_state.v_draft_id is None:
+        with write_session() as session:
+            st.session_state.v_draft_id = create_draft(session, st.session_state.user['id'])
+    return st.session_state.v_draft_id
+
+
+def attach_document(doc_type, file_bytes, file_type):
+    """Store an upload with the draft; returns its reference (which caches the extracted text)
+    and whether the file is new"""
+    documents = st.session_state.v_data.setdefault('documents', {})
+    previous = documents.get(doc_type)
+    ref = store_document(current_draft_id(), doc_type, file_bytes, file_type, previous)
+    documents[doc_type] = ref
+    return ref, ref is not previous
+
+
+def document_text(ref, file_bytes, file_type):
+    """Text Document AI reads from a document, extracted once per file. Returns (text, extracted now)."""
+    if ref.get('text'):
+        return ref['text'], False
+    text, _ = extract_with_ai(file_bytes, file_type)
+    if text:
+        ref['text'] = text
+    return text, bool(text)
+
+
+def autosave():
+    """Save the fields changed since the last save, unless the last save was moments ago"""
+    if st.session_state.v_draft_id is None and not st.session_state.v_data:
+        return
+    fields = draft_fields(st.session_state.v_step, st.session_state.v_data,
+                          st.session_state.ai_extracted, st.session_state.use_ai)
+    changed = changed_fields(fields, st.session_state.v_saved)
+    if not autosave_due(changed, st.session_state.v_saved_at):
+        return
+    try:
+        draft_id = current_draft_id()
+        with write_session() as session:
+            saved, _ = save_draft(session, draft_id, st.session_state.user['id'], changed)
+        if not saved:
+            # Discarded or purged elsewhere: keep the work in a new draft
+            st.session_state.v_draft_id = None
+            draft_id = current_draft_id()
+            with write_session() as session:
+                save_draft(session, draft_id, st.session_state.user['id'], fields)
+            changed = fields
+        st.session_state.v_saved.update(changed)
+        st.session_state.v_saved_at = time.time()
+    except Exception as e:
+        st.warning(f"Draft not saved: {e}")
+
+
+def resume_draft(draft_id):
+    """Load a saved draft into the wizard"""
+    # Read from the main database: a replica may not have the last autosave yet
+    with write_session() as session:
+        state, error = load_draft(session, draft_id, st.session_state.user['id'])
+    if error:
+        st.error(error)
+        return
+    reset_wizard()
+    st.session_state.v_step = state['step']
+    st.session_state.v_data = state['v_data']
+    st.session_state.ai_extracted = state['ai_extracted']
+    st.session_state.use_ai = state['use_ai']
+    st.session_state.v_draft_id = draft_id
+    st.session_state.v_saved = state['saved']
+    st.session_state.v_saved_at = time.time()
+    st.rerun()
+
+
+def discard_draft(draft_id):
+    """Delete a draft and its stored documents"""
+    with write_session() as session:
+        delete_draft(session, draft_id, st.session_state.user['id'])
+    remove_documents([draft_id])
+
+
 # ============ SIDEBAR ============
 with st.sidebar:
     st.markdown(f"**👤 {st.session_state.user['full_name']}**")
     st.caption(st.session_state.user['role'])
+    if st.session_state.v_draft_id is not None and not st.session_state.v_done:
+        st.caption("📝 Draft saved automatically")
+        if st.button("Discard draft and start over"):
+            discard_draft(st.session_state.v_draft_id)
+            reset_wizard()
+            st.rerun()
 
 
 # ============ MAIN ============
@@ -203,14 +364,26 @@ if st.session_state.v_done:
     """)
     
     if st.button("Register another vendor", type="primary"):
-        st.session_state.v_step = 1
-        st.session_state.v_data = {}
-        st.session_state.v_done = False
-        st.session_state.ai_extracted = {}
-        st.session_state.use_ai = False
+        reset_wizard()
         st.rerun()
     st.stop()
 
+# Saved drafts, offered before a new registration is started
+if st.session_state.v_draft_id is None and not st.session_state.v_data:
+    with read_session() as session:
+        drafts = list_drafts(session, st.session_state.user['id'])
+    if drafts:
+        with st.expander(f"📝 Saved drafts ({len(drafts)})", expanded=True):
+            for draft in drafts:
+                col1, col2, col3 = st.columns([4, 1, 1])
+                col1.write(f"**{draft['title'] or 'Untitled'}** · step {draft['step']} of 4 · "
+                           f"saved {draft['updated_at']:%d-%m-%Y %H:%M} UTC")
+                if col2.button("Resume", key=f"resume_{draft['id']}"):
+                    resume_draft(draft['id'])
+                if col3.button("Discard", key=f"discard_{draft['id']}"):
+                    discard_draft(draft['id'])
+                    st.rerun()
+
 # Progress
 steps = ["GST certificate", "Basic information", "Contact and ratings", "Bank and documents"]
 st.caption(f"Step {st.session_state.v_step} of 4: {steps[st.session_state.v_step - 1]}")
@@ -224,7 +397,9 @@ if st.session_state.v_step == 1:
     # AI Toggle
     col1, col2 = st.columns([3, 1])
     with col2:
-        use_ai = st.toggle("✨ Use AI to auto-fill", value=st.session_state.use_ai, 
+        if field_key('use_ai') not in st.session_state:
+            st.session_state[field_key('use_ai')] = st.session_state.use_ai
+        use_ai = st.toggle("✨ Use AI to auto-fill", key=field_key('use_ai'),
                           help="AI will automatically extract details from your document")
         st.session_state.use_ai = use_ai
     
@@ -237,6 +412,13 @@ if st.session_state.v_step == 1:
         
         st.session_state.v_data['gst_file'] = file_bytes
         st.session_state.v_data['gst_file_type'] = file_type
+        attach_document('gst_certificate', file_bytes, file_type)
+    
+    # The certificate uploaded now, or earlier in this draft
+    file_bytes = st.session_state.v_data.get('gst_file')
+    if file_bytes:
+        file_type = st.session_state.v_data['gst_file_type']
+        gst_ref = st.session_state.v_data['documents']['gst_certificate']
         
         col1, col2 = st.columns([1, 2])
         
@@ -247,11 +429,15 @@ if st.session_state.v_step == 1:
         with col2:
             if st.session_state.use_ai and os.path.exists(CREDENTIALS_PATH):
                 with st.spinner("Extracting details..."):
-                    raw_text, error = extract_with_ai(file_bytes, file_type)
+                    raw_text, extracted_now = document_text(gst_ref, file_bytes, file_type)
                     if raw_text:
                         extracted = parse_gst_data(raw_text)
                         extracted['raw_text'] = raw_text[:1000]
                         st.session_state.ai_extracted = extracted
+                        if extracted_now:
+                            # Details typed for an earlier certificate give way to this one's
+                            for field in GST_FIELDS:
+                                st.session_state.v_data.pop(field, None)
                         st.success("✅ Details extracted successfully")
                         
                         st.text_input("GSTIN", value=extracted.get('gstin', ''), disabled=True)
@@ -283,46 +469,93 @@ elif st.session_state.v_step == 2:
     st.subheader("📋 Basic information")
     
     extracted = st.session_state.ai_extracted or {}
+    # Fields as of the previous run; widgets start from them (this session or a resumed draft),
+    # else from the extracted ones
+    d = st.session_state.v_data
     
-    session = SessionLocal()
-    vendor_code = get_next_vendor_code(session)
-    session.close()
+    with write_session() as session:
+        vendor_code = get_next_vendor_code(session)
     
     st.info(f"Vendor code: **{vendor_code}** (auto-generated)")
     st.session_state.v_data['vendor_code'] = vendor_code
     
+    vendor_types = ["Material Supplier", "Service Provider", "Both"]
+    extracted_state = extracted.get('state', 'Maharashtra')
+    seed_fields({
+        'gstin': extracted.get('gstin', ''), 'pan': extracted.get('pan', ''),
+        'legal_name': extracted.get('legal_name', ''), 'trade_name': extracted.get('trade_name', ''),
+        'vendor_type': vendor_types[0], 'vendor_category': VENDOR_CATEGORIES[0],
+        'company_email': extracted.get('email', ''), 'company_phone': extracted.get('phone', ''),
+        'address': extracted.get('address', ''), 'pin': extracted.get('pin_code', ''),
+        'city': extracted.get('city', ''),
+        'state': extracted_state if extracted_state in INDIAN_STATES else 'Maharashtra',
+    }, choices={'vendor_type': vendor_types, 'vendor_category': VENDOR_CATEGORIES, 'state': INDIAN_STATES})
+    
     col1, col2 = st.columns(2)
     with col1:
-        gstin = st.text_input("GSTIN *", value=extracted.get('gstin', ''), max_chars=15)
-        pan = st.text_input("PAN *", value=extracted.get('pan', ''), max_chars=10)
-        legal_name = st.text_input("Legal name *", value=extracted.get('legal_name', ''))
-        vendor_type = st.selectbox("Vendor type *", ["Material Supplier", "Service Provider", "Both"])
+        gstin = st.text_input("GSTIN *", max_chars=15, key=field_key('gstin'))
+        pan = st.text_input("PAN *", max_chars=10, key=field_key('pan'))
+        legal_name = st.text_input("Legal name *", key=field_key('legal_name'))
+        vendor_type = st.selectbox("Vendor type *", vendor_types, key=field_key('vendor_type'))
     
     with col2:
-        trade_name = st.text_input("Trade name *", value=extracted.get('trade_name', ''))
-        vendor_category = st.selectbox("Category *", VENDOR_CATEGORIES)
-        company_email = st.text_input("Email *", value=extracted.get('email', ''))
-        company_phone = st.text_input("Phone *", value=extracted.get('phone', ''), max_chars=10)
+        trade_name = st.text_input("Trade name *", key=field_key('trade_name'))
+        vendor_category = st.selectbox("Category *", VENDOR_CATEGORIES, key=field_key('vendor_category'))
+        company_email = st.text_input("Email *", key=field_key('company_email'))
+        company_phone = st.text_input("Phone *", max_chars=10, key=field_key('company_phone'))
     
     st.markdown("##### Address")
-    address = st.text_input("Address line 1 *", value=extracted.get('address', ''))
+    address = st.text_input("Address line 1 *", key=field_key('address'))
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        city = st.text_input("City *", value=extracted.get('city', ''))
+        pin = st.text_input("PIN code *", max_chars=6, key=field_key('pin'),
+                            help="City and state are filled in from the PIN code")
+    
+    # Auto-fill city and state from the India Post directory when the PIN changes
+    place = lookup_pin(pin) or {}
+    if place and pin != d.get('pin'):
+        st.session_state[field_key('city')] = place['city']
+        if place['state'] in INDIAN_STATES:
+            st.session_state[field_key('state')] = place['state']
     with col2:
-        state_val = extracted.get('state', 'Maharashtra')
-        state_idx = INDIAN_STATES.index(state_val) if state_val in INDIAN_STATES else 10
-        state = st.selectbox("State *", INDIAN_STATES, index=state_idx)
+        city = st.text_input("City *", key=field_key('city'))
     with col3:
-        pin = st.text_input("PIN code *", value=extracted.get('pin_code', ''), max_chars=6)
+        state = st.selectbox("State *", INDIAN_STATES, key=field_key('state'))
+    
+    store_fields(['gstin', 'pan', 'legal_name', 'trade_name', 'vendor_type', 'vendor_category',
+                  'company_email', 'company_phone', 'address', 'city', 'state', 'pin'])
+    
+    # Format and consistency checks
+    field_errors = [e for e in (
+        validate_gstin(gstin) if gstin else None,
+        validate_pan(pan, gstin) if pan else None,
+        validate_pin_state(pin, state, gstin) if pin else None,
+    ) if e]
+    for error in field_errors:
+        st.error(error)
+    
+    # Duplicate check
+    exact_duplicate = False
+    if gstin or pan or legal_name or trade_name:
+        with write_session() as session:
+            duplicates = find_duplicates(session, gstin, pan, legal_name, trade_name)
+        
+        if duplicates:
+            exact_duplicate = any(d['reason'] in ("GSTIN", "PAN") for d in duplicates)
+            lines = []
+            for d in duplicates[:5]:
+                match = f"{d['reason']} match" if d['reason'] != "Name" else f"name {d['score']:.0%} similar"
+                lines.append(f"- **{d['vendor_code']}** {d['trade_name'] or d['legal_name']} ({match}, {d['status']})")
+            message = "Possible duplicate of existing vendors:\n" + "\n".join(lines)
+            if exact_duplicate:
+                st.error(message)
+            else:
+                st.warning(message)
     
-    st.session_state.v_data.update({
-        'gstin': gstin, 'pan': pan, 'legal_name': legal_name, 'trade_name': trade_name,
-        'vendor_type': vendor_type, 'vendor_category': vendor_category,
-        'company_email': company_email, 'company_phone': company_phone,
-        'address': address, 'city': city, 'state': state, 'pin': pin
-    })
+    confirmed = True
+    if exact_duplicate:
+        confirmed = st.checkbox("I have checked the vendors above and want to register this vendor anyway")
     
     st.markdown("---")
     col1, col2 = st.columns(2)
@@ -332,56 +565,66 @@ elif st.session_state.v_step == 2:
             st.rerun()
     with col2:
         required = [gstin, pan, legal_name, trade_name, company_email, company_phone, address, city, pin]
-        if all(required):
+        if all(required) and confirmed and not field_errors:
             if st.button("Next →", type="primary"):
                 st.session_state.v_step = 3
                 st.rerun()
         else:
             st.button("Next →", disabled=True)
-            st.caption("Please fill all required fields")
+            if not all(required):
+                st.caption("Please fill all required fields")
+            elif field_errors:
+                st.caption("Please correct the errors above")
+            else:
+                st.caption("Please confirm the duplicate check")
 
 # ============ STEP 3: CONTACT AND RATINGS ============
 elif st.session_state.v_step == 3:
     st.subheader("👥 Contact person and ratings")
     
+    term_options = ["30 Days", "45 Days", "60 Days", "90 Days", "Advance"]
+    seed_fields({
+        'p_name': '', 'p_mobile': '', 'p_desig': '', 'p_email': '',
+        'payment_terms': term_options[0], 'credit_days': 30, 'credit_limit': 500000.0,
+        'r_del': 4.0, 'r_qual': 4.0, 'r_price': 4.0, 'comments': '',
+    }, choices={'payment_terms': term_options})
+    
     st.markdown("##### Primary contact")
     col1, col2 = st.columns(2)
     with col1:
-        p_name = st.text_input("Name *")
-        p_mobile = st.text_input("Mobile *", max_chars=10)
+        p_name = st.text_input("Name *", key=field_key('p_name'))
+        p_mobile = st.text_input("Mobile *", max_chars=10, key=field_key('p_mobile'))
     with col2:
-        p_desig = st.text_input("Designation *")
-        p_email = st.text_input("Email")
+        p_desig = st.text_input("Designation *", key=field_key('p_desig'))
+        st.text_input("Email", key=field_key('p_email'))
     
     st.markdown("##### Payment terms")
     col1, col2, col3 = st.columns(3)
     with col1:
-        payment_terms = st.selectbox("Payment terms", ["30 Days", "45 Days", "60 Days", "90 Days", "Advance"])
+        st.selectbox("Payment terms", term_options, key=field_key('payment_terms'))
     with col2:
-        credit_days = st.number_input("Credit days", value=30, min_value=0)
+        st.number_input("Credit days", min_value=0, key=field_key('credit_days'))
     with col3:
-        credit_limit = st.number_input("Credit limit (₹)", value=500000.0, min_value=0.0, step=10000.0)
+        st.number_input("Credit limit (₹)", min_value=0.0, step=10000.0, key=field_key('credit_limit'))
     
     st.markdown("##### Vendor rating")
+    st.caption("Starting ratings. They follow the vendor's deliveries, rejections and invoices once POs are placed.")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        r_del = st.slider("Delivery", 1.0, 5.0, 4.0, 0.5)
+        r_del = st.slider("Delivery", 1.0, 5.0, step=0.5, key=field_key('r_del'))
     with col2:
-        r_qual = st.slider("Quality", 1.0, 5.0, 4.0, 0.5)
+        r_qual = st.slider("Quality", 1.0, 5.0, step=0.5, key=field_key('r_qual'))
     with col3:
-        r_price = st.slider("Pricing", 1.0, 5.0, 4.0, 0.5)
+        r_price = st.slider("Pricing", 1.0, 5.0, step=0.5, key=field_key('r_price'))
     with col4:
         r_overall = round((r_del + r_qual + r_price) / 3, 1)
         st.metric("Overall", f"⭐ {r_overall}")
     
-    comments = st.text_area("Comments (optional)", height=80)
+    st.text_area("Comments (optional)", height=80, key=field_key('comments'))
     
-    st.session_state.v_data.update({
-        'p_name': p_name, 'p_desig': p_desig, 'p_mobile': p_mobile, 'p_email': p_email,
-        'payment_terms': payment_terms, 'credit_days': credit_days, 'credit_limit': credit_limit,
-        'r_del': r_del, 'r_qual': r_qual, 'r_price': r_price, 'r_overall': r_overall,
-        'comments': comments
-    })
+    store_fields(['p_name', 'p_desig', 'p_mobile', 'p_email', 'payment_terms', 'credit_days',
+                  'credit_limit', 'r_del', 'r_qual', 'r_price', 'comments'])
+    st.session_state.v_data['r_overall'] = r_overall
     
     st.markdown("---")
     col1, col2 = st.columns(2)
@@ -404,16 +647,38 @@ elif st.session_state.v_step == 4:
     
     expected_pan = st.session_state.v_data.get('pan', '')
     
+    account_types = ["Current", "Savings"]
+    seed_fields({'ifsc': '', 'bank_name': '', 'account': '', 'acc_type': account_types[0], 'branch': '',
+                 'is_msme': False, 'status': "Active"},
+                choices={'acc_type': account_types, 'status': ["Active", "Inactive"]})
+    
     # Bank details - Manual entry first
     st.markdown("##### Bank details (optional)")
     col1, col2 = st.columns(2)
     with col1:
-        bank_name = st.text_input("Bank name", value=st.session_state.v_data.get('bank_name', ''))
-        account = st.text_input("Account number", value=st.session_state.v_data.get('account', ''))
-        ifsc = st.text_input("IFSC code", value=st.session_state.v_data.get('ifsc', ''), max_chars=11)
+        ifsc = st.text_input("IFSC code", max_chars=11, key=field_key('ifsc'),
+                             help="Bank name and branch are filled in from the IFSC code")
+    
+    # Auto-fill bank and branch from the RBI IFSC master when the IFSC changes
+    if ifsc != st.session_state.v_data.get('ifsc'):
+        ifsc_details = lookup_ifsc(ifsc) or {}
+        ifsc_bank = ifsc_details.get('bank') or bank_name_for_ifsc(ifsc)
+        if ifsc_bank:
+            st.session_state[field_key('bank_name')] = ifsc_bank
+        if ifsc_details.get('branch'):
+            st.session_state[field_key('branch')] = ifsc_details['branch']
     with col2:
-        branch = st.text_input("Branch", value=st.session_state.v_data.get('branch', ''))
-        acc_type = st.selectbox("Account type", ["Current", "Savings"])
+        bank_name = st.text_input("Bank name", key=field_key('bank_name'))
+    col1, col2 = st.columns(2)
+    with col1:
+        account = st.text_input("Account number", key=field_key('account'))
+        acc_type = st.selectbox("Account type", account_types, key=field_key('acc_type'))
+    with col2:
+        branch = st.text_input("Branch", key=field_key('branch'))
+    
+    ifsc_error = validate_ifsc(ifsc) if ifsc else None
+    if ifsc_error:
+        st.error(ifsc_error)
     
     st.markdown("---")
     
@@ -434,12 +699,16 @@ elif st.session_state.v_step == 4:
             pan_type = pan_file.name.split('.')[-1].lower()
             st.session_state.v_data['pan_file'] = pan_bytes
             st.session_state.v_data['pan_file_type'] = pan_type
-            
+            attach_document('pan_card', pan_bytes, pan_type)
+        
+        pan_bytes = st.session_state.v_data.get('pan_file')
+        if pan_bytes:
+            pan_type = st.session_state.v_data['pan_file_type']
             show_preview(pan_bytes, pan_type)
             
             if use_ai_pan and os.path.exists(CREDENTIALS_PATH):
                 with st.spinner("Verifying..."):
-                    pan_text, _ = extract_with_ai(pan_bytes, pan_type)
+                    pan_text, _ = document_text(st.session_state.v_data['documents']['pan_card'], pan_bytes, pan_type)
                     if pan_text:
                         extracted_pan = extract_pan_number(pan_text)
                         if extracted_pan:
@@ -462,37 +731,45 @@ elif st.session_state.v_step == 4:
             cheque_type = cheque_file.name.split('.')[-1].lower()
             st.session_state.v_data['cheque_file'] = cheque_bytes
             st.session_state.v_data['cheque_file_type'] = cheque_type
-            
+            attach_document('bank_document', cheque_bytes, cheque_type)
+        
+        cheque_bytes = st.session_state.v_data.get('cheque_file')
+        if cheque_bytes:
+            cheque_type = st.session_state.v_data['cheque_file_type']
             show_preview(cheque_bytes, cheque_type)
             
             if use_ai_bank and os.path.exists(CREDENTIALS_PATH):
                 with st.spinner("Extracting..."):
-                    cheque_text, _ = extract_with_ai(cheque_bytes, cheque_type)
+                    cheque_text, extracted_now = document_text(st.session_state.v_data['documents']['bank_document'],
+                                                               cheque_bytes, cheque_type)
                     if cheque_text:
                         bank_data = extract_bank_details(cheque_text)
                         if bank_data.get('ifsc'):
                             st.success("✅ Bank details extracted")
-                            st.session_state.v_data['bank_name'] = bank_data.get('bank_name') or bank_name
-                            st.session_state.v_data['ifsc'] = bank_data.get('ifsc') or ifsc
-                            st.session_state.v_data['account'] = bank_data.get('account') or account
-                            st.rerun()
+                            # Filled in once per document, so corrections made afterwards stay
+                            if extracted_now:
+                                fill_fields({
+                                    'bank_name': bank_data.get('bank_name') or bank_name,
+                                    'branch': bank_data.get('branch') or branch,
+                                    'ifsc': bank_data.get('ifsc') or ifsc,
+                                    'account': bank_data.get('account') or account,
+                                })
+                                st.rerun()
     
     st.markdown("---")
     
     # MSME
     st.markdown("##### MSME registration (optional)")
-    is_msme = st.checkbox("Vendor is MSME registered")
+    is_msme = st.checkbox("Vendor is MSME registered", key=field_key('is_msme'))
     msme_num = None
     if is_msme:
-        msme_num = st.text_input("MSME/Udyam number", placeholder="UDYAM-XX-XX-XXXXXXX")
+        seed_fields({'msme_num': ''})
+        msme_num = st.text_input("MSME/Udyam number", placeholder="UDYAM-XX-XX-XXXXXXX", key=field_key('msme_num'))
     
-    status = st.radio("Vendor status", ["Active", "Inactive"], horizontal=True)
+    status = st.radio("Vendor status", ["Active", "Inactive"], horizontal=True, key=field_key('status'))
     
-    st.session_state.v_data.update({
-        'bank_name': bank_name, 'branch': branch, 'account': account,
-        'ifsc': ifsc, 'acc_type': acc_type, 'is_msme': is_msme,
-        'msme_num': msme_num, 'status': status
-    })
+    store_fields(['bank_name', 'branch', 'account', 'ifsc', 'acc_type', 'is_msme', 'status'])
+    st.session_state.v_data['msme_num'] = msme_num
     
     # Summary
     with st.expander("📋 Review details before submission"):
@@ -522,86 +799,102 @@ elif st.session_state.v_step == 4:
             st.session_state.v_step = 3
             st.rerun()
     with col2:
-        if st.button("✅ Submit", type="primary"):
-            session = SessionLocal()
+        if ifsc_error:
+            st.button("✅ Submit", disabled=True)
+            st.caption("Please correct the IFSC code")
+        elif st.button("✅ Submit", type="primary"):
             try:
-                d = st.session_state.v_data
-                vendor_code = d['vendor_code']
+                with write_session() as session:
+                    d = st.session_state.v_data
+                    # Issued now: a resumed draft's code may have gone to another vendor since
+                    vendor_code = d['vendor_code'] = get_next_vendor_code(session)
                 
-                # Save documents
-                doc_gst = doc_pan = doc_cheque = None
+                    # Save documents
+                    doc_gst = doc_pan = doc_cheque = None
                 
-                if d.get('gst_file'):
-                    doc_gst = save_document(vendor_code, 'gst_certificate', 
-                                           d['gst_file'], d['gst_file_type'])
-                if d.get('pan_file'):
-                    doc_pan = save_document(vendor_code, 'pan_card', 
-                                           d['pan_file'], d['pan_file_type'])
-                if d.get('cheque_file'):
-                    doc_cheque = save_document(vendor_code, 'bank_document', 
-                                              d['cheque_file'], d['cheque_file_type'])
+                    if d.get('gst_file'):
+                        doc_gst = save_document(vendor_code, 'gst_certificate', 
+                                               d['gst_file'], d['gst_file_type'])
+                    if d.get('pan_file'):
+                        doc_pan = save_document(vendor_code, 'pan_card', 
+                                               d['pan_file'], d['pan_file_type'])
+                    if d.get('cheque_file'):
+                        doc_cheque = save_document(vendor_code, 'bank_document', 
+                                                  d['cheque_file'], d['cheque_file_type'])
                 
-                # Create vendor
-                vendor = Vendor(
-                    vendor_code=vendor_code,
-                    gstin=d.get('gstin'),
-                    pan=d.get('pan'),
-                    legal_name=d.get('legal_name'),
-                    trade_name=d.get('trade_name'),
-                    vendor_type=d.get('vendor_type'),
-                    vendor_category=d.get('vendor_category'),
-                    company_email=d.get('company_email'),
-                    company_phone=d.get('company_phone'),
-                    address_line1=d.get('address'),
-                    city=d.get('city'),
-                    state=d.get('state'),
-                    pin_code=d.get('pin'),
-                    bank_name=bank_name or None,
-                    bank_branch=branch or None,
-                    account_number=account or None,
-                    ifsc_code=ifsc or None,
-                    account_type=acc_type,
-                    payment_terms=d.get('payment_terms'),
-                    credit_days=d.get('credit_days'),
-                    credit_limit=d.get('credit_limit'),
-                    rating_delivery=d.get('r_del'),
-                    rating_quality=d.get('r_qual'),
-                    rating_pricing=d.get('r_price'),
-                    rating_overall=d.get('r_overall'),
-                    is_msme=is_msme,
-                    msme_number=msme_num,
-                    doc_gst_certificate=doc_gst,
-                    doc_pan_card=doc_pan,
-                    doc_cancelled_cheque=doc_cheque,
-                    comments=d.get('comments'),
-                    status=status,
-                    created_by_id=st.session_state.user['id']
-                )
+                    # Create vendor
+                    vendor = Vendor(
+                        vendor_code=vendor_code,
+                        gstin=d.get('gstin'),
+                        pan=d.get('pan'),
+                        legal_name=d.get('legal_name'),
+                        trade_name=d.get('trade_name'),
+                        vendor_type=d.get('vendor_type'),
+                        vendor_category=d.get('vendor_category'),
+                        company_email=d.get('company_email'),
+                        company_phone=d.get('company_phone'),
+                        address_line1=d.get('address'),
+                        city=d.get('city'),
+                        state=d.get('state'),
+                        pin_code=d.get('pin'),
+                        bank_name=bank_name or None,
+                        bank_branch=branch or None,
+                        account_number=account or None,
+                        ifsc_code=ifsc or None,
+                        account_type=acc_type,
+                        payment_terms=d.get('payment_terms'),
+                        credit_days=d.get('credit_days'),
+                        credit_limit=d.get('credit_limit'),
+                        rating_delivery=d.get('r_del'),
+                        rating_quality=d.get('r_qual'),
+                        rating_pricing=d.get('r_price'),
+                        rating_overall=d.get('r_overall'),
+                        is_msme=is_msme,
+                        msme_number=msme_num,
+                        doc_gst_certificate=doc_gst,
+                        doc_pan_card=doc_pan,
+                        doc_cancelled_cheque=doc_cheque,
+                        comments=d.get('comments'),
+                        status=status,
+                        created_by_id=st.session_state.user['id']
+                    )
                 
-                session.add(vendor)
-                session.flush()
+                    session.add(vendor)
+                    session.flush()
                 
-                # Add contact
-                contact = VendorContact(
-                    vendor_id=vendor.id,
-                    contact_type="Primary",
-                    name=d.get('p_name'),
-                    designation=d.get('p_desig'),
-                    mobile=d.get('p_mobile'),
-                    email=d.get('p_email'),
-                    is_primary=True
-                )
-                session.add(contact)
+                    # Add contact
+                    contact = VendorContact(
+                        vendor_id=vendor.id,
+                        contact_type="Primary",
+                        name=d.get('p_name'),
+                        designation=d.get('p_desig'),
+                        mobile=d.get('p_mobile'),
+                        email=d.get('p_email'),
+                        is_primary=True
+                    )
+                    session.add(contact)
+                    index_vendor_names(session, vendor)
+                    index_vendor_keys(session, vendor)
                 
-                log_action(session, st.session_state.user['id'], "CREATE",
-                          "vendors", vendor.id, f"Registered vendor {vendor_code}")
+                    log_action(session, st.session_state.user['id'], "CREATE",
+                              "vendors", vendor.id, f"Registered vendor {vendor_code}")
+                    
+                    draft_id = st.session_state.v_draft_id
+                    if draft_id is not None:
+                        delete_draft(session, draft_id, st.session_state.user['id'])
                 
-                session.commit()
+                if draft_id is not None:
+                    remove_documents([draft_id])
+                st.session_state.v_draft_id = None
+                st.session_state.v_saved = {}
+                st.cache_data.clear()
                 st.session_state.v_done = True
                 st.rerun()
                 
             except Exception as e:
-                session.rollback()
                 st.error(f"Error: {e}")
-            finally:
-                session.close()
+
+autosave()
+
+render_query_panel()
+page_finished()
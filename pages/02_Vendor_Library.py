@@ -7,19 +7,45 @@ import pandas as pd
 import os
 import base64
 from datetime import datetime
-from database import SessionLocal, Vendor, VendorContact
+from types import SimpleNamespace
+from sqlalchemy import case, func, select
+from config import EXPORT_DOWNLOAD_MB, INDIAN_STATES, PAYMENT_TERMS, VENDOR_CATEGORIES
+from database import Vendor, VendorContact, read_session, stream_rows, write_session
+from document_export import export_documents, export_path, financial_years
+from vendor_archive import archived_count, restore_vendor, search_archive
+from vendor_search import lookup_vendors
+from vendor_updates import bulk_update_vendors, update_vendor, vendor_history
+from vendor_ratings import DIMENSIONS, RATING_COLUMNS, vendor_rating_stats
+from validation import validate_gstin, validate_ifsc, validate_pan, validate_pin_state
+from auth import check_login
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started, timed
 from io import BytesIO
 
 st.set_page_config(page_title="Vendor Library", page_icon="📚", layout="wide")
 
+track_page("Vendor Library")
+page_started("Vendor Library")
+
 # Check login
-if not st.session_state.get('authenticated'):
+if not check_login():
     st.error("Please login to access this module")
     st.stop()
 
 DOCUMENTS_DIR = r"C:\Users\Admin\Desktop\PrarthiERP\documents"
 
+# Vendors offered in the action picker at a time
+PICKER_LIMIT = 20
+
+# Roles that may change vendors selected in the grid
+EDIT_ROLES = ["Purchase", "Accounts", "Management"]
+KEEP = "(no change)"
+
+# Audit entries shown in the history panel
+HISTORY_LIMIT = 50
+
 
+@timed("pdf_render")
 def generate_vendor_pdf(vendor):
     """Generate PDF for a vendor"""
     try:
@@ -81,97 +107,199 @@ def generate_vendor_pdf(vendor):
         return None
 
 
-# ============ MAIN ============
-st.title("📚 Vendor Library")
+# ============ CACHED DATA ============
+# Each fragment below reads only its own cached inputs, so interacting with one
+# part of the page does not re-query or rebuild the others.
+@st.cache_data(ttl=60, show_spinner=False)
+def load_vendor_stats():
+    """Header counts, computed in SQL"""
+    with read_session() as session:
+        total, active, inactive, msme = session.query(
+            func.count(Vendor.id),
+            func.coalesce(func.sum(case((Vendor.status == "Active", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Vendor.status == "Inactive", 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Vendor.is_msme == True, 1), else_=0)), 0),
+        ).one()
+        archived = archived_count(session)
+    return {"total": total, "active": active, "inactive": inactive, "msme": msme, "archived": archived}
 
-session = SessionLocal()
-vendors = session.query(Vendor).order_by(Vendor.created_at.desc()).all()
 
-# Stats row
-col1, col2, col3, col4 = st.columns(4)
-col1.metric("Total vendors", len(vendors))
-col2.metric("Active", len([v for v in vendors if v.status == "Active"]))
-col3.metric("Inactive", len([v for v in vendors if v.status == "Inactive"]))
-col4.metric("MSME registered", len([v for v in vendors if v.is_msme]))
+@st.cache_data(ttl=60, show_spinner=False)
+def load_vendor_table():
+    """Grid rows for all vendors, newest first, indexed by vendor id, and when they were read"""
+    loaded_at = datetime.utcnow()
+    with read_session() as session:
+        rows = stream_rows(session, select(
+            Vendor.id, Vendor.vendor_code, Vendor.trade_name, Vendor.legal_name, Vendor.gstin,
+            Vendor.pan, Vendor.vendor_category, Vendor.vendor_type, Vendor.city, Vendor.state,
+            Vendor.company_phone, Vendor.company_email, Vendor.bank_name, Vendor.account_number,
+            Vendor.ifsc_code, Vendor.credit_limit, Vendor.credit_days, Vendor.payment_terms,
+            Vendor.rating_overall, Vendor.status, Vendor.is_msme
+        ).order_by(Vendor.created_at.desc()))
+        raw = pd.DataFrame.from_records(rows, columns=[
+            "id", "vendor_code", "trade_name", "legal_name", "gstin", "pan", "vendor_category",
+            "vendor_type", "city", "state", "company_phone", "company_email", "bank_name",
+            "account_number", "ifsc_code", "credit_limit", "credit_days", "payment_terms",
+            "rating_overall", "status", "is_msme"
+        ])
+    
+    return pd.DataFrame({
+        "Code": raw["vendor_code"],
+        "Vendor name": raw["trade_name"].fillna(raw["legal_name"]),
+        "Legal name": raw["legal_name"],
+        "GSTIN": raw["gstin"],
+        "PAN": raw["pan"],
+        "Category": raw["vendor_category"],
+        "Type": raw["vendor_type"],
+        "City": raw["city"],
+        "State": raw["state"],
+        "Phone": raw["company_phone"],
+        "Email": raw["company_email"],
+        "Bank": raw["bank_name"].fillna("-"),
+        "Account": raw["account_number"].fillna("-"),
+        "IFSC": raw["ifsc_code"].fillna("-"),
+        "Credit limit": [f"₹{c:,.0f}" if c else "-" for c in raw["credit_limit"].fillna(0)],
+        "Credit days": raw["credit_days"],
+        "Payment terms": raw["payment_terms"],
+        "Rating": "⭐ " + raw["rating_overall"].fillna(0).astype(str),
+        "Status": raw["status"],
+        "MSME": raw["is_msme"].fillna(False).astype(bool).map({True: "Yes", False: "No"}),
+    }).set_index(raw["id"].rename("id")), loaded_at
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_vendor_detail(vendor_id):
+    """All columns of one vendor plus its contacts, as plain data"""
+    with read_session() as session:
+        vendor = session.get(Vendor, vendor_id)
+        if vendor is None:
+            return None
+        detail = {c.name: getattr(vendor, c.name) for c in Vendor.__table__.columns}
+        detail["contacts"] = [
+            {"name": c.name, "designation": c.designation, "mobile": c.mobile}
+            for c in session.query(VendorContact).filter_by(vendor_id=vendor_id).all()
+        ]
+    return detail
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def build_vendor_pdf(vendor_id):
+    """Vendor PDF, rendered once per vendor"""
+    detail = load_vendor_detail(vendor_id)
+    return generate_vendor_pdf(SimpleNamespace(**detail)) if detail else None
+
+
+# ============ FRAGMENTS ============
+def close_panel(key):
+    """Button callback: hide a details/documents panel before the fragment reruns"""
+    st.session_state[key] = None
 
-st.markdown("---")
 
-# Filters
-col1, col2, col3, col4 = st.columns([3, 1, 1, 2])
-with col1:
-    search = st.text_input("Search", placeholder="Search by name, GSTIN, code...", label_visibility="collapsed")
-with col2:
-    status_filter = st.selectbox("Status", ["All", "Active", "Inactive"], label_visibility="collapsed")
-with col3:
-    categories = ["All"] + list(set([v.vendor_category for v in vendors if v.vendor_category]))
-    category_filter = st.selectbox("Category", categories, label_visibility="collapsed")
-with col4:
-    col_a, col_b = st.columns(2)
-    export_selected = col_a.button("📥 Export selected")
-    export_all = col_b.button("📄 Export all")
-
-# Filter logic
-filtered = vendors
-if search:
-    s = search.lower()
-    filtered = [v for v in filtered if s in (v.trade_name or '').lower() or 
-                s in (v.legal_name or '').lower() or s in (v.gstin or '').lower() or 
-                s in (v.vendor_code or '').lower()]
-if status_filter != "All":
-    filtered = [v for v in filtered if v.status == status_filter]
-if category_filter != "All":
-    filtered = [v for v in filtered if v.vendor_category == category_filter]
-
-st.caption(f"Showing {len(filtered)} of {len(vendors)} vendors")
-
-# Build dataframe for display
-if filtered:
-    # Create data for table
-    table_data = []
-    for v in filtered:
-        table_data.append({
-            "Code": v.vendor_code,
-            "Vendor name": v.trade_name or v.legal_name,
-            "Legal name": v.legal_name,
-            "GSTIN": v.gstin,
-            "PAN": v.pan,
-            "Category": v.vendor_category,
-            "Type": v.vendor_type,
-            "City": v.city,
-            "State": v.state,
-            "Phone": v.company_phone,
-            "Email": v.company_email,
-            "Bank": v.bank_name or "-",
-            "Account": v.account_number or "-",
-            "IFSC": v.ifsc_code or "-",
-            "Credit limit": f"₹{v.credit_limit:,.0f}" if v.credit_limit else "-",
-            "Credit days": v.credit_days,
-            "Payment terms": v.payment_terms,
-            "Rating": f"⭐ {v.rating_overall or 0}",
-            "Status": v.status,
-            "MSME": "Yes" if v.is_msme else "No",
-        })
+@st.fragment
+def render_stats():
+    """Header stats row"""
+    stats = load_vendor_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total vendors", stats["total"])
+    col2.metric("Active", stats["active"])
+    col3.metric("Inactive", stats["inactive"])
+    col4.metric("MSME registered", stats["msme"])
+    if stats["archived"]:
+        st.caption(f"🗄️ {stats['archived']:,} long-inactive vendor(s) are archived and not counted here")
+
+
+def render_bulk_update(vendor_ids, loaded_at):
+    """Form changing status, category, payment terms or credit limit of the selected vendors"""
+    with st.form("bulk_update"):
+        st.markdown(f"**Update {len(vendor_ids)} selected vendor(s)**")
+        col1, col2, col3, col4 = st.columns(4)
+        status = col1.selectbox("Status", [KEEP, "Active", "Inactive"])
+        category = col2.selectbox("Category", [KEEP] + VENDOR_CATEGORIES)
+        terms = col3.selectbox("Payment terms", [KEEP] + PAYMENT_TERMS)
+        credit_limit = col4.number_input("Credit limit (₹)", min_value=0.0, value=None, step=10000.0,
+                                         placeholder=KEEP)
+        submitted = st.form_submit_button("Apply to selected vendors", type="primary")
+    if not submitted:
+        return
     
-    df = pd.DataFrame(table_data)
+    changes = {field: value for field, value in (("status", status), ("vendor_category", category),
+                                                 ("payment_terms", terms)) if value != KEEP}
+    if credit_limit is not None:
+        changes["credit_limit"] = credit_limit
+    try:
+        with write_session() as session:
+            result, error = bulk_update_vendors(session, vendor_ids, changes,
+                                                st.session_state.user['id'], loaded_at)
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        st.error(error)
+        return
     
-    # Display with horizontal scroll
-    st.markdown("""
-    <style>
-    .vendor-table-container {
-        width: 100%;
-        overflow-x: auto;
-        margin: 10px 0;
-    }
-    .vendor-table-container table {
-        width: max-content;
-        min-width: 100%;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.session_state['bulk_update_result'] = result
+    st.session_state['vendor_grid_version'] = st.session_state.get('vendor_grid_version', 0) + 1
+    st.cache_data.clear()
+    st.rerun()
+
+
+def show_bulk_update_result(result):
+    """Outcome of the last bulk update"""
+    st.success(f"Updated {len(result['updated'])} vendor(s)")
+    if result['unchanged']:
+        st.caption(f"{len(result['unchanged'])} vendor(s) already had these values")
+    if result['conflicts']:
+        st.warning(f"{len(result['conflicts'])} vendor(s) were changed by someone else after the list "
+                   f"was loaded and were not updated. Review them and try again: "
+                   f"{', '.join(result['conflicts'][:20])}")
+    if result['missing']:
+        st.caption(f"{len(result['missing'])} vendor(s) no longer exist")
+
+
+@st.fragment
+def render_vendor_grid():
+    """Filters, vendor grid and CSV export"""
+    table, loaded_at = load_vendor_table()
+    
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 2])
+    with col1:
+        search = st.text_input("Search", placeholder="Search by name, GSTIN, code...", label_visibility="collapsed")
+    with col2:
+        status_filter = st.selectbox("Status", ["All", "Active", "Inactive"], label_visibility="collapsed")
+    with col3:
+        categories = ["All"] + sorted(table["Category"].dropna().unique().tolist())
+        category_filter = st.selectbox("Category", categories, label_visibility="collapsed")
+    with col4:
+        col_a, col_b = st.columns(2)
+        export_selected = col_a.button("📥 Export selected")
+        export_all = col_b.button("📄 Export all")
+    
+    # Filter logic
+    df = table
+    if search:
+        s = search.lower()
+        mask = pd.Series(False, index=df.index)
+        for column in ["Vendor name", "Legal name", "GSTIN", "Code"]:
+            mask |= df[column].fillna("").str.lower().str.contains(s, regex=False)
+        df = df[mask]
+    if status_filter != "All":
+        df = df[df["Status"] == status_filter]
+    if category_filter != "All":
+        df = df[df["Category"] == category_filter]
+    
+    st.caption(f"Showing {len(df)} of {len(table)} vendors")
     
-    # Use st.dataframe with horizontal scroll
-    st.dataframe(
+    if df.empty:
+        st.info("No vendors found. Register your first vendor to get started.")
+        return
+    
+    # Use st.dataframe with horizontal scroll. Rows can be selected for bulk updates;
+    # the key changes after an update so the old selection is not applied to new rows
+    event = st.dataframe(
         df,
+        key=f"vendor_grid_{st.session_state.get('vendor_grid_version', 0)}",
+        on_select="rerun",
+        selection_mode="multi-row",
         use_container_width=True,
         hide_index=True,
         height=400,
@@ -199,168 +327,477 @@ if filtered:
         }
     )
     
-    st.markdown("---")
+    result = st.session_state.pop('bulk_update_result', None)
+    if result:
+        show_bulk_update_result(result)
+    
+    selected_ids = df.index[event.selection.rows].tolist()
+    if selected_ids and st.session_state.user['role'] in EDIT_ROLES:
+        render_bulk_update(selected_ids, loaded_at)
     
-    # Action buttons for each vendor
+    # Export all as CSV
+    if export_all:
+        with timed("csv_export"):
+            csv = df.to_csv(index=False)
+        st.download_button(
+            "⬇️ Download CSV",
+            csv,
+            "vendors_export.csv",
+            "text/csv"
+        )
+
+
+def _options(choices, current):
+    """Selectbox options and index, keeping a stored value that is not in the list
+    (or a blank first option when nothing is stored, so saving does not fill it in)"""
+    options = list(choices)
+    if current not in options:
+        options.insert(0, current or "")
+    return options, options.index(current or "")
+
+
+def render_vendor_edit(vendor):
+    """Edit form for one vendor, saved only if nobody else changed it since it was opened"""
+    opened_version = st.session_state['edit_vendor'][1]
+    with st.expander(f"✏️ Edit: {vendor.vendor_code} - {vendor.trade_name}", expanded=True):
+        with st.form(f"edit_vendor_{vendor.id}"):
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.markdown("**Company information**")
+                legal_name = st.text_input("Legal name", vendor.legal_name or "")
+                trade_name = st.text_input("Trade name", vendor.trade_name or "")
+                gstin = st.text_input("GSTIN", vendor.gstin or "", max_chars=15)
+                pan = st.text_input("PAN", vendor.pan or "", max_chars=10)
+                options, index = _options(["Material Supplier", "Service Provider", "Both"], vendor.vendor_type)
+                vendor_type = st.selectbox("Vendor type", options, index=index)
+                options, index = _options(VENDOR_CATEGORIES, vendor.vendor_category)
+                vendor_category = st.selectbox("Category", options, index=index)
+                options, index = _options(["Active", "Inactive"], vendor.status)
+                status = st.selectbox("Status", options, index=index)
+            
+            with col2:
+                st.markdown("**Contact and address**")
+                company_email = st.text_input("Email", vendor.company_email or "")
+                company_phone = st.text_input("Phone", vendor.company_phone or "")
+                website = st.text_input("Website", vendor.website or "")
+                address_line1 = st.text_input("Address line 1", vendor.address_line1 or "")
+                address_line2 = st.text_input("Address line 2", vendor.address_line2 or "")
+                city = st.text_input("City", vendor.city or "")
+                options, index = _options(INDIAN_STATES, vendor.state)
+                state = st.selectbox("State", options, index=index)
+                pin_code = st.text_input("PIN code", vendor.pin_code or "", max_chars=6)
+            
+            with col3:
+                st.markdown("**Bank and terms**")
+                bank_name = st.text_input("Bank", vendor.bank_name or "")
+                bank_branch = st.text_input("Branch", vendor.bank_branch or "")
+                account_number = st.text_input("Account number", vendor.account_number or "")
+                ifsc_code = st.text_input("IFSC", vendor.ifsc_code or "", max_chars=11)
+                options, index = _options(["Current", "Savings"], vendor.account_type)
+                account_type = st.selectbox("Account type", options, index=index)
+                options, index = _options(PAYMENT_TERMS, vendor.payment_terms)
+                payment_terms = st.selectbox("Payment terms", options, index=index)
+                credit_days = st.number_input("Credit days", min_value=0, value=int(vendor.credit_days or 0))
+                credit_limit = st.number_input("Credit limit (₹)", min_value=0.0, step=10000.0,
+                                               value=float(vendor.credit_limit or 0))
+                is_msme = st.checkbox("MSME registered", value=bool(vendor.is_msme))
+                msme_number = st.text_input("MSME number", vendor.msme_number or "")
+            
+            comments = st.text_area("Comments", vendor.comments or "")
+            
+            col1, col2 = st.columns([1, 5])
+            save = col1.form_submit_button("💾 Save changes", type="primary")
+            cancel = col2.form_submit_button("Cancel")
+    
+    if cancel:
+        st.session_state['edit_vendor'] = None
+        st.rerun(scope="fragment")
+    if not save:
+        return
+    
+    gstin, pan, ifsc_code = gstin.strip().upper(), pan.strip().upper(), ifsc_code.strip().upper()
+    errors = [e for e in (
+        validate_gstin(gstin) if gstin else None,
+        validate_pan(pan, gstin) if pan else None,
+        validate_pin_state(pin_code, state, gstin) if pin_code else None,
+        validate_ifsc(ifsc_code) if ifsc_code else None,
+    ) if e]
+    if errors:
+        for e in errors:
+            st.error(e)
+        return
+    
+    values = {
+        "legal_name": legal_name, "trade_name": trade_name, "gstin": gstin, "pan": pan,
+        "vendor_type": vendor_type, "vendor_category": vendor_category, "status": status,
+        "company_email": company_email, "company_phone": company_phone, "website": website,
+        "address_line1": address_line1, "address_line2": address_line2, "city": city,
+        "state": state, "pin_code": pin_code, "bank_name": bank_name, "bank_branch": bank_branch,
+        "account_number": account_number, "ifsc_code": ifsc_code, "account_type": account_type,
+        "payment_terms": payment_terms, "credit_days": credit_days, "credit_limit": credit_limit,
+        "is_msme": is_msme, "msme_number": msme_number if is_msme else "", "comments": comments,
+    }
+    try:
+        with write_session() as session:
+            result, error = update_vendor(session, vendor.id, opened_version, values,
+                                          st.session_state.user['id'])
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        # The cached details are out of date; reopening the form loads the current version
+        load_vendor_detail.clear()
+        st.session_state['edit_vendor'] = None
+        st.error(error)
+        return
+    
+    st.session_state['edit_vendor'] = None
+    st.session_state['vendor_edit_result'] = (vendor.vendor_code, len(result['changes']))
+    st.cache_data.clear()
+    st.rerun()
+
+
+def render_vendor_history(vendor):
+    """Changes made to a vendor, newest first"""
+    with read_session() as session:
+        history = vendor_history(session, vendor.id)[:HISTORY_LIMIT]
+    with st.expander(f"🕘 History: {vendor.trade_name} (version {vendor.version})", expanded=True):
+        if not history:
+            st.caption("No changes recorded")
+        for entry in history:
+            when = entry['timestamp'].strftime("%d-%m-%Y %H:%M") if entry['timestamp'] else ""
+            st.markdown(f"**{when}** · {entry['user'] or 'System'} · {entry['action']}")
+            if entry['changes']:
+                st.dataframe(
+                    [{"Field": field.replace("_", " ").capitalize(), "Before": str(old), "After": str(new)}
+                     for field, (old, new) in entry['changes'].items()],
+                    hide_index=True,
+                    use_container_width=True,
+                )
+            elif entry['details']:
+                st.caption(entry['details'])
+        st.button("Close history", on_click=close_panel, args=('show_vendor_history',))
+
+
+@st.fragment
+def render_vendor_actions():
+    """Vendor picker with details, documents, PDF download, editing and history"""
     st.subheader("Vendor actions")
     
-    selected_vendor = st.selectbox(
-        "Select vendor for actions",
-        options=[f"{v.vendor_code} - {v.trade_name}" for v in filtered],
-        label_visibility="collapsed",
-        placeholder="Select a vendor to view details, documents or download PDF..."
-    )
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        picker_query = st.text_input("Find vendor", placeholder="Type code, GSTIN or name...",
+                                     label_visibility="collapsed")
     
-    if selected_vendor:
-        vendor_code = selected_vendor.split(" - ")[0]
-        vendor = next((v for v in filtered if v.vendor_code == vendor_code), None)
-        
-        if vendor:
+    # Only the top matches are sent to the browser
+    if picker_query:
+        with read_session() as session:
+            matches = lookup_vendors(session, picker_query, limit=PICKER_LIMIT)
+    else:
+        recent = load_vendor_table()[0].head(PICKER_LIMIT)
+        matches = [(int(vendor_id), f"{code} - {name}") for vendor_id, code, name
+                   in zip(recent.index, recent["Code"], recent["Vendor name"])]
+    labels = dict(matches)
+    
+    with col2:
+        selected_id = st.selectbox(
+            "Select vendor for actions",
+            options=list(labels),
+            format_func=labels.get,
+            label_visibility="collapsed",
+            placeholder="Select a vendor to view details, documents or download PDF..."
+        )
+    
+    if picker_query and not matches:
+        st.caption("No vendors match your search")
+    
+    detail = load_vendor_detail(selected_id) if selected_id else None
+    if not detail:
+        return
+    vendor = SimpleNamespace(**detail)
+    
+    saved = st.session_state.pop('vendor_edit_result', None)
+    if saved:
+        code, changed = saved
+        st.success(f"Saved {changed} change(s) to {code}" if changed else f"No changes to save for {code}")
+    
+    can_edit = st.session_state.user['role'] in EDIT_ROLES
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    with col1:
+        if st.button("👁️ View full details", use_container_width=True):
+            st.session_state['show_vendor_detail'] = vendor.id
+    
+    with col2:
+        if st.button("📎 View documents", use_container_width=True):
+            st.session_state['show_vendor_docs'] = vendor.id
+    
+    with col3:
+        pdf_data = build_vendor_pdf(vendor.id)
+        if pdf_data:
+            st.download_button(
+                "📄 Download PDF",
+                pdf_data,
+                f"{vendor.vendor_code}.pdf",
+                "application/pdf",
+                use_container_width=True
+            )
+        else:
+            st.button("📄 Download PDF", disabled=True, use_container_width=True)
+            st.caption("Install reportlab for PDF")
+    
+    with col4:
+        if st.button("✏️ Edit vendor", disabled=not can_edit, use_container_width=True):
+            # Remember the version the form was opened at, for the compare-and-swap save
+            st.session_state['edit_vendor'] = (vendor.id, vendor.version)
+    
+    with col5:
+        if st.button("🕘 History", use_container_width=True):
+            st.session_state['show_vendor_history'] = vendor.id
+    
+    edit = st.session_state.get('edit_vendor')
+    if can_edit and edit and edit[0] == vendor.id:
+        render_vendor_edit(vendor)
+    
+    if st.session_state.get('show_vendor_history') == vendor.id:
+        render_vendor_history(vendor)
+    
+    # Show details popup
+    if st.session_state.get('show_vendor_detail') == vendor.id:
+        with st.expander(f"📋 Full details: {vendor.trade_name}", expanded=True):
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                if st.button("👁️ View full details", use_container_width=True):
-                    st.session_state['show_vendor_detail'] = vendor.id
+                st.markdown("**Company information**")
+                st.write(f"Code: {vendor.vendor_code}")
+                st.write(f"Legal name: {vendor.legal_name}")
+                st.write(f"Trade name: {vendor.trade_name}")
+                st.write(f"Type: {vendor.vendor_type}")
+                st.write(f"Category: {vendor.vendor_category}")
+                st.write(f"GSTIN: {vendor.gstin}")
+                st.write(f"PAN: {vendor.pan}")
+                if vendor.is_msme:
+                    st.write(f"MSME: {vendor.msme_number}")
             
             with col2:
-                if st.button("📎 View documents", use_container_width=True):
-                    st.session_state['show_vendor_docs'] = vendor.id
+                st.markdown("**Contact information**")
+                st.write(f"Email: {vendor.company_email}")
+                st.write(f"Phone: {vendor.company_phone}")
+                st.write(f"Address: {vendor.address_line1}")
+                st.write(f"City: {vendor.city}")
+                st.write(f"State: {vendor.state}")
+                st.write(f"PIN: {vendor.pin_code}")
+                
+                if vendor.contacts:
+                    st.markdown("**Contact person**")
+                    for c in vendor.contacts:
+                        st.write(f"{c['name']} ({c['designation']})")
+                        st.write(f"📞 {c['mobile']}")
             
             with col3:
-                pdf_data = generate_vendor_pdf(vendor)
-                if pdf_data:
-                    st.download_button(
-                        "📄 Download PDF",
-                        pdf_data,
-                        f"{vendor.vendor_code}.pdf",
-                        "application/pdf",
-                        use_container_width=True
-                    )
+                st.markdown("**Bank information**")
+                st.write(f"Bank: {vendor.bank_name or 'Not provided'}")
+                st.write(f"Branch: {vendor.bank_branch or '-'}")
+                st.write(f"Account: {vendor.account_number or '-'}")
+                st.write(f"IFSC: {vendor.ifsc_code or '-'}")
+                st.write(f"Type: {vendor.account_type or '-'}")
+                
+                st.markdown("**Payment terms**")
+                st.write(f"Terms: {vendor.payment_terms}")
+                st.write(f"Credit days: {vendor.credit_days}")
+                st.write(f"Credit limit: ₹{vendor.credit_limit:,.0f}" if vendor.credit_limit else "Not set")
+                
+                st.markdown("**Ratings**")
+                with read_session() as session:
+                    rating_stats = vendor_rating_stats(session, vendor.id)
+                for dimension in DIMENSIONS:
+                    rating, events = rating_stats.get(dimension, (getattr(vendor, RATING_COLUMNS[dimension]) or 0, 0))
+                    st.write(f"{dimension.title()}: {'⭐' * int(rating)} {rating}"
+                             + (f" ({events} event(s))" if events else " (as entered)"))
+                st.write(f"Overall: {'⭐' * int(vendor.rating_overall or 0)}")
+            
+            st.button("Close details", on_click=close_panel, args=('show_vendor_detail',))
+    
+    # Show documents popup
+    if st.session_state.get('show_vendor_docs') == vendor.id:
+        with st.expander(f"📎 Documents: {vendor.trade_name}", expanded=True):
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.markdown("**GST certificate**")
+                if vendor.doc_gst_certificate and os.path.exists(vendor.doc_gst_certificate):
+                    ext = vendor.doc_gst_certificate.split('.')[-1].lower()
+                    with open(vendor.doc_gst_certificate, 'rb') as f:
+                        file_bytes = f.read()
+                    if ext in ['jpg', 'jpeg', 'png']:
+                        st.image(file_bytes, width=200)
+                    else:
+                        b64 = base64.b64encode(file_bytes).decode()
+                        st.markdown(f'<a href="data:application/pdf;base64,{b64}" download="GST_Certificate.pdf">📥 Download GST certificate</a>', unsafe_allow_html=True)
                 else:
-                    st.button("📄 Download PDF", disabled=True, use_container_width=True)
-                    st.caption("Install reportlab for PDF")
+                    st.caption("Not uploaded")
             
-            # Show details popup
-            if st.session_state.get('show_vendor_detail') == vendor.id:
-                with st.expander(f"📋 Full details: {vendor.trade_name}", expanded=True):
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        st.markdown("**Company information**")
-                        st.write(f"Code: {vendor.vendor_code}")
-                        st.write(f"Legal name: {vendor.legal_name}")
-                        st.write(f"Trade name: {vendor.trade_name}")
-                        st.write(f"Type: {vendor.vendor_type}")
-                        st.write(f"Category: {vendor.vendor_category}")
-                        st.write(f"GSTIN: {vendor.gstin}")
-                        st.write(f"PAN: {vendor.pan}")
-                        if vendor.is_msme:
-                            st.write(f"MSME: {vendor.msme_number}")
-                    
-                    with col2:
-                        st.markdown("**Contact information**")
-                        st.write(f"Email: {vendor.company_email}")
-                        st.write(f"Phone: {vendor.company_phone}")
-                        st.write(f"Address: {vendor.address_line1}")
-                        st.write(f"City: {vendor.city}")
-                        st.write(f"State: {vendor.state}")
-                        st.write(f"PIN: {vendor.pin_code}")
-                        
-                        contacts = session.query(VendorContact).filter_by(vendor_id=vendor.id).all()
-                        if contacts:
-                            st.markdown("**Contact person**")
-                            for c in contacts:
-                                st.write(f"{c.name} ({c.designation})")
-                                st.write(f"📞 {c.mobile}")
-                    
-                    with col3:
-                        st.markdown("**Bank information**")
-                        st.write(f"Bank: {vendor.bank_name or 'Not provided'}")
-                        st.write(f"Branch: {vendor.bank_branch or '-'}")
-                        st.write(f"Account: {vendor.account_number or '-'}")
-                        st.write(f"IFSC: {vendor.ifsc_code or '-'}")
-                        st.write(f"Type: {vendor.account_type or '-'}")
-                        
-                        st.markdown("**Payment terms**")
-                        st.write(f"Terms: {vendor.payment_terms}")
-                        st.write(f"Credit days: {vendor.credit_days}")
-                        st.write(f"Credit limit: ₹{vendor.credit_limit:,.0f}" if vendor.credit_limit else "Not set")
-                        
-                        st.markdown("**Ratings**")
-                        st.write(f"Delivery: {'⭐' * int(vendor.rating_delivery or 0)}")
-                        st.write(f"Quality: {'⭐' * int(vendor.rating_quality or 0)}")
-                        st.write(f"Pricing: {'⭐' * int(vendor.rating_pricing or 0)}")
-                        st.write(f"Overall: {'⭐' * int(vendor.rating_overall or 0)}")
-                    
-                    if st.button("Close details"):
-                        st.session_state['show_vendor_detail'] = None
-                        st.rerun()
+            with col2:
+                st.markdown("**PAN card**")
+                if vendor.doc_pan_card and os.path.exists(vendor.doc_pan_card):
+                    ext = vendor.doc_pan_card.split('.')[-1].lower()
+                    with open(vendor.doc_pan_card, 'rb') as f:
+                        file_bytes = f.read()
+                    if ext in ['jpg', 'jpeg', 'png']:
+                        st.image(file_bytes, width=200)
+                    else:
+                        b64 = base64.b64encode(file_bytes).decode()
+                        st.markdown(f'<a href="data:application/pdf;base64,{b64}" download="PAN_Card.pdf">📥 Download PAN card</a>', unsafe_allow_html=True)
+                else:
+                    st.caption("Not uploaded")
             
-            # Show documents popup
-            if st.session_state.get('show_vendor_docs') == vendor.id:
-                with st.expander(f"📎 Documents: {vendor.trade_name}", expanded=True):
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        st.markdown("**GST certificate**")
-                        if vendor.doc_gst_certificate and os.path.exists(vendor.doc_gst_certificate):
-                            ext = vendor.doc_gst_certificate.split('.')[-1].lower()
-                            with open(vendor.doc_gst_certificate, 'rb') as f:
-                                file_bytes = f.read()
-                            if ext in ['jpg', 'jpeg', 'png']:
-                                st.image(file_bytes, width=200)
-                            else:
-                                b64 = base64.b64encode(file_bytes).decode()
-                                st.markdown(f'<a href="data:application/pdf;base64,{b64}" download="GST_Certificate.pdf">📥 Download GST certificate</a>', unsafe_allow_html=True)
-                        else:
-                            st.caption("Not uploaded")
-                    
-                    with col2:
-                        st.markdown("**PAN card**")
-                        if vendor.doc_pan_card and os.path.exists(vendor.doc_pan_card):
-                            ext = vendor.doc_pan_card.split('.')[-1].lower()
-                            with open(vendor.doc_pan_card, 'rb') as f:
-                                file_bytes = f.read()
-                            if ext in ['jpg', 'jpeg', 'png']:
-                                st.image(file_bytes, width=200)
-                            else:
-                                b64 = base64.b64encode(file_bytes).decode()
-                                st.markdown(f'<a href="data:application/pdf;base64,{b64}" download="PAN_Card.pdf">📥 Download PAN card</a>', unsafe_allow_html=True)
-                        else:
-                            st.caption("Not uploaded")
-                    
-                    with col3:
-                        st.markdown("**Bank document**")
-                        if vendor.doc_cancelled_cheque and os.path.exists(vendor.doc_cancelled_cheque):
-                            ext = vendor.doc_cancelled_cheque.split('.')[-1].lower()
-                            with open(vendor.doc_cancelled_cheque, 'rb') as f:
-                                file_bytes = f.read()
-                            if ext in ['jpg', 'jpeg', 'png']:
-                                st.image(file_bytes, width=200)
-                            else:
-                                b64 = base64.b64encode(file_bytes).decode()
-                                st.markdown(f'<a href="data:application/pdf;base64,{b64}" download="Bank_Document.pdf">📥 Download bank document</a>', unsafe_allow_html=True)
-                        else:
-                            st.caption("Not uploaded")
-                    
-                    if st.button("Close documents"):
-                        st.session_state['show_vendor_docs'] = None
-                        st.rerun()
+            with col3:
+                st.markdown("**Bank document**")
+                if vendor.doc_cancelled_cheque and os.path.exists(vendor.doc_cancelled_cheque):
+                    ext = vendor.doc_cancelled_cheque.split('.')[-1].lower()
+                    with open(vendor.doc_cancelled_cheque, 'rb') as f:
+                        file_bytes = f.read()
+                    if ext in ['jpg', 'jpeg', 'png']:
+                        st.image(file_bytes, width=200)
+                    else:
+                        b64 = base64.b64encode(file_bytes).decode()
+                        st.markdown(f'<a href="data:application/pdf;base64,{b64}" download="Bank_Document.pdf">📥 Download bank document</a>', unsafe_allow_html=True)
+                else:
+                    st.caption("Not uploaded")
+            
+            st.button("Close documents", on_click=close_panel, args=('show_vendor_docs',))
 
-    # Export all as CSV
-    if export_all:
-        csv = df.to_csv(index=False)
-        st.download_button(
-            "⬇️ Download CSV",
-            csv,
-            "vendors_export.csv",
-            "text/csv"
-        )
 
-else:
-    st.info("No vendors found. Register your first vendor to get started.")
+@st.fragment
+def render_archive():
+    """Search of archived vendors, with restore"""
+    with st.expander("🗄️ Archived vendors"):
+        restored = st.session_state.pop('vendor_restore_result', None)
+        if restored:
+            st.success(f"Restored {restored}. It is back in the list above as Inactive.")
+        
+        query = st.text_input("Search the archive", placeholder="Code, GSTIN, PAN or name...",
+                              key="archive_search")
+        with read_session() as session:
+            rows = search_archive(session, query)
+        if not rows:
+            st.caption("No archived vendors match" if query else "No vendors have been archived")
+            return
+        
+        st.dataframe(pd.DataFrame({
+            "Code": [r['vendor_code'] for r in rows],
+            "Vendor name": [r['trade_name'] or r['legal_name'] for r in rows],
+            "GSTIN": [r['gstin'] for r in rows],
+            "Category": [r['vendor_category'] for r in rows],
+            "City": [r['city'] for r in rows],
+            "Archived on": [r['archived_at'].strftime("%d-%m-%Y") for r in rows],
+        }), hide_index=True, use_container_width=True)
+        
+        if st.session_state.user['role'] not in EDIT_ROLES:
+            return
+        col1, col2 = st.columns([3, 1])
+        code = col1.selectbox("Vendor to restore", [r['vendor_code'] for r in rows], label_visibility="collapsed")
+        if col2.button("♻️ Restore", use_container_width=True):
+            try:
+                with write_session() as session:
+                    _, error = restore_vendor(session, code, st.session_state.user['id'])
+            except Exception as e:
+                st.error(f"Error: {e}")
+                return
+            if error:
+                st.error(error)
+                return
+            st.session_state['vendor_restore_result'] = code
+            st.cache_data.clear()
+            st.rerun()
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@st.fragment
+def render_document_export():
+    """ZIP of vendor documents with a manifest, for auditors"""
+    with st.expander("📦 Export documents for audit"):
+        col1, col2, col3 = st.columns(3)
+        category = col1.selectbox("Category", ["All"] + VENDOR_CATEGORIES, key="export_category")
+        year = col2.selectbox("Registered in financial year", ["All"] + financial_years(), key="export_year")
+        status = col3.selectbox("Status", ["All", "Active", "Inactive"], key="export_status")
+        
+        if st.button("📦 Build ZIP"):
+            filters = [None if value == "All" else value for value in (category, year, status)]
+            path = export_path(*filters[:2])
+            try:
+                with st.spinner("Packing documents..."):
+                    with read_session() as session:
+                        summary, error = export_documents(session, path, *filters)
+            except Exception as e:
+                st.error(f"Error: {e}")
+                return
+            if error:
+                st.error(error)
+                return
+            # Only this browser's latest export is kept
+            previous = st.session_state.get('document_export')
+            if previous and os.path.exists(previous[0]):
+                os.remove(previous[0])
+            st.session_state['document_export'] = (path, summary)
+        
+        export = st.session_state.get('document_export')
+        if not export or not os.path.exists(export[0]):
+            st.caption("GST, PAN, bank and MSME documents of the matching vendors (archived ones too), "
+                       "with manifest.csv listing every file and its SHA-256")
+            return
+        path, summary = export
+        st.success(f"{summary['files']:,} document(s) of {summary['vendors']:,} vendor(s), "
+                   f"{summary['bytes'] / 1e6:,.1f} MB")
+        if summary['missing']:
+            st.warning(f"{summary['missing']:,} document(s) were not found on disk; they are listed in manifest.csv")
+        if os.path.getsize(path) <= EXPORT_DOWNLOAD_MB * 1e6:
+            # Read from disk only when the button is clicked
+            st.download_button("⬇️ Download ZIP", lambda: _read_file(path), os.path.basename(path),
+                               "application/zip")
+        else:
+            st.info(f"Too large to download in the browser. Saved on the server as {os.path.abspath(path)}")
 
-session.close()
+
+# ============ MAIN ============
+st.title("📚 Vendor Library")
+
+render_stats()
+
+st.markdown("---")
+
+# Display with horizontal scroll
+st.markdown("""
+<style>
+.vendor-table-container {
+    width: 100%;
+    overflow-x: auto;
+    margin: 10px 0;
+}
+.vendor-table-container table {
+    width: max-content;
+    min-width: 100%;
+}
+</style>
+""", unsafe_allow_html=True)
+
+render_vendor_grid()
+
+render_archive()
+
+render_document_export()
+
+st.markdown("---")
+
+render_vendor_actions()
 
 st.markdown("---")
 st.caption("💡 Tip: Scroll the table horizontally to see all columns. Select a vendor below for more actions.")
+
+render_query_panel()
+page_finished()
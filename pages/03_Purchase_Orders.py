@@ -0,0 +1,227 @@
+"""
+Purchase Orders - Raise POs against vendors and browse the PO register
+"""
+
+import streamlit as st
+import pandas as pd
+from datetime import date
+from database import read_session, write_session
+from purchase_orders import (GST_RATES, PAGE_SIZE, PO_STATUSES, USER_TRANSITIONS, create_purchase_order,
+                             line_amount, list_purchase_orders, pending_po_count, po_lines, set_po_status)
+from vendor_search import lookup_vendors
+from auth import check_login
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started
+from config import get_financial_year
+
+st.set_page_config(page_title="Purchase Orders", page_icon="🧾", layout="wide")
+
+track_page("Purchase Orders")
+page_started("Purchase Orders")
+
+# Check login
+if not check_login():
+    st.error("Please login to access this module")
+    st.stop()
+
+user_role = st.session_state.user['role']
+if user_role not in ["Purchase", "Accounts", "Management"]:
+    st.error("Access denied. You don't have permission to access this module.")
+    st.stop()
+
+# Accounts can view the register; raising and closing POs is for Purchase and Management
+can_edit = user_role in ["Purchase", "Management"]
+
+UNITS = ["Nos", "MT", "Kg", "Bag", "Cum", "Sqm", "Rmt", "Ltr", "Set", "Job"]
+VENDOR_PICKER_LIMIT = 20
+
+LINE_COLUMNS = {
+    "item_code": st.column_config.TextColumn("Item code", width="small"),
+    "description": st.column_config.TextColumn("Description", width="large", required=True),
+    "unit": st.column_config.SelectboxColumn("Unit", options=UNITS, width="small"),
+    "quantity": st.column_config.NumberColumn("Quantity", min_value=0.0, format="%.3f"),
+    "rate": st.column_config.NumberColumn("Rate (₹)", min_value=0.0, format="%.2f"),
+    "gst_rate": st.column_config.SelectboxColumn("GST %", options=GST_RATES, default=18.0, width="small"),
+}
+
+
+def empty_lines():
+    """Blank line editor contents"""
+    return pd.DataFrame({
+        "item_code": pd.Series(dtype="str"),
+        "description": pd.Series(dtype="str"),
+        "unit": pd.Series(dtype="str"),
+        "quantity": pd.Series(dtype="float"),
+        "rate": pd.Series(dtype="float"),
+        "gst_rate": pd.Series(dtype="float"),
+    })
+
+
+def editor_lines(df):
+    """Line editor rows as dicts, with empty cells as None"""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+# ============ NEW PO ============
+@st.fragment
+def render_new_po():
+    """Vendor picker, line editor and PO creation"""
+    created = st.session_state.pop('po_created', None)
+    if created:
+        st.success(f"Purchase order {created} created")
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        query = st.text_input("Vendor", placeholder="Type vendor code, GSTIN or name...")
+    matches = []
+    if query:
+        with read_session() as session:
+            matches = lookup_vendors(session, query, limit=VENDOR_PICKER_LIMIT)
+    labels = dict(matches)
+    with col2:
+        vendor_id = st.selectbox("Select vendor", options=list(labels), format_func=labels.get,
+                                 placeholder="Search for a vendor first")
+    if query and not matches:
+        st.caption("No vendors match your search")
+
+    col1, col2, col3 = st.columns(3)
+    po_date = col1.date_input("PO date", value=date.today(), format="DD-MM-YYYY")
+    delivery_date = col2.date_input("Delivery by", value=None, format="DD-MM-YYYY")
+    delivery_site = col3.text_input("Delivery site", placeholder="Site or store name")
+
+    version = st.session_state.get('po_editor_version', 0)
+    lines = st.data_editor(empty_lines(), key=f"po_lines_{version}", num_rows="dynamic",
+                           column_config=LINE_COLUMNS, hide_index=True, use_container_width=True)
+    remarks = st.text_area("Remarks", height=80)
+
+    rows = editor_lines(lines)
+    total = sum(line_amount(r["quantity"] or 0, r["rate"] or 0, r["gst_rate"]) for r in rows)
+    st.markdown(f"**Total including GST: ₹{total:,.2f}**")
+
+    if not st.button("🧾 Create purchase order", type="primary", disabled=not vendor_id):
+        return
+    try:
+        with write_session() as session:
+            purchase_order, error = create_purchase_order(
+                session, vendor_id, rows, st.session_state.user['id'], po_date=po_date,
+                delivery_date=delivery_date, delivery_site=delivery_site.strip(), remarks=remarks.strip())
+            number = purchase_order.po_number if purchase_order else None
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        st.error(error)
+        return
+
+    st.session_state['po_created'] = number
+    st.session_state['po_editor_version'] = version + 1
+    st.rerun()
+
+
+# ============ PO REGISTER ============
+@st.fragment
+def render_po_register():
+    """Keyset-paginated PO list with lines and status changes"""
+    col1, col2 = st.columns([1, 3])
+    status = col1.selectbox("Status", ["All"] + PO_STATUSES)
+    status = None if status == "All" else status
+
+    # Stack of page keys; a new filter starts again from the newest PO
+    if 'po_pages' not in st.session_state or st.session_state.get('po_filter') != status:
+        st.session_state['po_filter'] = status
+        st.session_state['po_pages'] = [None]
+    pages = st.session_state['po_pages']
+
+    with read_session() as session:
+        rows, next_key = list_purchase_orders(session, status=status, before=pages[-1])
+
+    if not rows:
+        st.info("No purchase orders yet" if not status else f"No {status.lower()} purchase orders")
+        return
+
+    st.dataframe(
+        pd.DataFrame([{
+            "PO number": r.po_number,
+            "Date": r.po_date.strftime("%d-%m-%Y"),
+            "Vendor": f"{r.vendor_code} - {r.vendor_name}",
+            "Site": r.delivery_site or "-",
+            "Amount": f"₹{r.total_amount:,.2f}",
+            "Status": r.status,
+        } for r in rows]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    if col1.button("◀ Newer", disabled=len(pages) == 1, use_container_width=True):
+        pages.pop()
+        st.rerun(scope="fragment")
+    if col2.button("Older ▶", disabled=next_key is None, use_container_width=True):
+        pages.append(next_key)
+        st.rerun(scope="fragment")
+    col3.caption(f"Page {len(pages)} · {PAGE_SIZE} per page")
+
+    labels = {r.id: f"{r.po_number} - {r.vendor_name}" for r in rows}
+    po_id = st.selectbox("Purchase order", options=list(labels), format_func=labels.get, index=None,
+                         placeholder="Select a PO to see its lines...")
+    if po_id is None:
+        return
+    po = next(r for r in rows if r.id == po_id)
+
+    with read_session() as session:
+        lines = po_lines(session, po_id)
+    st.dataframe(
+        pd.DataFrame([{
+            "#": l.line_no,
+            "Item code": l.item_code or "-",
+            "Description": l.description,
+            "Unit": l.unit or "-",
+            "Quantity": l.quantity,
+            "Received": l.received_quantity or 0,
+            "Rate": f"₹{l.rate:,.2f}",
+            "GST %": l.gst_rate,
+            "Amount": f"₹{l.amount:,.2f}",
+        } for l in lines]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    if not can_edit or not USER_TRANSITIONS.get(po.status):
+        return
+    columns = st.columns(len(USER_TRANSITIONS[po.status]) + 3)
+    for column, new_status in zip(columns, sorted(USER_TRANSITIONS[po.status])):
+        if column.button(f"Mark {new_status.lower()}", key=f"po_{po_id}_{new_status}", use_container_width=True):
+            try:
+                with write_session() as session:
+                    old_status, error = set_po_status(session, po_id, new_status, st.session_state.user['id'])
+            except Exception as e:
+                error = f"Error: {e}"
+            if error:
+                st.error(error)
+            else:
+                st.rerun()
+
+
+# ============ MAIN ============
+st.title("🧾 Purchase Orders")
+
+with read_session() as session:
+    pending = pending_po_count(session)
+
+col1, col2 = st.columns(2)
+col1.metric("Pending POs", pending)
+col2.metric("Financial year", get_financial_year())
+
+st.markdown("---")
+
+if can_edit:
+    new_tab, register_tab = st.tabs(["New purchase order", "PO register"])
+    with new_tab:
+        render_new_po()
+    with register_tab:
+        render_po_register()
+else:
+    render_po_register()
+
+render_query_panel()
+page_finished()
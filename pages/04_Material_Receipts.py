@@ -0,0 +1,248 @@
+"""
+Material Receipts - Post MRVs against purchase orders, one at a time or from a batch file
+"""
+
+import io
+import streamlit as st
+import pandas as pd
+from datetime import date
+from database import read_session, write_session
+from material_receipts import (CSV_COLUMNS, find_pending_pos, list_receipts, pending_lines, post_receipt,
+                               post_receipt_batch, read_receipt_csv, receipt_lines, receipt_totals)
+from purchase_orders import PAGE_SIZE
+from auth import check_login
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started, timed
+
+st.set_page_config(page_title="Material Receipts", page_icon="📦", layout="wide")
+
+track_page("Material Receipts")
+page_started("Material Receipts")
+
+# Check login
+if not check_login():
+    st.error("Please login to access this module")
+    st.stop()
+
+user_role = st.session_state.user['role']
+if user_role not in ["Stores", "Purchase", "Accounts", "Management"]:
+    st.error("Access denied. You don't have permission to access this module.")
+    st.stop()
+
+# Purchase and Accounts follow receipts; posting them is for Stores and Management
+can_post = user_role in ["Stores", "Management"]
+
+PO_PICKER_LIMIT = 20
+
+TEMPLATE_CSV = ",".join(CSV_COLUMNS) + "\nPBL/PO/2026-27/00001,1,12.5,0.5,15-10-2026,DC-4411,MH12AB1234,Site A,\n"
+
+
+# ============ NEW RECEIPT ============
+@st.fragment
+def render_new_receipt():
+    """PO picker, pending lines with the quantity received, and posting"""
+    posted = st.session_state.pop('mrv_posted', None)
+    if posted:
+        st.success(f"{posted} posted")
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        query = st.text_input("Purchase order", placeholder="Type part of the PO number...")
+    matches = []
+    if query:
+        with read_session() as session:
+            matches = find_pending_pos(session, query, limit=PO_PICKER_LIMIT)
+    labels = dict(matches)
+    with col2:
+        po_id = st.selectbox("Select PO", options=list(labels), format_func=labels.get,
+                             placeholder="Search for a pending PO first")
+    if query and not matches:
+        st.caption("No pending POs match your search")
+    if not po_id:
+        return
+
+    with read_session() as session:
+        lines = pending_lines(session, po_id)
+    version = st.session_state.get('mrv_editor_version', 0)
+    edited = st.data_editor(
+        pd.DataFrame([{
+            "line_no": l.line_no,
+            "description": l.description,
+            "unit": l.unit or "",
+            "ordered": l.quantity,
+            "received_so_far": l.received_quantity,
+            "pending": max(l.quantity - l.received_quantity, 0),
+            "receive_now": 0.0,
+            "rejected": 0.0,
+        } for l in lines]),
+        key=f"mrv_lines_{po_id}_{version}",
+        column_config={
+            "line_no": st.column_config.NumberColumn("#", width="small"),
+            "description": st.column_config.TextColumn("Description", width="large"),
+            "unit": st.column_config.TextColumn("Unit", width="small"),
+            "ordered": st.column_config.NumberColumn("Ordered", format="%.3f"),
+            "received_so_far": st.column_config.NumberColumn("Received so far", format="%.3f"),
+            "pending": st.column_config.NumberColumn("Pending", format="%.3f"),
+            "receive_now": st.column_config.NumberColumn("Accepted", min_value=0.0, format="%.3f"),
+            "rejected": st.column_config.NumberColumn("Rejected", min_value=0.0, format="%.3f",
+                                                      help="Sent back at the gate; not added to stock"),
+        },
+        disabled=["line_no", "description", "unit", "ordered", "received_so_far", "pending"],
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    col1, col2, col3, col4 = st.columns(4)
+    receipt_date = col1.date_input("Receipt date", value=date.today(), max_value=date.today(), format="DD-MM-YYYY")
+    challan_number = col2.text_input("Delivery challan no.")
+    vehicle_number = col3.text_input("Vehicle no.")
+    site = col4.text_input("Site", placeholder="Defaults to the PO delivery site")
+    remarks = st.text_area("Remarks", height=80)
+
+    if not st.button("📦 Post receipt", type="primary"):
+        return
+    received = [{"line_no": int(row["line_no"]), "quantity": row["receive_now"], "rejected": row["rejected"]}
+                for row in edited.to_dict("records") if row["receive_now"] or row["rejected"]]
+    try:
+        with write_session() as session:
+            receipt, error = post_receipt(
+                session, po_id, received, st.session_state.user['id'], receipt_date=receipt_date,
+                site=site.strip(), challan_number=challan_number.strip(),
+                vehicle_number=vehicle_number.strip().upper(), remarks=remarks.strip())
+            number = receipt.mrv_number if receipt else None
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        st.error(error)
+        return
+
+    st.session_state['mrv_posted'] = number
+    st.session_state['mrv_editor_version'] = version + 1
+    st.rerun()
+
+
+# ============ BATCH UPLOAD ============
+def render_batch_upload():
+    """Post a shift's receipts from a CSV file or scanner export"""
+    st.caption("One row per PO line received. Rows with the same PO number, challan, date and site "
+               "become one MRV. Dates are DD-MM-YYYY; an empty date means today.")
+    st.download_button("⬇️ Download template", TEMPLATE_CSV, "mrv_upload_template.csv", "text/csv")
+
+    version = st.session_state.get('mrv_upload_version', 0)
+    upload = st.file_uploader("Receipts file", type=["csv", "txt"], key=f"mrv_upload_{version}")
+    result = st.session_state.pop('mrv_batch_result', None)
+    if result:
+        posted, problems = result
+        st.success(f"{len(posted)} receipt(s) posted" + (f": {', '.join(posted[:10])}" if posted else ""))
+        for problem in problems:
+            st.warning(problem)
+    if upload is None:
+        return
+
+    receipts, problems = read_receipt_csv(io.StringIO(upload.getvalue().decode("utf-8-sig", errors="replace")))
+    st.write(f"{len(receipts)} receipt(s) with {sum(len(r['lines']) for r in receipts)} line(s) in the file")
+    for problem in problems:
+        st.warning(problem)
+    if not receipts:
+        return
+
+    if st.button("📦 Post all receipts", type="primary"):
+        try:
+            with timed("mrv_batch_upload"), write_session() as session:
+                posted, posting_problems = post_receipt_batch(session, receipts, st.session_state.user['id'])
+        except Exception as e:
+            st.error(f"Error: {e}")
+            return
+        st.session_state['mrv_batch_result'] = (posted, problems + posting_problems)
+        st.session_state['mrv_upload_version'] = version + 1
+        st.rerun()
+
+
+# ============ RECEIPTS ============
+@st.fragment
+def render_receipts():
+    """Keyset-paginated MRV list with lines"""
+    if 'mrv_pages' not in st.session_state:
+        st.session_state['mrv_pages'] = [None]
+    pages = st.session_state['mrv_pages']
+
+    with read_session() as session:
+        rows, next_key = list_receipts(session, before=pages[-1])
+
+    if not rows:
+        st.info("No material receipts yet")
+        return
+
+    st.dataframe(
+        pd.DataFrame([{
+            "MRV number": r.mrv_number,
+            "Date": r.receipt_date.strftime("%d-%m-%Y"),
+            "PO number": r.po_number,
+            "Vendor": r.vendor_name,
+            "Site": r.site or "-",
+            "Challan": r.challan_number or "-",
+            "Vehicle": r.vehicle_number or "-",
+            "Value": f"₹{r.total_amount:,.2f}",
+        } for r in rows]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    if col1.button("◀ Newer", key="mrv_newer", disabled=len(pages) == 1, use_container_width=True):
+        pages.pop()
+        st.rerun(scope="fragment")
+    if col2.button("Older ▶", key="mrv_older", disabled=next_key is None, use_container_width=True):
+        pages.append(next_key)
+        st.rerun(scope="fragment")
+    col3.caption(f"Page {len(pages)} · {PAGE_SIZE} per page")
+
+    labels = {r.id: f"{r.mrv_number} - {r.vendor_name}" for r in rows}
+    mrv_id = st.selectbox("Receipt", options=list(labels), format_func=labels.get, index=None,
+                          placeholder="Select an MRV to see its lines...")
+    if mrv_id is None:
+        return
+    with read_session() as session:
+        lines = receipt_lines(session, mrv_id)
+    st.dataframe(
+        pd.DataFrame([{
+            "#": l.line_no,
+            "Item code": l.item_code or "-",
+            "Description": l.description,
+            "Unit": l.unit or "-",
+            "Quantity": l.quantity,
+            "Rejected": l.rejected_quantity or 0,
+            "Rate": f"₹{l.rate:,.2f}",
+            "Amount": f"₹{l.amount:,.2f}",
+        } for l in lines]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+
+# ============ MAIN ============
+st.title("📦 Material Receipts")
+
+with read_session() as session:
+    today_count, today_value = receipt_totals(session)
+
+col1, col2 = st.columns(2)
+col1.metric("Today's MRVs", today_count)
+col2.metric("Received today", f"₹{today_value:,.2f}")
+
+st.markdown("---")
+
+if can_post:
+    new_tab, batch_tab, list_tab = st.tabs(["New receipt", "Batch upload", "Receipts"])
+    with new_tab:
+        render_new_receipt()
+    with batch_tab:
+        render_batch_upload()
+    with list_tab:
+        render_receipts()
+else:
+    render_receipts()
+
+render_query_panel()
+page_finished()
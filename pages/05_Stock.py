@@ -0,0 +1,208 @@
+"""
+Stock - Balances per item and site, material issues, transfers and the item ledger
+"""
+
+import streamlit as st
+import pandas as pd
+from datetime import date
+from database import read_session, write_session
+from stock import (balances_as_of, closed_until, issue_stock, item_movements, list_balances, quantity_text,
+                   stock_balance, stock_sites, transfer_stock)
+from auth import check_login
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started
+
+st.set_page_config(page_title="Stock", page_icon="🏗️", layout="wide")
+
+track_page("Stock")
+page_started("Stock")
+
+# Check login
+if not check_login():
+    st.error("Please login to access this module")
+    st.stop()
+
+user_role = st.session_state.user['role']
+if user_role not in ["Stores", "Purchase", "Accounts", "Management"]:
+    st.error("Access denied. You don't have permission to access this module.")
+    st.stop()
+
+# Issues and transfers are for Stores and Management; the others can look up stock
+can_move = user_role in ["Stores", "Management"]
+
+
+def site_items(site):
+    """{item_code: "item_code (balance)"} of items in stock at a site"""
+    with read_session() as session:
+        balances = list_balances(session, site=site)
+    return {b.item_code: f"{b.item_code} ({quantity_text(b.quantity, b.unit)})" for b in balances if b.quantity > 0}
+
+
+# ============ BALANCES ============
+@st.fragment
+def render_balances(sites):
+    """Current balances, or balances as of an earlier date"""
+    col1, col2, col3 = st.columns([1, 1, 1])
+    site = col1.selectbox("Site", ["All sites"] + sites, key="balance_site")
+    site = None if site == "All sites" else site
+    item = col2.text_input("Item code", placeholder="Part of an item code...")
+    as_of = col3.date_input("As of", value=None, max_value=date.today(), format="DD-MM-YYYY",
+                            help="Leave empty for the current balance")
+
+    with read_session() as session:
+        if as_of:
+            balances = [(item_code, item_site, quantity, unit)
+                        for (item_code, item_site), (quantity, unit) in balances_as_of(session, as_of, site).items()
+                        if quantity and (not item or item.strip().upper() in item_code)]
+            balances.sort(key=lambda b: (b[1], b[0]))
+        else:
+            balances = [(b.item_code, b.site, b.quantity, b.unit) for b in list_balances(session, site, item)]
+
+    if not balances:
+        st.info("No stock" + (f" on {as_of.strftime('%d-%m-%Y')}" if as_of else ""))
+        return
+    st.dataframe(
+        pd.DataFrame([{"Site": s, "Item code": i, "Quantity": q, "Unit": u or "-"} for i, s, q, u in balances]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+
+# ============ ISSUE ============
+def render_issue(sites):
+    """Issue material from a site to work"""
+    result = st.session_state.pop('stock_issue_result', None)
+    if result:
+        st.success(result)
+    site = st.selectbox("From site", sites, key="issue_site")
+    items = site_items(site) if site else {}
+    if not items:
+        st.info("Nothing in stock at this site")
+        return
+    with st.form("issue_form", clear_on_submit=True):
+        item_code = st.selectbox("Item", list(items), format_func=items.get)
+        col1, col2 = st.columns(2)
+        quantity = col1.number_input("Quantity", min_value=0.0, format="%.3f")
+        issue_date = col2.date_input("Issue date", value=date.today(), max_value=date.today(), format="DD-MM-YYYY")
+        issued_to = st.text_input("Issued to", placeholder="Contractor, work area or floor")
+        remarks = st.text_input("Remarks")
+        submitted = st.form_submit_button("Issue material", type="primary")
+    if not submitted:
+        return
+    try:
+        with write_session() as session:
+            reference, error = issue_stock(session, item_code, site, quantity, st.session_state.user['id'],
+                                           movement_date=issue_date, issued_to=issued_to.strip(),
+                                           remarks=remarks.strip())
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        st.error(error)
+        return
+    st.session_state['stock_issue_result'] = f"{reference}: {quantity:g} of {item_code} issued from {site}"
+    st.rerun()
+
+
+# ============ TRANSFER ============
+def render_transfer(sites):
+    """Move material from one site to another"""
+    result = st.session_state.pop('stock_transfer_result', None)
+    if result:
+        st.success(result)
+    from_site = st.selectbox("From site", sites, key="transfer_site")
+    items = site_items(from_site) if from_site else {}
+    if not items:
+        st.info("Nothing in stock at this site")
+        return
+    with st.form("transfer_form", clear_on_submit=True):
+        item_code = st.selectbox("Item", list(items), format_func=items.get)
+        col1, col2, col3 = st.columns(3)
+        to_site = col1.text_input("To site", placeholder="Existing or new site name")
+        quantity = col2.number_input("Quantity", min_value=0.0, format="%.3f")
+        transfer_date = col3.date_input("Transfer date", value=date.today(), max_value=date.today(),
+                                        format="DD-MM-YYYY")
+        remarks = st.text_input("Remarks", placeholder="Vehicle, challan...")
+        submitted = st.form_submit_button("Transfer material", type="primary")
+    if not submitted:
+        return
+    try:
+        with write_session() as session:
+            reference, error = transfer_stock(session, item_code, from_site, to_site.strip(), quantity,
+                                              st.session_state.user['id'], movement_date=transfer_date,
+                                              remarks=remarks.strip())
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        st.error(error)
+        return
+    st.session_state['stock_transfer_result'] = (f"{reference}: {quantity:g} of {item_code} moved from "
+                                                 f"{from_site} to {to_site.strip()}")
+    st.rerun()
+
+
+# ============ ITEM LEDGER ============
+@st.fragment
+def render_ledger(sites):
+    """Latest movements of one item at one site"""
+    col1, col2 = st.columns(2)
+    site = col1.selectbox("Site", sites, key="ledger_site")
+    item_code = col2.text_input("Item code", key="ledger_item").strip().upper()
+    if not site or not item_code:
+        return
+    with read_session() as session:
+        balance = stock_balance(session, item_code, site)
+        movements = item_movements(session, item_code, site)
+    st.metric("Balance", f"{balance:g}")
+    if not movements:
+        st.info(f"No movements of {item_code} at {site}")
+        return
+    st.dataframe(
+        pd.DataFrame([{
+            "Date": m.movement_date.strftime("%d-%m-%Y"),
+            "Type": m.movement_type.replace("_", " ").title(),
+            "Quantity": m.quantity,
+            "Unit": m.unit or "-",
+            "Reference": m.reference or "-",
+            "Remarks": m.remarks or "",
+        } for m in movements]),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+
+# ============ MAIN ============
+st.title("🏗️ Stock")
+
+with read_session() as session:
+    sites = stock_sites(session)
+    closed = closed_until(session)
+
+col1, col2 = st.columns(2)
+col1.metric("Sites with stock", len(sites))
+col2.metric("Closed up to", closed.strftime("%d-%m-%Y") if closed else "-")
+
+st.markdown("---")
+
+if not sites:
+    st.info("No stock yet. Stock is added when material receipts are posted against PO lines with an item code.")
+elif can_move:
+    balance_tab, issue_tab, transfer_tab, ledger_tab = st.tabs(["Balances", "Issue", "Transfer", "Item ledger"])
+    with balance_tab:
+        render_balances(sites)
+    with issue_tab:
+        render_issue(sites)
+    with transfer_tab:
+        render_transfer(sites)
+    with ledger_tab:
+        render_ledger(sites)
+else:
+    balance_tab, ledger_tab = st.tabs(["Balances", "Item ledger"])
+    with balance_tab:
+        render_balances(sites)
+    with ledger_tab:
+        render_ledger(sites)
+
+render_query_panel()
+page_finished()
@@ -0,0 +1,253 @@
+"""
+Payables - Vendor ageing, invoices due for payment, and recording vendor invoices and payments
+"""
+
+import streamlit as st
+import pandas as pd
+from datetime import date
+from database import read_session, write_session
+from payables import (AGEING_BUCKETS, DUE_SOON_DAYS, PAYMENT_MODES, ageing_report, invoice_numbers, open_invoices,
+                      record_invoice, record_payment)
+from vendor_search import lookup_vendors
+from auth import check_login
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started
+
+st.set_page_config(page_title="Payables", page_icon="💰", layout="wide")
+
+track_page("Payables")
+page_started("Payables")
+
+# Check login
+if not check_login():
+    st.error("Please login to access this module")
+    st.stop()
+
+user_role = st.session_state.user['role']
+if user_role not in ["Purchase", "Accounts", "Management"]:
+    st.error("Access denied. You don't have permission to access this module.")
+    st.stop()
+
+# Purchase can view the ageing; recording invoices and payments is for Accounts and Management
+can_record = user_role in ["Accounts", "Management"]
+
+VENDOR_PICKER_LIMIT = 20
+# Rows shown in the on-screen tables; the CSV download has all of them
+DISPLAY_ROWS = 500
+
+
+def rupees(amount):
+    """₹ amount in lakh for the metrics"""
+    return f"₹{amount / 100_000:,.2f} L"
+
+
+def pick_vendor(key):
+    """Vendor typeahead. Returns the selected vendor id or None."""
+    col1, col2 = st.columns([1, 2])
+    query = col1.text_input("Vendor", placeholder="Type vendor code, GSTIN or name...", key=f"{key}_query")
+    matches = []
+    if query:
+        with read_session() as session:
+            matches = lookup_vendors(session, query, limit=VENDOR_PICKER_LIMIT)
+    labels = dict(matches)
+    # Keyed by the search text so that every new search starts at its first match
+    vendor_id = col2.selectbox("Select vendor", options=list(labels), format_func=labels.get,
+                               placeholder="Search for a vendor first", key=f"{key}_vendor_{query}")
+    if query and not matches:
+        st.caption("No vendors match your search")
+    return vendor_id
+
+
+# ============ VENDOR AGEING ============
+@st.fragment
+def render_ageing(report):
+    """Outstanding per vendor by age bucket, largest first"""
+    vendors = report["vendors"]
+    col1, col2 = st.columns([2, 1])
+    search = col1.text_input("Filter", placeholder="Vendor code or name...", key="ageing_filter")
+    over_limit = col2.checkbox("Only vendors over their credit limit")
+    if search:
+        text = search.strip().upper()
+        vendors = vendors[vendors["vendor_code"].str.upper().str.contains(text, regex=False)
+                          | vendors["vendor_name"].fillna("").str.upper().str.contains(text, regex=False)]
+    if over_limit:
+        vendors = vendors[vendors["utilization"] > 1]
+    if vendors.empty:
+        st.info("No vendors match")
+        return
+
+    shown = vendors.head(DISPLAY_ROWS)
+    st.dataframe(
+        pd.DataFrame({
+            "Vendor code": shown["vendor_code"],
+            "Vendor name": shown["vendor_name"].fillna("-"),
+            "Terms": shown["payment_terms"].fillna("-"),
+            "Invoices": shown["invoices"],
+            "Outstanding (₹)": shown["outstanding"],
+            **{f"{name} days (₹)": shown[name] for name in AGEING_BUCKETS},
+            "Overdue (₹)": shown["overdue"],
+            "Credit used": shown["utilization"] * 100,
+        }),
+        column_config={"Credit used": st.column_config.NumberColumn(format="%.0f%%")},
+        hide_index=True,
+        use_container_width=True,
+    )
+    if len(vendors) > DISPLAY_ROWS:
+        st.caption(f"Showing the top {DISPLAY_ROWS:,} of {len(vendors):,} vendors; the download has all of them")
+    st.download_button("Download ageing CSV", vendors.to_csv(index=False).encode("utf-8"),
+                       file_name=f"vendor_ageing_{report['as_of'].isoformat()}.csv", mime="text/csv")
+
+
+# ============ DUE FOR PAYMENT ============
+@st.fragment
+def render_due(report):
+    """Invoices overdue or falling due soon, earliest due first"""
+    due = report["due"]
+    only_overdue = st.checkbox("Only overdue invoices")
+    if only_overdue:
+        due = due[due["days_overdue"] > 0]
+    if due.empty:
+        st.info("Nothing due")
+        return
+
+    shown = due.head(DISPLAY_ROWS)
+    with read_session() as session:
+        numbers = invoice_numbers(session, shown["invoice_id"])
+    st.dataframe(
+        pd.DataFrame({
+            "Vendor code": shown["vendor_code"],
+            "Invoice no.": shown["invoice_id"].map(numbers),
+            "Invoice date": pd.to_datetime(shown["invoice_date"]).dt.strftime("%d-%m-%Y"),
+            "Due date": pd.to_datetime(shown["due_date"]).dt.strftime("%d-%m-%Y"),
+            "Days overdue": shown["days_overdue"].clip(lower=0),
+            "Outstanding (₹)": shown["outstanding"],
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+    if len(due) > DISPLAY_ROWS:
+        st.caption(f"Showing the first {DISPLAY_ROWS:,} of {len(due):,} invoices")
+
+
+# ============ RECORD INVOICE ============
+def render_record_invoice():
+    """Record a vendor's invoice"""
+    result = st.session_state.pop('payables_invoice_result', None)
+    if result:
+        st.success(result)
+    vendor_id = pick_vendor("invoice")
+    with st.form("invoice_form", clear_on_submit=True):
+        col1, col2, col3 = st.columns(3)
+        invoice_number = col1.text_input("Invoice number *")
+        invoice_date = col2.date_input("Invoice date", value=date.today(), max_value=date.today(),
+                                       format="DD-MM-YYYY")
+        due_date = col3.date_input("Due date", value=None, format="DD-MM-YYYY",
+                                   help="Leave empty to use the vendor's payment terms")
+        amount = st.number_input("Amount (₹) *", min_value=0.0, format="%.2f")
+        remarks = st.text_input("Remarks")
+        submitted = st.form_submit_button("Record invoice", type="primary")
+    if not submitted:
+        return
+    if not vendor_id:
+        st.error("Select a vendor first")
+        return
+    try:
+        with write_session() as session:
+            invoice, error = record_invoice(session, vendor_id, invoice_number, invoice_date, amount,
+                                            st.session_state.user['id'], due_date=due_date,
+                                            remarks=remarks.strip())
+            if not error:
+                message = f"Invoice {invoice.invoice_number} for ₹{invoice.amount:,.2f} recorded"
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        st.error(error)
+        return
+    st.session_state['payables_invoice_result'] = message
+    st.rerun()
+
+
+# ============ RECORD PAYMENT ============
+def render_record_payment():
+    """Record a payment to a vendor against their open invoices"""
+    result = st.session_state.pop('payables_payment_result', None)
+    if result:
+        st.success(result)
+    vendor_id = pick_vendor("payment")
+    if not vendor_id:
+        return
+    with read_session() as session:
+        invoices = open_invoices(session, vendor_id)
+    if not invoices:
+        st.info("No open invoices for this vendor")
+        return
+    labels = {i.id: f"{i.invoice_number} of {i.invoice_date.strftime('%d-%m-%Y')} "
+                    f"(₹{i.amount - i.paid_amount:,.2f} open)" for i in invoices}
+    st.caption(f"{len(invoices)} open invoice(s), ₹{sum(i.amount - i.paid_amount for i in invoices):,.2f} outstanding")
+
+    with st.form("payment_form", clear_on_submit=True):
+        invoice_ids = st.multiselect("Against invoices", list(labels), format_func=labels.get,
+                                     help="Leave empty to settle the oldest invoices first")
+        col1, col2, col3 = st.columns(3)
+        amount = col1.number_input("Amount (₹) *", min_value=0.0, format="%.2f")
+        payment_date = col2.date_input("Payment date", value=date.today(), max_value=date.today(),
+                                       format="DD-MM-YYYY")
+        mode = col3.selectbox("Mode", PAYMENT_MODES)
+        reference = st.text_input("Reference", placeholder="UTR or cheque number")
+        remarks = st.text_input("Remarks")
+        submitted = st.form_submit_button("Record payment", type="primary")
+    if not submitted:
+        return
+    try:
+        with write_session() as session:
+            payment, error = record_payment(session, vendor_id, amount, st.session_state.user['id'],
+                                            payment_date=payment_date, mode=mode, reference=reference.strip(),
+                                            invoice_ids=invoice_ids, remarks=remarks.strip())
+    except Exception as e:
+        st.error(f"Error: {e}")
+        return
+    if error:
+        st.error(error)
+        return
+    st.session_state['payables_payment_result'] = f"Payment of ₹{amount:,.2f} recorded"
+    st.rerun()
+
+
+# ============ MAIN ============
+st.title("💰 Payables")
+
+report = ageing_report()
+totals = report["totals"]
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Outstanding", rupees(totals["outstanding"]), help=f"{totals['invoices']:,} open invoices")
+col2.metric("Overdue", rupees(totals["overdue"]))
+col3.metric(f"Due in {DUE_SOON_DAYS} days", rupees(totals["due_soon"]))
+col4.metric("Vendors over credit limit", totals["over_limit"])
+st.caption(" · ".join(f"{name} days: {rupees(totals[name])}" for name in AGEING_BUCKETS)
+           + f" · as of {report['as_of'].strftime('%d-%m-%Y')}")
+
+st.markdown("---")
+
+if can_record:
+    ageing_tab, due_tab, invoice_tab, payment_tab = st.tabs(
+        ["Vendor ageing", "Due for payment", "Record invoice", "Record payment"])
+    with invoice_tab:
+        render_record_invoice()
+    with payment_tab:
+        render_record_payment()
+else:
+    ageing_tab, due_tab = st.tabs(["Vendor ageing", "Due for payment"])
+
+if not totals["invoices"]:
+    with ageing_tab:
+        st.info("No open vendor invoices")
+else:
+    with ageing_tab:
+        render_ageing(report)
+    with due_tab:
+        render_due(report)
+
+render_query_panel()
+page_finished()
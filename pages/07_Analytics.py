@@ -0,0 +1,119 @@
+"""
+Analytics - Vendor distribution, credit exposure, registration trend and material received, from the rollup tables
+"""
+
+import streamlit as st
+import pandas as pd
+from datetime import date
+from analytics import load_rollups, needs_refresh, refresh
+from database import read_session, write_session
+from auth import check_login
+from query_stats import render_query_panel, track_page
+from telemetry import page_finished, page_started
+
+st.set_page_config(page_title="Analytics", page_icon="📊", layout="wide")
+
+track_page("Analytics")
+page_started("Analytics")
+
+# Check login
+if not check_login():
+    st.error("Please login to access this module")
+    st.stop()
+
+if st.session_state.user['role'] != "Management":
+    st.error("Access denied. You don't have permission to access this module.")
+    st.stop()
+
+TOP_STATES = 15
+TREND_MONTHS = 24
+
+
+def rupees_lakh(amount):
+    """₹ amount in lakh"""
+    return f"₹{amount / 100_000:,.1f} L"
+
+
+def rollup(rollups, dimension):
+    """One dimension's rows, largest count first"""
+    return rollups[rollups["dimension"] == dimension].sort_values("records", ascending=False)
+
+
+def last_months(count):
+    """The last `count` months as "YYYY-MM", oldest first"""
+    today = date.today()
+    months = [(today.year * 12 + today.month - 1) - n for n in range(count - 1, -1, -1)]
+    return [f"{m // 12}-{m % 12 + 1:02d}" for m in months]
+
+
+# ============ MAIN ============
+st.title("📊 Vendor Analytics")
+
+# Only the vendor changes since the last visit are applied; the page itself reads the rollups only
+with read_session() as session:
+    stale = needs_refresh(session)
+if stale:
+    with write_session() as session:
+        refresh(session)
+with read_session() as session:
+    rollups, updated_at = load_rollups(session)
+
+if rollups.empty:
+    st.info("No vendors yet")
+    st.stop()
+
+status = rollup(rollups, "status")
+msme = rollup(rollups, "msme")
+active = status.loc[status["key"] == "Active", "records"].sum()
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Vendors", f"{status['records'].sum():,}")
+col2.metric("Active", f"{active:,}")
+col3.metric("MSME", f"{msme.loc[msme['key'] != 'Not MSME', 'records'].sum():,}")
+col4.metric("Credit limits", rupees_lakh(status["amount"].sum()), help="Total credit limit of all vendors")
+if updated_at:
+    st.caption(f"Figures as of {updated_at:%d-%m-%Y %H:%M} UTC")
+
+st.markdown("---")
+
+# ============ DISTRIBUTION ============
+category = rollup(rollups, "category")
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("Vendors by category")
+    st.bar_chart(category.set_index("key")["records"].rename("Vendors"))
+with col2:
+    st.subheader("Credit exposure by category")
+    st.bar_chart((category.set_index("key")["amount"] / 100_000).rename("Credit limit (₹ lakh)"))
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader(f"Top {TOP_STATES} states")
+    st.bar_chart(rollup(rollups, "state").head(TOP_STATES).set_index("key")["records"].rename("Vendors"))
+with col2:
+    st.subheader("MSME status")
+    st.dataframe(
+        pd.DataFrame({
+            "MSME": msme["key"],
+            "Vendors": msme["records"],
+            "Credit limit": msme["amount"].map(rupees_lakh),
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+# ============ TRENDS ============
+months = last_months(TREND_MONTHS)
+registrations = rollup(rollups, "registrations").set_index("period")["records"]
+st.subheader("Registrations per month")
+st.line_chart(registrations.reindex(months, fill_value=0).rename("Vendors registered"))
+st.caption("Vendors on record by the month they were registered")
+
+receipts = rollup(rollups, "receipts")
+if not receipts.empty:
+    st.subheader("Material received per month (₹ lakh)")
+    st.bar_chart(receipts.pivot_table(index="period", columns="key", values="amount", aggfunc="sum")
+                 .reindex(months[-12:]).fillna(0) / 100_000)
+
+render_query_panel()
+page_finished()
@@ -0,0 +1,315 @@
+"""
+Payables
+Prarthi ERP System
+
+Vendor invoices and payments, and the ageing engine behind the Payables
+page. A payment is allocated to the vendor's oldest open invoices (or to the
+ones chosen) and each invoice's paid_amount is updated in the same
+transaction, so the open balance of an invoice is always one subtraction.
+An invoice against a PO also scores the vendor's pricing rating.
+
+The engine loads every open invoice and the terms of their vendors as column
+arrays and works out due dates, the 0-30/31-60/61-90/90+ ageing buckets,
+overdue and due-soon amounts and credit-limit utilization per vendor with
+NumPy operations over whole arrays. Due dates follow the vendor's terms:
+Advance / Against Delivery / Against Invoice are due at once, otherwise
+credit_days after the invoice date (or the days in the terms, "45 Days"),
+unless the invoice states its own due date.
+
+Reports are cached for the day. Every invoice or payment bumps the
+payables_version counter in its own transaction, and a cached report is only
+used while the day and that version are unchanged.
+
+Usage:
+    python payables.py ageing [--as-of 2026-10-31] [--csv FILE]
+"""
+
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, cast, func, insert, select, update
+
+from database import (PaymentAllocation, PurchaseOrder, Vendor, VendorInvoice, VendorPayment, adjust_counter,
+                      log_action, read_counter, read_session)
+from vendor_ratings import rate_invoice
+
+AGEING_BUCKETS = ["0-30", "31-60", "61-90", "90+"]
+# Upper bound (days since invoice date) of every bucket but the last
+BUCKET_LIMITS = np.array([30, 60, 90])
+
+# Terms that are due on the invoice date
+IMMEDIATE_TERMS = ["Advance", "Against Delivery", "Against Invoice"]
+DEFAULT_CREDIT_DAYS = 30
+
+# "Due soon" window on the Payables page
+DUE_SOON_DAYS = 7
+
+PAYMENT_MODES = ["NEFT", "RTGS", "IMPS", "Cheque", "UPI"]
+
+# Bumped by every invoice and payment; cached reports are keyed on it
+VERSION_COUNTER = "payables_version"
+
+# Rupee amounts closer than this are equal
+AMOUNT_TOLERANCE = 0.005
+
+# Invoice ids per IN (...) lookup
+INVOICE_CHUNK = 500
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+# ============ INVOICES AND PAYMENTS ============
+def record_invoice(session, vendor_id, invoice_number, invoice_date, amount, user_id, due_date=None,
+                   po_id=None, remarks=None):
+    """Record a vendor invoice. Returns (invoice, error)."""
+    invoice_number = (invoice_number or "").strip()
+    if not invoice_number:
+        return None, "Enter the vendor's invoice number"
+    if not amount or amount <= 0:
+        return None, "Invoice amount must be above 0"
+    if due_date and due_date < invoice_date:
+        return None, "Due date cannot be before the invoice date"
+    vendor_code = session.scalar(select(Vendor.vendor_code).where(Vendor.id == vendor_id))
+    if vendor_code is None:
+        return None, "Vendor not found"
+    duplicate = session.scalar(select(VendorInvoice.id).where(VendorInvoice.vendor_id == vendor_id,
+                                                              VendorInvoice.invoice_number == invoice_number))
+    if duplicate:
+        return None, f"Invoice {invoice_number} of {vendor_code} is already recorded"
+    if po_id and session.scalar(select(PurchaseOrder.vendor_id).where(PurchaseOrder.id == po_id)) != vendor_id:
+        return None, "The purchase order is not on this vendor"
+
+    invoice = VendorInvoice(vendor_id=vendor_id, invoice_number=invoice_number, invoice_date=invoice_date,
+                            due_date=due_date, po_id=po_id, amount=round(amount, 2), paid_amount=0,
+                            status="Open", remarks=remarks or None, created_by_id=user_id)
+    session.add(invoice)
+    session.flush()
+    adjust_counter(session, VERSION_COUNTER, 1)
+    rate_invoice(session, invoice)
+    log_action(session, user_id, "CREATE", "vendor_invoices", invoice.id,
+               f"Invoice {invoice_number} of {vendor_code} for ₹{amount:,.2f}")
+    return invoice, None
+
+
+def record_payment(session, vendor_id, amount, user_id, payment_date=None, mode=None, reference=None,
+                   invoice_ids=None, remarks=None):
+    """Record a payment and allocate it to open invoices, oldest first (only to invoice_ids if given).
+    Returns (payment, error); nothing is written on error. Raises RuntimeError if another payment
+    took an invoice's balance meanwhile, so the caller's transaction rolls back."""
+    if not amount or amount <= 0:
+        return None, "Payment amount must be above 0"
+    query = (select(VendorInvoice.id, VendorInvoice.invoice_number, VendorInvoice.amount,
+                    VendorInvoice.paid_amount)
+             .where(VendorInvoice.vendor_id == vendor_id, VendorInvoice.status == "Open")
+             .order_by(VendorInvoice.invoice_date, VendorInvoice.id))
+    if invoice_ids:
+        query = query.where(VendorInvoice.id.in_(invoice_ids))
+    invoices = session.execute(query).all()
+    outstanding = sum(invoice.amount - invoice.paid_amount for invoice in invoices)
+    if amount > outstanding + AMOUNT_TOLERANCE:
+        scope = "the selected invoices" if invoice_ids else "this vendor's open invoices"
+        return None, f"Payment of ₹{amount:,.2f} is more than the ₹{outstanding:,.2f} outstanding on {scope}"
+
+    allocations, remaining = [], round(amount, 2)
+    for invoice in invoices:
+        if remaining <= AMOUNT_TOLERANCE:
+            break
+        applied = round(min(remaining, invoice.amount - invoice.paid_amount), 2)
+        allocations.append((invoice, applied))
+        remaining = round(remaining - applied, 2)
+
+    payment = VendorPayment(vendor_id=vendor_id, payment_date=payment_date or date.today(),
+                            amount=round(amount, 2), mode=mode or None, reference=reference or None,
+                            remarks=remarks or None, created_by_id=user_id)
+    session.add(payment)
+    session.flush()
+
+    for invoice, applied in allocations:
+        # Only applies if no other payment took the invoice's balance since it was read
+        written = session.execute(
+            update(VendorInvoice)
+            .where(VendorInvoice.id == invoice.id, VendorInvoice.status == "Open",
+                   VendorInvoice.amount - VendorInvoice.paid_amount >= applied - AMOUNT_TOLERANCE)
+            .values(paid_amount=VendorInvoice.paid_amount + applied,
+                    status="Paid" if invoice.amount - invoice.paid_amount - applied <= AMOUNT_TOLERANCE else "Open")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if written != 1:
+            # The payment row is already flushed; the caller's transaction must not commit
+            raise RuntimeError(f"Invoice {invoice.invoice_number} was paid by someone else meanwhile; "
+                               "please try again")
+    session.execute(insert(PaymentAllocation), [
+        {"payment_id": payment.id, "invoice_id": invoice.id, "amount": applied} for invoice, applied in allocations
+    ])
+    adjust_counter(session, VERSION_COUNTER, 1)
+    log_action(session, user_id, "CREATE", "vendor_payments", payment.id,
+               f"Paid ₹{amount:,.2f} against {len(allocations)} invoice(s)")
+    return payment, None
+
+
+def open_invoices(session, vendor_id):
+    """Open invoices of one vendor, oldest first"""
+    return session.execute(
+        select(VendorInvoice.id, VendorInvoice.invoice_number, VendorInvoice.invoice_date, VendorInvoice.due_date,
+               VendorInvoice.amount, VendorInvoice.paid_amount)
+        .where(VendorInvoice.vendor_id == vendor_id, VendorInvoice.status == "Open")
+        .order_by(VendorInvoice.invoice_date, VendorInvoice.id)
+    ).all()
+
+
+# ============ AGEING ENGINE ============
+def load_payables(session):
+    """Open invoices and the terms of their vendors as column arrays.
+    Returns (invoices, vendors): a dict of NumPy arrays and a DataFrame indexed by vendor id."""
+    # Read from the covering index through Core (no ORM row handling). Dates come as ISO text,
+    # missing ones as "NaT", so NumPy parses each column in one call.
+    rows = session.connection().execute(
+        select(VendorInvoice.id, VendorInvoice.vendor_id, cast(VendorInvoice.invoice_date, String),
+               func.coalesce(cast(VendorInvoice.due_date, String), "NaT"),
+               VendorInvoice.amount - VendorInvoice.paid_amount)
+        .where(VendorInvoice.status == "Open")
+    ).fetchall()
+    columns = list(zip(*rows)) or [()] * 5
+    invoices = {
+        "id": np.array(columns[0], dtype=np.int64),
+        "vendor_id": np.array(columns[1], dtype=np.int64),
+        "invoice_date": np.array(columns[2], dtype="datetime64[D]"),
+        "stated_due_date": np.array(columns[3], dtype="datetime64[D]"),
+        "outstanding": np.array(columns[4], dtype=np.float64),
+    }
+
+    # Outer join: invoices of a vendor deleted since still count, under "(deleted)"
+    open_vendors = select(VendorInvoice.vendor_id).where(VendorInvoice.status == "Open").distinct().subquery()
+    vendors = pd.DataFrame(session.execute(
+        select(open_vendors.c.vendor_id, Vendor.vendor_code, func.coalesce(Vendor.trade_name, Vendor.legal_name),
+               Vendor.payment_terms, Vendor.credit_days, Vendor.credit_limit)
+        .outerjoin(Vendor, Vendor.id == open_vendors.c.vendor_id)
+    ).all(), columns=["id", "vendor_code", "vendor_name", "payment_terms", "credit_days", "credit_limit"])
+    vendors["vendor_code"] = vendors["vendor_code"].fillna("(deleted)")
+    return invoices, vendors.set_index("id")
+
+
+def invoice_numbers(session, invoice_ids):
+    """{invoice id: invoice number} for the given invoices"""
+    invoice_ids = [int(invoice_id) for invoice_id in invoice_ids]
+    numbers = {}
+    for start in range(0, len(invoice_ids), INVOICE_CHUNK):
+        numbers.update(session.execute(
+            select(VendorInvoice.id, VendorInvoice.invoice_number)
+            .where(VendorInvoice.id.in_(invoice_ids[start:start + INVOICE_CHUNK]))
+        ).all())
+    return numbers
+
+
+def due_days(vendors):
+    """Credit days per vendor from payment_terms and credit_days"""
+    terms = vendors["payment_terms"].fillna("")
+    days_in_terms = pd.to_numeric(terms.str.extract(r"(\d+)", expand=False), errors="coerce")
+    days = pd.to_numeric(vendors["credit_days"], errors="coerce").fillna(days_in_terms).fillna(DEFAULT_CREDIT_DAYS)
+    return np.where(terms.isin(IMMEDIATE_TERMS), 0, days).astype(np.int64)
+
+
+def compute_ageing(invoices, vendors, as_of):
+    """Ageing report as of a date from load_payables() output, with whole-array operations only.
+    Returns {"as_of", "totals", "vendors" (DataFrame per vendor), "due" (DataFrame of invoices
+    overdue or due within DUE_SOON_DAYS)}."""
+    today = np.datetime64(as_of, "D")
+    position = vendors.index.get_indexer(invoices["vendor_id"])
+    outstanding = invoices["outstanding"]
+    vendor_count = len(vendors)
+
+    credit_days = due_days(vendors)
+    due = invoices["invoice_date"] + credit_days[position].astype("timedelta64[D]")
+    stated = invoices["stated_due_date"]
+    due = np.where(np.isnat(stated), due, stated)
+
+    age = (today - invoices["invoice_date"]).astype(np.int64)
+    bucket = np.searchsorted(BUCKET_LIMITS, age, side="left")
+    days_overdue = (today - due).astype(np.int64)
+    overdue = days_overdue > 0
+    due_soon = ~overdue & (days_overdue >= -DUE_SOON_DAYS)
+
+    by_bucket = np.bincount(position * len(AGEING_BUCKETS) + bucket, weights=outstanding,
+                            minlength=vendor_count * len(AGEING_BUCKETS)).reshape(vendor_count, len(AGEING_BUCKETS))
+    total = by_bucket.sum(axis=1)
+    credit_limit = vendors["credit_limit"].fillna(0).to_numpy(dtype=np.float64)
+    utilization = np.divide(total, credit_limit, out=np.full(vendor_count, np.nan), where=credit_limit > 0)
+    earliest_due = pd.Series(due).groupby(position).min().reindex(range(vendor_count)).to_numpy()
+
+    report = pd.DataFrame({
+        "vendor_id": vendors.index.to_numpy(),
+        "vendor_code": vendors["vendor_code"].to_numpy(),
+        "vendor_name": vendors["vendor_name"].to_numpy(),
+        "payment_terms": vendors["payment_terms"].to_numpy(),
+        "credit_days": credit_days,
+        "invoices": np.bincount(position, minlength=vendor_count),
+        "outstanding": total,
+        **{name: by_bucket[:, i] for i, name in enumerate(AGEING_BUCKETS)},
+        "overdue": np.bincount(position, weights=np.where(overdue, outstanding, 0), minlength=vendor_count),
+        "due_soon": np.bincount(position, weights=np.where(due_soon, outstanding, 0), minlength=vendor_count),
+        "earliest_due": earliest_due,
+        "credit_limit": credit_limit,
+        "utilization": utilization,
+    }).sort_values("outstanding", ascending=False, ignore_index=True)
+
+    selected = overdue | due_soon
+    due_list = pd.DataFrame({
+        "invoice_id": invoices["id"][selected],
+        "vendor_code": vendors["vendor_code"].to_numpy()[position[selected]],
+        "invoice_date": invoices["invoice_date"][selected],
+        "due_date": due[selected],
+        "days_overdue": days_overdue[selected],
+        "outstanding": outstanding[selected],
+    }).sort_values(["due_date", "invoice_id"], ignore_index=True)
+
+    totals = {name: float(by_bucket[:, i].sum()) for i, name in enumerate(AGEING_BUCKETS)}
+    totals.update(
+        outstanding=float(total.sum()),
+        overdue=float(report["overdue"].sum()),
+        due_soon=float(report["due_soon"].sum()),
+        invoices=len(outstanding),
+        vendors=vendor_count,
+        over_limit=int((utilization > 1).sum()),
+    )
+    return {"as_of": as_of, "totals": totals, "vendors": report, "due": due_list}
+
+
+def ageing_report(as_of=None):
+    """Ageing report for as_of (default today), reused until the day or the payables version changes"""
+    as_of = as_of or date.today()
+    with read_session() as session:
+        # Read the version before the data: a write in between only causes one extra rebuild
+        key = (as_of, read_counter(session, VERSION_COUNTER))
+        # One session builds the report while the others wait for it
+        with _cache_lock:
+            if _cache.get("key") != key:
+                _cache["report"] = compute_ageing(*load_payables(session), as_of)
+                _cache["key"] = key
+            return _cache["report"]
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Payables ageing")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ageing_cmd = sub.add_parser("ageing", help="Print the ageing summary")
+    ageing_cmd.add_argument("--as-of", type=date.fromisoformat, help="Ageing date (YYYY-MM-DD, default today)")
+    ageing_cmd.add_argument("--csv", help="Write the per-vendor ageing to this CSV file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = ageing_report(args.as_of)
+    totals = report["totals"]
+    print(f"{totals['invoices']:,} open invoices of {totals['vendors']:,} vendors as of "
+          f"{report['as_of'].isoformat()} ({time.perf_counter() - started:.2f}s)")
+    for name in AGEING_BUCKETS + ["outstanding", "overdue", "due_soon"]:
+        print(f"  {name:<12} ₹{totals[name]:>18,.2f}")
+    print(f"  {totals['over_limit']:,} vendor(s) over their credit limit")
+    if args.csv:
+        report["vendors"].to_csv(args.csv, index=False)
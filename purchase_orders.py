@@ -0,0 +1,202 @@
+"""
+Purchase Orders
+Prarthi ERP System
+
+Purchase orders raised against vendors. PO numbers run per financial year
+(PBL/PO/2026-27/00001) from the document_sequences table, so numbering
+restarts every April without looking at earlier POs. The number of pending
+POs is kept in the counters table and adjusted in the same transaction as
+every status change, so the dashboard reads one row. Listings are keyset-
+paginated on (po_date, id) along the purchase_orders indexes: the hundredth
+page costs the same as the first, however many years of POs there are.
+
+Usage:
+    python purchase_orders.py recount     (rebuild the pending PO counter)
+"""
+
+from datetime import date
+
+from sqlalchemy import func, insert, select, tuple_, update
+
+from config import COMPANY_SHORT, get_financial_year
+from database import (PurchaseOrder, PurchaseOrderLine, Vendor, adjust_counter, log_action,
+                      next_sequence_number, read_counter, write_session)
+
+PO_STATUSES = ["Open", "Partially Received", "Closed", "Cancelled"]
+
+# Statuses counted as pending on the dashboard
+PENDING_STATUSES = {"Open", "Partially Received"}
+PENDING_COUNTER = "pending_purchase_orders"
+
+# Status changes a user can make; receipts (MRV) move POs to Partially Received / Closed
+USER_TRANSITIONS = {
+    "Open": {"Closed", "Cancelled"},
+    "Partially Received": {"Closed"},
+    "Closed": set(),
+    "Cancelled": set(),
+}
+
+# POs per listing page
+PAGE_SIZE = 50
+
+GST_RATES = [0.0, 5.0, 12.0, 18.0, 28.0]
+
+
+def po_number(financial_year, number):
+    """PBL/PO/2026-27/00001 for financial year "2026-2027" and number 1"""
+    return f"{COMPANY_SHORT}/PO/{financial_year[:4]}-{financial_year[-2:]}/{number:05d}"
+
+
+def line_amount(quantity, rate, gst_rate):
+    """Line value including GST, in rupees"""
+    return round(quantity * rate * (1 + (gst_rate or 0) / 100), 2)
+
+
+def _pending_delta(old_status, new_status):
+    """Change to the pending counter when a PO moves from old_status to new_status"""
+    return (new_status in PENDING_STATUSES) - (old_status in PENDING_STATUSES)
+
+
+# ============ WRITES ============
+def create_purchase_order(session, vendor_id, lines, user_id, po_date=None, delivery_date=None,
+                          delivery_site=None, remarks=None):
+    """Create an open PO. lines are dicts with item_code, description, unit, quantity, rate
+    and gst_rate. Returns (purchase order, error)."""
+    vendor = session.get(Vendor, vendor_id)
+    if vendor is None:
+        return None, "Vendor not found"
+    if vendor.status != "Active":
+        return None, f"{vendor.vendor_code} is {vendor.status}; POs can only be raised on active vendors"
+
+    rows = []
+    for line in lines:
+        description = (line.get("description") or "").strip()
+        quantity, rate = line.get("quantity") or 0, line.get("rate") or 0
+        if not description and not quantity:
+            continue
+        if not description:
+            return None, f"Line {len(rows) + 1}: enter a description"
+        if quantity <= 0 or rate < 0:
+            return None, f"Line {len(rows) + 1}: quantity must be above 0 and rate 0 or more"
+        gst_rate = line.get("gst_rate")
+        gst_rate = 18.0 if gst_rate is None else gst_rate
+        rows.append({
+            "line_no": len(rows) + 1,
+            "item_code": (line.get("item_code") or "").strip() or None,
+            "description": description,
+            "unit": (line.get("unit") or "").strip() or None,
+            "quantity": quantity,
+            "rate": rate,
+            "gst_rate": gst_rate,
+            "amount": line_amount(quantity, rate, gst_rate),
+        })
+    if not rows:
+        return None, "Add at least one line"
+
+    po_date = po_date or date.today()
+    financial_year = get_financial_year(po_date)
+    purchase_order = PurchaseOrder(
+        po_number=po_number(financial_year, next_sequence_number(session, "PO", financial_year)),
+        financial_year=financial_year,
+        vendor_id=vendor_id,
+        po_date=po_date,
+        delivery_date=delivery_date,
+        delivery_site=delivery_site or None,
+        status="Open",
+        total_amount=round(sum(row["amount"] for row in rows), 2),
+        remarks=remarks or None,
+        created_by_id=user_id,
+    )
+    session.add(purchase_order)
+    session.flush()
+
+    session.execute(insert(PurchaseOrderLine), [dict(row, po_id=purchase_order.id) for row in rows])
+    adjust_counter(session, PENDING_COUNTER, 1)
+    log_action(session, user_id, "CREATE", "purchase_orders", purchase_order.id,
+               f"Raised {purchase_order.po_number} on {vendor.vendor_code}")
+    return purchase_order, None
+
+
+def set_po_status(session, po_id, status, user_id, transitions=USER_TRANSITIONS):
+    """Move a PO to a new status and keep the pending counter in step. Returns (old status, error)."""
+    if status not in PO_STATUSES:
+        return None, f"Unknown status {status}"
+    current = session.execute(select(PurchaseOrder.status, PurchaseOrder.po_number)
+                              .where(PurchaseOrder.id == po_id)).first()
+    if current is None:
+        return None, "Purchase order not found"
+    old_status, number = current
+    if old_status == status:
+        return old_status, None
+    if status not in transitions.get(old_status, ()):
+        return None, f"{number} is {old_status} and cannot be changed to {status}"
+
+    # Only applies if nobody changed the status since it was read
+    written = session.execute(
+        update(PurchaseOrder)
+        .where(PurchaseOrder.id == po_id, PurchaseOrder.status == old_status)
+        .values(status=status, modified_by_id=user_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if written != 1:
+        return None, f"{number} was changed by someone else; reload and try again"
+
+    delta = _pending_delta(old_status, status)
+    if delta:
+        adjust_counter(session, PENDING_COUNTER, delta)
+    log_action(session, user_id, "STATUS", "purchase_orders", po_id, f"{number}: {old_status} → {status}")
+    return old_status, None
+
+
+# ============ READS ============
+def pending_po_count(session):
+    """Open and partially received POs, from the maintained counter"""
+    return read_counter(session, PENDING_COUNTER)
+
+
+def list_purchase_orders(session, status=None, vendor_id=None, before=None, limit=PAGE_SIZE):
+    """One page of POs, newest first. before is the (po_date, id) key returned for the previous
+    page. Returns (rows, key for the next page or None on the last page)."""
+    query = (
+        select(PurchaseOrder.id, PurchaseOrder.po_number, PurchaseOrder.po_date, PurchaseOrder.status,
+               PurchaseOrder.total_amount, PurchaseOrder.delivery_site, Vendor.vendor_code,
+               func.coalesce(Vendor.trade_name, Vendor.legal_name).label("vendor_name"))
+        .join(Vendor, Vendor.id == PurchaseOrder.vendor_id)
+    )
+    if status:
+        query = query.where(PurchaseOrder.status == status)
+    if vendor_id:
+        query = query.where(PurchaseOrder.vendor_id == vendor_id)
+    if before:
+        query = query.where(tuple_(PurchaseOrder.po_date, PurchaseOrder.id) < tuple(before))
+    rows = session.execute(
+        query.order_by(PurchaseOrder.po_date.desc(), PurchaseOrder.id.desc()).limit(limit + 1)
+    ).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1].po_date, rows[-1].id)
+
+
+def po_lines(session, po_id):
+    """Lines of one PO in order"""
+    return session.execute(
+        select(PurchaseOrderLine).where(PurchaseOrderLine.po_id == po_id).order_by(PurchaseOrderLine.line_no)
+    ).scalars().all()
+
+
+def recount_pending(session):
+    """Recompute the pending PO counter from the purchase_orders table. Returns the new value."""
+    actual = session.scalar(select(func.count(PurchaseOrder.id))
+                            .where(PurchaseOrder.status.in_(PENDING_STATUSES)))
+    return adjust_counter(session, PENDING_COUNTER, actual - read_counter(session, PENDING_COUNTER))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["recount"]:
+        print("Usage: python purchase_orders.py recount")
+        sys.exit(2)
+    with write_session() as session:
+        print(f"Pending purchase orders: {recount_pending(session)}")
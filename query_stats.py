@@ -0,0 +1,248 @@
+"""
+SQL Query Statistics
+Prarthi ERP System
+
+Counts, times and sizes every statement the app sends to the database and
+attributes it to the page rerun that issued it. Statements slower than
+SLOW_QUERY_MS are logged with their query plan. Pages call track_page() at
+the top of each run and render_query_panel() at the end; the panel is shown
+to Management users when SQL_DEBUG_PANEL is on. Counting the rows a SELECT
+returns means buffering its result, so that is only done while the panel is on.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+import streamlit as st
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from config import SLOW_QUERY_MS, SQL_DEBUG_PANEL
+from database import engine, read_engine
+
+logger = logging.getLogger("prarthi.sql")
+
+# Reruns kept per browser session, and browser sessions kept in memory
+RERUNS_KEPT = 20
+SESSIONS_KEPT = 200
+
+# Slow statements kept for the debug panel
+SLOW_KEPT = 50
+
+_lock = threading.Lock()
+_sessions = OrderedDict()
+_slow = deque(maxlen=SLOW_KEPT)
+
+
+# ============ RERUN RECORDS ============
+def _new_run(page, fragment=False):
+    """Empty statistics for one script run"""
+    return {
+        "page": page,
+        "fragment": fragment,
+        "started": time.time(),
+        "queries": 0,
+        "seconds": 0.0,
+        "rows": 0,
+        "statements": {},
+        "marker": None,
+    }
+
+
+def _session_runs(session_id):
+    """Recent runs for a browser session, newest last"""
+    with _lock:
+        runs = _sessions.get(session_id)
+        if runs is None:
+            runs = _sessions[session_id] = deque(maxlen=RERUNS_KEPT)
+            while len(_sessions) > SESSIONS_KEPT:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(session_id)
+        return runs
+
+
+def track_page(page):
+    """Start attributing queries to a new run of page. Call at the top of every page."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    _session_runs(ctx.session_id).append(_new_run(page))
+
+
+def _current_run():
+    """Statistics for the script run issuing a query, or None outside Streamlit"""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    runs = _session_runs(ctx.session_id)
+    # A fragment rerun does not execute the page top, so start its record here.
+    # Each rerun request carries its own fragment id list, which identifies the run.
+    fragment_ids = ctx.fragment_ids_this_run
+    if fragment_ids and (not runs or runs[-1]["marker"] is not fragment_ids):
+        page = runs[-1]["page"] if runs else "(unknown)"
+        run = _new_run(page, fragment=True)
+        run["marker"] = fragment_ids
+        runs.append(run)
+    if not runs:
+        runs.append(_new_run("(unknown)"))
+    return runs[-1]
+
+
+def recent_runs(session_id=None):
+    """Recent runs for a browser session (the current one by default), newest first"""
+    if session_id is None:
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return []
+        session_id = ctx.session_id
+    with _lock:
+        runs = list(_sessions.get(session_id, ()))
+    return runs[::-1]
+
+
+def slow_queries():
+    """Recently logged slow statements, newest first"""
+    return list(_slow)[::-1]
+
+
+# ============ ENGINE EVENTS ============
+def _statement_key(statement):
+    """Statement text used to group repeated queries"""
+    return " ".join(statement.split())
+
+
+def _record(run, key, seconds=0.0, rows=0, count=1):
+    """Add one execution to a run's totals"""
+    run["queries"] += count
+    run["seconds"] += seconds
+    run["rows"] += rows
+    stats = run["statements"].setdefault(key, {"count": 0, "seconds": 0.0, "rows": 0})
+    stats["count"] += count
+    stats["seconds"] += seconds
+    stats["rows"] += rows
+
+
+def _query_plan(cursor, statement, parameters, dialect):
+    """Plan for a slow SELECT, run on the connection that executed it"""
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    plan_cursor = cursor.connection.cursor()
+    try:
+        plan_cursor.execute(prefix + statement, parameters)
+        return "\n".join(" | ".join(str(col) for col in row) for row in plan_cursor.fetchall())
+    except Exception as e:
+        return f"(plan unavailable: {e})"
+    finally:
+        plan_cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    key = _statement_key(statement)
+    is_select = cursor.description is not None
+
+    run = _current_run()
+    if run is not None:
+        # SELECT rows are counted by _count_rows when the debug panel is on;
+        # for writes the cursor reports rows affected
+        rows = 0 if is_select or cursor.rowcount < 0 else cursor.rowcount
+        _record(run, key, elapsed, rows)
+        conn.info["last_statement"] = key
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        plan = ""
+        if key[:6].upper() in ("SELECT", "WITH ") and not executemany:
+            plan = _query_plan(cursor, statement, parameters, conn.dialect)
+        page = run["page"] if run is not None else "(no page)"
+        _slow.append({"at": time.time(), "page": page, "ms": elapsed * 1000,
+                      "statement": key, "plan": plan})
+        logger.warning("Slow query (%.0f ms) on %s: %s\n%s", elapsed * 1000, page, key, plan)
+
+
+def _handle_error(context):
+    # A failed statement never reaches _after_cursor_execute; drop its start time here
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def _count_rows(orm_execute_state):
+    """Buffer ORM SELECT results so the rows they return can be counted (debug panel only)"""
+    if not orm_execute_state.is_select or get_script_run_ctx() is None:
+        return None
+    options = orm_execute_state.execution_options
+    if options.get("yield_per") or options.get("stream_results"):
+        return None
+
+    frozen = orm_execute_state.invoke_statement().freeze()
+    run = _current_run()
+    connection = orm_execute_state.session.connection()
+    key = connection.info.get("last_statement")
+    if run is not None and key is not None:
+        _record(run, key, rows=len(frozen.data), count=0)
+    return frozen()
+
+
+def install():
+    """Attach the statistics hooks to the database engines (once per process)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    for target in {engine, read_engine}:
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+        event.listen(target, "handle_error", _handle_error)
+    # Buffering copies every result once more, so rows are only counted for the panel
+    if SQL_DEBUG_PANEL:
+        event.listen(Session, "do_orm_execute", _count_rows)
+
+
+install()
+
+
+# ============ DEBUG PANEL ============
+def render_query_panel():
+    """Sidebar panel with this session's query statistics (Management only)"""
+    user = st.session_state.get("user")
+    if not SQL_DEBUG_PANEL or not user or user.get("role") != "Management":
+        return
+
+    runs = recent_runs()
+    with st.sidebar.expander("🛠️ SQL statistics"):
+        if not runs:
+            st.caption("No queries recorded yet")
+            return
+        st.dataframe(
+            [{
+                "Page": run["page"] + (" (fragment)" if run["fragment"] else ""),
+                "Queries": run["queries"],
+                "ms": round(run["seconds"] * 1000, 1),
+                "Rows": run["rows"],
+            } for run in runs],
+            hide_index=True,
+            use_container_width=True,
+        )
+        latest = runs[0]
+        if not latest["statements"]:
+            st.caption(f"The latest {latest['page']} run was served from cache")
+        else:
+            st.caption(f"Statements in the latest {latest['page']} run")
+            st.dataframe(
+                sorted(({"Statement": key[:200], "Count": stats["count"],
+                         "ms": round(stats["seconds"] * 1000, 1), "Rows": stats["rows"]}
+                        for key, stats in latest["statements"].items()),
+                       key=lambda row: -row["ms"]),
+                hide_index=True,
+                use_container_width=True,
+            )
+        slow = slow_queries()
+        if slow:
+            st.caption(f"Slow queries (≥ {SLOW_QUERY_MS} ms)")
+            for entry in slow[:5]:
+                st.code(f"{entry['ms']:.0f} ms · {entry['page']}\n{entry['statement'][:500]}\n\n{entry['plan']}",
+                        language="text")
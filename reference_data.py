@@ -0,0 +1,327 @@
+"""
+Reference Data Lookups
+Prarthi ERP System
+
+Offline lookups for IFSC branches (RBI master), PIN codes (India Post
+directory) and GST state codes.
+
+The source CSV files are compiled once into sorted binary index files:
+
+    header   8s magic, u16 key width, u16 field count, u32 record count
+    keys     record count x key width bytes, ASCII, sorted, NUL padded
+    offsets  (record count + 1) x u32 into the payload
+    payload  UTF-8 records, fields separated by 0x1F
+
+The index files are memory-mapped and binary searched, so a lookup is
+O(log n) and only touches a few pages. All sessions and worker processes
+share the same pages through the OS page cache.
+
+Usage:
+    python reference_data.py build     compile data/reference/*.csv
+    python reference_data.py IFSC HDFC0000001
+"""
+
+import bisect
+import csv
+import mmap
+import os
+import struct
+
+from config import GST_STATE_CODES, INDIAN_STATES
+
+REFERENCE_DIR = "./data/reference"
+
+IFSC_SOURCE = "ifsc.csv"
+PIN_SOURCE = "pincode.csv"
+IFSC_INDEX = "ifsc.idx"
+PIN_INDEX = "pincode.idx"
+
+_MAGIC = b"PRREFv1\0"
+_HEADER = struct.Struct("<8sHHI")
+_FIELD_SEP = "\x1f"
+
+IFSC_FIELDS = ["bank", "branch", "city", "district", "state", "address"]
+PIN_FIELDS = ["city", "district", "state"]
+
+# Source column names vary between RBI, India Post and third-party exports
+_IFSC_COLUMNS = {
+    "ifsc": ["ifsc", "ifsc code", "ifsc_code"],
+    "bank": ["bank", "bank name", "bank_name"],
+    "branch": ["branch", "branch name", "branch_name"],
+    "city": ["city", "city1", "centre"],
+    "district": ["district", "city2"],
+    "state": ["state"],
+    "address": ["address"],
+}
+_PIN_COLUMNS = {
+    "pin": ["pincode", "pin code", "pin"],
+    "city": ["taluk", "divisionname", "officename"],
+    "district": ["districtname", "district"],
+    "state": ["statename", "state"],
+    "delivery": ["deliverystatus", "delivery"],
+}
+
+# Used when the IFSC master has not been installed
+IFSC_BANK_PREFIXES = {
+    'HDFC': 'HDFC Bank', 'ICIC': 'ICICI Bank', 'SBIN': 'State Bank of India',
+    'UTIB': 'Axis Bank', 'AXIS': 'Axis Bank', 'KKBK': 'Kotak Mahindra Bank',
+    'PUNB': 'Punjab National Bank', 'BARB': 'Bank of Baroda', 'CNRB': 'Canara Bank',
+    'UBIN': 'Union Bank of India', 'BKID': 'Bank of India', 'IOBA': 'Indian Overseas Bank',
+    'IDIB': 'Indian Bank', 'MAHB': 'Bank of Maharashtra', 'CBIN': 'Central Bank of India',
+    'UCBA': 'UCO Bank', 'PSIB': 'Punjab and Sind Bank', 'YESB': 'Yes Bank',
+    'INDB': 'IndusInd Bank', 'IDFB': 'IDFC First Bank', 'FDRL': 'Federal Bank',
+    'SIBL': 'South Indian Bank', 'KARB': 'Karnataka Bank', 'RATN': 'RBL Bank',
+    'SCBL': 'Standard Chartered Bank', 'HSBC': 'HSBC', 'CITI': 'Citibank',
+    'DBSS': 'DBS Bank', 'AUBL': 'AU Small Finance Bank', 'SVCB': 'SVC Co-operative Bank',
+    'COSB': 'Cosmos Co-operative Bank', 'SRCB': 'Saraswat Co-operative Bank',
+}
+
+_STATE_ALIASES = {
+    "PONDICHERRY": "Puducherry",
+    "ORISSA": "Odisha",
+    "CHATTISGARH": "Chhattisgarh",
+    "UTTARANCHAL": "Uttarakhand",
+    "NEW DELHI": "Delhi",
+    "NCT OF DELHI": "Delhi",
+    "THE DADRA AND NAGAR HAVELI AND DAMAN AND DIU": "Dadra and Nagar Haveli",
+    "DADRA AND NAGAR HAVELI AND DAMAN AND DIU": "Dadra and Nagar Haveli",
+}
+_STATES_UPPER = {s.upper(): s for s in INDIAN_STATES}
+
+
+def canonical_state(name):
+    """Map a state name from any source to the spelling used in INDIAN_STATES"""
+    if not name:
+        return ""
+    key = " ".join(name.replace("&", " and ").upper().split())
+    return _STATES_UPPER.get(key) or _STATE_ALIASES.get(key) or name.strip().title()
+
+
+# ============ INDEX FILES ============
+class ReferenceIndex:
+    """Read-only, memory-mapped sorted index"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.key_width, self.field_count, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a reference index")
+        self._keys_at = _HEADER.size
+        self._offsets_at = self._keys_at + self.count * self.key_width
+        self._payload_at = self._offsets_at + (self.count + 1) * 4
+        self.mtime = os.path.getmtime(path)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        # Lets bisect search the mapped keys without materializing them
+        start = self._keys_at + i * self.key_width
+        return self._mm[start:start + self.key_width]
+
+    def _encode(self, key):
+        return key.encode("ascii", "ignore")[:self.key_width].ljust(self.key_width, b"\0")
+
+    def get(self, key):
+        """Fields for key as a list of strings, or None"""
+        probe = self._encode(key)
+        i = bisect.bisect_left(self, probe)
+        if i == self.count or self[i] != probe:
+            return None
+        return self.record(i)
+
+    def record(self, i):
+        """Fields of the record at position i"""
+        start, end = struct.unpack_from("<II", self._mm, self._offsets_at + i * 4)
+        return self._mm[self._payload_at + start:self._payload_at + end].decode("utf-8").split(_FIELD_SEP)
+
+    def keys_array(self):
+        """All keys as a NumPy fixed-width bytes array (zero-copy), for batch lookups"""
+        import numpy as np
+        return np.frombuffer(self._mm, dtype=f"S{self.key_width}", count=self.count, offset=self._keys_at)
+
+    def get_many(self, keys):
+        """Vectorized lookup; returns record positions, -1 where the key is missing"""
+        import numpy as np
+        needles = np.asarray(keys, dtype=f"S{self.key_width}")
+        if not self.count:
+            return np.full(len(needles), -1)
+        haystack = self.keys_array()
+        pos = np.minimum(np.searchsorted(haystack, needles), self.count - 1)
+        return np.where(haystack[pos] == needles, pos, -1)
+
+    def close(self):
+        self._mm.close()
+
+
+def write_index(path, records, key_width, field_count):
+    """Write {key: [fields]} as a sorted index file (atomically replaced)"""
+    keys = sorted(records)
+    offsets = [0]
+    payload = bytearray()
+    for key in keys:
+        payload += _FIELD_SEP.join(records[key]).encode("utf-8")
+        offsets.append(len(payload))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, key_width, field_count, len(keys)))
+        for key in keys:
+            f.write(key.encode("ascii")[:key_width].ljust(key_width, b"\0"))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(payload)
+    os.replace(tmp, path)
+    return len(keys)
+
+
+_indexes = {}
+
+
+def open_index(name, directory=None):
+    """Shared ReferenceIndex for a file, reopened if it has been rebuilt. None if missing."""
+    path = os.path.join(directory or REFERENCE_DIR, name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    index = _indexes.get(path)
+    if index is None or index.mtime != mtime:
+        index = ReferenceIndex(path)
+        _indexes[path] = index
+    return index
+
+
+# ============ BUILD ============
+def _read_rows(path, columns):
+    """Yield dicts keyed by our field names from a CSV with any known header spelling"""
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        reader = csv.reader(f)
+        header = [h.strip().lower() for h in next(reader)]
+        positions = {}
+        for field, names in columns.items():
+            for name in names:
+                if name in header:
+                    positions[field] = header.index(name)
+                    break
+        for row in reader:
+            yield {field: row[i].strip() if i < len(row) else "" for field, i in positions.items()}
+
+
+def build_ifsc_index(source, target):
+    """Compile the RBI IFSC master CSV"""
+    records = {}
+    for row in _read_rows(source, _IFSC_COLUMNS):
+        ifsc = row.get("ifsc", "").upper()
+        if len(ifsc) != 11:
+            continue
+        records[ifsc] = [
+            row.get("bank", ""), row.get("branch", ""), row.get("city", "").title(),
+            row.get("district", "").title(), canonical_state(row.get("state", "")),
+            " ".join(row.get("address", "").split()),
+        ]
+    return write_index(target, records, 11, len(IFSC_FIELDS))
+
+
+def build_pin_index(source, target):
+    """Compile the India Post PIN directory CSV. Delivery offices win over others."""
+    records = {}
+    for row in _read_rows(source, _PIN_COLUMNS):
+        pin = row.get("pin", "")
+        if len(pin) != 6 or not pin.isdigit():
+            continue
+        is_delivery = row.get("delivery", "").lower() == "delivery"
+        if pin in records and not is_delivery:
+            continue
+        district = row.get("district", "").title()
+        city = row.get("city", "").title()
+        if not city or city.upper() == "NA":
+            city = district
+        records[pin] = [city, district, canonical_state(row.get("state", ""))]
+    return write_index(target, records, 6, len(PIN_FIELDS))
+
+
+def build_all(directory=None):
+    """Compile every source file present in the reference directory"""
+    directory = directory or REFERENCE_DIR
+    built = {}
+    for source, target, builder in [(IFSC_SOURCE, IFSC_INDEX, build_ifsc_index),
+                                    (PIN_SOURCE, PIN_INDEX, build_pin_index)]:
+        source_path = os.path.join(directory, source)
+        if os.path.exists(source_path):
+            built[target] = builder(source_path, os.path.join(directory, target))
+    return built
+
+
+# ============ LOOKUPS ============
+def lookup_ifsc(ifsc):
+    """Branch details for an IFSC code, or None if unknown"""
+    ifsc = (ifsc or "").strip().upper()
+    if len(ifsc) != 11:
+        return None
+    index = open_index(IFSC_INDEX)
+    fields = index.get(ifsc) if index else None
+    if fields:
+        return dict(zip(IFSC_FIELDS, fields))
+    return None
+
+
+def bank_name_for_ifsc(ifsc):
+    """Bank name from the IFSC master, falling back to the bank prefix table"""
+    details = lookup_ifsc(ifsc)
+    if details:
+        return details["bank"]
+    return IFSC_BANK_PREFIXES.get((ifsc or "").strip().upper()[:4], "")
+
+
+def lookup_pin(pin):
+    """City, district and state for a PIN code, or None if unknown"""
+    pin = (pin or "").strip()
+    if len(pin) != 6:
+        return None
+    index = open_index(PIN_INDEX)
+    fields = index.get(pin) if index else None
+    return dict(zip(PIN_FIELDS, fields)) if fields else None
+
+
+def state_for_gstin(gstin):
+    """State name from the GSTIN state code, or None"""
+    return GST_STATE_CODES.get((gstin or "")[:2])
+
+
+def reference_issues(ifsc=None, pin=None, state=None, gstin=None):
+    """
+    Check vendor fields against the reference data.
+    Returns a list of messages; checks whose master file is missing are skipped.
+    """
+    issues = []
+    if ifsc and open_index(IFSC_INDEX) and not lookup_ifsc(ifsc):
+        issues.append(f"IFSC {ifsc} not found in RBI master")
+    if pin and open_index(PIN_INDEX):
+        place = lookup_pin(pin)
+        if not place:
+            issues.append(f"PIN code {pin} not found in India Post directory")
+        elif state and place["state"] != state:
+            issues.append(f"PIN code {pin} is in {place['state']}, not {state}")
+    if gstin and state:
+        gst_state = state_for_gstin(gstin)
+        if gst_state and gst_state != state and gst_state not in ("Other Territory", "Centre Jurisdiction"):
+            issues.append(f"GSTIN state code {gstin[:2]} is {gst_state}, not {state}")
+    return issues
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        started = time.perf_counter()
+        for name, count in build_all().items():
+            print(f"{name}: {count} records")
+        print(f"Built in {time.perf_counter() - started:.1f}s")
+    elif len(sys.argv) == 3 and sys.argv[1].upper() in ("IFSC", "PIN"):
+        result = lookup_ifsc(sys.argv[2]) if sys.argv[1].upper() == "IFSC" else lookup_pin(sys.argv[2])
+        print(result or "Not found")
+    else:
+        print(__doc__)
@@ -0,0 +1,369 @@
+"""
+Stock Ledger
+Prarthi ERP System
+
+Inventory per item and site. Every movement (a receipt from an MRV, an issue
+to site work, a transfer between sites) is appended to stock_movements and
+never changed afterwards. The current quantity lives in stock_balance and is
+moved in the same transaction as each movement, so looking up a balance
+reads one row by primary key however long the ledger grows.
+
+A month-end snapshot copies the balances as of that day into stock_snapshots
+and closes the period in stock_periods: no movement may be dated on or before
+the latest closed period, even one whose balances were all zero. A balance as of an earlier date is the nearest snapshot plus the
+movements after it, so it never replays more than one period of the ledger.
+The reconcile job checks the running balances and every snapshot against the
+ledger, reading each movement once.
+
+Usage:
+    python stock.py snapshot [--as-of 2026-09-30]    (close the period; default: end of last month)
+    python stock.py reconcile [--repair]             (check balances and snapshots against the ledger)
+"""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select, update
+
+from config import COMPANY_SHORT, get_financial_year
+from database import (StockBalance, StockMovement, StockPeriod, StockSnapshot, adjust_stock_balance, log_action,
+                      next_sequence_number, write_session)
+
+MOVEMENT_TYPES = ["RECEIPT", "ISSUE", "TRANSFER_IN", "TRANSFER_OUT"]
+
+# Site used for receipts whose PO and MRV name no site
+DEFAULT_SITE = "Main Store"
+
+# Quantities closer than this are equal (they are floats: 12.5 MT, 0.75 Cum)
+QUANTITY_TOLERANCE = 1e-6
+
+# Rows per INSERT batch when writing snapshots
+SNAPSHOT_CHUNK = 5000
+
+
+def slip_number(series, financial_year, number):
+    """PBL/ISS/2026-27/00001 for series "ISS", financial year "2026-2027" and number 1"""
+    return f"{COMPANY_SHORT}/{series}/{financial_year[:4]}-{financial_year[-2:]}/{number:05d}"
+
+
+def quantity_text(quantity, unit):
+    """12.5 MT, or just 12.5 when the unit is unknown"""
+    return f"{quantity:g} {unit}" if unit else f"{quantity:g}"
+
+
+def stock_movement(movement_date, item_code, site, movement_type, quantity, unit=None, reference=None,
+                   remarks=None):
+    """Ledger row for receive_stock(); quantity is signed (negative for stock going out)"""
+    return {"movement_date": movement_date, "item_code": item_code, "site": site,
+            "movement_type": movement_type, "quantity": quantity, "unit": unit,
+            "reference": reference, "remarks": remarks}
+
+
+# ============ PERIODS ============
+def closed_until(session):
+    """End of the latest closed period; movements on or before it are closed (None if never closed).
+    Snapshots taken before stock_periods existed close their period too."""
+    ends = [session.scalar(select(func.max(StockPeriod.period_end))),
+            session.scalar(select(func.max(StockSnapshot.snapshot_date)))]
+    return max((end for end in ends if end), default=None)
+
+
+def check_period(session, movement_date):
+    """Error if a movement cannot be dated movement_date, else None"""
+    if movement_date > date.today():
+        return "Stock movements cannot be dated in the future"
+    closed = closed_until(session)
+    if closed and movement_date <= closed:
+        return f"Stock is closed up to {closed.strftime('%d-%m-%Y')}; date the entry after that"
+    return None
+
+
+# ============ MOVEMENTS ============
+def _append(session, movements, user_id):
+    """Insert ledger rows in one multi-row INSERT"""
+    session.execute(insert(StockMovement), [dict(movement, created_by_id=user_id) for movement in movements])
+
+
+def receive_stock(session, movements, user_id):
+    """Append incoming movements (positive quantities) and add them to the balances.
+    The caller has checked the period."""
+    if not movements:
+        return
+    _append(session, movements, user_id)
+    totals = {}
+    for movement in movements:
+        key = (movement["item_code"], movement["site"])
+        quantity, unit = totals.get(key, (0, None))
+        totals[key] = (quantity + movement["quantity"], movement["unit"] or unit)
+    for (item_code, site), (quantity, unit) in totals.items():
+        adjust_stock_balance(session, item_code, site, quantity, unit)
+
+
+def _draw(session, item_code, site, quantity):
+    """Take quantity out of a balance if enough is there. One conditional UPDATE, so two
+    concurrent issues cannot both take the last of the stock. Returns True if taken."""
+    return session.execute(
+        update(StockBalance)
+        .where(StockBalance.item_code == item_code, StockBalance.site == site,
+               StockBalance.quantity >= quantity - QUANTITY_TOLERANCE)
+        .values(quantity=StockBalance.quantity - quantity, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def _shortage(session, item_code, site, quantity):
+    """Message for an issue or transfer larger than the balance"""
+    balance = session.execute(select(StockBalance.quantity, StockBalance.unit)
+                              .where(StockBalance.item_code == item_code, StockBalance.site == site)).first()
+    available, unit = balance if balance else (0, None)
+    return f"Only {quantity_text(available, unit)} of {item_code} at {site}; cannot take {quantity:g}"
+
+
+def issue_stock(session, item_code, site, quantity, user_id, movement_date=None, issued_to=None, remarks=None):
+    """Issue material from a site's stock. Returns (issue slip number, error); nothing is written on error."""
+    movement_date = movement_date or date.today()
+    if not quantity or quantity <= 0:
+        return None, "Quantity must be above 0"
+    error = check_period(session, movement_date)
+    if error:
+        return None, error
+    if not _draw(session, item_code, site, quantity):
+        return None, _shortage(session, item_code, site, quantity)
+
+    unit = session.scalar(select(StockBalance.unit).where(StockBalance.item_code == item_code,
+                                                          StockBalance.site == site))
+    financial_year = get_financial_year(movement_date)
+    reference = slip_number("ISS", financial_year, next_sequence_number(session, "ISS", financial_year))
+    remarks = " - ".join(part for part in (issued_to, remarks) if part) or None
+    _append(session, [stock_movement(movement_date, item_code, site, "ISSUE", -quantity, unit, reference,
+                                     remarks)], user_id)
+    log_action(session, user_id, "ISSUE", "stock_movements", None,
+               f"{reference}: {quantity_text(quantity, unit)} {item_code} from {site}")
+    return reference, None
+
+
+def transfer_stock(session, item_code, from_site, to_site, quantity, user_id, movement_date=None, remarks=None):
+    """Move material between sites. Returns (transfer slip number, error); nothing is written on error."""
+    movement_date = movement_date or date.today()
+    if not quantity or quantity <= 0:
+        return None, "Quantity must be above 0"
+    if not to_site or to_site == from_site:
+        return None, "Choose a different site to transfer to"
+    error = check_period(session, movement_date)
+    if error:
+        return None, error
+    if not _draw(session, item_code, from_site, quantity):
+        return None, _shortage(session, item_code, from_site, quantity)
+
+    unit = session.scalar(select(StockBalance.unit).where(StockBalance.item_code == item_code,
+                                                          StockBalance.site == from_site))
+    adjust_stock_balance(session, item_code, to_site, quantity, unit)
+    financial_year = get_financial_year(movement_date)
+    reference = slip_number("TRF", financial_year, next_sequence_number(session, "TRF", financial_year))
+    _append(session, [
+        stock_movement(movement_date, item_code, from_site, "TRANSFER_OUT", -quantity, unit, reference, remarks),
+        stock_movement(movement_date, item_code, to_site, "TRANSFER_IN", quantity, unit, reference, remarks),
+    ], user_id)
+    log_action(session, user_id, "TRANSFER", "stock_movements", None,
+               f"{reference}: {quantity_text(quantity, unit)} {item_code} from {from_site} to {to_site}")
+    return reference, None
+
+
+# ============ BALANCES ============
+def stock_balance(session, item_code, site):
+    """Current quantity of an item at a site (a primary key lookup)"""
+    return session.scalar(select(StockBalance.quantity).where(StockBalance.item_code == item_code,
+                                                              StockBalance.site == site)) or 0
+
+
+def list_balances(session, site=None, item=None):
+    """Current non-zero balances, by site then item"""
+    query = select(StockBalance).where(func.abs(StockBalance.quantity) > QUANTITY_TOLERANCE)
+    if site:
+        query = query.where(StockBalance.site == site)
+    if item:
+        query = query.where(StockBalance.item_code.contains(item.strip().upper()))
+    return session.execute(query.order_by(StockBalance.site, StockBalance.item_code)).scalars().all()
+
+
+def stock_sites(session):
+    """Sites that hold or have held stock"""
+    return session.execute(select(StockBalance.site).distinct().order_by(StockBalance.site)).scalars().all()
+
+
+def _latest_snapshot(session, on):
+    """Date of the newest snapshot taken on or before `on`, or None"""
+    return session.scalar(select(func.max(StockSnapshot.snapshot_date)).where(StockSnapshot.snapshot_date <= on))
+
+
+def balance_as_of(session, item_code, site, on):
+    """Quantity of an item at a site at the end of day `on`: the nearest snapshot plus later movements"""
+    snapshot_date = _latest_snapshot(session, on)
+    quantity = 0
+    moved = select(func.coalesce(func.sum(StockMovement.quantity), 0)).where(
+        StockMovement.item_code == item_code, StockMovement.site == site, StockMovement.movement_date <= on)
+    if snapshot_date:
+        quantity = session.scalar(select(StockSnapshot.quantity).where(
+            StockSnapshot.snapshot_date == snapshot_date, StockSnapshot.item_code == item_code,
+            StockSnapshot.site == site)) or 0
+        moved = moved.where(StockMovement.movement_date > snapshot_date)
+    return quantity + session.scalar(moved)
+
+
+def balances_as_of(session, on, site=None):
+    """{(item_code, site): (quantity, unit)} at the end of day `on`, including zero balances
+    of items that moved since the nearest snapshot"""
+    snapshot_date = _latest_snapshot(session, on)
+    balances = {}
+    if snapshot_date:
+        query = select(StockSnapshot.item_code, StockSnapshot.site, StockSnapshot.quantity, StockSnapshot.unit) \
+            .where(StockSnapshot.snapshot_date == snapshot_date)
+        if site:
+            query = query.where(StockSnapshot.site == site)
+        for item_code, item_site, quantity, unit in session.execute(query):
+            balances[(item_code, item_site)] = (quantity, unit)
+
+    query = (select(StockMovement.item_code, StockMovement.site, func.sum(StockMovement.quantity),
+                    func.max(StockMovement.unit))
+             .where(StockMovement.movement_date <= on)
+             .group_by(StockMovement.item_code, StockMovement.site))
+    if snapshot_date:
+        query = query.where(StockMovement.movement_date > snapshot_date)
+    if site:
+        query = query.where(StockMovement.site == site)
+    for item_code, item_site, moved, unit in session.execute(query):
+        quantity, known_unit = balances.get((item_code, item_site), (0, None))
+        balances[(item_code, item_site)] = (quantity + moved, known_unit or unit)
+    return balances
+
+
+def item_movements(session, item_code, site, limit=200):
+    """Latest ledger rows of an item at a site, newest first"""
+    return session.execute(
+        select(StockMovement)
+        .where(StockMovement.item_code == item_code, StockMovement.site == site)
+        .order_by(StockMovement.movement_date.desc(), StockMovement.id.desc())
+        .limit(limit)
+    ).scalars().all()
+
+
+# ============ SNAPSHOTS AND RECONCILIATION ============
+def _write_snapshot(session, snapshot_date, balances):
+    rows = [{"snapshot_date": snapshot_date, "item_code": item_code, "site": site, "quantity": quantity,
+             "unit": unit} for (item_code, site), (quantity, unit) in balances.items()]
+    for start in range(0, len(rows), SNAPSHOT_CHUNK):
+        session.execute(insert(StockSnapshot), rows[start:start + SNAPSHOT_CHUNK])
+    return len(rows)
+
+
+def take_snapshot(session, as_of):
+    """Record balances at the end of as_of and close the period up to it (also when there are
+    no balances to record). Returns (rows written, error)."""
+    closed = closed_until(session)
+    if closed and as_of <= closed:
+        return None, f"Stock is already closed up to {closed.strftime('%d-%m-%Y')}"
+    if as_of >= date.today():
+        return None, "Only a finished day can be closed"
+    balances = balances_as_of(session, as_of)
+    # Items already at zero in the previous snapshot are not carried forward
+    balances = {key: value for key, value in balances.items() if abs(value[0]) > QUANTITY_TOLERANCE}
+    written = _write_snapshot(session, as_of, balances)
+    session.execute(insert(StockPeriod).values(period_end=as_of, balances=written, closed_at=datetime.utcnow()))
+    return written, None
+
+
+def _compare(label, expected, actual):
+    """Problems where stored quantities (actual) differ from ledger totals (expected)"""
+    problems = []
+    for key in sorted(set(expected) | set(actual)):
+        want, have = expected.get(key, 0), actual.get(key, 0)
+        if abs(want - have) > QUANTITY_TOLERANCE:
+            problems.append(f"{label}: {key[0]} at {key[1]} is {have:g}, ledger says {want:g}")
+    return problems
+
+
+def _quantities(session, query):
+    """{(item_code, site): quantity} from a query of those three columns"""
+    return {(item_code, site): quantity for item_code, site, quantity in session.execute(query)}
+
+
+def reconcile(session, repair=False):
+    """Rebuild the balance at every snapshot date and today from the ledger, one snapshot period
+    at a time so each movement is read once, and compare with stock_snapshots and stock_balance.
+    Returns a list of problems; with repair=True the stored quantities are rewritten to match."""
+    snapshot_dates = session.execute(select(StockSnapshot.snapshot_date).distinct()
+                                     .order_by(StockSnapshot.snapshot_date)).scalars().all()
+    problems = []
+    running, units = {}, {}
+    period_start = None
+    for period_end in [*snapshot_dates, None]:
+        query = (select(StockMovement.item_code, StockMovement.site, func.sum(StockMovement.quantity),
+                        func.max(StockMovement.unit))
+                 .group_by(StockMovement.item_code, StockMovement.site))
+        if period_start:
+            query = query.where(StockMovement.movement_date > period_start)
+        if period_end:
+            query = query.where(StockMovement.movement_date <= period_end)
+        for item_code, site, quantity, unit in session.execute(query):
+            running[(item_code, site)] = running.get((item_code, site), 0) + quantity
+            units[(item_code, site)] = unit or units.get((item_code, site))
+        if period_end is None:
+            break
+
+        stored = _quantities(session, select(StockSnapshot.item_code, StockSnapshot.site, StockSnapshot.quantity)
+                             .where(StockSnapshot.snapshot_date == period_end))
+        found = _compare(f"Snapshot {period_end.isoformat()}", running, stored)
+        if found and repair:
+            session.execute(delete(StockSnapshot).where(StockSnapshot.snapshot_date == period_end))
+            _write_snapshot(session, period_end, {key: (quantity, units.get(key)) for key, quantity
+                                                  in running.items() if abs(quantity) > QUANTITY_TOLERANCE})
+        problems.extend(found)
+        period_start = period_end
+
+    stored = _quantities(session, select(StockBalance.item_code, StockBalance.site, StockBalance.quantity))
+    found = _compare("Balance", running, stored)
+    if found and repair:
+        session.execute(delete(StockBalance))
+        for (item_code, site), quantity in running.items():
+            adjust_stock_balance(session, item_code, site, quantity, units.get((item_code, site)))
+    return problems + found
+
+
+def last_month_end(today=None):
+    """Last day of the previous month"""
+    today = today or date.today()
+    return today.replace(day=1) - timedelta(days=1)
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="Stock ledger maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    snapshot_cmd = sub.add_parser("snapshot", help="Snapshot balances and close the stock period")
+    snapshot_cmd.add_argument("--as-of", type=date.fromisoformat, help="Last day of the period (YYYY-MM-DD)")
+    reconcile_cmd = sub.add_parser("reconcile", help="Check balances and snapshots against the ledger")
+    reconcile_cmd.add_argument("--repair", action="store_true", help="Rewrite them from the ledger")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "snapshot":
+        as_of = args.as_of or last_month_end()
+        with write_session() as session:
+            written, error = take_snapshot(session, as_of)
+        if error:
+            sys.exit(error)
+        print(f"Closed stock up to {as_of.isoformat()}: snapshot of {written} balance(s) "
+              f"({time.perf_counter() - started:.2f}s)")
+
+    elif args.command == "reconcile":
+        with write_session() as session:
+            problems = reconcile(session, repair=args.repair)
+        for problem in problems:
+            print(problem)
+        status = "repaired" if args.repair and problems else "found"
+        print(f"{len(problems)} difference(s) {status} ({time.perf_counter() - started:.2f}s)")
+        if problems and not args.repair:
+            sys.exit(1)
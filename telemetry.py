@@ -0,0 +1,252 @@
+"""
+Performance Telemetry
+Prarthi ERP System
+
+Times page runs and slow helpers (PDF rendering, Document AI extraction,
+exports) and measures how much each session keeps in st.session_state.
+Samples are kept in-process as histograms and exposed in the Prometheus text
+format, on a local HTTP endpoint and/or a textfile for node_exporter.
+
+With PRARTHI_METRICS off (the default) timed() hands back the function
+unchanged or a shared no-op context manager, so instrumented code costs
+nothing.
+"""
+
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import streamlit as st
+
+from config import METRICS_ENABLED, METRICS_FILE, METRICS_INTERVAL, METRICS_PORT
+
+logger = logging.getLogger("prarthi.metrics")
+
+METRIC_PREFIX = "prarthi_"
+
+# Histogram bucket bounds
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+HELP = {
+    "page_seconds": "Time to run a page script, by page",
+    "session_state_bytes": "Approximate size of st.session_state at the end of a page run, by page",
+}
+
+_lock = threading.Lock()
+_histograms = {}
+
+
+# ============ HISTOGRAMS ============
+def observe(metric, value, buckets=SECONDS_BUCKETS, **labels):
+    """Add one sample to a histogram (metric name without the prarthi_ prefix)"""
+    if not METRICS_ENABLED:
+        return
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                            "sum": 0.0, "count": 0}
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+                break
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+class _Timer:
+    """Context manager and decorator recording elapsed seconds"""
+
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.metric, time.perf_counter() - self.started, **self.labels)
+        return False
+
+    def __call__(self, func):
+        metric, labels = self.metric, self.labels
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(metric, time.perf_counter() - started, **labels)
+
+        return wrapper
+
+
+class _NoTimer:
+    """Stand-in for _Timer while metrics are off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(name, **labels):
+    """Time a block (with timed(...):) or every call of a function (@timed(...)) as <name>_seconds"""
+    if not METRICS_ENABLED:
+        return _NO_TIMER
+    return _Timer(f"{name}_seconds", labels)
+
+
+# ============ PAGES AND SESSION STATE ============
+def _deep_size(obj, seen):
+    """Bytes held by obj and everything it references, counting shared objects once"""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_size(vars(obj), seen)
+    return size
+
+
+def session_state_bytes():
+    """Approximate memory held by the current session's st.session_state"""
+    return _deep_size(st.session_state.to_dict(), set())
+
+
+def page_started(page):
+    """Start timing a page run. Call at the top of every page."""
+    if METRICS_ENABLED:
+        st.session_state["_page_timer"] = (page, time.perf_counter())
+
+
+def page_finished():
+    """Record the page run time and session state size. Call at the end of every page."""
+    if not METRICS_ENABLED:
+        return
+    # Runs cut short by st.stop()/st.rerun() never get here and are not counted
+    page, started = st.session_state.pop("_page_timer", (None, None))
+    if page is None:
+        return
+    observe("page_seconds", time.perf_counter() - started, page=page)
+    observe("session_state_bytes", session_state_bytes(), buckets=BYTES_BUCKETS, page=page)
+
+
+# ============ PROMETHEUS EXPORT ============
+def _label_text(labels):
+    """{a="1",b="2"}, with values escaped as Prometheus expects"""
+    if not labels:
+        return ""
+    escaped = ((k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def metrics_text():
+    """All histograms in the Prometheus text exposition format"""
+    with _lock:
+        snapshot = [(metric, labels, dict(h, counts=list(h["counts"])))
+                    for (metric, labels), h in sorted(_histograms.items())]
+
+    lines = []
+    described = set()
+    for metric, labels, histogram in snapshot:
+        name = METRIC_PREFIX + metric
+        if metric not in described:
+            described.add(metric)
+            help_text = HELP.get(metric, f"Duration of {metric.removesuffix('_seconds').replace('_', ' ')}")
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            cumulative += count
+            bucket_labels = _label_text(labels + (("le", f"{bound:g}"),))
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+        bucket_labels = _label_text(labels + (("le", "+Inf"),))
+        lines.append(f"{name}_bucket{bucket_labels} {histogram['count']}")
+        lines.append(f"{name}_sum{_label_text(labels)} {histogram['sum']:.6f}")
+        lines.append(f"{name}_count{_label_text(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """Write metrics_text() to path atomically (node_exporter textfile collector)"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(metrics_text())
+    os.replace(temp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port):
+    """Serve /metrics on localhost:port from a background thread"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def _write_textfile_forever(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_textfile(path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+
+
+def _start_exporters():
+    """Start the configured exporters (once per process, on first import)"""
+    if METRICS_PORT:
+        try:
+            start_http_server(METRICS_PORT)
+        except OSError as e:
+            # Another app process on this machine already serves the port
+            logger.warning("Metrics endpoint not started on port %s: %s", METRICS_PORT, e)
+    if METRICS_FILE:
+        threading.Thread(target=_write_textfile_forever, args=(METRICS_FILE, METRICS_INTERVAL),
+                         name="metrics-textfile", daemon=True).start()
+
+
+if METRICS_ENABLED:
+    _start_exporters()
@@ -0,0 +1,288 @@
+"""
+Statutory Field Validation
+Prarthi ERP System
+
+GSTIN (structure and mod-36 check digit), PAN structure, IFSC format and
+PIN-to-state consistency, as scalar functions for the wizard and as
+NumPy-vectorized batch functions for bulk imports and the nightly
+data-quality scan.
+
+Batch functions convert a column to a fixed-width array of code points once
+and then check every position for all rows at the same time.
+
+Usage:
+    python validation.py scan [--csv FILE]     nightly data-quality scan
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from config import GST_STATE_CODES
+from reference_data import PIN_FIELDS, PIN_INDEX, lookup_pin, open_index
+
+GSTIN_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# 4th character of a PAN: holder type
+PAN_HOLDER_TYPES = "PCHFATBLJG"
+
+GSTIN_PATTERN = re.compile(r"^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]$")
+PAN_PATTERN = re.compile(r"^[A-Z]{3}[PCHFATBLJG][A-Z][0-9]{4}[A-Z]$")
+IFSC_PATTERN = re.compile(r"^[A-Z]{4}0[A-Z0-9]{6}$")
+PIN_PATTERN = re.compile(r"^[1-9][0-9]{5}$")
+
+# States a GSTIN state code may carry without matching the vendor's address state
+_NON_TERRITORIAL_GST_CODES = {"97", "99"}
+
+
+# ============ SCALAR CHECKS ============
+def gstin_check_char(first14):
+    """Mod-36 check character for the first 14 characters of a GSTIN"""
+    total = 0
+    for i, ch in enumerate(first14):
+        product = GSTIN_CHARSET.index(ch) * (2 if i % 2 else 1)
+        total += product // 36 + product % 36
+    return GSTIN_CHARSET[(36 - total % 36) % 36]
+
+
+def validate_gstin(gstin):
+    """Error message for an invalid GSTIN, or None"""
+    gstin = (gstin or "").strip().upper()
+    if not GSTIN_PATTERN.match(gstin):
+        return "GSTIN must be 15 characters: state code, PAN, entity number, Z, check digit"
+    if gstin[:2] not in GST_STATE_CODES:
+        return f"GSTIN state code {gstin[:2]} does not exist"
+    if gstin[14] != gstin_check_char(gstin[:14]):
+        return "GSTIN check digit is wrong - please re-check the number"
+    return None
+
+
+def validate_pan(pan, gstin=None):
+    """Error message for an invalid PAN (or one that doesn't match the GSTIN), or None"""
+    pan = (pan or "").strip().upper()
+    if not PAN_PATTERN.match(pan):
+        return "PAN must be 5 letters, 4 digits, 1 letter with a valid holder type in 4th place"
+    gstin = (gstin or "").strip().upper()
+    if len(gstin) == 15 and gstin[2:12] != pan:
+        return "PAN does not match characters 3-12 of the GSTIN"
+    return None
+
+
+def validate_ifsc(ifsc):
+    """Error message for a malformed IFSC code, or None"""
+    if not IFSC_PATTERN.match((ifsc or "").strip().upper()):
+        return "IFSC must be 4 letters, 0, then 6 letters or digits"
+    return None
+
+
+def validate_pin_state(pin, state, gstin=None):
+    """Error message when PIN, state and GSTIN state code disagree, or None"""
+    pin = (pin or "").strip()
+    if not PIN_PATTERN.match(pin):
+        return "PIN code must be 6 digits and cannot start with 0"
+    place = lookup_pin(pin)
+    if place and state and place["state"] != state:
+        return f"PIN code {pin} belongs to {place['state']}, not {state}"
+    gst_code = (gstin or "").strip()[:2]
+    if state and gst_code in GST_STATE_CODES and gst_code not in _NON_TERRITORIAL_GST_CODES:
+        if GST_STATE_CODES[gst_code] != state:
+            return f"GSTIN is registered in {GST_STATE_CODES[gst_code]}, not {state}"
+    return None
+
+
+# ============ BATCH CHECKS ============
+# Code point -> GSTIN character value (0-35), -1 for anything else
+_VALUE = np.full(256, -1, dtype=np.int16)
+for _i, _ch in enumerate(GSTIN_CHARSET):
+    _VALUE[ord(_ch)] = _i
+_IS_DIGIT = (_VALUE >= 0) & (_VALUE < 10)
+_IS_ALPHA = _VALUE >= 10
+_IS_ALNUM = _VALUE >= 0
+_IS_PAN_HOLDER = np.zeros(256, dtype=bool)
+_IS_PAN_HOLDER[[ord(c) for c in PAN_HOLDER_TYPES]] = True
+_GSTIN_FACTORS = np.tile(np.array([1, 2], dtype=np.int16), 7)
+_GST_CODES = np.array(sorted(int(code) for code in GST_STATE_CODES))
+
+
+def _code_points(values, width):
+    """
+    Uppercased, stripped strings as an (n, width) uint8 array of code points.
+    Rows of any other length come back as all zeros.
+    """
+    s = pd.Series(values, dtype="object").fillna("").astype(str).str.strip().str.upper()
+    wide = np.array(s.tolist(), dtype=f"U{width + 1}").view(np.uint32).reshape(-1, width + 1)
+    exact = (wide[:, width] == 0) & (wide[:, width - 1] != 0) & (wide[:, :width] < 256).all(axis=1)
+    return np.where(exact[:, None], wide[:, :width], 0).astype(np.uint8)
+
+
+def _match(codes, classes):
+    """Rows where each position belongs to its character class (list of 256-entry masks)"""
+    ok = np.ones(len(codes), dtype=bool)
+    for position, mask in enumerate(classes):
+        ok &= mask[codes[:, position]]
+    return ok
+
+
+def _literal(ch):
+    mask = np.zeros(256, dtype=bool)
+    mask[ord(ch)] = True
+    return mask
+
+
+_GSTIN_CLASSES = ([_IS_DIGIT] * 2 + [_IS_ALPHA] * 5 + [_IS_DIGIT] * 4 + [_IS_ALPHA]
+                  + [_IS_ALNUM & ~_literal("0"), _literal("Z"), _IS_ALNUM])
+_PAN_CLASSES = [_IS_ALPHA] * 3 + [_IS_PAN_HOLDER, _IS_ALPHA] + [_IS_DIGIT] * 4 + [_IS_ALPHA]
+_IFSC_CLASSES = [_IS_ALPHA] * 4 + [_literal("0")] + [_IS_ALNUM] * 6
+_PIN_CLASSES = [_IS_DIGIT & ~_literal("0")] + [_IS_DIGIT] * 5
+
+
+def gstin_check_chars(first14_codes):
+    """Vectorized mod-36 check values for an (n, 14) array of code points"""
+    values = _VALUE[first14_codes].astype(np.int16)
+    products = values * _GSTIN_FACTORS
+    total = (products // 36 + products % 36).sum(axis=1)
+    return (36 - total % 36) % 36
+
+
+def gstin_valid(values):
+    """Boolean array: structure, state code and check digit are all correct"""
+    codes = _code_points(values, 15)
+    ok = _match(codes, _GSTIN_CLASSES)
+    state_codes = (codes[:, 0].astype(np.int16) - 48) * 10 + (codes[:, 1].astype(np.int16) - 48)
+    ok &= np.isin(state_codes, _GST_CODES)
+    ok &= gstin_check_chars(codes[:, :14]) == _VALUE[codes[:, 14]]
+    return ok
+
+
+def pan_valid(values):
+    """Boolean array: PAN structure is correct"""
+    return _match(_code_points(values, 10), _PAN_CLASSES)
+
+
+def gstin_pan_match(gstins, pans):
+    """Boolean array: characters 3-12 of the GSTIN equal the PAN"""
+    g = _code_points(gstins, 15)
+    p = _code_points(pans, 10)
+    return (g[:, 2:12] == p).all(axis=1) & (p[:, 0] != 0)
+
+
+def ifsc_valid(values):
+    """Boolean array: IFSC format is correct"""
+    return _match(_code_points(values, 11), _IFSC_CLASSES)
+
+
+def pin_valid(values):
+    """Boolean array: PIN format is correct"""
+    return _match(_code_points(values, 6), _PIN_CLASSES)
+
+
+def pin_states(pins):
+    """
+    State for each PIN from the India Post index (empty where unknown or no index).
+    Matches are found with one vectorized search of the index, and each matched
+    record is decoded once, so cost is bounded by the PIN directory, not the row count.
+    """
+    pins = pd.Series(pins, dtype="object").fillna("").astype(str).str.strip()
+    index = open_index(PIN_INDEX)
+    if index is None:
+        return pd.Series("", index=pins.index)
+    distinct = pd.unique(pins[pin_valid(pins)])
+    positions = index.get_many(distinct.astype("S6"))
+    state_at = PIN_FIELDS.index("state")
+    states = {pos: index.record(pos)[state_at] for pos in np.unique(positions[positions >= 0])}
+    by_pin = {pin: states[pos] for pin, pos in zip(distinct, positions) if pos >= 0}
+    return pins.map(by_pin).fillna("")
+
+
+def validate_frame(df):
+    """
+    Validate a DataFrame with any of the columns gstin, pan, ifsc_code, pin_code, state.
+    Returns a DataFrame of booleans (True = passes) aligned with df.
+    Checks for missing or blank optional values pass.
+    """
+    result = pd.DataFrame(index=df.index)
+    present = {c: df[c].fillna("").astype(str).str.strip() != "" for c in df.columns}
+
+    if "gstin" in df:
+        result["gstin_ok"] = gstin_valid(df["gstin"]) | ~present["gstin"]
+    if "pan" in df:
+        result["pan_ok"] = pan_valid(df["pan"]) | ~present["pan"]
+    if "gstin" in df and "pan" in df:
+        result["gstin_pan_ok"] = gstin_pan_match(df["gstin"], df["pan"]) | ~present["gstin"] | ~present["pan"]
+    if "ifsc_code" in df:
+        result["ifsc_ok"] = ifsc_valid(df["ifsc_code"]) | ~present["ifsc_code"]
+    if "pin_code" in df:
+        result["pin_ok"] = pin_valid(df["pin_code"]) | ~present["pin_code"]
+    if "pin_code" in df and "state" in df:
+        looked_up = pin_states(df["pin_code"])
+        result["pin_state_ok"] = (looked_up == "") | (looked_up == df["state"].fillna(""))
+    if "gstin" in df and "state" in df:
+        gst_state = df["gstin"].fillna("").astype(str).str.strip().str[:2].map(GST_STATE_CODES)
+        territorial = ~df["gstin"].fillna("").astype(str).str.strip().str[:2].isin(_NON_TERRITORIAL_GST_CODES)
+        result["gstin_state_ok"] = gst_state.isna() | ~territorial | (gst_state == df["state"])
+    return result
+
+
+CHECK_LABELS = {
+    "gstin_ok": "Invalid GSTIN",
+    "pan_ok": "Invalid PAN",
+    "gstin_pan_ok": "PAN does not match GSTIN",
+    "ifsc_ok": "Invalid IFSC",
+    "pin_ok": "Invalid PIN code",
+    "pin_state_ok": "PIN code is in a different state",
+    "gstin_state_ok": "GSTIN state code differs from state",
+}
+
+
+def failed_rows(checks):
+    """Rows with at least one failed check, with a readable list of the failures"""
+    failing = checks[~checks.all(axis=1)]
+    issues = failing.apply(lambda row: "; ".join(CHECK_LABELS[c] for c in failing.columns if not row[c]), axis=1)
+    return failing.assign(issues=issues)
+
+
+# ============ NIGHTLY SCAN ============
+def scan_vendors(session, batch_size=50000):
+    """
+    Validate every vendor in batches.
+    Returns a DataFrame of failing vendors with their code and issues.
+    """
+    from sqlalchemy import select
+    from database import Vendor
+
+    columns = [Vendor.id, Vendor.vendor_code, Vendor.gstin, Vendor.pan,
+               Vendor.ifsc_code, Vendor.pin_code, Vendor.state]
+    found = []
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(*columns).where(Vendor.id > last_id).order_by(Vendor.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        df = pd.DataFrame(rows, columns=[c.key for c in columns])
+        failing = failed_rows(validate_frame(df))
+        if len(failing):
+            found.append(df.loc[failing.index, ["id", "vendor_code"]].join(failing["issues"]))
+        last_id = rows[-1][0]
+    if not found:
+        return pd.DataFrame(columns=["id", "vendor_code", "issues"])
+    return pd.concat(found, ignore_index=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import read_session
+
+    parser = argparse.ArgumentParser(description="Vendor data-quality scan")
+    parser.add_argument("command", choices=["scan"])
+    parser.add_argument("--csv", help="Write failing vendors to this CSV file")
+    args = parser.parse_args()
+
+    with read_session() as session:
+        report = scan_vendors(session)
+    if args.csv:
+        report.to_csv(args.csv, index=False)
+    print(report.to_string(index=False) if len(report) else "No issues found")
+    print(f"{len(report)} vendor(s) with issues")
@@ -0,0 +1,230 @@
+"""
+Vendor Archive
+Prarthi ERP System
+
+Keeps the vendors table down to the vendors people work with. A vendor that
+has been Inactive and untouched for ARCHIVE_AFTER_DAYS, and was never used
+on a purchase order, receipt, invoice, payment or rating, is moved with its
+contacts into vendors_archive and vendor_contacts_archive (same database,
+same columns; vendors keep their ids, which are never handed out again). Its typeahead and duplicate-name index entries go
+with it, so the Library grid, its counts, the vendor picker and name
+matching read only live vendors. The change feed records the move as a
+DELETE, so downstream copies and analytics drop the vendor too.
+
+Vendor codes stay taken while archived. find_vendors() looks a code, GSTIN
+or PAN up in both tables with one UNION ALL query, and registration still
+warns about an archived vendor with the same GSTIN or PAN. restore_vendor()
+moves a vendor back (still Inactive) in one click from the Library.
+
+Run the archiver monthly, e.g. from Task Scheduler.
+
+Usage:
+    python vendor_archive.py run [--days N] [--dry-run]
+    python vendor_archive.py restore V-0042
+    python vendor_archive.py list [TEXT]
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, Integer, delete, exists, func, insert, literal, or_, select, union_all
+
+from config import ARCHIVE_AFTER_DAYS
+from database import (AuditLog, MaterialReceipt, PurchaseOrder, Vendor, VendorArchive, VendorContact,
+                      VendorContactArchive, VendorInvoice, VendorNameSignature, VendorPayment, VendorRatingEvent,
+                      VendorRatingStat, VendorSearchKey, adjust_counter, log_action, read_counter,
+                      record_vendor_changes)
+from duplicates import index_vendor_names
+from telemetry import timed
+from vendor_search import index_vendor_keys
+
+# Dashboard counter of archived vendors
+ARCHIVE_COUNTER = "archived_vendors"
+
+# Vendors moved per statement
+ARCHIVE_CHUNK = 500
+
+# Rows that keep a vendor in the vendors table: they point at vendors.id
+REFERENCING = [PurchaseOrder, MaterialReceipt, VendorInvoice, VendorPayment, VendorRatingEvent, VendorRatingStat]
+
+# Matches returned by a search of the archive
+SEARCH_LIMIT = 50
+
+SUMMARY_COLUMNS = ["id", "vendor_code", "trade_name", "legal_name", "gstin", "pan", "vendor_category",
+                   "city", "status"]
+
+
+def _unreferenced():
+    """Conditions: no purchase order, receipt, invoice, payment or rating points at the vendor"""
+    return [~exists().where(model.vendor_id == Vendor.id) for model in REFERENCING]
+
+
+# ============ ARCHIVING ============
+def archive_candidates(session, days=ARCHIVE_AFTER_DAYS):
+    """Ids of vendors Inactive and unchanged for `days` days, with nothing referencing them"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return session.scalars(
+        select(Vendor.id)
+        .where(Vendor.status == "Inactive", func.coalesce(Vendor.modified_at, Vendor.created_at) < cutoff,
+               *_unreferenced())
+        .order_by(Vendor.id)
+    ).all()
+
+
+def _copy(session, source, target, where, now, user_id, keep_ids=True):
+    """INSERT ... SELECT the matching rows of source into its archive table, stamped with when and by whom.
+    Without keep_ids the archive numbers the rows itself."""
+    copied = [column for column in source.columns if keep_ids or column.name != "id"]
+    names = [*(column.name for column in copied), "archived_at", "archived_by_id"]
+    columns = [*copied, literal(now, DateTime), literal(user_id, Integer)]
+    session.execute(insert(target).from_select(names, select(*columns).where(where)))
+
+
+@timed("vendor_archive")
+def archive_vendors(session, vendor_ids, user_id=None):
+    """Move vendors and their contacts into the archive tables. Vendors something references
+    are skipped. Returns the codes archived."""
+    now = datetime.utcnow()
+    vendor_ids = list(vendor_ids)
+    archived = []
+    for start in range(0, len(vendor_ids), ARCHIVE_CHUNK):
+        chunk = vendor_ids[start:start + ARCHIVE_CHUNK]
+        # An id already archived was reused before vendors had AUTOINCREMENT; that vendor stays live
+        rows = session.execute(select(Vendor.id, Vendor.vendor_code)
+                               .where(Vendor.id.in_(chunk), *_unreferenced(),
+                                      ~exists().where(VendorArchive.id == Vendor.id))).all()
+        if not rows:
+            continue
+        ids = [row.id for row in rows]
+
+        _copy(session, Vendor.__table__, VendorArchive.__table__, Vendor.id.in_(ids), now, user_id)
+        # Contact ids can be reused by SQLite, so archived contacts get ids of their own
+        _copy(session, VendorContact.__table__, VendorContactArchive.__table__,
+              VendorContact.vendor_id.in_(ids), now, user_id, keep_ids=False)
+        for model in (VendorSearchKey, VendorNameSignature, VendorContact):
+            session.execute(delete(model).where(model.vendor_id.in_(ids)))
+        session.execute(delete(Vendor).where(Vendor.id.in_(ids)).execution_options(synchronize_session=False))
+
+        record_vendor_changes(session, dict.fromkeys(ids, "DELETE"))
+        session.execute(insert(AuditLog), [
+            {"user_id": user_id, "action": "ARCHIVE", "table_name": "vendors", "record_id": row.id,
+             "details": json.dumps({"vendor_code": row.vendor_code}), "timestamp": now}
+            for row in rows
+        ])
+        archived.extend(row.vendor_code for row in rows)
+
+    if archived:
+        adjust_counter(session, ARCHIVE_COUNTER, len(archived))
+    return archived
+
+
+def archived_count(session):
+    """Vendors in the archive"""
+    return read_counter(session, ARCHIVE_COUNTER)
+
+
+# ============ RESTORE ============
+@timed("vendor_restore")
+def restore_vendor(session, vendor_code, user_id=None):
+    """Move an archived vendor and its contacts back into the vendors table, still Inactive.
+    Returns (vendor id, None) or (None, error)."""
+    row = session.execute(select(VendorArchive.__table__)
+                          .where(VendorArchive.vendor_code == vendor_code)).mappings().first()
+    if row is None:
+        return None, f"{vendor_code} is not in the archive"
+    if session.scalar(select(Vendor.id).where(Vendor.vendor_code == vendor_code)) is not None:
+        return None, f"A live vendor already uses the code {vendor_code}"
+
+    now = datetime.utcnow()
+    values = {column.name: row[column.name] for column in Vendor.__table__.columns}
+    # Only in databases that reused vendor ids before vendors had AUTOINCREMENT
+    if session.scalar(select(Vendor.id).where(Vendor.id == row["id"])) is not None:
+        del values["id"]
+    values.update(version=(row["version"] or 1) + 1, modified_by_id=user_id, modified_at=now)
+    vendor_id = session.execute(insert(Vendor).values(**values).returning(Vendor.id)).scalar_one()
+
+    contacts = session.execute(select(VendorContactArchive.__table__)
+                               .where(VendorContactArchive.vendor_id == row["id"])
+                               .order_by(VendorContactArchive.id)).mappings().all()
+    if contacts:
+        session.execute(insert(VendorContact), [
+            dict({column.name: contact[column.name] for column in VendorContact.__table__.columns
+                  if column.name != "id"}, vendor_id=vendor_id)
+            for contact in contacts
+        ])
+    session.execute(delete(VendorContactArchive).where(VendorContactArchive.vendor_id == row["id"]))
+    session.execute(delete(VendorArchive).where(VendorArchive.id == row["id"]))
+
+    vendor = session.get(Vendor, vendor_id)
+    index_vendor_names(session, vendor)
+    index_vendor_keys(session, vendor)
+    record_vendor_changes(session, {vendor_id: "INSERT"})
+    log_action(session, user_id, "RESTORE", "vendors", vendor_id,
+               json.dumps({"vendor_code": vendor_code, "archived_at": str(row["archived_at"])}))
+    adjust_counter(session, ARCHIVE_COUNTER, -1)
+    return vendor_id, None
+
+
+# ============ LOOKUPS ============
+def find_vendors(session, key):
+    """Live and archived vendors whose code, GSTIN or PAN is key, as dicts with "archived" set"""
+    key = (key or "").strip().upper()
+    if not key:
+        return []
+    queries = [
+        select(*(model.__table__.c[name] for name in SUMMARY_COLUMNS), literal(archived).label("archived"))
+        .where(or_(model.vendor_code == key, model.gstin == key, model.pan == key))
+        for model, archived in ((Vendor, False), (VendorArchive, True))
+    ]
+    return [dict(row) for row in session.execute(union_all(*queries)).mappings()]
+
+
+def search_archive(session, text="", limit=SEARCH_LIMIT):
+    """Archived vendors by exact code, GSTIN or PAN, or by a piece of their name; latest archived first"""
+    text = (text or "").strip()
+    query = select(*(VendorArchive.__table__.c[name] for name in SUMMARY_COLUMNS), VendorArchive.archived_at)
+    if text:
+        pattern = f"%{text}%"
+        query = query.where(or_(VendorArchive.vendor_code == text.upper(), VendorArchive.gstin == text.upper(),
+                                VendorArchive.pan == text.upper(), VendorArchive.trade_name.ilike(pattern),
+                                VendorArchive.legal_name.ilike(pattern)))
+    query = query.order_by(VendorArchive.archived_at.desc(), VendorArchive.id.desc()).limit(limit)
+    return [dict(row) for row in session.execute(query).mappings()]
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+
+    from database import write_session
+
+    parser = argparse.ArgumentParser(description="Vendor archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Archive vendors Inactive and unchanged for --days days")
+    run.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    run.add_argument("--dry-run", action="store_true", help="Only count the vendors that would be archived")
+    restore = sub.add_parser("restore", help="Move an archived vendor back to the vendors table")
+    restore.add_argument("vendor_code")
+    listing = sub.add_parser("list", help="Show archived vendors (optionally matching a code, GSTIN, PAN or name)")
+    listing.add_argument("text", nargs="?", default="")
+    args = parser.parse_args()
+
+    with write_session() as session:
+        if args.command == "run":
+            candidates = archive_candidates(session, args.days)
+            if args.dry_run:
+                print(f"{len(candidates):,} vendor(s) would be archived")
+            else:
+                archived = archive_vendors(session, candidates)
+                print(f"Archived {len(archived):,} vendor(s); {archived_count(session):,} in the archive")
+        elif args.command == "restore":
+            vendor_id, error = restore_vendor(session, args.vendor_code.strip().upper())
+            if error:
+                parser.error(error)
+            print(f"Restored {args.vendor_code} as vendor id {vendor_id} (status unchanged)")
+        else:
+            rows = search_archive(session, args.text)
+            for row in rows:
+                print(f"{row['vendor_code']:<8} {row['gstin'] or '-':<15} "
+                      f"{(row['trade_name'] or row['legal_name'] or '')[:40]:<40} archived {row['archived_at']:%d-%m-%Y}")
+            print(f"{len(rows):,} shown of {archived_count(session):,} archived vendor(s)")
@@ -0,0 +1,235 @@
+"""
+Vendor Registration Drafts
+Prarthi ERP System
+
+Saves the registration wizard while it is filled in, so a browser refresh, a
+server restart or moving to another app server does not lose the work. A
+draft is a vendor_drafts row plus one vendor_draft_fields row (JSON) per
+wizard field. Autosave compares the wizard state with what was last saved
+and writes only the fields that changed: at most every
+DRAFT_AUTOSAVE_SECONDS, and at once when the step changes or a document is
+uploaded.
+
+Uploaded documents are written once, to DOCUMENTS_DIR/drafts/<draft id>/.
+The draft keeps a reference to each (path, file type, SHA-256) with the
+text Document AI read from it, so resuming, or uploading the same file
+again, needs neither another upload nor another extraction.
+
+Drafts untouched for DRAFT_EXPIRY_DAYS are purged with their documents by
+the sweeper; run it daily, e.g. from Task Scheduler.
+
+Usage:
+    python vendor_drafts.py purge
+    python vendor_drafts.py list
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from config import DOCUMENTS_DIR, DRAFT_AUTOSAVE_SECONDS, DRAFT_EXPIRY_DAYS
+from database import VendorDraft, VendorDraftField
+
+# Uploads held as bytes in the wizard, and the document each is stored as
+DOCUMENT_TYPES = {"gst_file": "gst_certificate", "pan_file": "pan_card", "cheque_file": "bank_document"}
+
+# Not saved as fields: file bytes and types, restored from the stored documents
+SKIPPED_FIELDS = {*DOCUMENT_TYPES, *(f"{field}_type" for field in DOCUMENT_TYPES)}
+
+# Wizard state saved next to v_data's fields
+WIZARD_FIELDS = ["step", "use_ai", "ai_extracted"]
+
+# Changes to these are saved without waiting for the autosave interval
+IMMEDIATE_FIELDS = {"step", "documents"}
+
+# Drafts per DELETE when purging
+PURGE_BATCH = 500
+
+
+def documents_dir(draft_id):
+    """Folder holding a draft's uploaded documents"""
+    return os.path.join(DOCUMENTS_DIR, "drafts", str(draft_id))
+
+
+# ============ AUTOSAVE ============
+def draft_fields(step, v_data, ai_extracted, use_ai):
+    """{field: JSON} of the wizard state, without the uploaded file bytes"""
+    state = {field: value for field, value in v_data.items() if field not in SKIPPED_FIELDS}
+    state.update(step=step, use_ai=use_ai, ai_extracted=ai_extracted)
+    return {field: json.dumps(value, sort_keys=True, default=str) for field, value in state.items()}
+
+
+def changed_fields(fields, saved):
+    """The fields whose JSON differs from what was last saved"""
+    return {field: value for field, value in fields.items() if saved.get(field) != value}
+
+
+def autosave_due(changed, last_saved_at):
+    """Whether to write the changed fields now rather than with a later rerun"""
+    if not changed:
+        return False
+    return bool(IMMEDIATE_FIELDS & changed.keys()) or time.time() - last_saved_at >= DRAFT_AUTOSAVE_SECONDS
+
+
+def create_draft(session, user_id):
+    """Start an empty draft for a user; returns its id"""
+    now = datetime.utcnow()
+    draft = VendorDraft(user_id=user_id, step=1, created_at=now, updated_at=now,
+                        expires_at=now + timedelta(days=DRAFT_EXPIRY_DAYS))
+    session.add(draft)
+    session.flush()
+    return draft.id
+
+
+def save_draft(session, draft_id, user_id, changed):
+    """Write the changed fields ({field: JSON}) of a user's draft and push back its expiry.
+    Returns (True, None), or (False, error) if the draft is gone (submitted, discarded or purged)."""
+    now = datetime.utcnow()
+    values = {"updated_at": now, "expires_at": now + timedelta(days=DRAFT_EXPIRY_DAYS)}
+    if "step" in changed:
+        values["step"] = json.loads(changed["step"])
+    if "trade_name" in changed:
+        values["title"] = (json.loads(changed["trade_name"]) or "")[:200] or None
+    # The UPDATE also locks the draft, so two tabs saving the same draft take turns
+    result = session.execute(update(VendorDraft)
+                             .where(VendorDraft.id == draft_id, VendorDraft.user_id == user_id)
+                             .values(**values))
+    if result.rowcount == 0:
+        return False, "This draft no longer exists"
+    session.execute(delete(VendorDraftField).where(VendorDraftField.draft_id == draft_id,
+                                                   VendorDraftField.field.in_(list(changed))))
+    session.execute(insert(VendorDraftField),
+                    [{"draft_id": draft_id, "field": field, "value": value} for field, value in changed.items()])
+    return True, None
+
+
+# ============ DOCUMENTS ============
+def store_document(draft_id, doc_type, file_bytes, file_type, previous=None):
+    """Reference {path, type, sha256} to an upload stored with the draft. The same file uploaded
+    again returns the previous reference (with its extracted text) without writing anything."""
+    sha256 = hashlib.sha256(file_bytes).hexdigest()
+    if previous and previous.get("sha256") == sha256 and os.path.exists(previous["path"]):
+        return previous
+    folder = documents_dir(draft_id)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{doc_type}.{file_type}")
+    with open(path, "wb") as f:
+        f.write(file_bytes)
+    if previous and previous.get("path") != path and os.path.exists(previous["path"]):
+        os.remove(previous["path"])
+    return {"path": path, "type": file_type, "sha256": sha256}
+
+
+def read_document(ref):
+    """Bytes of a stored draft document, or None if it is missing"""
+    if not ref or not os.path.exists(ref["path"]):
+        return None
+    with open(ref["path"], "rb") as f:
+        return f.read()
+
+
+def remove_documents(draft_ids):
+    """Delete the stored documents of drafts that were submitted, discarded or purged"""
+    for draft_id in draft_ids:
+        shutil.rmtree(documents_dir(draft_id), ignore_errors=True)
+
+
+# ============ RESUME ============
+def list_drafts(session, user_id):
+    """A user's drafts, latest first"""
+    rows = session.execute(select(VendorDraft.id, VendorDraft.title, VendorDraft.step, VendorDraft.updated_at)
+                           .where(VendorDraft.user_id == user_id)
+                           .order_by(VendorDraft.updated_at.desc())).all()
+    return [row._asdict() for row in rows]
+
+
+def load_draft(session, draft_id, user_id):
+    """(wizard state, None) to resume a user's draft, or (None, error). The state has step, use_ai,
+    ai_extracted, v_data (with the stored documents' bytes back in it) and saved ({field: JSON})."""
+    exists = session.scalar(select(VendorDraft.id).where(VendorDraft.id == draft_id, VendorDraft.user_id == user_id))
+    if exists is None:
+        return None, "This draft no longer exists"
+    saved = dict(session.execute(select(VendorDraftField.field, VendorDraftField.value)
+                                 .where(VendorDraftField.draft_id == draft_id)).all())
+    v_data = {field: json.loads(value) for field, value in saved.items() if field not in WIZARD_FIELDS}
+    for file_field, doc_type in DOCUMENT_TYPES.items():
+        ref = v_data.get("documents", {}).get(doc_type)
+        content = read_document(ref)
+        if content is not None:
+            v_data[file_field] = content
+            v_data[f"{file_field}_type"] = ref["type"]
+    state = {field: json.loads(saved[field]) for field in WIZARD_FIELDS if field in saved}
+    return {
+        "step": state.get("step", 1),
+        "use_ai": state.get("use_ai", False),
+        "ai_extracted": state.get("ai_extracted", {}),
+        "v_data": v_data,
+        "saved": saved,
+    }, None
+
+
+def delete_draft(session, draft_id, user_id):
+    """Delete a user's draft (discarded, or submitted as a vendor). Remove its documents with
+    remove_documents once the transaction has committed."""
+    deleted = session.execute(delete(VendorDraft)
+                              .where(VendorDraft.id == draft_id, VendorDraft.user_id == user_id)).rowcount
+    if deleted:
+        session.execute(delete(VendorDraftField).where(VendorDraftField.draft_id == draft_id))
+    return bool(deleted)
+
+
+# ============ SWEEPER ============
+def purge_expired(session, now=None):
+    """Delete drafts past their expiry; returns their ids, for remove_documents after commit"""
+    expired = session.scalars(select(VendorDraft.id).where(VendorDraft.expires_at < (now or datetime.utcnow()))).all()
+    for start in range(0, len(expired), PURGE_BATCH):
+        chunk = expired[start:start + PURGE_BATCH]
+        session.execute(delete(VendorDraftField).where(VendorDraftField.draft_id.in_(chunk)))
+        session.execute(delete(VendorDraft).where(VendorDraft.id.in_(chunk)))
+    return expired
+
+
+def orphaned_document_dirs(session):
+    """Draft ids with a documents folder but no draft (left behind if a removal failed)"""
+    root = os.path.join(DOCUMENTS_DIR, "drafts")
+    if not os.path.isdir(root):
+        return []
+    folders = {int(name) for name in os.listdir(root) if name.isdigit()}
+    live = set(session.scalars(select(VendorDraft.id).where(VendorDraft.id.in_(folders)))) if folders else set()
+    return sorted(folders - live)
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+
+    from database import User, write_session
+
+    parser = argparse.ArgumentParser(description="Vendor registration drafts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("purge", help=f"Delete drafts untouched for {DRAFT_EXPIRY_DAYS} days, with their documents")
+    sub.add_parser("list", help="Show the drafts in progress")
+    args = parser.parse_args()
+
+    if args.command == "purge":
+        with write_session() as session:
+            purged = purge_expired(session)
+        with write_session() as session:
+            orphans = orphaned_document_dirs(session)
+        remove_documents([*purged, *orphans])
+        print(f"Purged {len(purged):,} expired draft(s); removed {len(orphans):,} orphaned document folder(s)")
+    else:
+        with write_session() as session:
+            rows = session.execute(select(VendorDraft.id, User.username, VendorDraft.title, VendorDraft.step,
+                                          VendorDraft.updated_at, VendorDraft.expires_at)
+                                   .join(User, User.id == VendorDraft.user_id)
+                                   .order_by(VendorDraft.updated_at.desc())).all()
+        for draft_id, username, title, step, updated_at, expires_at in rows:
+            print(f"{draft_id:>6}  {username:<15} {(title or 'Untitled')[:40]:<40} step {step}  "
+                  f"saved {updated_at:%d-%m-%Y %H:%M}  expires {expires_at:%d-%m-%Y}")
+        print(f"{len(rows):,} draft(s)")
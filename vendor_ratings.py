@@ -0,0 +1,281 @@
+"""
+Vendor Ratings
+Prarthi ERP System
+
+Keeps the delivery, quality and pricing ratings of vendors in step with
+what they actually do, instead of the sliders set once at registration:
+- every MRV scores its delivery against the PO delivery date, and its
+  quality by the share of the material received that was accepted
+- every invoice against a PO scores its pricing by how far it bills above
+  the PO value
+
+Each event is logged in vendor_rating_events and added to the vendor's
+running sums in vendor_rating_stats. A rating is the exponentially decayed
+average of its event scores (half-life RATING_HALF_LIFE_DAYS). Weights are
+taken from a fixed epoch, 2 ^ (days since EPOCH / half-life), so the sums
+are never rescaled, events may arrive out of order, and a new event costs
+one upsert and one vendor UPDATE however long the vendor's history is.
+A dimension without events keeps the rating it had.
+
+rebuild recomputes every vendor's sums and ratings from the event log (for
+example after changing the half-life); --from-history first regenerates the
+log from all MRVs and invoices, to backfill ratings from past records.
+
+Usage:
+    python vendor_ratings.py rebuild [--from-history]
+    python vendor_ratings.py show V-0001
+"""
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, cast, delete, func, insert, select, String, update
+
+from database import (MaterialReceipt, MaterialReceiptLine, PurchaseOrder, Vendor, VendorInvoice, VendorRatingEvent,
+                      VendorRatingStat, add_rating_score, record_vendor_changes)
+
+DIMENSIONS = ["delivery", "quality", "pricing"]
+RATING_COLUMNS = {"delivery": "rating_delivery", "quality": "rating_quality", "pricing": "rating_pricing"}
+
+# An event counts half as much as one this many days newer
+RATING_HALF_LIFE_DAYS = 180
+EPOCH = date(2020, 1, 1)
+
+MIN_SCORE, MAX_SCORE = 1.0, 5.0
+# A delivery loses a point per week late; an invoice a point per 2% billed above the PO
+LATE_DAYS_PER_POINT = 7
+OVERBILLED_PERCENT_PER_POINT = 2
+
+# Rows per INSERT / UPDATE batch in rebuild, and event log rows summed per batch
+REBUILD_CHUNK = 20_000
+LOG_BATCH = 200_000
+
+
+# ============ SCORES ============
+def event_weight(event_date):
+    """Decay weight of an event dated event_date"""
+    return 2.0 ** ((event_date - EPOCH).days / RATING_HALF_LIFE_DAYS)
+
+
+def delivery_score(receipt_date, delivery_date):
+    """5 when received by the PO delivery date, a point less per LATE_DAYS_PER_POINT late"""
+    days_late = max((receipt_date - delivery_date).days, 0)
+    return max(MAX_SCORE - days_late / LATE_DAYS_PER_POINT, MIN_SCORE)
+
+
+def quality_score(lines):
+    """1 to 5 by the average share accepted of each line; lines are (accepted, rejected) pairs"""
+    shares = [accepted / (accepted + rejected) for accepted, rejected in lines if accepted + rejected > 0]
+    return MIN_SCORE + (MAX_SCORE - MIN_SCORE) * sum(shares) / len(shares)
+
+
+def pricing_score(amount, po_value, billed_before):
+    """5 while the PO's invoices stay within its value, a point less per OVERBILLED_PERCENT_PER_POINT above"""
+    over = amount - max(po_value - billed_before, 0)
+    if over <= 0 or po_value <= 0:
+        return MAX_SCORE
+    return max(MAX_SCORE - over / po_value * 100 / OVERBILLED_PERCENT_PER_POINT, MIN_SCORE)
+
+
+# ============ EVENTS ============
+def record_events(session, vendor_id, events):
+    """Log events [(dimension, score, event_date, reference)] of one vendor and update its ratings"""
+    if not events:
+        return
+    # Scores are kept as logged so that a rebuild from the log gives the same sums
+    events = [(dimension, round(score, 3), event_date, reference) for dimension, score, event_date, reference in events]
+    session.execute(insert(VendorRatingEvent), [
+        {"vendor_id": vendor_id, "dimension": dimension, "event_date": event_date, "score": score,
+         "reference": reference}
+        for dimension, score, event_date, reference in events
+    ])
+    ratings = {}
+    for dimension, score, event_date, _ in events:
+        weight = event_weight(event_date)
+        weighted_score, total_weight = add_rating_score(session, vendor_id, dimension, score * weight, weight)
+        ratings[RATING_COLUMNS[dimension]] = round(weighted_score / total_weight, 1)
+
+    current = session.execute(
+        select(Vendor.rating_delivery, Vendor.rating_quality, Vendor.rating_pricing).where(Vendor.id == vendor_id)
+    ).one()._asdict()
+    current.update(ratings)
+    session.execute(
+        update(Vendor).where(Vendor.id == vendor_id)
+        # modified_at is left alone: a rating change is not an edit and must not make open edits stale
+        .values(**ratings, rating_overall=round(sum(v or 0 for v in current.values()) / 3, 1),
+                modified_at=Vendor.modified_at)
+        .execution_options(synchronize_session=False)
+    )
+    record_vendor_changes(session, {vendor_id: "UPDATE"})
+
+
+def rate_receipt(session, vendor_id, receipt_date, delivery_date, lines, reference):
+    """Delivery (when the PO has a delivery date) and quality events of a posted MRV.
+    lines are (accepted, rejected) quantity pairs."""
+    events = [("quality", quality_score(lines), receipt_date, reference)]
+    if delivery_date:
+        events.append(("delivery", delivery_score(receipt_date, delivery_date), receipt_date, reference))
+    record_events(session, vendor_id, events)
+
+
+def rate_invoice(session, invoice):
+    """Pricing event of a recorded invoice against a PO"""
+    if not invoice.po_id:
+        return
+    po_value = session.scalar(select(PurchaseOrder.total_amount).where(PurchaseOrder.id == invoice.po_id)) or 0
+    billed_before = session.scalar(
+        select(func.coalesce(func.sum(VendorInvoice.amount), 0))
+        .where(VendorInvoice.po_id == invoice.po_id, VendorInvoice.id != invoice.id)
+    )
+    record_events(session, invoice.vendor_id, [
+        ("pricing", pricing_score(invoice.amount, po_value, billed_before), invoice.invoice_date,
+         invoice.invoice_number),
+    ])
+
+
+def vendor_rating_stats(session, vendor_id):
+    """{dimension: (rating, events)} of the dimensions a vendor has events in"""
+    return {
+        row.dimension: (round(row.weighted_score / row.weight, 1), row.events)
+        for row in session.execute(select(VendorRatingStat).where(VendorRatingStat.vendor_id == vendor_id)).scalars()
+    }
+
+
+# ============ REBUILD ============
+def _frame(session, statement, columns):
+    """DataFrame of a large SELECT, read through Core"""
+    return pd.DataFrame(session.connection().execute(statement).fetchall(), columns=columns)
+
+
+def history_events(session):
+    """Rating events of every MRV and invoice on record, as a DataFrame"""
+    receipts = _frame(session, (
+        select(MaterialReceipt.vendor_id, MaterialReceipt.receipt_date, PurchaseOrder.delivery_date,
+               MaterialReceipt.mrv_number)
+        .join(PurchaseOrder, PurchaseOrder.id == MaterialReceipt.po_id)
+        .where(PurchaseOrder.delivery_date.isnot(None))
+    ), ["vendor_id", "event_date", "delivery_date", "reference"])
+    days_late = (pd.to_datetime(receipts["event_date"]) - pd.to_datetime(receipts["delivery_date"])).dt.days
+    receipts["score"] = (MAX_SCORE - days_late.clip(lower=0) / LATE_DAYS_PER_POINT).clip(lower=MIN_SCORE)
+    receipts["dimension"] = "delivery"
+
+    lines = _frame(session, (
+        select(MaterialReceipt.vendor_id, MaterialReceipt.receipt_date, MaterialReceipt.mrv_number,
+               MaterialReceiptLine.quantity, func.coalesce(MaterialReceiptLine.rejected_quantity, 0))
+        .join(MaterialReceipt, MaterialReceipt.id == MaterialReceiptLine.mrv_id)
+    ), ["vendor_id", "event_date", "reference", "accepted", "rejected"])
+    lines = lines[lines["accepted"] + lines["rejected"] > 0]
+    lines["share"] = lines["accepted"] / (lines["accepted"] + lines["rejected"])
+    quality = lines.groupby(["vendor_id", "event_date", "reference"], as_index=False)["share"].mean()
+    quality["score"] = MIN_SCORE + (MAX_SCORE - MIN_SCORE) * quality.pop("share")
+    quality["dimension"] = "quality"
+
+    invoices = _frame(session, (
+        select(VendorInvoice.vendor_id, VendorInvoice.invoice_date, VendorInvoice.invoice_number,
+               VendorInvoice.po_id, VendorInvoice.amount, func.coalesce(PurchaseOrder.total_amount, 0))
+        .join(PurchaseOrder, PurchaseOrder.id == VendorInvoice.po_id)
+        .order_by(VendorInvoice.po_id, VendorInvoice.id)
+    ), ["vendor_id", "event_date", "reference", "po_id", "amount", "po_value"])
+    billed_before = invoices.groupby("po_id")["amount"].cumsum() - invoices["amount"]
+    over = invoices["amount"] - (invoices["po_value"] - billed_before).clip(lower=0)
+    percent_over = (over.clip(lower=0) / invoices["po_value"].where(invoices["po_value"] > 0) * 100).fillna(0)
+    invoices["score"] = (MAX_SCORE - percent_over / OVERBILLED_PERCENT_PER_POINT).clip(lower=MIN_SCORE)
+    invoices["dimension"] = "pricing"
+
+    columns = ["vendor_id", "dimension", "event_date", "score", "reference"]
+    return pd.concat([receipts[columns], quality[columns], invoices[columns]], ignore_index=True)
+
+
+def rebuild(session, from_history=False):
+    """Recompute every vendor's rating sums and ratings from the event log (regenerated from
+    MRVs and invoices first if from_history). Returns (events, vendors rated)."""
+    # Core statements throughout: ORM row handling would cost more than the work itself
+    connection = session.connection()
+    if from_history:
+        events = history_events(session)
+        connection.execute(delete(VendorRatingEvent))
+        records = events.assign(score=events["score"].round(3)).to_dict("records")
+        for start in range(0, len(records), REBUILD_CHUNK):
+            connection.execute(insert(VendorRatingEvent.__table__), records[start:start + REBUILD_CHUNK])
+
+    # The log is read in batches with dates as ISO text; each batch is weighted and summed per
+    # vendor and dimension with NumPy, so memory stays bounded however long the log is
+    result = connection.execute(
+        select(VendorRatingEvent.vendor_id, VendorRatingEvent.dimension, cast(VendorRatingEvent.event_date, String),
+               VendorRatingEvent.score).execution_options(yield_per=LOG_BATCH))
+    partial, events = [], 0
+    for rows in result.partitions():
+        vendor_ids, dimensions, dates, scores = zip(*rows)
+        days = (np.array(dates, dtype="datetime64[D]") - np.datetime64(EPOCH, "D")).astype(np.float64)
+        weight = np.exp2(days / RATING_HALF_LIFE_DAYS)
+        partial.append(pd.DataFrame({
+            "vendor_id": np.array(vendor_ids, dtype=np.int64), "dimension": dimensions,
+            "weighted_score": np.array(scores, dtype=np.float64) * weight, "weight": weight, "events": 1,
+        }).groupby(["vendor_id", "dimension"], as_index=False).sum())
+        events += len(rows)
+    if not partial:
+        return 0, 0
+    stats = pd.concat(partial).groupby(["vendor_id", "dimension"], as_index=False).sum()
+
+    connection.execute(delete(VendorRatingStat))
+    records = stats.to_dict("records")
+    stat_insert = insert(VendorRatingStat.__table__).values(updated_at=datetime.utcnow())
+    for start in range(0, len(records), REBUILD_CHUNK):
+        connection.execute(stat_insert, records[start:start + REBUILD_CHUNK])
+
+    # New ratings of the dimensions with events; the others keep theirs
+    ratings = (stats.assign(rating=(stats["weighted_score"] / stats["weight"]).round(1))
+               .pivot(index="vendor_id", columns="dimension", values="rating").rename(columns=RATING_COLUMNS))
+    current = _frame(session, select(Vendor.id, *(getattr(Vendor, c) for c in RATING_COLUMNS.values())),
+                     ["vendor_id", *RATING_COLUMNS.values()]).set_index("vendor_id")
+    ratings = ratings.reindex(columns=list(RATING_COLUMNS.values())).combine_first(current).loc[
+        current.index.intersection(ratings.index)].fillna(0)
+    ratings["rating_overall"] = ratings.mean(axis=1).round(1)
+
+    vendor_table = Vendor.__table__
+    records = [{"vendor": vendor_id, **row} for vendor_id, row in ratings.to_dict("index").items()]
+    for start in range(0, len(records), REBUILD_CHUNK):
+        connection.execute(
+            update(vendor_table).where(vendor_table.c.id == bindparam("vendor"))
+            .values(modified_at=vendor_table.c.modified_at),
+            records[start:start + REBUILD_CHUNK],
+        )
+    record_vendor_changes(session, {int(vendor_id): "UPDATE" for vendor_id in ratings.index})
+    return events, len(ratings)
+
+
+# ============ COMMAND LINE ============
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    from database import read_session, write_session
+
+    parser = argparse.ArgumentParser(description="Vendor ratings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="Recompute all ratings from the event log")
+    rebuild_cmd.add_argument("--from-history", action="store_true",
+                             help="Regenerate the event log from all MRVs and invoices first")
+    show_cmd = sub.add_parser("show", help="Print one vendor's ratings")
+    show_cmd.add_argument("vendor_code")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        started = time.perf_counter()
+        with write_session() as session:
+            events, vendors = rebuild(session, from_history=args.from_history)
+        print(f"{events:,} events, {vendors:,} vendors rated in {time.perf_counter() - started:.1f}s")
+    else:
+        with read_session() as session:
+            vendor = session.execute(select(Vendor).where(Vendor.vendor_code == args.vendor_code.upper())).scalar()
+            if vendor is None:
+                sys.exit(f"Vendor {args.vendor_code} not found")
+            stats = vendor_rating_stats(session, vendor.id)
+            for dimension in DIMENSIONS:
+                rating = getattr(vendor, RATING_COLUMNS[dimension]) or 0
+                events = stats.get(dimension, (None, 0))[1]
+                print(f"  {dimension:<10} {rating:>4.1f}  ({events:,} events)" if events
+                      else f"  {dimension:<10} {rating:>4.1f}  (as entered)")
+            print(f"  {'overall':<10} {vendor.rating_overall or 0:>4.1f}")
@@ -0,0 +1,140 @@
+"""
+Vendor Typeahead Search
+Prarthi ERP System
+
+Keeps a sorted table of prefix keys per vendor (code, GSTIN and normalized
+names starting at each word) so the vendor picker can fetch the top matches
+for what the user typed with a single index range scan, instead of sending
+every vendor to the browser.
+"""
+
+from sqlalchemy import delete, insert, select, tuple_
+
+from database import Vendor, VendorSearchKey
+from duplicates import normalize_name
+from telemetry import timed
+
+# Matches returned per lookup
+DEFAULT_LIMIT = 20
+
+# Names are also indexed from their 2nd, 3rd... word so "steel" finds "Shree Steel"
+MAX_NAME_SUFFIXES = 4
+
+
+def vendor_keys(vendor_code, gstin, legal_name, trade_name):
+    """Search keys for one vendor"""
+    keys = set()
+    if vendor_code:
+        code = vendor_code.strip().upper()
+        keys.add(code)
+        if "-" in code:
+            keys.add(code.split("-", 1)[1])
+    if gstin:
+        keys.add(gstin.strip().upper())
+    for name in (legal_name, trade_name):
+        words = normalize_name(name).split()
+        for i in range(min(len(words), MAX_NAME_SUFFIXES)):
+            keys.add(" ".join(words[i:])[:200])
+    keys.discard("")
+    return keys
+
+
+# ============ INDEX MAINTENANCE ============
+def remove_vendor_keys(session, vendor_id):
+    """Drop a vendor's search keys"""
+    session.execute(delete(VendorSearchKey).where(VendorSearchKey.vendor_id == vendor_id))
+
+
+def index_vendor_keys(session, vendor):
+    """(Re)index a vendor for typeahead. Call after the vendor has been flushed."""
+    remove_vendor_keys(session, vendor.id)
+    keys = vendor_keys(vendor.vendor_code, vendor.gstin, vendor.legal_name, vendor.trade_name)
+    if keys:
+        session.execute(insert(VendorSearchKey),
+                        [{"search_key": k, "vendor_id": vendor.id} for k in keys])
+
+
+def rebuild_search_index(session, batch_size=5000):
+    """Rebuild the typeahead index from the vendors table"""
+    session.execute(delete(VendorSearchKey))
+
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(Vendor.id, Vendor.vendor_code, Vendor.gstin, Vendor.legal_name, Vendor.trade_name)
+            .where(Vendor.id > last_id).order_by(Vendor.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        entries = [
+            {"search_key": k, "vendor_id": row[0]}
+            for row in rows
+            for k in vendor_keys(*row[1:])
+        ]
+        if entries:
+            session.execute(insert(VendorSearchKey), entries)
+        last_id = rows[-1][0]
+
+    session.commit()
+
+
+def ensure_search_index(session):
+    """Build the typeahead index once for databases that predate it"""
+    has_vendors = session.execute(select(Vendor.id).limit(1)).first()
+    has_keys = session.execute(select(VendorSearchKey.vendor_id).limit(1)).first()
+    if has_vendors and not has_keys:
+        rebuild_search_index(session)
+
+
+# ============ LOOKUP ============
+def _prefix_scan(session, prefix, limit, found):
+    """Walk keys starting with prefix in sorted order until limit vendors are found"""
+    upper = prefix + "\uffff"
+    last = None
+    while len(found) < limit:
+        query = (
+            select(VendorSearchKey.search_key, VendorSearchKey.vendor_id)
+            .where(VendorSearchKey.search_key >= prefix, VendorSearchKey.search_key < upper)
+            .order_by(VendorSearchKey.search_key, VendorSearchKey.vendor_id)
+            .limit(limit * 2)
+        )
+        if last is not None:
+            query = query.where(tuple_(VendorSearchKey.search_key, VendorSearchKey.vendor_id) > last)
+        rows = session.execute(query).all()
+        for key, vendor_id in rows:
+            if vendor_id not in found and len(found) < limit:
+                found[vendor_id] = key
+        if len(rows) < limit * 2:
+            break
+        last = tuple(rows[-1])
+
+
+@timed("vendor_lookup")
+def lookup_vendors(session, text, limit=DEFAULT_LIMIT):
+    """
+    Top matches for typed text, in key order.
+    Returns a list of (vendor_id, label) tuples.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+
+    found = {}
+    for prefix in dict.fromkeys([text.upper(), normalize_name(text)]):
+        if prefix:
+            _prefix_scan(session, prefix, limit, found)
+    if not found:
+        return []
+
+    rows = session.execute(
+        select(Vendor.id, Vendor.vendor_code, Vendor.trade_name, Vendor.legal_name)
+        .where(Vendor.id.in_(list(found)))
+    ).all()
+    labels = {r.id: vendor_label(r) for r in rows}
+    ordered = sorted(found, key=lambda vendor_id: found[vendor_id])
+    return [(vendor_id, labels[vendor_id]) for vendor_id in ordered if vendor_id in labels][:limit]
+
+
+def vendor_label(vendor):
+    """Label shown in the vendor picker"""
+    return f"{vendor.vendor_code} - {vendor.trade_name or vendor.legal_name}"
@@ -0,0 +1,220 @@
+"""
+Vendor Updates
+Prarthi ERP System
+
+Edits of a single vendor and bulk changes to vendors selected in the Vendor
+Library grid. Updates are optimistic: nothing is locked while a user has a
+vendor open. Every update bumps Vendor.version, and an edit is written with
+a compare-and-swap UPDATE ... WHERE id = :id AND version = :opened, so a
+concurrent edit is reported instead of silently overwritten. Bulk updates
+skip vendors modified after the grid was loaded.
+
+Only changed columns are written. Each update stores its field-level diff,
+{"changes": {field: [old, new]}}, as JSON in AuditLog.details; walking those
+diffs back from the current row reconstructs earlier versions of a vendor
+without keeping full row copies.
+"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import insert, or_, select, update
+
+from database import AuditLog, User, Vendor, record_vendor_changes
+from duplicates import index_vendor_names
+from telemetry import timed
+from vendor_search import index_vendor_keys
+
+# Fields the Library can change in bulk, with their labels
+BULK_FIELDS = {
+    "status": "Status",
+    "vendor_category": "Category",
+    "payment_terms": "Payment terms",
+    "credit_limit": "Credit limit",
+}
+
+# Fields editable on the vendor edit form. The vendor code, document paths and
+# audit columns are maintained by the app.
+EDITABLE_FIELDS = [
+    "legal_name", "trade_name", "gstin", "pan", "vendor_type", "vendor_category",
+    "company_email", "company_phone", "website",
+    "address_line1", "address_line2", "city", "state", "pin_code",
+    "bank_name", "bank_branch", "account_number", "ifsc_code", "account_type",
+    "payment_terms", "credit_days", "credit_limit",
+    "is_msme", "msme_number", "msme_category",
+    "status", "comments",
+]
+
+# Fields the duplicate detection and typeahead indexes are built from
+INDEXED_FIELDS = {"legal_name", "trade_name", "gstin"}
+
+# Vendor ids per IN (...) list
+ID_CHUNK = 500
+
+CONFLICT_MESSAGE = ("This vendor was changed by someone else after you opened it. "
+                    "Nothing was saved; reopen the vendor to see their changes.")
+
+
+def _not_modified_since(loaded_at):
+    """Vendors nobody has changed after loaded_at"""
+    return or_(Vendor.modified_at.is_(None), Vendor.modified_at <= loaded_at)
+
+
+@timed("vendor_bulk_update")
+def bulk_update_vendors(session, vendor_ids, changes, user_id, loaded_at):
+    """Set changes ({field: value}) on the given vendors, skipping any modified after loaded_at.
+    Returns ({"updated", "unchanged", "conflicts", "missing"}, error); nothing is written on error."""
+    unknown = sorted(set(changes) - set(BULK_FIELDS))
+    if unknown:
+        return None, f"These fields cannot be changed in bulk: {', '.join(unknown)}"
+    if not changes:
+        return None, "Choose at least one field to change"
+    vendor_ids = list(dict.fromkeys(int(vendor_id) for vendor_id in vendor_ids))
+    if not vendor_ids:
+        return None, "No vendors selected"
+
+    fields = list(changes)
+    now = datetime.utcnow()
+    result = {"updated": [], "unchanged": [], "conflicts": [], "missing": []}
+    audit_rows = []
+
+    for start in range(0, len(vendor_ids), ID_CHUNK):
+        chunk = vendor_ids[start:start + ID_CHUNK]
+        rows = session.execute(
+            select(Vendor.id, Vendor.vendor_code, Vendor.modified_at, *(getattr(Vendor, f) for f in fields))
+            .where(Vendor.id.in_(chunk))
+        ).all()
+
+        found = set()
+        to_update = []
+        for row in rows:
+            found.add(row.id)
+            if row.modified_at is not None and row.modified_at > loaded_at:
+                result["conflicts"].append(row.vendor_code)
+                continue
+            diff = {field: [old, changes[field]] for field, old in zip(fields, row[3:])
+                    if old != changes[field]}
+            if not diff:
+                result["unchanged"].append(row.id)
+                continue
+            to_update.append(row.id)
+            audit_rows.append({
+                "user_id": user_id, "action": "UPDATE", "table_name": "vendors", "record_id": row.id,
+                "details": json.dumps({"changes": diff, "bulk": len(vendor_ids)}), "timestamp": now,
+            })
+        result["missing"].extend(vendor_id for vendor_id in chunk if vendor_id not in found)
+
+        if not to_update:
+            continue
+        # Re-check the condition in the UPDATE: a vendor edited since the SELECT is not matched
+        written = session.execute(
+            update(Vendor)
+            .where(Vendor.id.in_(to_update), _not_modified_since(loaded_at))
+            .values(**changes, version=Vendor.version + 1, modified_by_id=user_id, modified_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if written != len(to_update):
+            session.rollback()
+            return None, "Some vendors were changed by someone else while saving. Nothing was updated; please try again."
+        result["updated"].extend(to_update)
+
+    if audit_rows:
+        session.execute(insert(AuditLog), audit_rows)
+        record_vendor_changes(session, dict.fromkeys(result["updated"], "UPDATE"))
+    return result, None
+
+
+# ============ SINGLE VENDOR EDIT ============
+def _blank_to_none(value):
+    """Treat empty form fields and NULL columns alike"""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def vendor_diff(current, values):
+    """{field: [old, new]} for the editable fields whose value differs"""
+    diff = {}
+    for field, value in values.items():
+        if field not in EDITABLE_FIELDS:
+            continue
+        old, new = _blank_to_none(current[field]), _blank_to_none(value)
+        # An unset column shown as 0 / unticked on the form is not a change
+        if old != new and (old or new):
+            diff[field] = [old, new]
+    return diff
+
+
+@timed("vendor_edit")
+def update_vendor(session, vendor_id, opened_version, values, user_id):
+    """Write the changed fields of one vendor if it is still at opened_version.
+    Returns ({"version", "changes"}, error); nothing is written on error."""
+    current = session.execute(select(Vendor.__table__).where(Vendor.id == vendor_id)).mappings().first()
+    if current is None:
+        return None, "This vendor no longer exists"
+    if current["version"] != opened_version:
+        return None, CONFLICT_MESSAGE
+    diff = vendor_diff(current, values)
+    if not diff:
+        return {"version": opened_version, "changes": {}}, None
+
+    now = datetime.utcnow()
+    written = session.execute(
+        update(Vendor)
+        .where(Vendor.id == vendor_id, Vendor.version == opened_version)
+        .values(**{field: new for field, (old, new) in diff.items()},
+                version=opened_version + 1, modified_by_id=user_id, modified_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if written != 1:
+        return None, CONFLICT_MESSAGE
+
+    session.execute(insert(AuditLog), [{
+        "user_id": user_id, "action": "UPDATE", "table_name": "vendors", "record_id": vendor_id,
+        "details": json.dumps({"changes": diff, "version": opened_version + 1}), "timestamp": now,
+    }])
+    record_vendor_changes(session, {vendor_id: "UPDATE"})
+    if INDEXED_FIELDS & diff.keys():
+        updated = SimpleNamespace(**dict(current, **{field: new for field, (old, new) in diff.items()}))
+        index_vendor_names(session, updated)
+        index_vendor_keys(session, updated)
+    return {"version": opened_version + 1, "changes": diff}, None
+
+
+# ============ HISTORY ============
+def _diff_from_details(details):
+    """Field diff stored by an update, or None for free-text audit entries"""
+    try:
+        parsed = json.loads(details or "")
+    except ValueError:
+        return None
+    return parsed.get("changes") if isinstance(parsed, dict) else None
+
+
+def vendor_history(session, vendor_id):
+    """Audit entries of a vendor, newest first, each with the changes it made and the
+    editable fields as they were right after it (reconstructed from the stored diffs)"""
+    current = session.execute(select(Vendor.__table__).where(Vendor.id == vendor_id)).mappings().first()
+    if current is None:
+        return []
+    entries = session.execute(
+        select(AuditLog.timestamp, AuditLog.action, AuditLog.details, User.full_name)
+        .outerjoin(User, User.id == AuditLog.user_id)
+        .where(AuditLog.table_name == "vendors", AuditLog.record_id == vendor_id)
+        .order_by(AuditLog.id.desc())
+    ).all()
+
+    state = {field: current[field] for field in EDITABLE_FIELDS}
+    history = []
+    for timestamp, action, details, user_name in entries:
+        changes = _diff_from_details(details)
+        history.append({"timestamp": timestamp, "action": action, "user": user_name,
+                        "changes": changes or {}, "details": None if changes else details,
+                        "state": dict(state)})
+        # Undo this entry's changes to get the state before it
+        for field, (old, new) in (changes or {}).items():
+            if field in state:
+                state[field] = old
+    return history